@@ -0,0 +1,253 @@
+# coding: utf-8
+#
+"""
+Throughput benchmark of `.reg` export.
+
+Export a subtree with `regfile.export_reg` to a temporary file and report
+MB/s of `.reg` output, keys, and fields.
+
+The subtree is read from:
+- A registry hive file if HIVE_FILE is given, e.g. a copy of `SOFTWARE`.
+- Otherwise a synthetic in-memory tree of KEY_COUNT keys, each with a mix of
+  string, dword, binary, and multi-string fields, so that only formatting,
+  encoding, and writing are measured.
+
+On Windows, `--live KEY_PATH` exports the live registry via
+`registry.export_reg` instead.
+
+Usage:
+    python benchmark/bench_export_reg.py [KEY_COUNT]
+    python benchmark/bench_export_reg.py --hive HIVE_FILE [KEY_PATH]
+    python benchmark/bench_export_reg.py --live KEY_PATH
+"""
+from __future__ import absolute_import
+
+import os
+import os.path
+import sys
+import tempfile
+import time
+
+
+#
+def _src_dir_add():
+    """
+    Add "src" directory to "sys.path".
+
+    @return: None.
+    """
+    # Get "src" directory path
+    src_dir = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        'src',
+    )
+
+    # If "src" directory path is not in "sys.path"
+    if src_dir not in sys.path:
+        # Add "src" directory to "sys.path"
+        sys.path.insert(0, src_dir)
+
+
+# Add "src" directory to "sys.path"
+_src_dir_add()
+
+# Import after "sys.path" is prepared
+from aoikregistryeditor.regfile import export_reg  # noqa: E402
+from aoikregistryeditor.regval import REG_BINARY  # noqa: E402
+from aoikregistryeditor.regval import REG_DWORD  # noqa: E402
+from aoikregistryeditor.regval import REG_MULTI_SZ  # noqa: E402
+from aoikregistryeditor.regval import REG_SZ  # noqa: E402
+from aoikregistryeditor.regval import RegVal  # noqa: E402
+
+
+#
+class SyntheticRegKey(object):
+    """
+    SyntheticRegKey is an in-memory key with the RegKey methods used by
+    `export_reg`. Key `Root` has `fanout` child keys, each having `fanout`
+    child keys, and so on until the key count is reached.
+    """
+
+    def __init__(self, index, key_count, fanout):
+        # Key index in breadth-first order
+        self._index = index
+
+        # Total number of keys
+        self._key_count = key_count
+
+        # Number of child keys per key
+        self._fanout = fanout
+
+    def iter_fields(self, start=0, limit=None, with_data=False):
+        # Yield fields of each type
+        yield RegVal(self, '', REG_SZ, 'Key {}'.format(self._index))
+        yield RegVal(
+            self, 'Path', REG_SZ,
+            'C:\\Program Files\\App{}\\bin\\app.exe'.format(self._index),
+        )
+        yield RegVal(self, 'Flags', REG_DWORD, self._index)
+        yield RegVal(self, 'Blob', REG_BINARY, bytes(range(64)))
+        yield RegVal(
+            self, 'List', REG_MULTI_SZ, ['alpha', 'beta', 'gamma']
+        )
+
+    def child_names(self):
+        # Get first child index
+        first = self._index * self._fanout + 1
+
+        # Return child key names
+        return [
+            'K{}'.format(x)
+            for x in range(first, min(first + self._fanout, self._key_count))
+        ]
+
+    def close(self):
+        pass
+
+
+#
+def synthetic_regkey_get_create(key_count, fanout=10):
+    """
+    Create RegKey getter function of a synthetic tree.
+
+    @param key_count: Number of keys.
+
+    @param fanout: Number of child keys per key.
+
+    @return: RegKey getter function.
+    """
+    # Create RegKey getter function
+    def regkey_get(path):
+        # Get key name
+        name = path.rpartition('\\')[2]
+
+        # Get key index
+        index = 0 if name == 'Root' else int(name[1:])
+
+        # Return SyntheticRegKey object
+        return SyntheticRegKey(index, key_count, fanout)
+
+    # Return RegKey getter function
+    return regkey_get
+
+
+#
+def main(args=None):
+    """
+    Benchmark entry function.
+
+    @param args: Command arguments list.
+
+    @return: Exit code.
+    """
+    # If arguments are not given
+    if args is None:
+        # Use command arguments
+        args = sys.argv[1:]
+
+    # Hive file to close after the benchmark, or None
+    hive = None
+
+    # If export live registry
+    if args and args[0] == '--live':
+        # Import live registry module, which requires pywin32
+        from aoikregistryeditor import registry
+
+        # Get key path
+        path = args[1]
+
+        # Create export function
+        def export_func(out_stream):
+            return registry.export_reg(path, out_stream)
+
+        # Get source label
+        label = 'live registry `{}`'.format(path)
+
+    # If export hive file
+    elif args and args[0] == '--hive':
+        # Import hive module
+        from aoikregistryeditor.hive import HiveFile
+
+        # Open the hive file
+        hive = HiveFile(args[1])
+
+        # Get key path
+        path = args[2] if len(args) > 2 else ''
+
+        # Create export function
+        def export_func(out_stream):
+            return export_reg(path, out_stream, regkey_get=hive.regkey_get)
+
+        # Get source label
+        label = 'hive file `{}`'.format(args[1])
+
+    # If export synthetic tree
+    else:
+        # Get number of keys
+        key_count = int(args[0]) if args else 100000
+
+        # Create RegKey getter function
+        regkey_get = synthetic_regkey_get_create(key_count)
+
+        # Create export function
+        def export_func(out_stream):
+            return export_reg('Root', out_stream, regkey_get=regkey_get)
+
+        # Get source label
+        label = 'synthetic tree of {} keys'.format(key_count)
+
+    # Create temporary file
+    fd, file_path = tempfile.mkstemp(suffix='.reg')
+
+    try:
+        # Open the temporary file
+        with os.fdopen(fd, 'wb') as out_stream:
+            # Get start time
+            start_time = time.perf_counter()
+
+            # Export
+            stats = export_func(out_stream)
+
+            # Flush to the OS so the write cost is counted
+            out_stream.flush()
+
+            # Get elapsed time
+            elapsed = time.perf_counter() - start_time
+
+    finally:
+        # Remove the temporary file
+        os.remove(file_path)
+
+        # If have hive file
+        if hive is not None:
+            # Close the hive file
+            hive.close()
+
+    # Get output size in MB
+    size_mb = stats['bytes'] / (1024 * 1024)
+
+    # Print result
+    sys.stdout.write(
+        'Source: {}\n'
+        'Keys: {}\n'
+        'Fields: {}\n'
+        'Output: {:.1f} MB\n'
+        'Time: {:.2f} s\n'
+        'Throughput: {:.1f} MB/s\n'.format(
+            label,
+            stats['keys'],
+            stats['values'],
+            size_mb,
+            elapsed,
+            size_mb / elapsed if elapsed > 0 else 0.0,
+        )
+    )
+
+    # Return exit code
+    return 0
+
+
+# If this module is the main module
+if __name__ == '__main__':
+    # Call "main" function
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# coding: utf-8
+#
+"""
+Memory benchmark of registry field containers.
+
+Compare bytes per field of:
+- A list of dict-backed RegVal objects, i.e. the layout before `__slots__`.
+- A list of slot-based RegVal objects.
+- A FieldTable without data column.
+- A FieldTable with data column.
+
+Field names and data are created before measuring, so only the containers'
+own memory is counted.
+
+Usage:
+    python benchmark/bench_field_memory.py [FIELD_COUNT]
+"""
+from __future__ import absolute_import
+
+from array import array
+import os.path
+import sys
+import tracemalloc
+
+
+#
+def _src_dir_add():
+    """
+    Add "src" directory to "sys.path".
+
+    @return: None.
+    """
+    # Get "src" directory path
+    src_dir = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        'src',
+    )
+
+    # If "src" directory path is not in "sys.path"
+    if src_dir not in sys.path:
+        # Add "src" directory to "sys.path"
+        sys.path.insert(0, src_dir)
+
+
+# Add "src" directory to "sys.path"
+_src_dir_add()
+
+# Import after "sys.path" is prepared
+from aoikregistryeditor.regval import FieldTable  # noqa: E402
+from aoikregistryeditor.regval import RegVal  # noqa: E402
+
+
+#
+class DictRegVal(object):
+    """
+    DictRegVal has the same attributes as RegVal, stored in an attribute dict
+    as RegVal did before using `__slots__`.
+    """
+
+    def __init__(self, regkey, name, type, data):
+        # RegKey object
+        self._regkey = regkey
+
+        # Field name
+        self._name = name
+
+        # Field type
+        self._type = type
+
+        # Field data
+        self._data = data
+
+
+#
+def measure(build_func):
+    """
+    Measure memory allocated by given build function and still referenced by
+    its result.
+
+    @param build_func: Build function that returns the container.
+
+    @return: A tuple: (container, bytes allocated).
+    """
+    # Start tracing
+    tracemalloc.start()
+
+    # Get memory before building
+    before, _ = tracemalloc.get_traced_memory()
+
+    # Build the container
+    container = build_func()
+
+    # Get memory after building
+    after, _ = tracemalloc.get_traced_memory()
+
+    # Stop tracing
+    tracemalloc.stop()
+
+    # Return the container and bytes allocated
+    return container, after - before
+
+
+#
+def main(args=None):
+    """
+    Benchmark entry function.
+
+    @param args: Command arguments list.
+
+    @return: Exit code.
+    """
+    # If arguments are not given
+    if args is None:
+        # Use command arguments
+        args = sys.argv[1:]
+
+    # Get number of fields
+    count = int(args[0]) if args else 50000
+
+    # Create field names
+    name_s = ['Value{:06d}'.format(x) for x in range(count)]
+
+    # Create field types
+    type_s = [1] * count
+
+    # Create field data
+    data_s = ['C:\\Windows\\System32\\x{}.dll'.format(x) for x in range(count)]
+
+    # Stand-in RegKey object
+    regkey = object()
+
+    # Cases list.
+    # Each case is a tuple: (label, build function).
+    case_s = [
+        (
+            'list of dict-backed RegVal',
+            lambda: [
+                DictRegVal(regkey, n, t, d)
+                for n, t, d in zip(name_s, type_s, data_s)
+            ],
+        ),
+        (
+            'list of slot-based RegVal',
+            lambda: [
+                RegVal(regkey, n, t, d)
+                for n, t, d in zip(name_s, type_s, data_s)
+            ],
+        ),
+        (
+            'FieldTable without data column',
+            lambda: FieldTable(
+                regkey, list(name_s), array('I', type_s), None
+            ),
+        ),
+        (
+            'FieldTable with data column',
+            lambda: FieldTable(
+                regkey, list(name_s), array('I', type_s), list(data_s)
+            ),
+        ),
+    ]
+
+    # Print header
+    sys.stdout.write('Fields: {}\n'.format(count))
+
+    # For each case
+    for label, build_func in case_s:
+        # Measure the case
+        container, size = measure(build_func)
+
+        # Print bytes per field
+        sys.stdout.write(
+            '{:<34} {:8.1f} bytes/field\n'.format(label, size / count)
+        )
+
+        # Release the container before the next case
+        del container
+
+    # Return exit code
+    return 0
+
+
+# If this module is the main module
+if __name__ == '__main__':
+    # Call "main" function
+    sys.exit(main())
@@ -0,0 +1,303 @@
+# coding: utf-8
+#
+"""
+Benchmark of regex search with literal prefilter against naive `re.search`.
+
+For each pattern, match all fields' raw data two ways and report time and
+hits:
+- Naive: decode every field's data, as `fields(with_data=True)` does, and
+  run `re.search` on every string.
+- Prefiltered: `search.RegexMatcher.raw_match`, which decodes only string
+  fields and runs the regex only on strings containing the pattern's
+  required literals.
+
+The fields are read from:
+- A snapshot file if SNAPSHOT_FILE is given, see `snapshot.SnapshotFile`.
+- Otherwise a synthetic list of KEY_COUNT keys' raw fields, with a mix of
+  paths, GUIDs, multi-strings, integers, and binary data.
+
+Usage:
+    python benchmark/bench_regex_search.py [KEY_COUNT] [-p PATTERN]...
+    python benchmark/bench_regex_search.py --snapshot SNAPSHOT_FILE
+        [-p PATTERN]...
+"""
+from __future__ import absolute_import
+
+import os.path
+import re
+import sys
+import time
+
+
+#
+def _src_dir_add():
+    """
+    Add "src" directory to "sys.path".
+
+    @return: None.
+    """
+    # Get "src" directory path
+    src_dir = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        'src',
+    )
+
+    # If "src" directory path is not in "sys.path"
+    if src_dir not in sys.path:
+        # Add "src" directory to "sys.path"
+        sys.path.insert(0, src_dir)
+
+
+# Add "src" directory to "sys.path"
+_src_dir_add()
+
+# Import after "sys.path" is prepared
+from aoikregistryeditor.regval import REG_BINARY  # noqa: E402
+from aoikregistryeditor.regval import REG_DWORD  # noqa: E402
+from aoikregistryeditor.regval import REG_EXPAND_SZ  # noqa: E402
+from aoikregistryeditor.regval import REG_MULTI_SZ  # noqa: E402
+from aoikregistryeditor.regval import REG_SZ  # noqa: E402
+from aoikregistryeditor.regval import data_decode  # noqa: E402
+from aoikregistryeditor.regval import data_encode  # noqa: E402
+from aoikregistryeditor.search import RegexMatcher  # noqa: E402
+
+
+# Default patterns
+_PATTERNS_DEFAULT = [
+    # GUID in braces
+    r'\{[0-9A-F]{8}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{4}-[0-9A-F]{12}\}',
+    # Path under a user profile
+    r'C:\\Users\\[^\\]+\\AppData\\',
+    # DLL in system directory, ignoring case
+    r'(?i)\\system32\\\w+\.dll$',
+    # Rare vendor name
+    r'Vendor4242\b',
+]
+
+
+#
+def synthetic_fields_create(key_count):
+    """
+    Create synthetic raw fields.
+
+    @param key_count: Number of keys.
+
+    @return: Raw fields list. Each item is a tuple: (type, raw_data).
+    """
+    # Raw fields list
+    field_s = []
+
+    # For each key index
+    for index in range(key_count):
+        # Create fields of each type
+        for type, data in [
+            (
+                REG_SZ,
+                'C:\\Program Files\\Vendor{0}\\bin\\app{0}.exe'.format(index),
+            ),
+            (
+                REG_SZ,
+                '{{{:08X}-1234-5678-9ABC-{:012X}}}'.format(index, index * 7),
+            ),
+            (
+                REG_EXPAND_SZ,
+                '%SystemRoot%\\System32\\lib{}.dll'.format(index),
+            ),
+            (
+                REG_SZ,
+                'C:\\Users\\user{}\\AppData\\Roaming\\App'.format(index)
+                if index % 50 == 0 else 'Application {}'.format(index),
+            ),
+            (REG_MULTI_SZ, ['alpha{}'.format(index), 'beta', 'gamma']),
+            (REG_DWORD, index),
+            (REG_BINARY, bytes(range(256))),
+        ]:
+            # Add the raw field
+            field_s.append((type, data_encode(type, data)))
+
+    # Return raw fields list
+    return field_s
+
+
+#
+def snapshot_fields_read(file_path):
+    """
+    Read raw fields of a snapshot file.
+
+    @param file_path: Snapshot file path.
+
+    @return: Raw fields list. Each item is a tuple: (type, raw_data).
+    """
+    # Import snapshot module
+    from aoikregistryeditor.snapshot import SnapshotFile
+
+    # Open the snapshot file
+    with SnapshotFile(file_path) as snapshot:
+        # Return raw fields, copied because the file is closed after
+        return [
+            (type, bytes(raw))
+            for _, _, _, raw_field_s in snapshot.iter_records()
+            for _, type, raw in raw_field_s
+        ]
+
+
+#
+def naive_count(regex, field_s):
+    """
+    Count matched fields by decoding every field and running the regex on
+    every string.
+
+    @param regex: Compiled regex.
+
+    @param field_s: Raw fields list.
+
+    @return: Number of matched fields.
+    """
+    # Number of matched fields
+    count = 0
+
+    # For each raw field
+    for type, raw in field_s:
+        # Decode the data
+        data = data_decode(type, raw)
+
+        # If the data is string
+        if isinstance(data, str):
+            # Match the string
+            matched = regex.search(data) is not None
+
+        # If the data is multi-string
+        elif isinstance(data, list):
+            # Match each string
+            matched = any(regex.search(x) is not None for x in data)
+
+        # If the data is something else
+        else:
+            # Set not matched
+            matched = False
+
+        # If matched
+        if matched:
+            # Increment number of matched fields
+            count += 1
+
+    # Return number of matched fields
+    return count
+
+
+#
+def prefiltered_count(matcher, field_s):
+    """
+    Count matched fields via `RegexMatcher.raw_match`.
+
+    @param matcher: RegexMatcher object.
+
+    @param field_s: Raw fields list.
+
+    @return: Number of matched fields.
+    """
+    # Get raw field data matcher function
+    raw_match = matcher.raw_match
+
+    # Return number of matched fields
+    return sum(1 for type, raw in field_s if raw_match(type, raw))
+
+
+#
+def main(args=None):
+    """
+    Benchmark entry function.
+
+    @param args: Command arguments list.
+
+    @return: Exit code.
+    """
+    # If arguments are not given
+    if args is None:
+        # Use command arguments
+        args = sys.argv[1:]
+
+    # Get patterns
+    pattern_s = [
+        args[index + 1] for index, arg in enumerate(args) if arg == '-p'
+    ] or _PATTERNS_DEFAULT
+
+    # Get arguments other than patterns
+    args = [
+        arg for index, arg in enumerate(args)
+        if arg != '-p' and (index == 0 or args[index - 1] != '-p')
+    ]
+
+    # If read snapshot file
+    if args and args[0] == '--snapshot':
+        # Read raw fields
+        field_s = snapshot_fields_read(args[1])
+
+        # Get source label
+        label = 'snapshot file `{}`'.format(args[1])
+
+    # If use synthetic fields
+    else:
+        # Get number of keys
+        key_count = int(args[0]) if args else 50000
+
+        # Create raw fields
+        field_s = synthetic_fields_create(key_count)
+
+        # Get source label
+        label = 'synthetic fields of {} keys'.format(key_count)
+
+    # Print source
+    sys.stdout.write(
+        'Source: {}\nFields: {}\n'.format(label, len(field_s))
+    )
+
+    # For each pattern
+    for pattern in pattern_s:
+        # Create regex matcher
+        matcher = RegexMatcher(pattern)
+
+        # Get start time
+        start_time = time.perf_counter()
+
+        # Count matched fields, naively
+        naive_hit_count = naive_count(re.compile(pattern), field_s)
+
+        # Get naive elapsed time
+        naive_elapsed = time.perf_counter() - start_time
+
+        # Get start time
+        start_time = time.perf_counter()
+
+        # Count matched fields, with prefilter
+        hit_count = prefiltered_count(matcher, field_s)
+
+        # Get prefiltered elapsed time
+        elapsed = time.perf_counter() - start_time
+
+        # Print result
+        sys.stdout.write(
+            '\nPattern: {}\n'
+            'Literals: {}\n'
+            'Hits: {} naive, {} prefiltered{}\n'
+            'Time: {:.3f} s naive, {:.3f} s prefiltered\n'
+            'Speedup: {:.1f}x\n'.format(
+                pattern,
+                matcher.literals(),
+                naive_hit_count,
+                hit_count,
+                '' if hit_count == naive_hit_count else ' (MISMATCH)',
+                naive_elapsed,
+                elapsed,
+                naive_elapsed / elapsed if elapsed > 0 else 0.0,
+            )
+        )
+
+    # Return exit code
+    return 0
+
+
+# If this module is the main module
+if __name__ == '__main__':
+    # Call "main" function
+    sys.exit(main())
@@ -0,0 +1,593 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+
+from win32con import KEY_READ
+
+from .registry import RegKey
+from .registry import regkey_child_names
+from .registry import regkey_get
+from .registry import walk as _walk
+from .registry_walker import WalkCancelToken
+
+
+# Default number of executor worker threads.
+# Registry calls block in the kernel without holding the GIL, so more
+# threads than CPUs help parallel reads of independent keys.
+_WORKERS_DEFAULT = min(32, (os.cpu_count() or 1) + 4)
+
+# Executor that runs blocking registry calls for the coroutines
+_EXECUTOR = ThreadPoolExecutor(max_workers=_WORKERS_DEFAULT)
+
+# Lock that guards replacing the executor
+_EXECUTOR_LOCK = threading.Lock()
+
+
+#
+def executor():
+    """
+    Get the executor that runs blocking registry calls for the coroutines.
+
+    @return: Executor object.
+    """
+    # Return the executor
+    return _EXECUTOR
+
+
+#
+def executor_set(workers):
+    """
+    Replace the executor with a new one bounded to given number of worker
+    threads. Calls already submitted to the old executor are completed.
+
+    @param workers: Number of worker threads.
+
+    @return: None.
+    """
+    global _EXECUTOR
+
+    with _EXECUTOR_LOCK:
+        # Get the old executor
+        old_executor = _EXECUTOR
+
+        # Create new executor
+        _EXECUTOR = ThreadPoolExecutor(max_workers=workers)
+
+    # Shut down the old executor without waiting for running calls
+    old_executor.shutdown(wait=False)
+
+
+#
+async def _run(func, *args, timeout=None, on_orphan=None):
+    """
+    Run a blocking function on the executor and wait for its result.
+
+    If the waiting coroutine is cancelled or times out, the call is cancelled
+    if it has not started. A call that has started cannot be interrupted; it
+    runs to completion in the worker thread and its result is given to
+    `on_orphan`, e.g. to close a RegKey object nobody will receive.
+
+    @param func: Blocking function.
+
+    @param args: Arguments for the function.
+
+    @param timeout: Timeout in seconds. None means no timeout.
+
+    @param on_orphan: Function taking the result of a call whose waiter has
+    gone. Called in the worker thread.
+
+    @return: The function's result. Raise `asyncio.TimeoutError` if timed
+    out, or the function's error.
+    """
+    # Submit the call to the executor
+    cfuture = _EXECUTOR.submit(func, *args)
+
+    try:
+        # Wait for the call's result
+        return await asyncio.wait_for(asyncio.wrap_future(cfuture), timeout)
+
+    # If the waiter is cancelled or timed out
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        # If the call has started, and have orphan result handler
+        if not cfuture.cancel() and on_orphan is not None:
+            # Give the call's result to the handler when the call is done
+            cfuture.add_done_callback(
+                lambda done_future: _orphan_handle(done_future, on_orphan)
+            )
+
+        # Propagate the error
+        raise
+
+
+#
+def _orphan_handle(cfuture, on_orphan):
+    """
+    Give an orphan call's result to the orphan result handler.
+
+    @param cfuture: Done future of the orphan call.
+
+    @param on_orphan: Orphan result handler.
+
+    @return: None.
+    """
+    # If the call has error
+    if cfuture.cancelled() or cfuture.exception() is not None:
+        # Have no result to handle
+        return
+
+    # If the call has no error.
+
+    try:
+        # Call the handler
+        on_orphan(cfuture.result())
+
+    # If have error
+    except Exception:
+        # Ignore
+        pass
+
+
+#
+def _regkey_close(regkey):
+    """
+    Close RegKey object if it is not None.
+
+    @param regkey: RegKey object, or None.
+
+    @return: None.
+    """
+    # If have RegKey object
+    if regkey is not None:
+        # Close the RegKey object
+        regkey.close()
+
+
+#
+async def aregkey_get(path, mask=None, pooled=True, timeout=None):
+    """
+    Coroutine version of `registry.regkey_get`.
+
+    @param path: Registry key path, or RegPath object.
+
+    @param mask: Permission mask.
+
+    @param pooled: Whether lease the registry key handle from the handle pool.
+
+    @param timeout: Timeout in seconds. None means no timeout.
+
+    @return: RegKey object, or None if failed getting the registry key handle.
+    The caller should close the RegKey object.
+    """
+    # Run `regkey_get` on the executor.
+    # If the caller has gone, close the RegKey object got.
+    return await _run(
+        lambda: regkey_get(path, mask=mask, pooled=pooled),
+        timeout=timeout,
+        on_orphan=_regkey_close,
+    )
+
+
+#
+def _fields_by_path(path, cached, as_table):
+    """
+    Open a key with read permission and get its fields with data loaded.
+
+    @param path: Registry key path.
+
+    @param cached: Whether reuse cached fields.
+
+    @param as_table: Whether return a FieldTable instead of a list.
+
+    @return: Key fields, or None if failed opening the key.
+    """
+    # Open the key
+    regkey = regkey_get(path, mask=KEY_READ)
+
+    # If failed opening the key
+    if regkey is None:
+        # Return None
+        return None
+
+    # If not failed opening the key.
+
+    try:
+        # Get fields with data loaded so that they can be used after the key
+        # is closed.
+        return regkey.fields(with_data=True, cached=cached, as_table=as_table)
+
+    finally:
+        # Close the key
+        regkey.close()
+
+
+#
+async def afields(
+    regkey,
+    with_data=False,
+    cached=False,
+    as_table=False,
+    timeout=None,
+):
+    """
+    Coroutine version of `RegKey.fields`.
+
+    @param regkey: RegKey object, or registry key path. If a path is given,
+    the key is opened with read permission and closed after the call, and
+    field data are always loaded.
+
+    @param with_data: Whether keep field data got in the enumeration pass.
+
+    @param cached: Whether reuse cached fields if the key's last write time
+    has not changed.
+
+    @param as_table: Whether return a FieldTable instead of a list.
+
+    @param timeout: Timeout in seconds. None means no timeout.
+
+    @return: Key fields list, or FieldTable if `as_table` is on. None if a
+    path is given and failed opening the key.
+    """
+    # If RegKey object is given
+    if isinstance(regkey, RegKey):
+        # Run `RegKey.fields` on the executor
+        return await _run(
+            lambda: regkey.fields(
+                with_data=with_data, cached=cached, as_table=as_table
+            ),
+            timeout=timeout,
+        )
+
+    # If registry key path is given.
+
+    # Run `_fields_by_path` on the executor
+    return await _run(
+        _fields_by_path, regkey, cached, as_table, timeout=timeout
+    )
+
+
+#
+async def achild_names(regkey, cached=True, timeout=None):
+    """
+    Coroutine version of `RegKey.child_names` and
+    `registry.regkey_child_names`.
+
+    @param regkey: RegKey object, or registry key path.
+
+    @param cached: Whether reuse cached child key names if the key's last
+    write time has not changed.
+
+    @param timeout: Timeout in seconds. None means no timeout.
+
+    @return: Child key names list. None if a path is given and failed opening
+    the key.
+    """
+    # If RegKey object is given
+    if isinstance(regkey, RegKey):
+        # Run `RegKey.child_names` on the executor
+        return await _run(
+            lambda: regkey.child_names(cached=cached), timeout=timeout
+        )
+
+    # If registry key path is given.
+
+    # Run `regkey_child_names` on the executor
+    return await _run(
+        lambda: regkey_child_names(regkey, cached=cached), timeout=timeout
+    )
+
+
+#
+def _field_write_by_path(path, name, type, data, notify):
+    """
+    Open a key and write a field.
+
+    @param path: Registry key path.
+
+    @param name: Field name.
+
+    @param type: Field type.
+
+    @param data: Field data.
+
+    @param notify: Whether request a `WM_SETTINGCHANGE` broadcast.
+
+    @return: Whether the operation is successful. False if failed opening the
+    key or failed writing.
+    """
+    # Open the key
+    regkey = regkey_get(path)
+
+    # If failed opening the key
+    if regkey is None:
+        # Return the operation is not successful
+        return False
+
+    # If not failed opening the key.
+
+    try:
+        # Write the field.
+        # Return whether the operation is successful.
+        return regkey.field_write(
+            name=name, type=type, data=data, notify=notify
+        )
+
+    finally:
+        # Close the key
+        regkey.close()
+
+
+#
+async def afield_write(
+    regkey,
+    name,
+    type,
+    data,
+    notify=True,
+    timeout=None,
+):
+    """
+    Coroutine version of `RegKey.field_write`.
+
+    Notice a write whose waiter is cancelled or times out after the write has
+    started still completes.
+
+    @param regkey: RegKey object, or registry key path.
+
+    @param name: Field name.
+
+    @param type: Field type.
+
+    @param data: Field data.
+
+    @param notify: Whether request a `WM_SETTINGCHANGE` broadcast.
+
+    @param timeout: Timeout in seconds. None means no timeout.
+
+    @return: Whether the operation is successful. False if a path is given
+    and failed opening the key, or failed writing.
+    """
+    # If RegKey object is given
+    if isinstance(regkey, RegKey):
+        # Run `RegKey.field_write` on the executor
+        return await _run(
+            lambda: regkey.field_write(
+                name=name, type=type, data=data, notify=notify
+            ),
+            timeout=timeout,
+        )
+
+    # If registry key path is given.
+
+    # Run `_field_write_by_path` on the executor
+    return await _run(
+        _field_write_by_path, regkey, name, type, data, notify,
+        timeout=timeout,
+    )
+
+
+#
+class AsyncWalk(object):
+    """
+    AsyncWalk is an async iterator over `registry.walk` results.
+
+    Each step advances the blocking walk generator on the executor. The walk
+    itself lists keys on its own bounded thread pool, so independent keys
+    are read in parallel.
+
+    If a step is cancelled or times out, the walk is cancelled and the
+    iterator is exhausted.
+    """
+
+    def __init__(
+        self,
+        path,
+        max_depth=None,
+        workers=None,
+        include_values=False,
+        on_error=None,
+        timeout=None,
+    ):
+        """
+        Initialize object.
+
+        @param path: Registry key path of the subtree's top key.
+
+        @param max_depth: Max depth to descend. None means no limit.
+
+        @param workers: Number of walk worker threads.
+
+        @param include_values: Whether list fields of each key.
+
+        @param on_error: Error callback taking arguments `(path, exc)`.
+        Called in an executor thread.
+
+        @param timeout: Timeout in seconds for each step. None means no
+        timeout.
+
+        @return: None.
+        """
+        # Cancel token of the walk
+        self._cancel_token = WalkCancelToken()
+
+        # Blocking walk generator
+        self._generator = _walk(
+            path,
+            max_depth=max_depth,
+            workers=workers,
+            include_values=include_values,
+            cancel_token=self._cancel_token,
+            on_error=on_error,
+        )
+
+        # Timeout in seconds for each step
+        self._timeout = timeout
+
+        # Whether the walk is done
+        self._done = False
+
+    def __aiter__(self):
+        """
+        Get async iterator.
+
+        @return: The object itself.
+        """
+        # Return the object itself
+        return self
+
+    async def __anext__(self):
+        """
+        Get next walk result.
+
+        @return: A tuple: (path, child_names, fields).
+        """
+        # If the walk is done
+        if self._done:
+            # Stop iteration
+            raise StopAsyncIteration()
+
+        # If the walk is not done.
+
+        try:
+            # Advance the walk generator on the executor
+            return await _run(
+                _walk_step, self._generator, timeout=self._timeout
+            )
+
+        # If the walk generator is exhausted
+        except StopAsyncIteration:
+            # Set done flag on
+            self._done = True
+
+            # Propagate the error
+            raise
+
+        # If the step is cancelled or timed out, or have error
+        except BaseException:
+            # Cancel the walk
+            self.cancel()
+
+            # Propagate the error
+            raise
+
+    def cancel(self):
+        """
+        Cancel the walk. The walk generator is closed in an executor thread
+        once any running step is done.
+
+        @return: None.
+        """
+        # If the walk is done
+        if self._done:
+            # Do nothing
+            return
+
+        # If the walk is not done.
+
+        # Set done flag on
+        self._done = True
+
+        # Cancel the walk
+        self._cancel_token.cancel()
+
+        # Close the walk generator on the executor.
+        # The executor runs it after any running step since a generator can
+        # not be closed while running in another thread.
+        _EXECUTOR.submit(_walk_close, self._generator)
+
+    async def aclose(self):
+        """
+        Cancel the walk.
+
+        @return: None.
+        """
+        # Cancel the walk
+        self.cancel()
+
+
+#
+def _walk_step(generator):
+    """
+    Advance a walk generator by one step. Run in an executor thread.
+
+    @param generator: Walk generator.
+
+    @return: Next walk result. Raise StopAsyncIteration if exhausted.
+    """
+    try:
+        # Return next walk result
+        return next(generator)
+
+    # If the generator is exhausted
+    except StopIteration:
+        # Raise StopAsyncIteration.
+        # StopIteration can not be propagated through a future.
+        raise StopAsyncIteration()
+
+
+#
+def _walk_close(generator):
+    """
+    Close a walk generator, retrying while it is running in another thread.
+
+    @param generator: Walk generator.
+
+    @return: None.
+    """
+    # Loop until closed
+    while True:
+        try:
+            # Close the generator
+            generator.close()
+
+            # Stop the loop
+            return
+
+        # If the generator is running in another thread
+        except ValueError:
+            # Wait a moment before retry.
+            # The running step returns soon because the walk is cancelled.
+            time.sleep(0.01)
+
+
+#
+def walk(
+    path,
+    max_depth=None,
+    workers=None,
+    include_values=False,
+    on_error=None,
+    timeout=None,
+):
+    """
+    Async version of `registry.walk`. Use with `async for`.
+
+    @param path: Registry key path of the subtree's top key.
+
+    @param max_depth: Max depth to descend. The top key is depth 0. None
+    means no limit.
+
+    @param workers: Number of walk worker threads. Default is number of CPUs.
+
+    @param include_values: Whether list fields of each key.
+
+    @param on_error: Error callback taking arguments `(path, exc)`.
+
+    @param timeout: Timeout in seconds for each step. None means no timeout.
+
+    @return: AsyncWalk object yielding tuples: (path, child_names, fields).
+    """
+    # Return AsyncWalk object
+    return AsyncWalk(
+        path,
+        max_depth=max_depth,
+        workers=workers,
+        include_values=include_values,
+        on_error=on_error,
+        timeout=timeout,
+    )
@@ -0,0 +1,466 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from collections import namedtuple
+from itertools import compress
+import re
+
+from .registry_walker import walk as _walk
+from .regpath import path_normalize
+from .regval import REG_BINARY
+from .regval import data_encode
+
+
+# Binary search hit.
+# `path` is the registry key path.
+# `name` and `type` are the field's name and type.
+# `offset` is the byte offset of the match in the field's data.
+BinaryHit = namedtuple('BinaryHit', ['path', 'name', 'type', 'offset'])
+
+# Default field types whose data are scanned
+BINARY_TYPES_DEFAULT = frozenset([REG_BINARY])
+
+# Default size in bytes of gathered field data that triggers a scan
+CHUNK_SIZE_DEFAULT = 4 * 1024 * 1024
+
+# Hex digits
+_HEX_DIGITS = '0123456789abcdefABCDEF'
+
+
+#
+def _nibble_class(token):
+    """
+    Create regex character class for a byte token with one wildcard nibble.
+
+    @param token: Two-character byte token, e.g. `4?` or `?D`.
+
+    @return: Bytes regex character class.
+    """
+    # If the high nibble is wildcard
+    if token[0] == '?':
+        # Get the low nibble
+        low = int(token[1], 16)
+
+        # Get bytes with the low nibble, any high nibble
+        value_s = [(high << 4) | low for high in range(16)]
+
+    # If the low nibble is wildcard
+    else:
+        # Get the high nibble
+        high = int(token[0], 16)
+
+        # Get bytes with the high nibble, any low nibble
+        value_s = [(high << 4) | low for low in range(16)]
+
+    # Return character class of the bytes
+    return b'[' + b''.join(re.escape(bytes([x])) for x in value_s) + b']'
+
+
+#
+def byte_pattern_compile(text):
+    """
+    Compile hex byte pattern into bytes regex.
+
+    The pattern is hex byte tokens, optionally separated by spaces, e.g.
+    `4D 5A ?? 00` or `4d5a??00`. `??` matches any byte. `4?` and `?D` match
+    any byte with the given high or low nibble.
+
+    @param text: Hex byte pattern.
+
+    @return: Compiled bytes regex, matching across newline bytes. Raise
+    ValueError if the pattern is not valid.
+    """
+    # Get pattern without spaces
+    hex_text = ''.join(text.split())
+
+    # If the pattern is empty, or has odd number of characters
+    if not hex_text or len(hex_text) % 2:
+        # Raise error
+        raise ValueError('Invalid byte pattern: `{}`.'.format(text))
+
+    # Regex parts
+    part_s = []
+
+    # For each byte token
+    for index in range(0, len(hex_text), 2):
+        # Get the byte token
+        token = hex_text[index:index + 2]
+
+        # If the token is any byte
+        if token == '??':
+            # Add any byte
+            part_s.append(b'.')
+
+        # If the token is a byte
+        elif token[0] in _HEX_DIGITS and token[1] in _HEX_DIGITS:
+            # Add the byte
+            part_s.append(re.escape(bytes([int(token, 16)])))
+
+        # If the token is a byte with one wildcard nibble
+        elif '?' in token and token.replace('?', '') in _HEX_DIGITS:
+            # Add character class of the bytes
+            part_s.append(_nibble_class(token))
+
+        # If the token is something else
+        else:
+            # Raise error
+            raise ValueError('Invalid byte pattern: `{}`.'.format(text))
+
+    # Return compiled bytes regex
+    return re.compile(b''.join(part_s), re.DOTALL)
+
+
+#
+class BinaryScanner(object):
+    """
+    BinaryScanner finds a byte pattern in many fields' data.
+
+    Field data are gathered in chunks, with a map from each chunk position
+    back to key path and field name, and each chunk is scanned by mapping
+    the regex search over it, so the loop runs in C and only fields having
+    a match cost Python code. The data are not copied into one buffer,
+    because the regex engine scans no faster over one buffer and the copy
+    would cost more than the per-field calls it saves.
+
+    Gathered data are scanned and released whenever they reach the chunk
+    size, so memory stays bounded by the chunk size plus the largest field's
+    data.
+    """
+
+    def __init__(self, pattern, chunk_size=None, all_matches=False):
+        """
+        Initialize object.
+
+        @param pattern: Hex byte pattern, see `byte_pattern_compile`, or
+        compiled bytes regex.
+
+        @param chunk_size: Size in bytes of gathered data that triggers a
+        scan. Default is `CHUNK_SIZE_DEFAULT`.
+
+        @param all_matches: Whether report every match offset in a field's
+        data, including overlapping matches. Default is report the first
+        match only.
+
+        @return: None. Raise ValueError if the pattern is not valid.
+        """
+        # Compiled bytes regex.
+        # May raise ValueError.
+        self._regex = pattern if not isinstance(pattern, str) \
+            else byte_pattern_compile(pattern)
+
+        # Chunk size in bytes
+        self._chunk_size = chunk_size \
+            if chunk_size is not None else CHUNK_SIZE_DEFAULT
+
+        # Whether report every match offset
+        self._all_matches = all_matches
+
+        # Gathered field data not scanned yet
+        self._raw_s = []
+
+        # Field references in same order as the gathered data.
+        # Each item is a tuple: (path, name, type).
+        self._ref_s = []
+
+        # Size in bytes of gathered data not scanned yet
+        self._pending_size = 0
+
+        # Number of bytes scanned
+        self._byte_count = 0
+
+    def byte_count(self):
+        """
+        Get number of bytes scanned.
+
+        @return: Number of bytes scanned.
+        """
+        # Return number of bytes scanned
+        return self._byte_count
+
+    def feed(self, path, name, type, raw):
+        """
+        Gather a field's data. Scan the gathered data if they reach the chunk
+        size.
+
+        @param path: Registry key path.
+
+        @param name: Field name.
+
+        @param type: Field type.
+
+        @param raw: Raw field data, a bytes-like object.
+
+        @return: BinaryHit objects list, found if the gathered data are
+        scanned.
+        """
+        # Gather the field's data
+        return self.feed_many([(path, name, type)], [raw])
+
+    def feed_many(self, ref_s, raw_s):
+        """
+        Gather fields' data, e.g. one key's fields. Scan the gathered data if
+        they reach the chunk size.
+
+        @param ref_s: Field references. Each item is a tuple:
+        (path, name, type).
+
+        @param raw_s: Raw field data in same order as the field references.
+        Each item is a bytes-like object.
+
+        @return: BinaryHit objects list, found if the gathered data are
+        scanned.
+        """
+        # Add the field references
+        self._ref_s.extend(ref_s)
+
+        # Add the fields' data
+        self._raw_s.extend(raw_s)
+
+        # Increase size of gathered data
+        self._pending_size += sum(map(len, raw_s))
+
+        # If the gathered data reach the chunk size
+        if self._pending_size >= self._chunk_size:
+            # Scan the gathered data
+            return self.flush()
+
+        # If the gathered data not reach the chunk size.
+
+        # Return no hits
+        return []
+
+    def flush(self):
+        """
+        Scan the gathered data and release them.
+
+        @return: BinaryHit objects list.
+        """
+        # If have no gathered data
+        if not self._raw_s:
+            # Return no hits
+            return []
+
+        # If have gathered data.
+
+        # Get gathered data and field references
+        raw_s = self._raw_s
+
+        ref_s = self._ref_s
+
+        # Count scanned bytes
+        self._byte_count += self._pending_size
+
+        # Release them from the object
+        self._raw_s = []
+
+        self._ref_s = []
+
+        self._pending_size = 0
+
+        # Get regex search function
+        search = self._regex.search
+
+        # Search each field's data.
+        # `map` runs the loop in C, so fields without match cost no Python
+        # code.
+        match_s = list(map(search, raw_s))
+
+        # Hits list
+        hit_s = []
+
+        # For the index of each field having a match
+        for index in compress(range(len(match_s)), match_s):
+            # Get the field reference
+            path, name, type = ref_s[index]
+
+            # Get the first match
+            match = match_s[index]
+
+            # While have match
+            while match is not None:
+                # Add hit
+                hit_s.append(BinaryHit(path, name, type, match.start()))
+
+                # If not report all matches
+                if not self._all_matches:
+                    # Stop the loop
+                    break
+
+                # Find next match, which may overlap
+                match = search(raw_s[index], match.start() + 1)
+
+        # Return hits list
+        return hit_s
+
+
+#
+def binary_search(
+    path_s,
+    pattern,
+    regkey_get,
+    types=None,
+    chunk_size=None,
+    all_matches=False,
+    workers=None,
+    cancel_token=None,
+    on_error=None,
+):
+    """
+    Search registry subtrees for a byte pattern in fields' data.
+
+    @param path_s: Registry key paths of the subtrees' top keys.
+
+    @param pattern: Hex byte pattern, see `byte_pattern_compile`.
+
+    @param regkey_get: RegKey getter function. It takes a registry key path
+    and returns a RegKey-compatible object, or None if failed.
+
+    @param types: Field types whose data are scanned. Default is
+    `BINARY_TYPES_DEFAULT`.
+
+    @param chunk_size: Size in bytes of gathered data that triggers a scan,
+    see `BinaryScanner`.
+
+    @param all_matches: Whether report every match offset in a field's data.
+
+    @param workers: Number of walk worker threads.
+
+    @param cancel_token: WalkCancelToken object to cancel the search.
+
+    @param on_error: Error callback taking arguments `(path, exc)`.
+
+    @return: Generator of BinaryHit objects, in batches as the gathered data
+    reach the chunk size.
+    Raise ValueError if the pattern is not valid.
+    """
+    # Create scanner.
+    # May raise ValueError.
+    scanner = BinaryScanner(
+        pattern, chunk_size=chunk_size, all_matches=all_matches
+    )
+
+    # Get field types to scan
+    type_s = types if types is not None else BINARY_TYPES_DEFAULT
+
+    # For each subtree's top key path
+    for path in path_s:
+        # For each key in the subtree
+        for key_path, _, field_s in _walk(
+            path,
+            regkey_get,
+            workers=workers,
+            include_values=True,
+            cancel_token=cancel_token,
+            on_error=on_error,
+        ):
+            # The key's field references to scan
+            ref_s = []
+
+            # The key's raw field data to scan
+            raw_s = []
+
+            # For each field's name, type, and data
+            for name, type, data in zip(
+                field_s.names(), field_s.types(), field_s.datas()
+            ):
+                # If the field type is to scan
+                if type in type_s:
+                    # Add the field reference
+                    ref_s.append((key_path, name, type))
+
+                    # Add raw data.
+                    # Data of types other than integers are bytes already.
+                    raw_s.append(
+                        data if isinstance(data, bytes)
+                        else data_encode(type, data)
+                    )
+
+            # If the key has fields to scan
+            if raw_s:
+                # For each hit found if the gathered data are scanned
+                for hit in scanner.feed_many(ref_s, raw_s):
+                    # Yield the hit
+                    yield hit
+
+    # For each hit in the rest of the gathered data
+    for hit in scanner.flush():
+        # Yield the hit
+        yield hit
+
+
+#
+def snapshot_binary_search(
+    snapshot,
+    pattern,
+    path=None,
+    types=None,
+    chunk_size=None,
+    all_matches=False,
+):
+    """
+    Search a snapshot's raw key records for a byte pattern in fields' data,
+    in one sequential pass without decoding.
+
+    @param snapshot: SnapshotFile object.
+
+    @param pattern: Hex byte pattern, see `byte_pattern_compile`.
+
+    @param path: Registry key path of the subtree to search in. Default is
+    the snapshot's root key path.
+
+    @param types: Field types whose data are scanned. Default is
+    `BINARY_TYPES_DEFAULT`.
+
+    @param chunk_size: Size in bytes of gathered data that triggers a scan,
+    see `BinaryScanner`.
+
+    @param all_matches: Whether report every match offset in a field's data.
+
+    @return: Generator of BinaryHit objects, in batches as the gathered data
+    reach the chunk size.
+    Raise ValueError if the pattern is not valid.
+    """
+    # Create scanner.
+    # May raise ValueError.
+    scanner = BinaryScanner(
+        pattern, chunk_size=chunk_size, all_matches=all_matches
+    )
+
+    # Get field types to scan
+    type_s = types if types is not None else BINARY_TYPES_DEFAULT
+
+    # Get casefolded subtree path, or None for the whole snapshot.
+    # Hive alias is resolved to match the snapshot's key paths.
+    path_key = path_normalize(path).casefold() if path is not None else None
+
+    # For each key record
+    for key_path, _, _, raw_field_s in snapshot.iter_records():
+        # If the key is not in the subtree
+        if path_key is not None:
+            # Get casefolded key path
+            key_path_key = key_path.casefold()
+
+            # If the key is not the subtree's top key or a descendant
+            if key_path_key != path_key \
+                    and not key_path_key.startswith(path_key + '\\'):
+                # Skip the key
+                continue
+
+        # Get the key's raw fields to scan
+        scan_field_s = [x for x in raw_field_s if x[1] in type_s]
+
+        # If the key has fields to scan
+        if scan_field_s:
+            # For each hit found if the gathered data are scanned
+            for hit in scanner.feed_many(
+                [(key_path, name, type) for name, type, _ in scan_field_s],
+                [x[2] for x in scan_field_s],
+            ):
+                # Yield the hit
+                yield hit
+
+    # For each hit in the rest of the gathered data
+    for hit in scanner.flush():
+        # Yield the hit
+        yield hit
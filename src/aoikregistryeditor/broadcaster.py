@@ -0,0 +1,226 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import threading
+import time
+
+
+#
+class DebouncedBroadcaster(object):
+    """
+    DebouncedBroadcaster coalesces bursts of broadcast requests into one
+    broadcast, sent from a background thread after no request has been made
+    for a quiet period.
+
+    The send function is given by the creator, e.g. a function sending
+    `WM_SETTINGCHANGE`, so that callers making requests are never blocked by
+    the broadcast.
+    """
+
+    # Default quiet period in seconds
+    QUIET_PERIOD_DEFAULT = 0.5
+
+    def __init__(self, send_func, quiet_period=None):
+        """
+        Initialize object.
+
+        @param send_func: Broadcast send function. It takes no arguments.
+
+        @param quiet_period: Quiet period in seconds. Default is
+        `QUIET_PERIOD_DEFAULT`.
+
+        @return: None.
+        """
+        # Broadcast send function
+        self._send_func = send_func
+
+        # Quiet period in seconds
+        self._quiet_period = quiet_period \
+            if quiet_period is not None else self.QUIET_PERIOD_DEFAULT
+
+        # Whether have a request not broadcast yet
+        self._pending = False
+
+        # Time of the last request
+        self._request_time = 0.0
+
+        # Number of requests
+        self._request_count = 0
+
+        # Number of broadcasts sent
+        self._send_count = 0
+
+        # Condition that guards the states above and wakes up the worker
+        self._cond = threading.Condition()
+
+        # Worker thread. Created on first request.
+        self._thread = None
+
+        # Lock that serializes calls to the send function
+        self._send_lock = threading.Lock()
+
+    def quiet_period(self):
+        """
+        Get quiet period in seconds.
+
+        @return: Quiet period in seconds.
+        """
+        # Return the quiet period
+        return self._quiet_period
+
+    def quiet_period_set(self, quiet_period):
+        """
+        Set quiet period in seconds.
+
+        @param quiet_period: Quiet period in seconds.
+
+        @return: None.
+        """
+        with self._cond:
+            # Set the quiet period
+            self._quiet_period = quiet_period
+
+            # Wake up the worker to use the new quiet period
+            self._cond.notify_all()
+
+    def pending(self):
+        """
+        Test whether have a request not broadcast yet.
+
+        @return: Boolean.
+        """
+        # Return whether have a request not broadcast yet
+        return self._pending
+
+    def stats(self):
+        """
+        Get broadcaster statistics dict.
+
+        @return: Broadcaster statistics dict.
+        """
+        with self._cond:
+            # Return broadcaster statistics dict
+            return {
+                'requests': self._request_count,
+                'sends': self._send_count,
+                'pending': self._pending,
+            }
+
+    def request(self):
+        """
+        Request a broadcast. Return immediately.
+
+        @return: None.
+        """
+        with self._cond:
+            # Set pending flag on
+            self._pending = True
+
+            # Store request time
+            self._request_time = time.monotonic()
+
+            # Increment request count
+            self._request_count += 1
+
+            # If the worker thread has not been started
+            if self._thread is None:
+                # Create worker thread
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='DebouncedBroadcaster',
+                )
+
+                # Do not keep the process alive for the worker thread.
+                # Call `flush` before exit to send pending broadcast.
+                self._thread.daemon = True
+
+                # Start the worker thread
+                self._thread.start()
+
+            # If the worker thread has been started
+            else:
+                # Wake up the worker to restart the quiet period
+                self._cond.notify_all()
+
+    def flush(self):
+        """
+        Send pending broadcast now, in the caller's thread.
+
+        @return: Whether a broadcast is sent.
+        """
+        with self._cond:
+            # If have no pending request
+            if not self._pending:
+                # Return no broadcast is sent
+                return False
+
+            # If have pending request.
+
+            # Set pending flag off
+            self._pending = False
+
+            # Wake up the worker so it stops waiting
+            self._cond.notify_all()
+
+        # Send broadcast
+        self._send()
+
+        # Return a broadcast is sent
+        return True
+
+    def _send(self):
+        """
+        Call the send function, ignoring error.
+
+        @return: None.
+        """
+        with self._send_lock:
+            try:
+                # Call the send function
+                self._send_func()
+
+            # If have error
+            except Exception:
+                # Ignore
+                pass
+
+        with self._cond:
+            # Increment send count
+            self._send_count += 1
+
+    def _run(self):
+        """
+        Worker thread function.
+
+        @return: None.
+        """
+        # Loop forever
+        while True:
+            with self._cond:
+                # While have no pending request
+                while not self._pending:
+                    # Wait for a request
+                    self._cond.wait()
+
+                # Get time left in the quiet period
+                time_left = \
+                    self._request_time + self._quiet_period - time.monotonic()
+
+                # If the quiet period has not ended
+                if time_left > 0:
+                    # Wait until the quiet period ends, or a new request
+                    # restarts it.
+                    self._cond.wait(time_left)
+
+                    # Check again
+                    continue
+
+                # If the quiet period has ended.
+
+                # Set pending flag off
+                self._pending = False
+
+            # Send broadcast outside the condition so that requests are not
+            # blocked by the broadcast.
+            self._send()
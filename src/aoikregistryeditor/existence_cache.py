@@ -0,0 +1,236 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import threading
+import time
+
+from .regpath import RegPath
+
+
+#
+class ExistenceCache(object):
+    """
+    ExistenceCache memoizes whether registry key paths exist, for a short
+    time to live, so that repeated checks of the same path, e.g. while the
+    path bar is being edited, do not open the key again.
+
+    A missing key implies its descendant keys are missing, so a lookup also
+    checks the path's ancestors. E.g. if `A\\B` is cached as missing, then
+    `A\\B\\C` is known missing without a registry call. Likewise an existing
+    key implies its ancestor keys exist.
+
+    A key that exists but can not be read, e.g. because access is denied, is
+    cached as existing and not readable. Lookups of the key itself answer
+    False, but it says nothing about its descendant keys.
+
+    Paths are compared as RegPath objects, so paths differing only in case
+    share one entry. Oldest entries are evicted when the number of entries
+    exceeds the capacity.
+    """
+
+    # Default time to live in seconds
+    TTL_DEFAULT = 2.0
+
+    # Default max number of entries
+    CAPACITY_DEFAULT = 4096
+
+    def __init__(self, ttl=None, capacity=None):
+        """
+        Initialize object.
+
+        @param ttl: Time to live of entries in seconds. Default is
+        `TTL_DEFAULT`.
+
+        @param capacity: Max number of entries. Default is
+        `CAPACITY_DEFAULT`.
+
+        @return: None.
+        """
+        # Time to live in seconds
+        self._ttl = ttl if ttl is not None else self.TTL_DEFAULT
+
+        # Max number of entries
+        self._capacity = capacity \
+            if capacity is not None else self.CAPACITY_DEFAULT
+
+        # Entries dict ordered from oldest to newest.
+        # Key is RegPath object.
+        # Value is a tuple: (exists, readable, expire_time).
+        self._entries = OrderedDict()
+
+        # Number of `get` calls answered from the entries
+        self._hits = 0
+
+        # Number of `get` calls not answered from the entries
+        self._misses = 0
+
+        # Lock that guards the entries dict and the counters
+        self._lock = threading.RLock()
+
+    def stats(self):
+        """
+        Get cache statistics dict.
+
+        @return: Cache statistics dict.
+        """
+        with self._lock:
+            # Return cache statistics dict
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'entries': len(self._entries),
+                'ttl': self._ttl,
+                'capacity': self._capacity,
+            }
+
+    def get(self, path):
+        """
+        Get whether a registry key path exists and is readable, from its own
+        entry or a missing ancestor's entry.
+
+        @param path: Registry key path, or RegPath object.
+
+        @return: True or False if known, or None if not known.
+        """
+        # Get RegPath object
+        regpath = RegPath.of(path)
+
+        # Get current time
+        now = time.monotonic()
+
+        with self._lock:
+            # Key path to look up, from the path up to the hive
+            node = regpath
+
+            # While the key path is not root key path
+            while not node.is_root():
+                # Get the key path's entry
+                entry = self._entries.get(node, None)
+
+                # If the entry is cached and not expired
+                if entry is not None and entry[2] > now:
+                    # If the entry is the path's own entry,
+                    # or the entry says the ancestor is missing.
+                    if node is regpath or not entry[0]:
+                        # Increment hit count
+                        self._hits += 1
+
+                        # Return whether the path exists and is readable
+                        return entry[1] if node is regpath else False
+
+                    # If an ancestor exists, it says nothing about the
+                    # path, and any entry further up says the ancestor's
+                    # ancestors exist.
+
+                    # Stop the loop
+                    break
+
+                # Move to parent key path
+                node = node.parent()
+
+            # Increment miss count
+            self._misses += 1
+
+            # Return not known
+            return None
+
+    def put(self, path, exists, readable=None):
+        """
+        Cache whether a registry key path exists.
+
+        Only cache a key as missing if opening it failed because it not
+        exists, because a missing key implies its descendant keys are missing.
+
+        @param path: Registry key path, or RegPath object.
+
+        @param exists: Whether the key exists.
+
+        @param readable: Whether the key is readable. Default is `exists`.
+
+        @return: None.
+        """
+        # If readable is not given
+        if readable is None:
+            # Use whether the key exists
+            readable = exists
+
+        # Get RegPath object
+        regpath = RegPath.of(path)
+
+        # If the path is root key path
+        if regpath.is_root():
+            # Do nothing because root key always exists
+            return
+
+        # If the path is not root key path.
+
+        with self._lock:
+            # If the key exists
+            if exists:
+                # Get parent key path
+                node = regpath.parent()
+
+                # While the key path is not root key path
+                while not node.is_root():
+                    # Get the ancestor's entry
+                    entry = self._entries.get(node, None)
+
+                    # If the ancestor is cached as missing
+                    if entry is not None and not entry[0]:
+                        # Remove the stale entry
+                        del self._entries[node]
+
+                    # Move to parent key path
+                    node = node.parent()
+
+            # Remove old entry so that the new entry is newest
+            self._entries.pop(regpath, None)
+
+            # Cache the entry
+            self._entries[regpath] = (
+                exists, readable, time.monotonic() + self._ttl
+            )
+
+            # While the number of entries exceeds the capacity
+            while len(self._entries) > self._capacity:
+                # Remove oldest entry
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path=None, subtree=False):
+        """
+        Remove cached entries.
+
+        @param path: Registry key path, or RegPath object. None means all
+        paths.
+
+        @param subtree: Whether also remove entries of descendant paths.
+
+        @return: None.
+        """
+        with self._lock:
+            # If path is not given
+            if path is None:
+                # Remove all entries
+                self._entries.clear()
+
+                # Return
+                return
+
+            # If path is given.
+
+            # Get RegPath object
+            path = RegPath.of(path)
+
+            # Remove the path's entry
+            self._entries.pop(path, None)
+
+            # If remove entries of descendant paths
+            if subtree:
+                # For each cached path
+                for entry_path in list(self._entries.keys()):
+                    # If the cached path is a descendant path
+                    if entry_path.is_within(path):
+                        # Remove the entry
+                        del self._entries[entry_path]
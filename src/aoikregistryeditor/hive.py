@@ -0,0 +1,1331 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from array import array
+import mmap
+import struct
+from sys import intern
+
+from .registry_walker import walk as _walk
+from .regval import FieldTable
+from .regval import RegKeyInfo
+from .regval import RegVal
+from .regval import data_decode
+
+
+# Base block size. Hive bins start after the base block, and cell offsets
+# are relative to the start of hive bins.
+_BASE_BLOCK_SIZE = 4096
+
+# Base block layout: signature, sequence numbers, timestamp, major version,
+# minor version, file type, file format, root cell offset, hive bins size.
+_BASE_BLOCK = struct.Struct('<4sIIQIIIIII')
+
+# Key node cell layout: signature, flags, last write time, access bits,
+# parent offset, subkey count, volatile subkey count, subkey list offset,
+# volatile subkey list offset, value count, value list offset, security
+# offset, class name offset, max subkey name length, max class name length,
+# max value name length, max value data size, work var, name length, class
+# name length. The name follows.
+_NK = struct.Struct('<2sHQIIIIIIIIIIIIIIIHH')
+
+# Value cell layout: signature, name length, data size, data offset, data
+# type, flags, spare. The name follows.
+_VK = struct.Struct('<2sHIIIHH')
+
+# Big data cell layout: signature, segment count, segment list offset
+_DB = struct.Struct('<2sHI')
+
+# Subkey list cell header layout: signature, entry count
+_LIST_HEADER = struct.Struct('<2sH')
+
+# Unsigned 32-bit integer
+_UINT32 = struct.Struct('<I')
+
+# Signed 32-bit integer
+_INT32 = struct.Struct('<i')
+
+# Offset meaning no cell
+_OFFSET_NONE = 0xFFFFFFFF
+
+# Key node flag meaning the name is stored as ASCII
+_KEY_COMP_NAME = 0x0020
+
+# Value flag meaning the name is stored as ASCII
+_VALUE_COMP_NAME = 0x0001
+
+# Data size bit meaning the data is stored in the data offset field
+_DATA_RESIDENT = 0x80000000
+
+# Max data size of one big data segment
+_DB_SEGMENT_SIZE = 16344
+
+# Max number of cached path lookups
+_PATH_CACHE_CAPACITY = 4096
+
+# Max key depth. The registry limits key trees to 512 levels.
+_MAX_DEPTH = 512
+
+
+#
+class HiveFile(object):
+    """
+    HiveFile opens a registry hive file, e.g. a collected `NTUSER.DAT` or
+    `SYSTEM` file, read-only via `mmap`.
+
+    Only the base block is parsed on open. Key and value cells are parsed
+    lazily via `memoryview` slices of the mapping when they are accessed, so
+    opening a large hive costs almost nothing.
+
+    Key paths are relative to the hive's root key, which has path `''`.
+
+    Transaction logs are not applied, so a dirty hive shows its state as of
+    the last flush.
+    """
+
+    class FormatError(ValueError):
+        """
+        Error raised when the hive file is not valid.
+        """
+        pass
+
+    # Root key path
+    ROOT = ''
+
+    def __init__(self, file_path):
+        """
+        Initialize object.
+
+        @param file_path: Hive file path.
+
+        @return: None. Raise `HiveFile.FormatError` if the file is not a hive
+        file, or OSError if failed opening the file.
+        """
+        # Hive file path
+        self._file_path = file_path
+
+        # Open the file
+        self._file = open(file_path, 'rb')
+
+        try:
+            # Map the file read-only
+            self._mmap = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+        # If have error, e.g. the file is empty
+        except ValueError:
+            # Close the file
+            self._file.close()
+
+            # Raise error
+            raise HiveFile.FormatError(
+                'Not a hive file: `{}`.'.format(file_path)
+            )
+
+        # View of the mapping
+        self._view = memoryview(self._mmap)
+
+        # Path lookup cache.
+        # Key is casefolded key path.
+        # Value is key node cell offset.
+        self._path_cache = {}
+
+        # Path index, e.g. HiveIndex object, used for path lookups not in the
+        # path lookup cache. None means descend the tree.
+        self._index = None
+
+        try:
+            # Parse the base block
+            self._base_block_parse()
+
+        # If have error
+        except Exception:
+            # Close the hive file
+            self.close()
+
+            # Propagate the error
+            raise
+
+    def _base_block_parse(self):
+        """
+        Parse the base block.
+
+        @return: None. Raise `HiveFile.FormatError` if not valid.
+        """
+        # If the file is smaller than the base block
+        if len(self._view) < _BASE_BLOCK_SIZE:
+            # Raise error
+            raise HiveFile.FormatError(
+                'Not a hive file: `{}`.'.format(self._file_path)
+            )
+
+        # Parse the base block
+        (
+            signature,
+            _,
+            _,
+            _,
+            major_version,
+            minor_version,
+            _,
+            _,
+            root_offset,
+            _,
+        ) = _BASE_BLOCK.unpack_from(self._view, 0)
+
+        # If the signature is not valid
+        if signature != b'regf':
+            # Raise error
+            raise HiveFile.FormatError(
+                'Not a hive file: `{}`.'.format(self._file_path)
+            )
+
+        # If the signature is valid.
+
+        # Version tuple
+        self._version = (major_version, minor_version)
+
+        # Root key node cell offset
+        self._root_offset = root_offset
+
+        # Check the root key node cell
+        self._nk_parse(root_offset)
+
+    def __enter__(self):
+        """
+        Enter context.
+
+        @return: The object itself.
+        """
+        # Return the object itself
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Exit context. Close the hive file.
+
+        @return: False, so that error raised in the block is propagated.
+        """
+        # Close the hive file
+        self.close()
+
+        # Propagate error raised in the block
+        return False
+
+    def file_path(self):
+        """
+        Get hive file path.
+
+        @return: Hive file path.
+        """
+        # Return the hive file path
+        return self._file_path
+
+    def version(self):
+        """
+        Get hive format version.
+
+        @return: A tuple: (major_version, minor_version).
+        """
+        # Return the version tuple
+        return self._version
+
+    def index(self):
+        """
+        Get path index.
+
+        @return: Path index, or None.
+        """
+        # Return the path index
+        return self._index
+
+    def index_set(self, index):
+        """
+        Set path index used for path lookups, e.g. HiveIndex object.
+
+        @param index: Path index with method `offset(path)` returning key node
+        cell offset or None. None means descend the tree.
+
+        @return: None.
+        """
+        # Set the path index
+        self._index = index
+
+        # Clear the path lookup cache
+        self._path_cache.clear()
+
+    def close(self):
+        """
+        Close the hive file. HiveRegKey objects can not be used after this.
+
+        @return: None.
+        """
+        # If the hive file has been closed
+        if self._view is None:
+            # Do nothing
+            return
+
+        # Release the view before closing the mapping it exports
+        self._view.release()
+
+        # Set the view to None
+        self._view = None
+
+        try:
+            # Close the mapping
+            self._mmap.close()
+
+        # If slices got by `HiveRegKey.field_raw` are still alive
+        except BufferError:
+            # Leave the mapping to be closed when the slices are released
+            pass
+
+        # Close the file
+        self._file.close()
+
+    def closed(self):
+        """
+        Test whether the hive file has been closed.
+
+        @return: Boolean.
+        """
+        # Return whether the hive file has been closed
+        return self._view is None
+
+    def _cell(self, offset):
+        """
+        Get a cell's data bounds.
+
+        @param offset: Cell offset, relative to the start of hive bins.
+
+        @return: A tuple: (data_start, data_end), absolute offsets in the
+        file. Raise `HiveFile.FormatError` if the cell is out of the file.
+        """
+        # Get absolute offset of the cell's size field
+        start = _BASE_BLOCK_SIZE + offset
+
+        # Get file size
+        file_size = len(self._view)
+
+        # If the size field is out of the file
+        if offset == _OFFSET_NONE or start + 4 > file_size:
+            # Raise error
+            raise HiveFile.FormatError(
+                'Invalid cell offset: {}'.format(offset)
+            )
+
+        # Get the cell size.
+        # It is negative if the cell is allocated.
+        size = abs(_INT32.unpack_from(self._view, start)[0])
+
+        # Get end offset
+        end = start + size
+
+        # If the cell is out of the file
+        if size < 4 or end > file_size:
+            # Raise error
+            raise HiveFile.FormatError(
+                'Invalid cell offset: {}'.format(offset)
+            )
+
+        # Return the cell's data bounds
+        return start + 4, end
+
+    def _nk_parse(self, offset):
+        """
+        Parse a key node cell's fixed part.
+
+        @param offset: Key node cell offset.
+
+        @return: Tuple unpacked via `_NK`, with the data start appended.
+        """
+        # Get the cell's data bounds
+        start, end = self._cell(offset)
+
+        # If the cell is too small
+        if end - start < _NK.size:
+            # Raise error
+            raise HiveFile.FormatError('Invalid key cell: {}'.format(offset))
+
+        # Parse the fixed part
+        nk_tuple = _NK.unpack_from(self._view, start)
+
+        # If the signature is not valid
+        if nk_tuple[0] != b'nk':
+            # Raise error
+            raise HiveFile.FormatError('Invalid key cell: {}'.format(offset))
+
+        # Return the parsed tuple with the data start
+        return nk_tuple + (start,)
+
+    def _name_decode(self, start, length, compressed):
+        """
+        Decode a key or value name.
+
+        @param start: Absolute offset of the name.
+
+        @param length: Name length in bytes.
+
+        @param compressed: Whether the name is stored as ASCII.
+
+        @return: Name string.
+        """
+        # Get the name bytes
+        name_bytes = self._view[start:start + length]
+
+        # If the name is stored as ASCII
+        if compressed:
+            # Decode as Latin-1, which maps each byte to one character
+            return str(name_bytes, 'latin-1')
+
+        # If the name is stored as UTF-16LE
+        else:
+            # Decode as UTF-16LE
+            return str(name_bytes, 'utf-16-le', 'replace')
+
+    def _nk_name(self, offset):
+        """
+        Get a key node's name.
+
+        @param offset: Key node cell offset.
+
+        @return: Key name.
+        """
+        # Parse the key node
+        nk_tuple = self._nk_parse(offset)
+
+        # Return the key name
+        return self._name_decode(
+            nk_tuple[-1] + _NK.size,
+            nk_tuple[18],
+            nk_tuple[1] & _KEY_COMP_NAME,
+        )
+
+    def _subkey_offsets(self, list_offset, depth=0):
+        """
+        Iterate child key node cell offsets in a subkey list.
+
+        @param list_offset: Subkey list cell offset.
+
+        @param depth: Index list nesting depth.
+
+        @return: Generator of key node cell offsets.
+        """
+        # If the list is empty
+        if list_offset == _OFFSET_NONE:
+            # Stop
+            return
+
+        # Get the cell's data bounds
+        start, end = self._cell(list_offset)
+
+        # Parse the list header
+        signature, count = _LIST_HEADER.unpack_from(self._view, start)
+
+        # Get entries start
+        entry_start = start + _LIST_HEADER.size
+
+        # If the list is fast leaf or hash leaf,
+        # each entry is key node offset followed by a name hint or hash.
+        if signature == b'lf' or signature == b'lh':
+            # Entry size
+            entry_size = 8
+
+        # If the list is index leaf or index root,
+        # each entry is an offset only.
+        elif signature == b'li' or signature == b'ri':
+            # Entry size
+            entry_size = 4
+
+        # If the list is not valid
+        else:
+            # Raise error
+            raise HiveFile.FormatError(
+                'Invalid subkey list cell: {}'.format(list_offset)
+            )
+
+        # If the entries are out of the cell
+        if entry_start + count * entry_size > end:
+            # Raise error
+            raise HiveFile.FormatError(
+                'Invalid subkey list cell: {}'.format(list_offset)
+            )
+
+        # For each entry
+        for index in range(count):
+            # Get the entry's offset
+            offset = _UINT32.unpack_from(
+                self._view, entry_start + index * entry_size
+            )[0]
+
+            # If the list is index root
+            if signature == b'ri':
+                # If index roots nest too deep, it means the hive is corrupt
+                if depth > 0:
+                    # Raise error
+                    raise HiveFile.FormatError(
+                        'Invalid subkey list cell: {}'.format(list_offset)
+                    )
+
+                # Yield key node offsets in the leaf list
+                for child_offset in self._subkey_offsets(offset, depth + 1):
+                    yield child_offset
+
+            # If the list is leaf list
+            else:
+                # Yield the key node offset
+                yield offset
+
+    def _vk_offsets(self, list_offset, count):
+        """
+        Get value cell offsets in a value list.
+
+        @param list_offset: Value list cell offset.
+
+        @param count: Number of values.
+
+        @return: Value cell offsets tuple.
+        """
+        # If have no values
+        if count == 0 or list_offset == _OFFSET_NONE:
+            # Return empty tuple
+            return ()
+
+        # Get the cell's data bounds
+        start, end = self._cell(list_offset)
+
+        # If the entries are out of the cell
+        if start + count * 4 > end:
+            # Raise error
+            raise HiveFile.FormatError(
+                'Invalid value list cell: {}'.format(list_offset)
+            )
+
+        # Return value cell offsets
+        return struct.unpack_from('<{}I'.format(count), self._view, start)
+
+    def _vk_parse(self, offset):
+        """
+        Parse a value cell's fixed part and name.
+
+        @param offset: Value cell offset.
+
+        @return: A tuple: (name, type, data_size, data_offset).
+        """
+        # Get the cell's data bounds
+        start, end = self._cell(offset)
+
+        # If the cell is too small
+        if end - start < _VK.size:
+            # Raise error
+            raise HiveFile.FormatError(
+                'Invalid value cell: {}'.format(offset)
+            )
+
+        # Parse the fixed part
+        (
+            signature,
+            name_len,
+            data_size,
+            data_offset,
+            type,
+            flags,
+            _,
+        ) = _VK.unpack_from(self._view, start)
+
+        # If the signature is not valid
+        if signature != b'vk':
+            # Raise error
+            raise HiveFile.FormatError(
+                'Invalid value cell: {}'.format(offset)
+            )
+
+        # Decode the name
+        name = self._name_decode(
+            start + _VK.size, name_len, flags & _VALUE_COMP_NAME
+        )
+
+        # If the data is stored in the data offset field
+        if data_size & _DATA_RESIDENT:
+            # Use absolute offset of the data offset field
+            data_offset = start + 8
+
+        # Return the parsed tuple
+        return name, type, data_size, data_offset
+
+    def _vk_data_raw(self, data_size, data_offset):
+        """
+        Get a value's raw data.
+
+        @param data_size: Data size field of the value cell.
+
+        @param data_offset: Data cell offset, or absolute offset of the data
+        offset field if the data is resident.
+
+        @return: Raw data, a `memoryview` slice if the data is in one cell,
+        otherwise bytes.
+        """
+        # If the data is stored in the data offset field
+        if data_size & _DATA_RESIDENT:
+            # Get data size
+            data_size &= ~_DATA_RESIDENT
+
+            # Return the data in the data offset field
+            return self._view[data_offset:data_offset + min(data_size, 4)]
+
+        # If have no data
+        if data_size == 0:
+            # Return empty data
+            return b''
+
+        # Get the data cell's bounds
+        start, end = self._cell(data_offset)
+
+        # If the data may be stored in big data segments
+        if data_size > _DB_SEGMENT_SIZE and self._version >= (1, 4) \
+                and self._view[start:start + 2] == b'db':
+            # Parse the big data cell
+            _, segment_count, segment_list_offset = \
+                _DB.unpack_from(self._view, start)
+
+            # Get the segment list cell's bounds
+            list_start, _ = self._cell(segment_list_offset)
+
+            # Data parts list
+            part_s = []
+
+            # Size left to read
+            size_left = data_size
+
+            # For each segment
+            for index in range(segment_count):
+                # If have read all data
+                if size_left <= 0:
+                    # Stop the loop
+                    break
+
+                # Get the segment's cell bounds
+                segment_start, segment_end = self._cell(
+                    _UINT32.unpack_from(self._view, list_start + index * 4)[0]
+                )
+
+                # Get the part size
+                part_size = min(
+                    size_left,
+                    _DB_SEGMENT_SIZE,
+                    segment_end - segment_start,
+                )
+
+                # Add the part
+                part_s.append(
+                    self._view[segment_start:segment_start + part_size]
+                )
+
+                # Decrease size left
+                size_left -= part_size
+
+            # Return the joined data
+            return b''.join(part_s)
+
+        # If the data is stored in one cell.
+
+        # Return the data
+        return self._view[start:min(end, start + data_size)]
+
+    def _child_offset(self, offset, child_name):
+        """
+        Find a child key node by name, ignoring case.
+
+        @param offset: Parent key node cell offset.
+
+        @param child_name: Child key name.
+
+        @return: Child key node cell offset, or None if not found.
+        """
+        # Get casefolded child name
+        child_name_key = child_name.casefold()
+
+        # Parse the parent key node
+        nk_tuple = self._nk_parse(offset)
+
+        # For each child key node offset
+        for child_offset in self._subkey_offsets(nk_tuple[7]):
+            # If the child key name matches
+            if self._nk_name(child_offset).casefold() == child_name_key:
+                # Return the child key node offset
+                return child_offset
+
+        # Return None
+        return None
+
+    def _path_offset(self, path):
+        """
+        Find a key node by path.
+
+        @param path: Key path relative to the hive's root key.
+
+        @return: Key node cell offset, or None if not found.
+        """
+        # If the path is root key path
+        if path == self.ROOT:
+            # Return root key node offset
+            return self._root_offset
+
+        # Get casefolded path as cache key
+        path_key = path.casefold()
+
+        # Get cached offset
+        offset = self._path_cache.get(path_key, None)
+
+        # If the offset is cached
+        if offset is not None:
+            # Return the offset
+            return offset
+
+        # If the offset is not cached.
+
+        # If have path index
+        if self._index is not None:
+            # Look up the path in the index
+            offset = self._index.offset(path)
+
+        # If have no path index
+        else:
+            # Split the path into parent path and child name
+            parent_path, _, child_name = path.rpartition('\\')
+
+            # Find the parent key node
+            parent_offset = self._path_offset(parent_path)
+
+            # If the parent key node is not found
+            if parent_offset is None:
+                # Return None
+                return None
+
+            # Find the child key node
+            offset = self._child_offset(parent_offset, child_name)
+
+        # If the child key node is found
+        if offset is not None:
+            # If the cache is full
+            if len(self._path_cache) >= _PATH_CACHE_CAPACITY:
+                # Clear the cache
+                self._path_cache.clear()
+
+            # Cache the offset
+            self._path_cache[path_key] = offset
+
+        # Return the offset
+        return offset
+
+    def _ancestor_offsets(self, path):
+        """
+        Get key node offsets of a key path and all its ancestors.
+
+        @param path: Key path relative to the hive's root key.
+
+        @return: Key node cell offsets set. Raise `HiveFile.FormatError` if
+        the path is too deep or a key on the path is not found.
+        """
+        # Offsets set, with the root key node offset
+        offset_s = {self._root_offset}
+
+        # If the path is root key path
+        if path == self.ROOT:
+            # Return the offsets set
+            return offset_s
+
+        # Split the path into key names
+        name_s = path.split('\\')
+
+        # If the path is too deep
+        if len(name_s) > _MAX_DEPTH:
+            # Raise error
+            raise HiveFile.FormatError(
+                'Key tree too deep: `{}`.'.format(path)
+            )
+
+        # For each ancestor key path, and the path itself
+        for index in range(1, len(name_s) + 1):
+            # Find the key node
+            offset = self._path_offset('\\'.join(name_s[:index]))
+
+            # If the key node is not found
+            if offset is None:
+                # Raise error
+                raise HiveFile.FormatError(
+                    'Key not found: `{}`.'.format(path)
+                )
+
+            # Add the offset
+            offset_s.add(offset)
+
+        # Return the offsets set
+        return offset_s
+
+    def key_nodes(self, path=''):
+        """
+        Iterate key nodes of a subtree in depth-first pre-order, in one
+        streaming pass without building the tree in memory.
+
+        @param path: Key path of the subtree's top key.
+
+        @return: Generator of tuples: (path, offset, value_count,
+        last_write_time). Raise `HiveFile.FormatError` if the hive file is
+        corrupt.
+        """
+        # Find the top key node
+        offset = self._path_offset(path)
+
+        # If the top key node is not found
+        if offset is None:
+            # Stop
+            return
+
+        # Key nodes to visit.
+        # Each item is a tuple: (path, offset, depth).
+        todo_s = [(path, offset, 0)]
+
+        # Offsets of key nodes visited.
+        # Each key node of a valid hive has only one parent, so a key node
+        # visited twice means a subkey list points back into the tree.
+        visited_offset_s = set()
+
+        # While have key nodes to visit
+        while todo_s:
+            # Get a key node to visit
+            key_path, offset, depth = todo_s.pop()
+
+            # If the key node is visited already
+            if offset in visited_offset_s:
+                # Raise error
+                raise HiveFile.FormatError(
+                    'Key cell visited twice: {}'.format(offset)
+                )
+
+            # If the depth exceeds the limit
+            if depth > _MAX_DEPTH:
+                # Raise error
+                raise HiveFile.FormatError(
+                    'Key tree too deep: `{}`.'.format(key_path)
+                )
+
+            # Mark the key node as visited
+            visited_offset_s.add(offset)
+
+            # Parse the key node
+            nk_tuple = self._nk_parse(offset)
+
+            # Yield the key node's path, offset, value count, and last write
+            # time.
+            yield key_path, offset, nk_tuple[9], nk_tuple[2]
+
+            # Get child key node offsets
+            child_offset_s = list(self._subkey_offsets(nk_tuple[7]))
+
+            # For each child key node offset, reversed so that the stack pops
+            # them in enumeration order
+            for child_offset in reversed(child_offset_s):
+                # Get child key name
+                child_name = self._nk_name(child_offset)
+
+                # Add the child key node to visit
+                todo_s.append((
+                    child_name if key_path == self.ROOT
+                    else key_path + '\\' + child_name,
+                    child_offset,
+                    depth + 1,
+                ))
+
+    def regkey_get(self, path=''):
+        """
+        Create HiveRegKey object for given key path.
+
+        @param path: Key path relative to the hive's root key.
+
+        @return: HiveRegKey object, or None if the key is not found or the
+        hive file is corrupt.
+        """
+        #
+        try:
+            # Find the key node
+            offset = self._path_offset(path)
+
+        # If have error
+        except (HiveFile.FormatError, struct.error):
+            # Return None
+            return None
+
+        # If the key node is not found
+        if offset is None:
+            # Return None
+            return None
+
+        # If the key node is found.
+
+        # Return HiveRegKey object
+        return HiveRegKey(hive=self, offset=offset, path=path)
+
+    def regkey_exists(self, path):
+        """
+        Test whether given key path exists.
+
+        @param path: Key path relative to the hive's root key.
+
+        @return: Boolean.
+        """
+        # Return whether the key is found
+        return self.regkey_get(path) is not None
+
+    def regkey_child_names(self, path):
+        """
+        Get given key path's child key names list.
+
+        @param path: Key path relative to the hive's root key.
+
+        @return: Child key names list, or None if the key is not found.
+        """
+        # Get HiveRegKey object
+        regkey = self.regkey_get(path)
+
+        # If the key is not found
+        if regkey is None:
+            # Return None
+            return None
+
+        # If the key is found.
+
+        # Return child key names list
+        return regkey.child_names()
+
+    def walk(
+        self,
+        path='',
+        max_depth=None,
+        workers=None,
+        include_values=False,
+        cancel_token=None,
+        on_error=None,
+    ):
+        """
+        Walk a subtree of the hive. See `registry_walker.walk`.
+
+        @param path: Key path of the subtree's top key, relative to the hive's
+        root key.
+
+        @param max_depth: Max depth to descend. The top key is depth 0. None
+        means no limit.
+
+        @param workers: Number of worker threads. Parsing holds the GIL, so
+        one worker is usually as fast as more. Default is 1.
+
+        @param include_values: Whether list fields of each key.
+
+        @param cancel_token: WalkCancelToken object to cancel the walk.
+
+        @param on_error: Error callback taking arguments `(path, exc)`. A key
+        whose subkey list points back to the key or one of its ancestors is
+        reported with `HiveFile.FormatError` and not descended.
+
+        @return: Generator of tuples: (path, child_names, fields).
+        """
+        # Return the walk generator
+        return _walk(
+            path,
+            regkey_get=self.regkey_get,
+            max_depth=max_depth,
+            workers=workers if workers is not None else 1,
+            include_values=include_values,
+            cancel_token=cancel_token,
+            on_error=on_error,
+        )
+
+
+#
+class HiveRegKey(object):
+    """
+    HiveRegKey represents a key in a hive file. It has the read methods of
+    `registry.RegKey`. Write methods raise ValueError.
+    """
+
+    # Root path
+    ROOT = HiveFile.ROOT
+
+    # Attribute slots
+    __slots__ = ('_hive', '_offset', '_path')
+
+    def __init__(self, hive, offset, path):
+        """
+        Initialize object.
+
+        @param hive: HiveFile object.
+
+        @param offset: Key node cell offset.
+
+        @param path: Key path relative to the hive's root key.
+
+        @return: None.
+        """
+        # HiveFile object
+        self._hive = hive
+
+        # Key node cell offset
+        self._offset = offset
+
+        # Key path
+        self._path = path
+
+    def __str__(self):
+        """
+        Get string of the object.
+
+        @return: String of the object.
+        """
+        # Return the key path
+        return self._path
+
+    def path(self):
+        """
+        Get key path.
+
+        @return: Key path
+        """
+        # Return the key path
+        return self._path
+
+    def hive(self):
+        """
+        Get HiveFile object.
+
+        @return: HiveFile object.
+        """
+        # Return the HiveFile object
+        return self._hive
+
+    def name(self):
+        """
+        Get key name as stored in the key node.
+
+        @return: Key name.
+        """
+        # Return the key name
+        return self._hive._nk_name(self._offset)
+
+    def info(self):
+        """
+        Get the key's metadata from the key node.
+
+        @return: RegKeyInfo object.
+        """
+        # Parse the key node
+        nk_tuple = self._hive._nk_parse(self._offset)
+
+        # Return RegKeyInfo object
+        return RegKeyInfo(
+            subkey_count=nk_tuple[5],
+            value_count=nk_tuple[9],
+            # The upper bits store other data since Windows Vista
+            max_subkey_name_len=nk_tuple[13] & 0xFFFF,
+            max_value_name_len=nk_tuple[15],
+            max_value_data_len=nk_tuple[16],
+            last_write_time=nk_tuple[2],
+        )
+
+    def child_names(self, cached=False):
+        """
+        Get child key names list.
+
+        @param cached: Not used. Hive files are not changed while open.
+
+        @return: Child key names list.
+        """
+        # Return child key names list
+        return list(self.iter_child_names())
+
+    def iter_child_names(self, start=0, limit=None):
+        """
+        Iterate child key names.
+
+        @param start: Index of the first child key.
+
+        @param limit: Max number of child key names. None means no limit.
+
+        @return: Generator of child key names. Raise `HiveFile.FormatError`
+        if a child key is the key itself or one of its ancestors.
+        """
+        # Get HiveFile object
+        hive = self._hive
+
+        # Parse the key node
+        nk_tuple = hive._nk_parse(self._offset)
+
+        # Get key node offsets of the key and its ancestors.
+        # A child key node among them means a subkey list points back into
+        # the tree, which would make walking the hive never end.
+        ancestor_offset_s = hive._ancestor_offsets(self._path)
+
+        # Number of child keys yielded
+        count = 0
+
+        # For each child key node offset
+        for index, child_offset in enumerate(
+                hive._subkey_offsets(nk_tuple[7])):
+            # If the child key node is the key or one of its ancestors
+            if child_offset in ancestor_offset_s:
+                # Raise error
+                raise HiveFile.FormatError(
+                    'Key cell is its own ancestor: {}'.format(child_offset)
+                )
+
+            # If the index is before the start index
+            if index < start:
+                # Skip
+                continue
+
+            # If reached the limit
+            if limit is not None and count >= limit:
+                # Stop the loop
+                break
+
+            # Yield the interned child key name
+            yield intern(hive._nk_name(child_offset))
+
+            # Increment count
+            count += 1
+
+    def child_paths(self):
+        """
+        Get child key paths list.
+
+        @return: Child key paths list.
+        """
+        # If the key is root key
+        if self._path == self.ROOT:
+            # Use child names as child paths
+            return self.child_names()
+
+        # If the key is not root key.
+
+        # Return child key paths list
+        return [self._path + '\\' + name for name in self.child_names()]
+
+    def _vk_offsets(self):
+        """
+        Get value cell offsets of the key.
+
+        @return: Value cell offsets tuple.
+        """
+        # Parse the key node
+        nk_tuple = self._hive._nk_parse(self._offset)
+
+        # Return value cell offsets
+        return self._hive._vk_offsets(nk_tuple[10], nk_tuple[9])
+
+    def iter_fields(self, start=0, limit=None, with_data=False):
+        """
+        Iterate fields. Each field is a RegVal object.
+
+        @param start: Index of the first field.
+
+        @param limit: Max number of fields. None means no limit.
+
+        @param with_data: Whether load field data in the RegVal objects.
+
+        @return: Generator of RegVal objects.
+        """
+        # Get value cell offsets
+        vk_offset_s = self._vk_offsets()
+
+        # Get stop index
+        stop = len(vk_offset_s) if limit is None \
+            else min(len(vk_offset_s), start + limit)
+
+        # For each value cell offset in the range
+        for vk_offset in vk_offset_s[start:stop]:
+            # Parse the value cell
+            name, type, data_size, data_offset = \
+                self._hive._vk_parse(vk_offset)
+
+            # Yield RegVal object
+            yield RegVal(
+                regkey=self,
+                name=name,
+                type=type,
+                data=data_decode(
+                    type, self._hive._vk_data_raw(data_size, data_offset)
+                ) if with_data else RegVal.DATA_NOT_LOADED,
+            )
+
+    def fields(self, with_data=False, cached=False, as_table=False):
+        """
+        Get key fields list. Each field is a RegVal object.
+
+        @param with_data: Whether load field data in the RegVal objects.
+
+        @param cached: Not used. Hive files are not changed while open.
+
+        @param as_table: Whether return a FieldTable instead of a list.
+
+        @return: Key fields list, or FieldTable if `as_table` is on.
+        """
+        # Get value cell offsets
+        vk_offset_s = self._vk_offsets()
+
+        # Get number of fields
+        field_count = len(vk_offset_s)
+
+        # Pre-size names column
+        name_s = [None] * field_count
+
+        # Pre-size types column
+        type_s = array('I', [0]) * field_count
+
+        # Pre-size data column
+        data_s = [None] * field_count if with_data else None
+
+        # For each value cell offset
+        for field_index, vk_offset in enumerate(vk_offset_s):
+            # Parse the value cell
+            name, type, data_size, data_offset = \
+                self._hive._vk_parse(vk_offset)
+
+            # Put the interned field name to names column
+            name_s[field_index] = intern(name)
+
+            # Put the field type to types column
+            type_s[field_index] = type
+
+            # If load field data
+            if data_s is not None:
+                # Put the field data to data column
+                data_s[field_index] = data_decode(
+                    type, self._hive._vk_data_raw(data_size, data_offset)
+                )
+
+        # Create field table
+        table = FieldTable(
+            regkey=self,
+            names=name_s,
+            types=type_s,
+            datas=data_s,
+        )
+
+        # Return the field table, or the RegVal objects list
+        return table if as_table else table.to_list()
+
+    def field_raw(self, name):
+        """
+        Get field type and raw data, without decoding.
+
+        @param name: Field name. Empty string means the default field.
+
+        @return: A tuple: (type, raw_data), or None if not found. `raw_data`
+        is a `memoryview` slice of the mapping or bytes.
+        """
+        # Get casefolded field name
+        name_key = name.casefold()
+
+        # For each value cell offset
+        for vk_offset in self._vk_offsets():
+            # Parse the value cell
+            vk_name, type, data_size, data_offset = \
+                self._hive._vk_parse(vk_offset)
+
+            # If the field name matches
+            if vk_name.casefold() == name_key:
+                # Return the type and raw data
+                return type, self._hive._vk_data_raw(data_size, data_offset)
+
+        # Return None
+        return None
+
+    def _field_data_type_tuple(self, name):
+        """
+        Get field data and type tuple: (data, type).
+
+        @return: Field data and type tuple: (data, type), or None if have
+        error.
+        """
+        #
+        try:
+            # Get field type and raw data
+            type_raw_tuple = self.field_raw(name)
+
+        # If have error
+        except (HiveFile.FormatError, struct.error):
+            # Return None
+            return None
+
+        # If the field is not found
+        if type_raw_tuple is None:
+            # Return None
+            return None
+
+        # If the field is found.
+
+        # Get field type and raw data
+        type, raw_data = type_raw_tuple
+
+        # Return field data and type tuple
+        return data_decode(type, raw_data), type
+
+    def field_type(self, name):
+        """
+        Get field type.
+
+        @param name: Field name.
+
+        @return: Field type, or None if have error.
+        """
+        # Get field data and type tuple
+        data_type_tuple = self._field_data_type_tuple(name)
+
+        # Return field type
+        return None if data_type_tuple is None else data_type_tuple[1]
+
+    def field_data(self, name):
+        """
+        Get field data.
+
+        @param name: Field name.
+
+        @return: Field data, or None if have error.
+        """
+        # Get field data and type tuple
+        data_type_tuple = self._field_data_type_tuple(name)
+
+        # Return field data
+        return None if data_type_tuple is None else data_type_tuple[0]
+
+    def field_write(self, name, type, data, notify=True):
+        """
+        Raise error because hive files are opened read-only.
+        """
+        # Raise error
+        raise ValueError('Hive file is read-only.')
+
+    def field_delete(self, name, notify=True):
+        """
+        Raise error because hive files are opened read-only.
+        """
+        # Raise error
+        raise ValueError('Hive file is read-only.')
+
+    def close(self):
+        """
+        Do nothing. The key node stays valid until the hive file is closed.
+
+        @return: None.
+        """
+        pass
+
+    def closed(self):
+        """
+        Test whether the hive file has been closed.
+
+        @return: Boolean.
+        """
+        # Return whether the hive file has been closed
+        return self._hive.closed()
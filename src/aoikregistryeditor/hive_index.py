@@ -0,0 +1,359 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+
+# Index schema version. Indexes of other versions are rebuilt.
+_SCHEMA_VERSION = '1'
+
+# Number of rows inserted per batch when building
+_BUILD_BATCH_SIZE = 10000
+
+# Number of leading bytes of the indexed file that are hashed. For hive
+# files this is the base block, whose sequence numbers and timestamp change
+# on every write.
+_HASH_SIZE = 4096
+
+# SQL inserting a key row.
+# Casefolded paths of sibling keys may collide in rare cases, e.g. `ß` and
+# `ss`. The first key wins.
+_KEY_INSERT_SQL = 'INSERT OR IGNORE INTO keys VALUES (?, ?, ?, ?, ?, ?)'
+
+
+#
+def file_identity(file_path):
+    """
+    Get identity of a file, used to tell whether an index is still valid.
+
+    @param file_path: File path.
+
+    @return: Identity string made of the file's size, modification time, and
+    hash of its leading bytes.
+    """
+    # Get file status
+    stat = os.stat(file_path)
+
+    # Create hasher
+    hasher = hashlib.sha1()
+
+    # Open the file
+    with open(file_path, 'rb') as file:
+        # Hash the leading bytes
+        hasher.update(file.read(_HASH_SIZE))
+
+    # Return the identity string
+    return '{}:{}:{}'.format(
+        stat.st_size, stat.st_mtime_ns, hasher.hexdigest()
+    )
+
+
+#
+class HiveIndex(object):
+    """
+    HiveIndex is an on-disk SQLite index of a hive file's key paths. It maps
+    casefolded key paths to key node cell offsets, value counts, and last
+    write times, and indexes key names for lookups by name.
+
+    The index is built in one streaming pass over the hive the first time,
+    and reused on later opens as long as the hive file's identity, see
+    `file_identity`, has not changed.
+
+    Set it to a HiveFile via `HiveFile.index_set` so that path lookups become
+    indexed queries instead of descending the tree.
+    """
+
+    def __init__(self, hive, index_path=None, rebuild=False):
+        """
+        Initialize object. Open the index file, building it if it not exists
+        or is stale.
+
+        @param hive: HiveFile object.
+
+        @param index_path: Index file path. Default is the hive file path
+        plus `.index.sqlite`.
+
+        @param rebuild: Whether rebuild the index even if it is valid.
+
+        @return: None.
+        """
+        # HiveFile object
+        self._hive = hive
+
+        # Index file path
+        self._index_path = index_path if index_path is not None \
+            else hive.file_path() + '.index.sqlite'
+
+        # Lock that serializes queries, because walk worker threads may look
+        # up paths concurrently.
+        self._lock = threading.Lock()
+
+        # Get the hive file's identity
+        identity = file_identity(hive.file_path())
+
+        # Connection
+        self._conn = None
+
+        # If not rebuild
+        if not rebuild:
+            # Open the index file if it is valid
+            self._conn = self._open_valid(identity)
+
+        # If the index file is not opened
+        if self._conn is None:
+            # Build the index file
+            self._build(identity)
+
+            # Open the index file
+            self._conn = self._open_valid(identity)
+
+            # If the index file is still not valid
+            if self._conn is None:
+                # Raise error
+                raise ValueError(
+                    'Failed building index: `{}`.'.format(self._index_path)
+                )
+
+    def _open_valid(self, identity):
+        """
+        Open the index file if it exists and matches the hive file.
+
+        @param identity: The hive file's identity.
+
+        @return: Connection, or None if the index file not exists or is stale.
+        """
+        # If the index file not exists
+        if not os.path.isfile(self._index_path):
+            # Return None
+            return None
+
+        # If the index file exists.
+
+        # Open the index file.
+        # The connection is used from multiple threads under the lock.
+        conn = sqlite3.connect(self._index_path, check_same_thread=False)
+
+        try:
+            # Get meta dict
+            meta = dict(conn.execute('SELECT key, value FROM meta'))
+
+        # If have error, e.g. the file is not an index file
+        except sqlite3.DatabaseError:
+            # Set meta dict to empty
+            meta = {}
+
+        # If the index matches the schema version and the hive file
+        if meta.get('schema_version') == _SCHEMA_VERSION \
+                and meta.get('identity') == identity:
+            # Return the connection
+            return conn
+
+        # If the index is stale.
+
+        # Close the connection
+        conn.close()
+
+        # Return None
+        return None
+
+    def _build(self, identity):
+        """
+        Build the index file in one streaming pass over the hive.
+
+        The index is written to a temporary file that replaces the index file
+        only when complete, so an interrupted build leaves no stale index.
+
+        @param identity: The hive file's identity.
+
+        @return: None.
+        """
+        # Get temporary file path
+        tmp_path = self._index_path + '.tmp'
+
+        # If the temporary file exists
+        if os.path.exists(tmp_path):
+            # Remove the temporary file
+            os.remove(tmp_path)
+
+        # Create the temporary file
+        conn = sqlite3.connect(tmp_path)
+
+        try:
+            # Create tables
+            conn.executescript(
+                """
+                PRAGMA journal_mode = OFF;
+                PRAGMA synchronous = OFF;
+                CREATE TABLE meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                CREATE TABLE keys (
+                    path_key TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    name_key TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    value_count INTEGER NOT NULL,
+                    last_write_time INTEGER NOT NULL
+                ) WITHOUT ROWID;
+                """
+            )
+
+            # Rows batch
+            row_s = []
+
+            # For each key node of the hive, in one streaming pass
+            for path, offset, value_count, last_write_time in \
+                    self._hive.key_nodes():
+                # Get casefolded path
+                path_key = path.casefold()
+
+                # Add the row
+                row_s.append((
+                    path_key,
+                    path,
+                    path_key.rpartition('\\')[2],
+                    offset,
+                    value_count,
+                    last_write_time,
+                ))
+
+                # If the batch is full
+                if len(row_s) >= _BUILD_BATCH_SIZE:
+                    # Insert the batch
+                    conn.executemany(_KEY_INSERT_SQL, row_s)
+
+                    # Clear the batch
+                    row_s = []
+
+            # Insert the last batch
+            conn.executemany(_KEY_INSERT_SQL, row_s)
+
+            # Create name index after inserting, which is faster than
+            # updating it per row.
+            conn.execute('CREATE INDEX keys_name_key ON keys (name_key)')
+
+            # Store meta
+            conn.executemany(
+                'INSERT INTO meta VALUES (?, ?)',
+                [
+                    ('schema_version', _SCHEMA_VERSION),
+                    ('identity', identity),
+                ],
+            )
+
+            # Commit
+            conn.commit()
+
+        # If have error, e.g. the hive file is corrupt
+        except Exception:
+            # Close the connection
+            conn.close()
+
+            # Remove the temporary file
+            os.remove(tmp_path)
+
+            # Propagate the error
+            raise
+
+        finally:
+            # Close the connection
+            conn.close()
+
+        # Replace the index file with the temporary file
+        os.replace(tmp_path, self._index_path)
+
+    def index_path(self):
+        """
+        Get index file path.
+
+        @return: Index file path.
+        """
+        # Return the index file path
+        return self._index_path
+
+    def close(self):
+        """
+        Close the index file.
+
+        @return: None.
+        """
+        with self._lock:
+            # Close the connection
+            self._conn.close()
+
+    def size(self):
+        """
+        Get number of indexed keys.
+
+        @return: Number of indexed keys.
+        """
+        with self._lock:
+            # Query number of indexed keys
+            row = self._conn.execute('SELECT COUNT(*) FROM keys').fetchone()
+
+        # Return number of indexed keys
+        return row[0]
+
+    def offset(self, path):
+        """
+        Get key node cell offset of given key path, ignoring case.
+
+        @param path: Key path relative to the hive's root key.
+
+        @return: Key node cell offset, or None if not found.
+        """
+        with self._lock:
+            # Query the offset
+            row = self._conn.execute(
+                'SELECT offset FROM keys WHERE path_key = ?',
+                (path.casefold(),),
+            ).fetchone()
+
+        # Return the offset, or None if not found
+        return row[0] if row is not None else None
+
+    def info(self, path):
+        """
+        Get indexed metadata of given key path, ignoring case.
+
+        @param path: Key path relative to the hive's root key.
+
+        @return: A tuple: (path, offset, value_count, last_write_time), or
+        None if not found. `path` is in the case stored in the hive.
+        """
+        with self._lock:
+            # Query the row
+            row = self._conn.execute(
+                'SELECT path, offset, value_count, last_write_time FROM keys'
+                ' WHERE path_key = ?',
+                (path.casefold(),),
+            ).fetchone()
+
+        # Return the row, or None if not found
+        return tuple(row) if row is not None else None
+
+    def find(self, name, limit=None):
+        """
+        Find key paths by key name, ignoring case.
+
+        @param name: Key name.
+
+        @param limit: Max number of paths. None means no limit.
+
+        @return: Key paths list, in path order.
+        """
+        with self._lock:
+            # Query the paths
+            row_s = self._conn.execute(
+                'SELECT path FROM keys WHERE name_key = ?'
+                ' ORDER BY path_key LIMIT ?',
+                (name.casefold(), -1 if limit is None else limit),
+            ).fetchall()
+
+        # Return the paths list
+        return [row[0] for row in row_s]
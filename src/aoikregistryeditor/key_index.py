@@ -0,0 +1,591 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from array import array
+import os
+import sqlite3
+import threading
+
+from .registry_walker import walk as _walk
+from .regpath import path_normalize
+from .regval import FieldTable
+from .regval import REG_EXPAND_SZ
+from .regval import REG_MULTI_SZ
+from .regval import REG_SZ
+from .regval import data_decode
+
+
+# Field types whose data are decoded when indexing a snapshot
+STRING_TYPES = frozenset([REG_SZ, REG_EXPAND_SZ, REG_MULTI_SZ])
+
+
+#
+def path_key(path):
+    """
+    Get comparison key of a registry key path, as stored in an index's keys
+    table.
+
+    @param path: Registry key path.
+
+    @return: Casefolded normalized path, see `regpath.path_normalize`.
+    """
+    # Return casefolded normalized path
+    return path_normalize(path).casefold()
+
+
+#
+def subtree_where(path):
+    """
+    Get SQL condition matching rows of a subtree in an index's keys table.
+
+    @param path: Registry key path of the subtree's top key. Empty string
+    means all keys.
+
+    @return: A tuple: (sql, args).
+    """
+    # If the path is root key path
+    if path == '':
+        # Match all keys
+        return '1', ()
+
+    # If the path is not root key path.
+
+    # Get the path's comparison key
+    key = path_key(path)
+
+    # Match the top key, and paths between `path\` and `path]`, because `]`
+    # is the character after `\`.
+    return (
+        '(path_key = ? OR (path_key >= ? AND path_key < ?))',
+        (key, key + '\\', key + ']'),
+    )
+
+
+#
+class KeyIndex(object):
+    """
+    KeyIndex is the base class of on-disk SQLite indexes over registry keys.
+
+    Each indexed key has a row in the keys table, with its path's comparison
+    key, see `path_key`, its path, and its last write time, so that
+    `refresh` re-reads only keys changed since they were indexed. Subclasses
+    define the keys table and their own tables in `_SCHEMA_SQL`, and
+    implement `key_update` and `_keys_drop` to store and drop a key's
+    entries.
+
+    Methods are thread-safe, so `watch` handlers can update the index from
+    registry watcher threads.
+    """
+
+    # Index schema version. Indexes of other versions are rebuilt.
+    _SCHEMA_VERSION = None
+
+    # Keys table name. The table has columns `path_key`, `path`, and
+    # `last_write_time`.
+    _KEYS_TABLE = 'keys'
+
+    # SQL script creating tables other than the meta table
+    _SCHEMA_SQL = ''
+
+    # Initial meta rows other than schema version. Each item is a tuple:
+    # (key, value).
+    _META_DEFAULTS = ()
+
+    def __init__(self, index_path, rebuild=False):
+        """
+        Initialize object. Open the index file, creating it if it not exists
+        or is not valid.
+
+        @param index_path: Index file path.
+
+        @param rebuild: Whether discard the existing index file.
+
+        @return: None.
+        """
+        # Index file path
+        self._index_path = index_path
+
+        # Lock that serializes index access
+        self._lock = threading.RLock()
+
+        # Connection
+        self._conn = None
+
+        # If not rebuild
+        if not rebuild:
+            # Open the index file if it is valid
+            self._conn = self._open_valid()
+
+        # If the index file is not opened
+        if self._conn is None:
+            # Create the index file
+            self._conn = self._create()
+
+    def _open_valid(self):
+        """
+        Open the index file if it exists and is valid.
+
+        @return: Connection, or None if the index file not exists or is not
+        valid.
+        """
+        # If the index file not exists
+        if not os.path.isfile(self._index_path):
+            # Return None
+            return None
+
+        # If the index file exists.
+
+        # Open the index file.
+        # The connection is used from multiple threads under the lock.
+        conn = sqlite3.connect(self._index_path, check_same_thread=False)
+
+        try:
+            # Get meta dict
+            meta = dict(conn.execute('SELECT key, value FROM meta'))
+
+        # If have error, e.g. the file is not an index file
+        except sqlite3.DatabaseError:
+            # Set meta dict to empty
+            meta = {}
+
+        # If the index matches the schema version
+        if meta.get('schema_version') == self._SCHEMA_VERSION:
+            # Return the connection
+            return conn
+
+        # If the index is not valid.
+
+        # Close the connection
+        conn.close()
+
+        # Return None
+        return None
+
+    def _create(self):
+        """
+        Create an empty index file, replacing the existing one.
+
+        @return: Connection.
+        """
+        # If the index file exists
+        if os.path.exists(self._index_path):
+            # Remove the index file
+            os.remove(self._index_path)
+
+        # Create the index file.
+        # The connection is used from multiple threads under the lock.
+        conn = sqlite3.connect(self._index_path, check_same_thread=False)
+
+        # Create meta table
+        conn.execute(
+            'CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)'
+        )
+
+        # Create other tables
+        conn.executescript(self._SCHEMA_SQL)
+
+        # Store meta
+        conn.executemany(
+            'INSERT INTO meta VALUES (?, ?)',
+            (('schema_version', self._SCHEMA_VERSION),)
+            + tuple(self._META_DEFAULTS),
+        )
+
+        # Commit
+        conn.commit()
+
+        # Return the connection
+        return conn
+
+    def index_path(self):
+        """
+        Get index file path.
+
+        @return: Index file path.
+        """
+        # Return the index file path
+        return self._index_path
+
+    def close(self):
+        """
+        Flush pending updates and close the index file.
+
+        @return: None.
+        """
+        with self._lock:
+            # Flush pending updates
+            self.flush()
+
+            # Close the connection
+            self._conn.close()
+
+    def size(self):
+        """
+        Get number of indexed keys.
+
+        @return: Number of indexed keys.
+        """
+        with self._lock:
+            # Query number of indexed keys
+            row = self._conn.execute(
+                'SELECT COUNT(*) FROM ' + self._KEYS_TABLE
+            ).fetchone()
+
+        # Return number of indexed keys
+        return row[0]
+
+    def _commit(self):
+        """
+        Commit the connection. Subclasses store their meta counters first.
+
+        Caller should hold the lock.
+
+        @return: None.
+        """
+        # Commit
+        self._conn.commit()
+
+    def flush(self):
+        """
+        Write pending updates and commit.
+
+        @return: None.
+        """
+        with self._lock:
+            # Commit
+            self._commit()
+
+    def key_update(self, path, field_s, last_write_time=0):
+        """
+        Index a key, replacing its old entries if any. Updates are pending
+        until `flush`.
+
+        @param path: Registry key path.
+
+        @param field_s: FieldTable with data loaded. Data of non-string types
+        are not used and can be None.
+
+        @param last_write_time: The key's last write time, used by `refresh`.
+
+        @return: None.
+        """
+        # Raise error
+        raise NotImplementedError()
+
+    def _keys_drop(self, where, args):
+        """
+        Drop keys and their entries.
+
+        Caller should hold the lock.
+
+        @param where: SQL condition on the keys table.
+
+        @param args: SQL condition arguments.
+
+        @return: Number of dropped keys.
+        """
+        # Raise error
+        raise NotImplementedError()
+
+    def key_remove(self, path, subtree=False):
+        """
+        Remove a key from the index.
+
+        @param path: Registry key path.
+
+        @param subtree: Whether also remove descendant keys.
+
+        @return: Number of removed keys.
+        """
+        with self._lock:
+            # Drop the key, or the subtree's keys
+            drop_count = self._keys_drop(
+                *(subtree_where(path) if subtree
+                  else ('path_key = ?', (path_key(path),)))
+            )
+
+            # Commit
+            self._commit()
+
+        # Return number of removed keys
+        return drop_count
+
+    def build_from_walk(
+        self,
+        path,
+        regkey_get,
+        workers=None,
+        cancel_token=None,
+        on_error=None,
+    ):
+        """
+        Index a subtree by walking it, replacing the subtree's old keys.
+
+        @param path: Registry key path of the subtree's top key.
+
+        @param regkey_get: RegKey getter function.
+
+        @param workers: Number of listing worker threads.
+
+        @param cancel_token: WalkCancelToken object to cancel the walk.
+
+        @param on_error: Error callback taking arguments `(path, exc)`.
+
+        @return: Statistics dict with key `keys`.
+        """
+        # Number of indexed keys
+        key_count = 0
+
+        with self._lock:
+            # Drop the subtree's old keys
+            self._keys_drop(*subtree_where(path))
+
+        # For each key in the subtree
+        for key_path, _, field_s, info in _walk(
+            path,
+            regkey_get=regkey_get,
+            workers=workers,
+            include_values=True,
+            cancel_token=cancel_token,
+            on_error=on_error,
+            include_info=True,
+        ):
+            # Index the key
+            self.key_update(key_path, field_s, info.last_write_time)
+
+            # Increment number of indexed keys
+            key_count += 1
+
+        # Flush pending updates
+        self.flush()
+
+        # Return statistics dict
+        return {'keys': key_count}
+
+    def build_from_snapshot(self, snapshot):
+        """
+        Index a snapshot, replacing old keys of the snapshot's root subtree.
+
+        @param snapshot: SnapshotFile object.
+
+        @return: Statistics dict with key `keys`.
+        """
+        # Number of indexed keys
+        key_count = 0
+
+        with self._lock:
+            # Drop old keys of the snapshot's root subtree
+            self._keys_drop(*subtree_where(snapshot.root_path()))
+
+        # For each key record
+        for key_path, last_write_time, _, raw_field_s in \
+                snapshot.iter_records():
+            # Names column
+            name_s = []
+
+            # Types column
+            type_s = array('I')
+
+            # Data column, decoded for string types only
+            data_s = []
+
+            # For each raw field
+            for name, type, raw in raw_field_s:
+                # Add the field's name and type
+                name_s.append(name)
+
+                type_s.append(type)
+
+                # Add the field's data, decoded if it is string type
+                data_s.append(
+                    data_decode(type, bytes(raw))
+                    if type in STRING_TYPES else None
+                )
+
+            # Index the key
+            self.key_update(
+                key_path,
+                FieldTable(
+                    regkey=None, names=name_s, types=type_s, datas=data_s
+                ),
+                last_write_time,
+            )
+
+            # Increment number of indexed keys
+            key_count += 1
+
+        # Flush pending updates
+        self.flush()
+
+        # Return statistics dict
+        return {'keys': key_count}
+
+    def refresh(
+        self,
+        path,
+        regkey_get,
+        workers=None,
+        cancel_token=None,
+        on_error=None,
+    ):
+        """
+        Update a subtree's keys incrementally. Walk the subtree listing only
+        metadata, re-index keys whose last write time differs from the
+        indexed one, and remove keys no longer found, including keys that
+        failed listing.
+
+        @param path: Registry key path of the subtree's top key.
+
+        @param regkey_get: RegKey getter function.
+
+        @param workers: Number of listing worker threads.
+
+        @param cancel_token: WalkCancelToken object to cancel the walk. If
+        cancelled, keys not walked are not removed.
+
+        @param on_error: Error callback taking arguments `(path, exc)`.
+
+        @return: Statistics dict with keys `keys`, `updates`, and `removes`.
+        """
+        # Get SQL condition matching keys of the subtree
+        where, where_args = subtree_where(path)
+
+        with self._lock:
+            # Get indexed last write times of the subtree's keys.
+            # Key is the path's comparison key.
+            last_write_time_s = dict(self._conn.execute(
+                'SELECT path_key, last_write_time FROM '
+                + self._KEYS_TABLE + ' WHERE ' + where,
+                where_args,
+            ))
+
+        # Statistics dict
+        stats = {'keys': 0, 'updates': 0, 'removes': 0}
+
+        # For each key in the subtree
+        for key_path, _, _, info in _walk(
+            path,
+            regkey_get=regkey_get,
+            workers=workers,
+            cancel_token=cancel_token,
+            on_error=on_error,
+            include_info=True,
+        ):
+            # Increment number of keys
+            stats['keys'] += 1
+
+            # Get indexed last write time, and mark the key as found
+            last_write_time = last_write_time_s.pop(path_key(key_path), None)
+
+            # If the key is indexed and has not changed
+            if last_write_time == info.last_write_time:
+                # Skip the key
+                continue
+
+            # If the key is not indexed or has changed.
+
+            try:
+                # Re-index the key
+                updated = self.key_refresh(key_path, regkey_get, info=info)
+
+            # If have error
+            except Exception as exc:
+                # If have error callback
+                if on_error is not None:
+                    # Call the error callback
+                    on_error(key_path, exc)
+
+                # Keep the old entries, so that the key is not removed below
+                continue
+
+            # If re-indexed the key
+            if updated:
+                # Increment number of updates
+                stats['updates'] += 1
+
+        # If the walk is not cancelled
+        if cancel_token is None or not cancel_token.cancelled():
+            with self._lock:
+                # For each key not found
+                for key in last_write_time_s:
+                    # Drop the key
+                    stats['removes'] += self._keys_drop(
+                        'path_key = ?', (key,)
+                    )
+
+        # Flush pending updates
+        self.flush()
+
+        # Return statistics dict
+        return stats
+
+    def key_refresh(self, path, regkey_get, info=None):
+        """
+        Re-index a key from current data, or remove it if it not exists.
+        Updates are pending until `flush`.
+
+        @param path: Registry key path.
+
+        @param regkey_get: RegKey getter function.
+
+        @param info: The key's RegKeyInfo if known.
+
+        @return: Whether the key is re-indexed.
+        """
+        # Open the key
+        regkey = regkey_get(path)
+
+        # If failed opening the key
+        if regkey is None:
+            # Remove the key
+            self.key_remove(path)
+
+            # Return not re-indexed
+            return False
+
+        # If not failed opening the key.
+
+        try:
+            # If metadata is not given
+            if info is None:
+                # Get metadata
+                info = regkey.info()
+
+            # Get fields with data
+            field_s = regkey.fields(with_data=True, as_table=True)
+
+        finally:
+            # Close the key
+            regkey.close()
+
+        # Index the key
+        self.key_update(path, field_s, info.last_write_time)
+
+        # Return re-indexed
+        return True
+
+    def watch(self, watcher, regkey_get, on_error=None):
+        """
+        Refresh the index when a RegKeyWatcher notifies changes. The watched
+        key path's subtree is refreshed, see `refresh`, in the watcher's
+        worker thread.
+
+        @param watcher: RegKeyWatcher object. Watch paths with `subtree` on
+        so that changes of descendant keys are notified.
+
+        @param regkey_get: RegKey getter function.
+
+        @param on_error: Error callback taking arguments `(path, exc)`.
+
+        @return: None.
+        """
+        # Create change event handler
+        def on_change(path):
+            # Refresh the watched key path's subtree
+            self.refresh(path, regkey_get, on_error=on_error)
+
+        # For each change event
+        for event in (watcher.KEY_CHANGED, watcher.VALUE_CHANGED):
+            # Add the change event handler
+            watcher.handler_add(event, on_change, need_arg=True)
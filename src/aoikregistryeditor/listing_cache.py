@@ -0,0 +1,317 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import threading
+
+from .regpath import RegPath
+
+
+#
+class ListingCache(object):
+    """
+    ListingCache caches registry key listings, e.g. child key names and field
+    tables, keyed by (registry key path, listing kind). Paths are compared as
+    RegPath objects, so paths differing only in case share one entry.
+
+    Each entry is stored with a validation stamp, e.g. the key's last write
+    time. An entry is reused only if the caller's current stamp is equal to
+    the stored stamp, so that a cheap metadata query can replace a full
+    enumeration.
+
+    Least recently used entries are evicted when the total estimated size of
+    entries exceeds the capacity in bytes.
+    """
+
+    # Default capacity in bytes
+    CAPACITY_DEFAULT = 64 * 1024 * 1024
+
+    def __init__(self, capacity=None):
+        """
+        Initialize object.
+
+        @param capacity: Max total estimated size of entries in bytes.
+        Default is `CAPACITY_DEFAULT`.
+
+        @return: None.
+        """
+        # Capacity in bytes
+        self._capacity = capacity \
+            if capacity is not None else self.CAPACITY_DEFAULT
+
+        # Entries dict ordered from least to most recently used.
+        # Key is (path, kind) tuple.
+        # Value is a tuple: (stamp, value, size).
+        self._entries = OrderedDict()
+
+        # Map path to listing kinds cached for the path, so that invalidating
+        # a path does not scan all entries.
+        # Key is RegPath object.
+        # Value is a set of listing kinds.
+        self._path_kinds = {}
+
+        # Total estimated size of entries in bytes
+        self._size = 0
+
+        # Number of `get` calls served by a valid entry
+        self._hits = 0
+
+        # Number of `get` calls not served by a valid entry
+        self._misses = 0
+
+        # Lock that guards the entries dict and the counters
+        self._lock = threading.RLock()
+
+    def capacity(self):
+        """
+        Get capacity in bytes.
+
+        @return: Capacity in bytes.
+        """
+        # Return the capacity
+        return self._capacity
+
+    def capacity_set(self, capacity):
+        """
+        Set capacity in bytes. Evict entries if the new capacity is exceeded.
+
+        @param capacity: Capacity in bytes.
+
+        @return: None.
+        """
+        # If the capacity is negative
+        if capacity < 0:
+            # Raise error
+            raise ValueError(capacity)
+
+        # If the capacity is not negative.
+
+        with self._lock:
+            # Set the capacity
+            self._capacity = capacity
+
+            # Evict entries exceeding the capacity
+            self._evict()
+
+    def size(self):
+        """
+        Get total estimated size of entries in bytes.
+
+        @return: Total estimated size in bytes.
+        """
+        # Return the total estimated size
+        return self._size
+
+    def stats(self):
+        """
+        Get cache statistics dict.
+
+        @return: Cache statistics dict.
+        """
+        with self._lock:
+            # Return cache statistics dict
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'entries': len(self._entries),
+                'size': self._size,
+                'capacity': self._capacity,
+            }
+
+    def get(self, path, kind, stamp):
+        """
+        Get cached value.
+
+        @param path: Registry key path, or RegPath object.
+
+        @param kind: Listing kind.
+
+        @param stamp: Current validation stamp. The cached value is returned
+        only if its stamp is equal to the current stamp.
+
+        @return: Cached value, or None if not cached or stale.
+        """
+        # Get entry key
+        key = (RegPath.of(path), kind)
+
+        with self._lock:
+            # Get cached entry
+            entry = self._entries.get(key, None)
+
+            # If the entry is not cached
+            if entry is None:
+                # Increment miss count
+                self._misses += 1
+
+                # Return None
+                return None
+
+            # If the entry is cached.
+
+            # Get the entry's stamp, value, and size
+            entry_stamp, value, size = entry
+
+            # If the entry is stale
+            if entry_stamp != stamp:
+                # Remove the entry
+                self._entry_remove(key)
+
+                # Increment miss count
+                self._misses += 1
+
+                # Return None
+                return None
+
+            # If the entry is not stale.
+
+            # Mark the entry as most recently used
+            self._entries.move_to_end(key)
+
+            # Increment hit count
+            self._hits += 1
+
+            # Return the cached value
+            return value
+
+    def put(self, path, kind, stamp, value, size):
+        """
+        Cache value.
+
+        @param path: Registry key path, or RegPath object.
+
+        @param kind: Listing kind.
+
+        @param stamp: Validation stamp.
+
+        @param value: Value to cache. Notice do not change the value after it
+        is cached.
+
+        @param size: Estimated size of the value in bytes.
+
+        @return: None.
+        """
+        # Get entry key
+        key = (RegPath.of(path), kind)
+
+        with self._lock:
+            # Remove old entry
+            self._entry_remove(key)
+
+            # If the value alone exceeds the capacity
+            if size > self._capacity:
+                # Do not cache
+                return
+
+            # If the value not exceeds the capacity.
+
+            # Cache the value
+            self._entries[key] = (stamp, value, size)
+
+            # Add the listing kind to the path's listing kinds
+            self._path_kinds.setdefault(key[0], set()).add(kind)
+
+            # Increase total size
+            self._size += size
+
+            # Evict entries exceeding the capacity
+            self._evict()
+
+    def invalidate(self, path=None, subtree=False):
+        """
+        Remove cached entries.
+
+        @param path: Registry key path, or RegPath object. None means all
+        paths.
+
+        @param subtree: Whether also remove entries of descendant paths.
+
+        @return: None.
+        """
+        with self._lock:
+            # If path is not given
+            if path is None:
+                # Remove all entries
+                self._entries.clear()
+
+                # Remove all paths' listing kinds
+                self._path_kinds.clear()
+
+                # Reset total size
+                self._size = 0
+
+                # Return
+                return
+
+            # If path is given.
+
+            # Get RegPath object
+            path = RegPath.of(path)
+
+            # If subtree is on
+            if subtree:
+                # Get cached paths that are the path or descendant paths.
+                # Scan all cached paths because descendants are not indexed.
+                path_s = [x for x in self._path_kinds if x.is_within(path)]
+
+            # If subtree is off
+            else:
+                # Get the path only
+                path_s = [path]
+
+            # For each path
+            for entry_path in path_s:
+                # For each listing kind cached for the path
+                for kind in list(self._path_kinds.get(entry_path, ())):
+                    # Remove the entry
+                    self._entry_remove((entry_path, kind))
+
+    def _entry_remove(self, key):
+        """
+        Remove an entry if it is cached.
+
+        Caller should hold the lock.
+
+        @param key: Entry key, a tuple: (RegPath object, kind).
+
+        @return: None.
+        """
+        # Remove the entry
+        entry = self._entries.pop(key, None)
+
+        # If the entry is not cached
+        if entry is None:
+            # Return
+            return
+
+        # If the entry is cached.
+
+        # Decrease total size
+        self._size -= entry[2]
+
+        # Get the path's listing kinds
+        kind_s = self._path_kinds.get(key[0], None)
+
+        # If the path has listing kinds
+        if kind_s is not None:
+            # Remove the listing kind
+            kind_s.discard(key[1])
+
+            # If the path has no listing kinds left
+            if not kind_s:
+                # Remove the path
+                del self._path_kinds[key[0]]
+
+    def _evict(self):
+        """
+        Remove least recently used entries until total size not exceeds the
+        capacity.
+
+        Caller should hold the lock.
+
+        @return: None.
+        """
+        # While total size exceeds the capacity
+        while self._size > self._capacity and self._entries:
+            # Remove least recently used entry
+            self._entry_remove(next(iter(self._entries)))
@@ -8,7 +8,19 @@ from tkinter import Tk
 from traceback import format_exc
 
 from .aoikimportutil import load_obj
+from .regfile import change_text
+from .registry import export_reg
+from .registry import import_reg
+from .registry import snapshot_restore
+from .registry import snapshot_save
+from .merkle import MERKLE_FILE_SUFFIX
+from .merkle import MerkleFile
+from .merkle import snapshot_diff
+from .reference_index import REFERENCE_INDEX_SUFFIX
+from .reference_index import ReferenceIndex
+from .reference_index import reference_index_path
 from .registry_editor import RegistryEditor
+from .snapshot import SnapshotFile
 from .tkinterutil.label import LabelVidget
 
 
@@ -88,6 +100,70 @@ def get_cmdargs_parser():
         help='Print default field editor factory config module.',
     )
 
+    #
+    parser.add_argument(
+        '--export-reg',
+        dest='export_reg_args',
+        nargs=2,
+        default=None,
+        metavar=('KEY_PATH', 'REG_FILE'),
+        help='Export registry key subtree to `.reg` file, then exit.'
+        ' REG_FILE `-` means stdout.',
+    )
+
+    #
+    parser.add_argument(
+        '--import-reg',
+        dest='import_reg_path',
+        default=None,
+        metavar='REG_FILE',
+        help='Apply `.reg` file to registry, print changes, then exit.'
+        ' REG_FILE `-` means stdin.',
+    )
+
+    #
+    parser.add_argument(
+        '--dry-run',
+        dest='dry_run',
+        action='store_true',
+        help='With `--import-reg`, print changes without writing.',
+    )
+
+    #
+    parser.add_argument(
+        '--snapshot-save',
+        dest='snapshot_save_args',
+        nargs=2,
+        default=None,
+        metavar=('KEY_PATH', 'SNAPSHOT_FILE'),
+        help='Save registry key subtree to binary snapshot file, its'
+        ' Merkle file to SNAPSHOT_FILE plus `{}`, and its reference index to'
+        ' SNAPSHOT_FILE plus `{}`, then exit.'.format(
+            MERKLE_FILE_SUFFIX, REFERENCE_INDEX_SUFFIX
+        ),
+    )
+
+    #
+    parser.add_argument(
+        '--snapshot-restore',
+        dest='snapshot_restore_path',
+        default=None,
+        metavar='SNAPSHOT_FILE',
+        help='Restore registry key subtree from binary snapshot file, then'
+        ' exit.',
+    )
+
+    #
+    parser.add_argument(
+        '--snapshot-diff',
+        dest='snapshot_diff_args',
+        nargs=2,
+        default=None,
+        metavar=('OLD_SNAPSHOT_FILE', 'NEW_SNAPSHOT_FILE'),
+        help='Print changes between two binary snapshot files, using their'
+        ' Merkle files, then exit.',
+    )
+
     # Return the command arguments parser
     return parser
 
@@ -172,6 +248,219 @@ def main_core(args=None, step_func=None):
 
     # If not print default field editor factory config module.
 
+    # If export registry key subtree
+    if args.export_reg_args is not None:
+        # Set step info
+        step_func(title='Export registry key subtree', exit_code=1)
+
+        # Get registry key path and `.reg` file path
+        key_path, reg_file_path = args.export_reg_args
+
+        # Create error callback
+        def on_error(path, exc):
+            # Print the error
+            sys.stderr.write('Error: {}\n'.format(exc))
+
+        # If the `.reg` file path is `-`
+        if reg_file_path == '-':
+            # Export to stdout
+            stats = export_reg(key_path, sys.stdout.buffer, on_error=on_error)
+
+        # If the `.reg` file path is not `-`
+        else:
+            # Open the `.reg` file
+            with open(reg_file_path, 'wb') as out_stream:
+                # Export to the `.reg` file
+                stats = export_reg(key_path, out_stream, on_error=on_error)
+
+            # Print writer statistics
+            sys.stderr.write(
+                'Exported {} keys, {} fields, {} bytes, {} errors.\n'.format(
+                    stats['keys'],
+                    stats['values'],
+                    stats['bytes'],
+                    stats['errors'],
+                )
+            )
+
+        # Exit, with non-zero exit code if any key failed, e.g. the top key
+        # can not be opened
+        return 1 if stats['errors'] else 0
+
+    # If not export registry key subtree.
+
+    # If apply `.reg` file
+    if args.import_reg_path is not None:
+        # Set step info
+        step_func(title='Apply `.reg` file', exit_code=1)
+
+        # Create change callback
+        def on_change(change):
+            # Print the change
+            sys.stdout.write(change_text(change) + '\n')
+
+        # Create error callback
+        def on_error(path, exc):
+            # Print the error
+            sys.stderr.write('Error: {}\n'.format(exc))
+
+        # If the `.reg` file path is `-`
+        if args.import_reg_path == '-':
+            # Apply from stdin
+            stats = import_reg(
+                sys.stdin.buffer,
+                dry_run=args.dry_run,
+                on_change=on_change,
+                on_error=on_error,
+            )
+
+        # If the `.reg` file path is not `-`
+        else:
+            # Open the `.reg` file
+            with open(args.import_reg_path, 'rb') as in_stream:
+                # Apply the `.reg` file
+                stats = import_reg(
+                    in_stream,
+                    dry_run=args.dry_run,
+                    on_change=on_change,
+                    on_error=on_error,
+                )
+
+        # Print statistics
+        sys.stderr.write(
+            '{} {} keys, {} fields: {} changes, {} errors.\n'.format(
+                'Checked' if args.dry_run else 'Applied',
+                stats['keys'],
+                stats['values'],
+                stats['changes'],
+                stats['errors'],
+            )
+        )
+
+        # Exit, with non-zero exit code if have errors
+        return 1 if stats['errors'] else 0
+
+    # If not apply `.reg` file.
+
+    # If save snapshot
+    if args.snapshot_save_args is not None:
+        # Set step info
+        step_func(title='Save snapshot', exit_code=1)
+
+        # Get registry key path and snapshot file path
+        key_path, snapshot_file_path = args.snapshot_save_args
+
+        # Paths of keys and fields that failed saving
+        error_path_s = []
+
+        # Create error callback
+        def on_error(path, exc):
+            # Add the path
+            error_path_s.append(path)
+
+            # Print the error
+            sys.stderr.write('Error: `{}`: {}\n'.format(path, exc))
+
+        # Open the snapshot file and the Merkle file
+        with open(snapshot_file_path, 'wb') as out_stream, \
+                open(snapshot_file_path + MERKLE_FILE_SUFFIX, 'wb') \
+                as merkle_stream:
+            # Save the snapshot
+            stats = snapshot_save(
+                key_path,
+                out_stream,
+                on_error=on_error,
+                merkle_stream=merkle_stream,
+            )
+
+        # Open the saved snapshot file
+        with SnapshotFile(snapshot_file_path) as snapshot:
+            # Create the reference index kept next to the snapshot file,
+            # replacing an old one
+            reference_index = ReferenceIndex(
+                reference_index_path(snapshot_file_path), rebuild=True
+            )
+
+            try:
+                # Index the snapshot
+                reference_index.build_from_snapshot(snapshot)
+
+            finally:
+                # Close the reference index
+                reference_index.close()
+
+        # Print writer statistics
+        sys.stderr.write(
+            'Saved {} keys, {} fields, {} bytes, {} errors.\n'.format(
+                stats['keys'],
+                stats['values'],
+                stats['bytes'],
+                len(error_path_s),
+            )
+        )
+
+        # Exit, with non-zero exit code if have errors
+        return 1 if error_path_s else 0
+
+    # If not save snapshot.
+
+    # If restore snapshot
+    if args.snapshot_restore_path is not None:
+        # Set step info
+        step_func(title='Restore snapshot', exit_code=1)
+
+        # Create error callback
+        def on_error(path, exc):
+            # Print the error
+            sys.stderr.write('Error: {}\n'.format(exc))
+
+        # Open the snapshot file
+        with SnapshotFile(args.snapshot_restore_path) as snapshot:
+            # Restore the snapshot
+            stats = snapshot_restore(snapshot, on_error=on_error)
+
+        # Print statistics
+        sys.stderr.write(
+            'Restored {} keys: {} created, {} writes, {} deletes,'
+            ' {} errors.\n'.format(
+                stats['keys'],
+                stats['creates'],
+                stats['writes'],
+                stats['deletes'],
+                stats['errors'],
+            )
+        )
+
+        # Exit, with non-zero exit code if have errors
+        return 1 if stats['errors'] else 0
+
+    # If not restore snapshot.
+
+    # If compare snapshots
+    if args.snapshot_diff_args is not None:
+        # Set step info
+        step_func(title='Compare snapshots')
+
+        # Get snapshot file paths
+        old_path, new_path = args.snapshot_diff_args
+
+        # Open the snapshot files and their Merkle files
+        with SnapshotFile(old_path) as old_snapshot, \
+                MerkleFile(old_path + MERKLE_FILE_SUFFIX) as old_merkle, \
+                SnapshotFile(new_path) as new_snapshot, \
+                MerkleFile(new_path + MERKLE_FILE_SUFFIX) as new_merkle:
+            # For each change
+            for change in snapshot_diff(
+                old_snapshot, old_merkle, new_snapshot, new_merkle
+            ):
+                # Print the change
+                sys.stdout.write(change_text(change) + '\n')
+
+        # Exit
+        return
+
+    # If not compare snapshots.
+
     # Set step info
     step_func(title='Create TK root')
 
@@ -260,6 +549,7 @@ def main_core(args=None, step_func=None):
         field_load_label=editor._field_load_label,
         field_save_label=editor._field_save_label,
         field_add_dialog=editor._field_add_dialog,
+        search_dialog=editor._search_dialog,
     )
 
     # Set step info
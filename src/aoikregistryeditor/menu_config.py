@@ -34,6 +34,23 @@ def _create_menu_config():
 
     # Create menu config list
     menu_config = [
+        # File
+        dict(pid='/', id='File', type='menu'),
+        dict(pid='/File', id='Export', label='Export...', action='export_reg'),
+        dict(pid='/File', id='Search', label='Search...', action='search'),
+        dict(
+            pid='/File',
+            id='Index References',
+            label='Index References...',
+            action='reference_index',
+        ),
+        dict(
+            pid='/File',
+            id='Find References',
+            label='Find References',
+            action='references_find',
+        ),
+
         # Hive
         dict(pid='/', id='Hive', type='menu'),
         dict(pid='/Hive', id='ROOT', key=''),
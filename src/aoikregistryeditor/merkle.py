@@ -0,0 +1,683 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import hashlib
+import mmap
+import struct
+
+from .regfile import CHANGE_FIELD_ADD
+from .regfile import CHANGE_FIELD_CHANGE
+from .regfile import CHANGE_FIELD_DELETE
+from .regfile import CHANGE_KEY_ADD
+from .regfile import CHANGE_KEY_DELETE
+from .regfile import RegChange
+from .regval import data_decode
+
+
+# Merkle file layout:
+# - Header: magic, format version, key count.
+# - Entries: one fixed-size entry per key, in the snapshot's key order, so
+#   key N's entry is at a computable offset.
+#
+# A key's digest hashes the key's fields sorted by casefolded name, its child
+# key names, and the names and digests of its child keys that have records.
+# Last write times are not hashed, so digests depend on content only.
+#
+# Snapshot key records are in depth-first pre-order, so a key's subtree is
+# the key counts' range starting at the key. A key's first child key is the
+# next key, and each next child key follows the previous child key's
+# subtree. Together with name hashes, this lets the diff match child keys
+# of two snapshots without decoding their records.
+
+# File magic
+_MAGIC = b'AOIKMRKL'
+
+# Format version
+_VERSION = 1
+
+# Header layout: magic, format version, key count
+_HEADER = struct.Struct('<8sIQ')
+
+# Entry layout: subtree digest, casefolded name hash, subtree key count
+_ENTRY = struct.Struct('<20sQQ')
+
+# Unsigned 32-bit integer
+_UINT32 = struct.Struct('<I')
+
+# Merkle file path suffix, added to the snapshot file path
+MERKLE_FILE_SUFFIX = '.merkle'
+
+# Encoding of names
+_STRING_ENCODING = 'utf-8'
+
+# Encoding error handler of names
+_STRING_ERRORS = 'surrogatepass'
+
+
+#
+def _name_bytes(name):
+    """
+    Encode a name, length-prefixed so that hashed items are unambiguous.
+
+    @param name: Name.
+
+    @return: Length-prefixed name bytes.
+    """
+    # Encode the name
+    name_bytes = name.encode(_STRING_ENCODING, _STRING_ERRORS)
+
+    # Return length-prefixed name bytes
+    return _UINT32.pack(len(name_bytes)) + name_bytes
+
+
+#
+def name_hash(name):
+    """
+    Get hash of a key name, ignoring case.
+
+    @param name: Key name.
+
+    @return: 64-bit integer.
+    """
+    # Return the leading 8 bytes of the casefolded name's SHA-1 as integer
+    return struct.unpack_from(
+        '<Q',
+        hashlib.sha1(
+            name.casefold().encode(_STRING_ENCODING, _STRING_ERRORS)
+        ).digest(),
+    )[0]
+
+
+#
+class MerkleWriter(object):
+    """
+    MerkleWriter computes per-key subtree digests bottom-up while keys are
+    fed in the snapshot's key order, and writes a Merkle file.
+
+    Only digests of the keys on the path to the current key are kept in
+    memory. Each key's entry is written when its subtree is complete, so the
+    output stream must be seekable.
+    """
+
+    def __init__(self, out_stream):
+        """
+        Initialize object. Write a header with zero key count, which is
+        updated on close.
+
+        @param out_stream: Seekable binary output stream.
+
+        @return: None.
+        """
+        # Binary output stream
+        self._out_stream = out_stream
+
+        # Number of keys added
+        self._key_count = 0
+
+        # Keys whose subtrees are not complete, from the top key down.
+        # Each item is a list: [depth, key_index, name, hasher].
+        self._open_key_s = []
+
+        # Whether closed
+        self._closed = False
+
+        # Write the header
+        self._out_stream.write(_HEADER.pack(_MAGIC, _VERSION, 0))
+
+    def key_add(self, depth, name, child_name_s, field_s):
+        """
+        Add a key.
+
+        @param depth: Depth relative to the snapshot's top key, which is 0.
+
+        @param name: Key name. Not used for the top key.
+
+        @param child_name_s: Child key names.
+
+        @param field_s: Fields. Each field is a tuple: (name, type,
+        raw_data).
+
+        @return: None.
+        """
+        # Complete keys whose subtrees end before this key
+        self._complete(depth)
+
+        # Create hasher
+        hasher = hashlib.sha1()
+
+        # For each field, sorted by casefolded name
+        for field_name, type, raw_data in sorted(
+                field_s, key=lambda x: x[0].casefold()):
+            # Hash the field
+            hasher.update(b'F')
+
+            hasher.update(_name_bytes(field_name))
+
+            hasher.update(_UINT32.pack(type))
+
+            hasher.update(_UINT32.pack(len(raw_data)))
+
+            hasher.update(raw_data)
+
+        # For each child key name.
+        # Names of child keys without records are hashed here too.
+        for child_name in child_name_s:
+            # Hash the child key name
+            hasher.update(b'N')
+
+            hasher.update(_name_bytes(child_name))
+
+        # Add the key to open keys.
+        # Its child keys' digests are added when they are complete.
+        self._open_key_s.append([depth, self._key_count, name, hasher])
+
+        # Increment number of keys
+        self._key_count += 1
+
+    def _complete(self, depth):
+        """
+        Complete open keys at or below given depth, writing their entries and
+        adding their digests to their parent keys' hashers.
+
+        @param depth: Depth.
+
+        @return: None.
+        """
+        # Get open keys
+        open_key_s = self._open_key_s
+
+        # While the last open key is at or below the depth
+        while open_key_s and open_key_s[-1][0] >= depth:
+            # Remove the key
+            key_depth, key_index, name, hasher = open_key_s.pop()
+
+            # Get the key's subtree digest
+            digest = hasher.digest()
+
+            # Seek to the key's entry
+            self._out_stream.seek(_HEADER.size + key_index * _ENTRY.size)
+
+            # Write the key's entry
+            self._out_stream.write(_ENTRY.pack(
+                digest,
+                name_hash(name) if key_depth > 0 else 0,
+                self._key_count - key_index,
+            ))
+
+            # If have parent key
+            if open_key_s:
+                # Add the key's name and digest to the parent key's hasher
+                parent_hasher = open_key_s[-1][3]
+
+                parent_hasher.update(b'C')
+
+                parent_hasher.update(_name_bytes(name))
+
+                parent_hasher.update(digest)
+
+    def close(self):
+        """
+        Complete all open keys and update the header's key count.
+        The output stream is not closed.
+
+        @return: Number of keys.
+        """
+        # If not closed
+        if not self._closed:
+            # Set closed
+            self._closed = True
+
+            # Complete all open keys
+            self._complete(0)
+
+            # Seek to the header
+            self._out_stream.seek(0)
+
+            # Write the header with key count
+            self._out_stream.write(
+                _HEADER.pack(_MAGIC, _VERSION, self._key_count)
+            )
+
+            # Seek to the end
+            self._out_stream.seek(0, 2)
+
+        # Return number of keys
+        return self._key_count
+
+
+#
+def merkle_build(snapshot, out_stream):
+    """
+    Build Merkle file of an existing snapshot, e.g. one saved without
+    `merkle_stream`.
+
+    @param snapshot: SnapshotFile object.
+
+    @param out_stream: Seekable binary output stream.
+
+    @return: Number of keys.
+    """
+    # Create writer
+    writer = MerkleWriter(out_stream)
+
+    # Get root path's length
+    root_len = len(snapshot.root_path())
+
+    # For each key record
+    for path, _, child_name_s, field_s in snapshot.iter_records():
+        # Get the key's path relative to the root path
+        rel_path = path[root_len:].lstrip('\\')
+
+        # Add the key
+        writer.key_add(
+            rel_path.count('\\') + 1 if rel_path else 0,
+            rel_path.rpartition('\\')[2],
+            child_name_s,
+            field_s,
+        )
+
+    # Complete the file.
+    # Return number of keys.
+    return writer.close()
+
+
+#
+class MerkleFile(object):
+    """
+    MerkleFile opens a Merkle file read-only via `mmap`.
+    """
+
+    class FormatError(ValueError):
+        """
+        Error raised when the Merkle file is not valid.
+        """
+        pass
+
+    def __init__(self, file_path):
+        """
+        Initialize object.
+
+        @param file_path: Merkle file path.
+
+        @return: None. Raise `MerkleFile.FormatError` if the file is not a
+        Merkle file, or OSError if failed opening the file.
+        """
+        # Merkle file path
+        self._file_path = file_path
+
+        # Open the file
+        self._file = open(file_path, 'rb')
+
+        try:
+            # Map the file read-only
+            self._mmap = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+        # If have error, e.g. the file is empty
+        except ValueError:
+            # Close the file
+            self._file.close()
+
+            # Raise error
+            raise MerkleFile.FormatError(
+                'Not a Merkle file: `{}`.'.format(file_path)
+            )
+
+        # Get file size
+        size = len(self._mmap)
+
+        # If the file is smaller than the header
+        if size < _HEADER.size:
+            # Close the Merkle file
+            self.close()
+
+            # Raise error
+            raise MerkleFile.FormatError(
+                'Not a Merkle file: `{}`.'.format(file_path)
+            )
+
+        # Parse the header
+        magic, version, key_count = _HEADER.unpack_from(self._mmap, 0)
+
+        # If the header is not valid, or the file is truncated, e.g. the
+        # writer was not closed.
+        if magic != _MAGIC or version != _VERSION \
+                or size < _HEADER.size + key_count * _ENTRY.size:
+            # Close the Merkle file
+            self.close()
+
+            # Raise error
+            raise MerkleFile.FormatError(
+                'Not a valid Merkle file: `{}`.'.format(file_path)
+            )
+
+        # Number of keys
+        self._key_count = key_count
+
+    def __enter__(self):
+        """
+        Enter context.
+
+        @return: The object itself.
+        """
+        # Return the object itself
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Exit context. Close the Merkle file.
+
+        @return: False, so that error raised in the block is propagated.
+        """
+        # Close the Merkle file
+        self.close()
+
+        # Propagate error raised in the block
+        return False
+
+    def file_path(self):
+        """
+        Get Merkle file path.
+
+        @return: Merkle file path.
+        """
+        # Return the Merkle file path
+        return self._file_path
+
+    def key_count(self):
+        """
+        Get number of keys.
+
+        @return: Number of keys.
+        """
+        # Return number of keys
+        return self._key_count
+
+    def close(self):
+        """
+        Close the Merkle file.
+
+        @return: None.
+        """
+        # If the Merkle file has been closed
+        if self._mmap is None:
+            # Do nothing
+            return
+
+        # Close the mapping
+        self._mmap.close()
+
+        # Set the mapping to None
+        self._mmap = None
+
+        # Close the file
+        self._file.close()
+
+    def entry(self, key_index):
+        """
+        Get a key's entry.
+
+        @param key_index: Key index in the snapshot's key order.
+
+        @return: A tuple: (digest, name_hash, subtree_key_count).
+        """
+        # Return the entry
+        return _ENTRY.unpack_from(
+            self._mmap, _HEADER.size + key_index * _ENTRY.size
+        )
+
+    def digest(self, key_index):
+        """
+        Get a key's subtree digest.
+
+        @param key_index: Key index in the snapshot's key order.
+
+        @return: Digest bytes.
+        """
+        # Return the digest
+        return self.entry(key_index)[0]
+
+    def child_entries(self, key_index):
+        """
+        Get a key's child keys' entries, without decoding records.
+
+        @param key_index: Key index in the snapshot's key order.
+
+        @return: List of tuples: (key_index, digest, name_hash,
+        subtree_key_count), in the snapshot's key order.
+        """
+        # Get the subtree's end key index
+        end = key_index + self.entry(key_index)[2]
+
+        # Child entries list
+        child_entry_s = []
+
+        # The first child key's index
+        child_index = key_index + 1
+
+        # While within the subtree
+        while child_index < end:
+            # Get the child key's entry
+            digest, child_name_hash, size = self.entry(child_index)
+
+            # Add the child key's entry
+            child_entry_s.append((child_index, digest, child_name_hash, size))
+
+            # Move to the next child key, after the child key's subtree
+            child_index += size
+
+        # Return child entries list
+        return child_entry_s
+
+
+#
+def _subtree_changes(snapshot, merkle, key_index, added):
+    """
+    Yield changes of a whole subtree that is added or removed.
+
+    @param snapshot: SnapshotFile object of the side that has the subtree.
+
+    @param merkle: MerkleFile object of the side that has the subtree.
+
+    @param key_index: The subtree's top key's index.
+
+    @param added: Whether the subtree is added, otherwise removed.
+
+    @return: Generator of RegChange objects.
+    """
+    # Get the subtree's key count
+    size = merkle.entry(key_index)[2]
+
+    # Get change kinds
+    if added:
+        key_kind = CHANGE_KEY_ADD
+
+        field_kind = CHANGE_FIELD_ADD
+    else:
+        key_kind = CHANGE_KEY_DELETE
+
+        field_kind = CHANGE_FIELD_DELETE
+
+    # For each key record of the subtree
+    for path, _, _, field_s in snapshot.iter_records(
+            key_index, key_index + size):
+        # Yield the key change
+        yield RegChange(key_kind, path, None, None, None)
+
+        # For each field
+        for name, type, raw_data in field_s:
+            # Get the field's data and type tuple
+            data_type_tuple = (data_decode(type, raw_data), type)
+
+            # Yield the field change
+            yield RegChange(
+                field_kind,
+                path,
+                name,
+                None if added else data_type_tuple,
+                data_type_tuple if added else None,
+            )
+
+
+#
+def snapshot_diff(old_snapshot, old_merkle, new_snapshot, new_merkle):
+    """
+    Compare two snapshots of a subtree via their Merkle files, descending
+    only into subtrees whose digests differ.
+
+    Only the records of keys on the paths to changes are decoded, so the
+    time depends on the number and depth of changes, not on the snapshots'
+    sizes.
+
+    @param old_snapshot: SnapshotFile object of the old state.
+
+    @param old_merkle: MerkleFile object of the old snapshot.
+
+    @param new_snapshot: SnapshotFile object of the new state.
+
+    @param new_merkle: MerkleFile object of the new snapshot.
+
+    @return: Generator of RegChange objects. A key's changes are yielded
+    before its descendants' changes. Changed and added keys use the new
+    snapshot's paths, removed keys use the old snapshot's paths. Raise
+    `MerkleFile.FormatError` if a Merkle file does not match its snapshot.
+    """
+    # For each side
+    for snapshot, merkle in (
+        (old_snapshot, old_merkle),
+        (new_snapshot, new_merkle),
+    ):
+        # If the Merkle file does not match the snapshot
+        if merkle.key_count() != snapshot.key_count():
+            # Raise error
+            raise MerkleFile.FormatError(
+                'Merkle file does not match snapshot: `{}`.'.format(
+                    merkle.file_path()
+                )
+            )
+
+    # If either snapshot is empty
+    if old_snapshot.key_count() == 0 or new_snapshot.key_count() == 0:
+        # If the new snapshot is not empty
+        if new_snapshot.key_count() != 0:
+            # Yield the new subtree as added
+            for change in _subtree_changes(new_snapshot, new_merkle, 0, True):
+                yield change
+
+        # If the old snapshot is not empty
+        if old_snapshot.key_count() != 0:
+            # Yield the old subtree as removed
+            for change in _subtree_changes(
+                    old_snapshot, old_merkle, 0, False):
+                yield change
+
+        # Stop
+        return
+
+    # Pairs of matched keys to compare.
+    # Each item is a tuple: (old_key_index, new_key_index).
+    # Used as a stack so that keys are compared depth-first.
+    todo_s = [(0, 0)]
+
+    # While have pairs to compare
+    while todo_s:
+        # Get a pair
+        old_index, new_index = todo_s.pop()
+
+        # If the subtrees' digests are equal
+        if old_merkle.digest(old_index) == new_merkle.digest(new_index):
+            # Skip the subtrees
+            continue
+
+        # If the subtrees' digests differ.
+
+        # Get the keys' records
+        old_path, _, _, old_field_s = old_snapshot.record_at(old_index)
+
+        new_path, _, _, new_field_s = new_snapshot.record_at(new_index)
+
+        # Get old fields dict.
+        # Key is casefolded field name.
+        # Value is a tuple: (name, type, raw_data).
+        old_field_dict = dict((x[0].casefold(), x) for x in old_field_s)
+
+        # For each new field
+        for name, type, raw_data in new_field_s:
+            # Get the old field
+            old_field = old_field_dict.pop(name.casefold(), None)
+
+            # If the field is added
+            if old_field is None:
+                # Yield the change
+                yield RegChange(
+                    CHANGE_FIELD_ADD,
+                    new_path,
+                    name,
+                    None,
+                    (data_decode(type, raw_data), type),
+                )
+
+            # If the field's type or data differs
+            elif old_field[1] != type or old_field[2] != raw_data:
+                # Yield the change
+                yield RegChange(
+                    CHANGE_FIELD_CHANGE,
+                    new_path,
+                    name,
+                    (data_decode(old_field[1], old_field[2]), old_field[1]),
+                    (data_decode(type, raw_data), type),
+                )
+
+        # For each removed field, in old order
+        for name, type, raw_data in old_field_s:
+            # If the field is removed
+            if name.casefold() in old_field_dict:
+                # Yield the change
+                yield RegChange(
+                    CHANGE_FIELD_DELETE,
+                    new_path,
+                    name,
+                    (data_decode(type, raw_data), type),
+                    None,
+                )
+
+        # Get old child keys dict.
+        # Key is name hash.
+        # Value is the child key's index.
+        old_child_dict = dict(
+            (x[2], x[0]) for x in old_merkle.child_entries(old_index)
+        )
+
+        # Pairs of matched child keys to compare
+        pair_s = []
+
+        # For each new child key
+        for child_index, _, child_name_hash, _ in \
+                new_merkle.child_entries(new_index):
+            # Get the matched old child key
+            old_child_index = old_child_dict.pop(child_name_hash, None)
+
+            # If the child key is added
+            if old_child_index is None:
+                # Yield the added subtree
+                for change in _subtree_changes(
+                        new_snapshot, new_merkle, child_index, True):
+                    yield change
+
+            # If the child key is matched
+            else:
+                # Add the pair to compare
+                pair_s.append((old_child_index, child_index))
+
+        # For each removed child key, in old order
+        for old_child_index in sorted(old_child_dict.values()):
+            # Yield the removed subtree
+            for change in _subtree_changes(
+                    old_snapshot, old_merkle, old_child_index, False):
+                yield change
+
+        # Add the pairs to compare, reversed so that the stack pops them in
+        # key order
+        todo_s.extend(reversed(pair_s))
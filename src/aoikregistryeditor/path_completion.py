@@ -0,0 +1,288 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from bisect import bisect_left
+import sys
+
+from .listing_cache import ListingCache
+from .regpath import RegPath
+
+
+#
+class ChildNameIndex(object):
+    """
+    ChildNameIndex is an immutable index of a registry key's child key names,
+    sorted by casefolded name, for case-insensitive prefix lookup by binary
+    search.
+    """
+
+    # Attribute slots
+    __slots__ = ('_keys', '_names')
+
+    def __init__(self, name_s):
+        """
+        Initialize object.
+
+        @param name_s: Child key names.
+
+        @return: None.
+        """
+        # Get (casefolded name, name) tuples sorted by casefolded name
+        pair_s = sorted((x.casefold(), x) for x in name_s)
+
+        # Casefolded names list, sorted
+        self._keys = [x[0] for x in pair_s]
+
+        # Names list, in same order as the casefolded names
+        self._names = [x[1] for x in pair_s]
+
+    def __len__(self):
+        """
+        Get number of child key names.
+
+        @return: Number of child key names.
+        """
+        # Return number of child key names
+        return len(self._names)
+
+    def size(self):
+        """
+        Estimate size in bytes.
+
+        @return: Estimated size in bytes.
+        """
+        # Size of the lists themselves
+        size = sys.getsizeof(self._keys) + sys.getsizeof(self._names)
+
+        # For each casefolded name and name
+        for key, name in zip(self._keys, self._names):
+            # Add the names' sizes, counting a shared string once
+            size += sys.getsizeof(name) + (
+                sys.getsizeof(key) if key is not name else 0
+            )
+
+        # Return the estimated size
+        return size
+
+    def prefix_match(self, prefix, limit=None):
+        """
+        Get child key names starting with a prefix, ignoring case.
+
+        @param prefix: Name prefix.
+
+        @param limit: Max number of names. None means no limit.
+
+        @return: Names list, sorted by casefolded name.
+        """
+        # Get casefolded prefix
+        prefix = prefix.casefold()
+
+        # Find the first casefolded name not less than the prefix
+        start = bisect_left(self._keys, prefix)
+
+        # Get stop index of the search
+        stop = len(self._keys) if limit is None \
+            else min(start + limit, len(self._keys))
+
+        # Get index after the last name starting with the prefix.
+        # Sorted order puts all names starting with the prefix together.
+        end = start
+
+        # While the name at the index starts with the prefix
+        while end < stop and self._keys[end].startswith(prefix):
+            # Move to next index
+            end += 1
+
+        # Return names starting with the prefix
+        return self._names[start:end]
+
+
+#
+def _parent_path(text):
+    """
+    Get parent key path of a partial registry key path, whose child key names
+    complete the text.
+
+    @param text: Partial registry key path.
+
+    @return: Parent key path. Without separator, root key path.
+    """
+    # Split the text at the last separator
+    head, sep, _ = text.rpartition('\\')
+
+    # Return parent key path.
+    # Without separator, the parent is the root key.
+    return head if sep else RegPath.root()
+
+
+#
+class PathCompleter(object):
+    """
+    PathCompleter completes partial registry key paths, e.g. typed in the
+    path bar.
+
+    A partial path is split at the last separator into a parent key path and
+    a child name prefix. The parent's child key names are enumerated once
+    into a ChildNameIndex, which is cached with the parent's last write time
+    as validation stamp. Later completions under the same parent cost one
+    `RegQueryInfoKey` call and a binary search.
+    """
+
+    # Listing kind of child key name indexes in the cache
+    _INDEX_KIND = 'child_name_index'
+
+    # Default cache capacity in bytes
+    CAPACITY_DEFAULT = 16 * 1024 * 1024
+
+    def __init__(self, regkey_get, capacity=None):
+        """
+        Initialize object.
+
+        @param regkey_get: Function that takes a registry key path and
+        returns a RegKey object, or None if failed.
+
+        @param capacity: Max total estimated size of cached indexes in bytes.
+        Default is `CAPACITY_DEFAULT`.
+
+        @return: None.
+        """
+        # RegKey getter function
+        self._regkey_get = regkey_get
+
+        # Child key name index cache
+        self._cache = ListingCache(
+            capacity=capacity if capacity is not None
+            else self.CAPACITY_DEFAULT
+        )
+
+    def cache(self):
+        """
+        Get the child key name index cache.
+
+        @return: ListingCache object.
+        """
+        # Return the cache
+        return self._cache
+
+    def index(self, path):
+        """
+        Get a registry key's child key name index, from the cache if the
+        key's last write time has not changed.
+
+        @param path: Registry key path.
+
+        @return: ChildNameIndex object, or None if the key can not be read.
+        """
+        try:
+            # Get RegPath object.
+            # May raise ValueError.
+            regpath = RegPath.of(path)
+
+        # If the path is not valid
+        except ValueError:
+            # Return None
+            return None
+
+        # Create RegKey object
+        regkey = self._regkey_get(str(regpath))
+
+        # If the RegKey object is not created
+        if regkey is None:
+            # Return None
+            return None
+
+        # If the RegKey object is created.
+
+        try:
+            # Get the key's last write time
+            stamp = regkey.info().last_write_time
+
+            # Get cached index
+            index = self._cache.get(regpath, self._INDEX_KIND, stamp)
+
+            # If have valid cached index
+            if index is not None:
+                # Return the cached index
+                return index
+
+            # If not have valid cached index.
+
+            # Create index of the child key names.
+            # Bypass the listing cache because the index is cached here, so
+            # that the names are not cached twice.
+            index = ChildNameIndex(regkey.child_names(cached=False))
+
+        # If have error
+        except Exception:
+            # Return None
+            return None
+
+        finally:
+            # Close the RegKey object
+            regkey.close()
+
+        # Cache the index with the last write time got before enumeration,
+        # so that a change during enumeration makes the entry stale.
+        self._cache.put(
+            regpath, self._INDEX_KIND, stamp, index, size=index.size()
+        )
+
+        # Return the index
+        return index
+
+    def complete(self, text, limit=None):
+        """
+        Get completions of a partial registry key path.
+
+        @param text: Partial registry key path. The part after the last
+        separator is the child name prefix. Without separator, the text is a
+        hive name prefix.
+
+        @param limit: Max number of completions. None means no limit.
+
+        @return: Completed key paths list, sorted by casefolded child name.
+        The text before the last separator is kept as is.
+        """
+        # Split the text at the last separator
+        head, sep, prefix = text.rpartition('\\')
+
+        # Get the parent's child key name index
+        index = self.index(_parent_path(text))
+
+        # If the index is not got
+        if index is None:
+            # Return no completions
+            return []
+
+        # If the index is got.
+
+        # Return completed key paths
+        return [
+            head + sep + name
+            for name in index.prefix_match(prefix, limit=limit)
+        ]
+
+    def prefetch(self, text):
+        """
+        Build and cache the child key name index that completions of a
+        partial registry key path use, e.g. in a background thread before
+        the completions are needed.
+
+        @param text: Partial registry key path, see `complete`.
+
+        @return: None.
+        """
+        # Get the parent's child key name index, caching it
+        self.index(_parent_path(text))
+
+    def invalidate(self, path=None):
+        """
+        Remove cached indexes.
+
+        @param path: Registry key path. None means all paths.
+
+        @return: None.
+        """
+        # Remove cached indexes
+        self._cache.invalidate(path)
@@ -0,0 +1,396 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import re
+
+from .key_index import KeyIndex
+from .key_index import STRING_TYPES
+from .key_index import subtree_where
+from .regpath import path_normalize
+
+
+# Entity kind: GUID, e.g. a CLSID. Entity value is uppercase with braces.
+ENTITY_GUID = 'guid'
+
+# Entity kind: file path. Entity value is casefolded.
+ENTITY_PATH = 'path'
+
+# Entity kind: file name of a file path. Entity value is casefolded.
+ENTITY_FILE = 'file'
+
+# Entity kind: ProgID, e.g. `Word.Application.16`. Entity value is
+# casefolded.
+ENTITY_PROGID = 'progid'
+
+# Reference index file path suffix, added to the snapshot file path
+REFERENCE_INDEX_SUFFIX = '.refs'
+
+# Number of pending key updates that triggers a commit
+_COMMIT_KEY_COUNT = 10000
+
+# GUID regex, not part of a longer hex run
+_GUID_REGEX = re.compile(
+    r'(?<![0-9A-Fa-f-])'
+    r'([0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}'
+    r'-[0-9A-Fa-f]{12})'
+    r'(?![0-9A-Fa-f-])'
+)
+
+# File path regex.
+# A path starts with a drive, an environment variable, or a UNC host, and
+# ends with a file name having an extension. Directory names may contain
+# spaces. Quotes, commas, and semicolons end a path, as in command lines,
+# resource references, and path lists.
+_PATH_REGEX = re.compile(
+    r'(?:[A-Za-z]:|%[A-Za-z0-9_()]+%|\\\\[^\\/:*?"<>|\s,;]+)'
+    r'(?:\\[^\\/:*?"<>|\r\n,;]+)*?'
+    r'\\[^\\/:*?"<>|\r\n,;]*?\.[A-Za-z0-9]{1,8}'
+    r'(?![A-Za-z0-9])'
+)
+
+# ProgID regex, matched against a whole string, e.g. `Word.Application.16`
+_PROGID_REGEX = re.compile(
+    r'[A-Za-z][A-Za-z0-9_]*(?:\.[A-Za-z][A-Za-z0-9_]*){1,2}(?:\.[0-9]+)?'
+)
+
+# Last parts that make a dotted string a file or host name, not a ProgID
+_PROGID_EXCLUDED_SUFFIXES = frozenset([
+    'bat', 'cmd', 'com', 'cpl', 'dat', 'dll', 'drv', 'exe', 'htm', 'html',
+    'ico', 'ini', 'js', 'json', 'lnk', 'log', 'msc', 'msi', 'net', 'ocx',
+    'org', 'png', 'ps1', 'sys', 'tlb', 'txt', 'vbs', 'xml',
+])
+
+
+#
+def entity(kind, value):
+    """
+    Create entity string.
+
+    @param kind: Entity kind, e.g. ENTITY_GUID.
+
+    @param value: Normalized entity value.
+
+    @return: Entity string: kind, colon, and value.
+    """
+    # Return entity string
+    return kind + ':' + value
+
+
+#
+def entities(string):
+    """
+    Extract entities referenced by a string: GUIDs, file paths and their
+    file names, and ProgIDs.
+
+    @param string: String, e.g. field name or field data.
+
+    @return: Set of entity strings, see `entity`.
+    """
+    # Entity strings set
+    entity_s = set()
+
+    # For each GUID
+    for match in _GUID_REGEX.finditer(string):
+        # Add GUID entity
+        entity_s.add(entity(ENTITY_GUID, '{' + match.group(1).upper() + '}'))
+
+    # For each file path
+    for match in _PATH_REGEX.finditer(string):
+        # Get casefolded file path
+        path = match.group(0).casefold()
+
+        # Add file path entity
+        entity_s.add(entity(ENTITY_PATH, path))
+
+        # Add file name entity
+        entity_s.add(entity(ENTITY_FILE, path.rpartition('\\')[2]))
+
+    # Get the string without surrounding spaces
+    text = string.strip()
+
+    # If the whole string is a ProgID
+    if _PROGID_REGEX.fullmatch(text) \
+            and text.rpartition('.')[2].casefold() \
+            not in _PROGID_EXCLUDED_SUFFIXES:
+        # Add ProgID entity
+        entity_s.add(entity(ENTITY_PROGID, text.casefold()))
+
+    # Return entity strings set
+    return entity_s
+
+
+#
+def query_entities(text):
+    """
+    Get entities to look up for a query text, e.g. a CLSID, a file path, a
+    file name, or a ProgID typed by user.
+
+    @param text: Query text.
+
+    @return: Entity strings list. Entities referenced by the text if any,
+    otherwise the text as a file name and as a ProgID.
+    """
+    # Get entities referenced by the text
+    entity_s = entities(text)
+
+    # If the text references entities
+    if entity_s:
+        # Return the entities, sorted
+        return sorted(entity_s)
+
+    # If the text references no entities.
+
+    # Get casefolded text
+    text = text.strip().casefold()
+
+    # Return the text as a file name and as a ProgID
+    return [entity(ENTITY_FILE, text), entity(ENTITY_PROGID, text)]
+
+
+#
+def _key_refs(field_s):
+    """
+    Get entity references of a key's fields.
+
+    @param field_s: FieldTable with data loaded.
+
+    @return: Set of tuples: (entity, field_name).
+    """
+    # References set
+    ref_s = set()
+
+    # Get data column
+    data_s = field_s.datas()
+
+    # For each field's name and type
+    for index, (name, type) in enumerate(
+        zip(field_s.names(), field_s.types())
+    ):
+        # For each entity in the field name
+        for entity_str in entities(name):
+            # Add the reference
+            ref_s.add((entity_str, name))
+
+        # If have no data, or the field type is not string type
+        if data_s is None or type not in STRING_TYPES:
+            # Skip the data
+            continue
+
+        # Get field data
+        data = data_s[index]
+
+        # Get the data's strings
+        string_s = data if isinstance(data, list) \
+            else [data] if isinstance(data, str) else []
+
+        # For each string
+        for string in string_s:
+            # For each entity in the string
+            for entity_str in entities(string):
+                # Add the reference
+                ref_s.add((entity_str, name))
+
+    # Return references set
+    return ref_s
+
+
+#
+def reference_index_path(snapshot_path):
+    """
+    Get path of the reference index file kept next to a snapshot file.
+
+    @param snapshot_path: Snapshot file path.
+
+    @return: Reference index file path.
+    """
+    # Return the snapshot file path with index suffix
+    return snapshot_path + REFERENCE_INDEX_SUFFIX
+
+
+#
+class ReferenceIndex(KeyIndex):
+    """
+    ReferenceIndex is an on-disk SQLite inverted index from entities
+    referenced by field names and string data, i.e. GUIDs, file paths, file
+    names, and ProgIDs, to the fields referencing them, so that questions
+    like "what references this CLSID" look up rows instead of scanning the
+    registry.
+
+    Building, refreshing, and watching are inherited from `KeyIndex`.
+    """
+
+    # Index schema version. Indexes of other versions are rebuilt.
+    _SCHEMA_VERSION = '1'
+
+    # SQL script creating tables other than the meta table
+    _SCHEMA_SQL = """
+        CREATE TABLE keys (
+            key_id INTEGER PRIMARY KEY,
+            path_key TEXT NOT NULL UNIQUE,
+            path TEXT NOT NULL,
+            last_write_time INTEGER NOT NULL
+        );
+        CREATE TABLE refs (
+            entity TEXT NOT NULL,
+            key_id INTEGER NOT NULL,
+            name TEXT NOT NULL
+        );
+        CREATE INDEX refs_entity ON refs (entity);
+        CREATE INDEX refs_key_id ON refs (key_id);
+        """
+
+    def __init__(self, index_path, rebuild=False):
+        """
+        Initialize object. Open the index file, creating it if it not exists
+        or is not valid.
+
+        @param index_path: Index file path.
+
+        @param rebuild: Whether discard the existing index file.
+
+        @return: None.
+        """
+        # Number of key updates not committed
+        self._pending_count = 0
+
+        # Open the index file
+        super(ReferenceIndex, self).__init__(index_path, rebuild=rebuild)
+
+    def _commit(self):
+        """
+        Commit pending updates.
+
+        @return: None.
+        """
+        # Commit
+        self._conn.commit()
+
+        # Reset number of pending updates
+        self._pending_count = 0
+
+    def stats(self):
+        """
+        Get index statistics.
+
+        @return: Statistics dict with keys `keys`, `refs`, and `entities`.
+        """
+        with self._lock:
+            # Query reference statistics
+            ref_count, entity_count = self._conn.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT entity) FROM refs'
+            ).fetchone()
+
+            # Return statistics dict
+            return {
+                'keys': self.size(),
+                'refs': ref_count,
+                'entities': entity_count,
+            }
+
+    def _keys_drop(self, where, args):
+        """
+        Drop key rows and their references.
+
+        @param where: SQL condition on key rows.
+
+        @param args: SQL condition arguments.
+
+        @return: Number of dropped keys.
+        """
+        # Delete the keys' references
+        self._conn.execute(
+            'DELETE FROM refs WHERE key_id IN'
+            ' (SELECT key_id FROM keys WHERE ' + where + ')',
+            args,
+        )
+
+        # Delete the key rows.
+        # Return number of dropped keys.
+        return self._conn.execute(
+            'DELETE FROM keys WHERE ' + where, args
+        ).rowcount
+
+    def key_update(self, path, field_s, last_write_time=0):
+        """
+        Index a key's references, replacing its old ones.
+        Updates are committed by `flush`, or when many are pending.
+
+        @param path: Registry key path.
+
+        @param field_s: FieldTable with data loaded. Data of non-string types
+        are not used and can be None.
+
+        @param last_write_time: The key's last write time, used by `refresh`.
+
+        @return: None.
+        """
+        # Get normalized path, so that paths given with hive alias or full
+        # hive name share one key row
+        path = path_normalize(path)
+
+        # Get the key's references
+        ref_s = _key_refs(field_s)
+
+        with self._lock:
+            # Get casefolded path
+            path_key = path.casefold()
+
+            # Drop the key's old row and references
+            self._keys_drop('path_key = ?', (path_key,))
+
+            # Insert the key row
+            key_id = self._conn.execute(
+                'INSERT INTO keys (path_key, path, last_write_time)'
+                ' VALUES (?, ?, ?)',
+                (path_key, path, last_write_time),
+            ).lastrowid
+
+            # Insert the references
+            self._conn.executemany(
+                'INSERT INTO refs VALUES (?, ?, ?)',
+                ((x, key_id, name) for x, name in ref_s),
+            )
+
+            # Increment number of pending updates
+            self._pending_count += 1
+
+            # If pending updates are too many
+            if self._pending_count >= _COMMIT_KEY_COUNT:
+                # Commit pending updates
+                self.flush()
+
+    def referrers(self, entity_s, path=''):
+        """
+        Find fields referencing any of given entities.
+
+        @param entity_s: Entity strings, see `entity` and `query_entities`.
+
+        @param path: Registry key path of the subtree to find in. Empty
+        string means all indexed keys.
+
+        @return: List of tuples: (key_path, field_name, entity), sorted by
+        casefolded key path, then field name.
+        """
+        # Get SQL condition matching keys of the subtree
+        where, where_args = subtree_where(path)
+
+        # Rows list
+        row_s = []
+
+        with self._lock:
+            # For each entity
+            for entity_str in entity_s:
+                # Query referencing fields in the subtree
+                row_s.extend(self._conn.execute(
+                    'SELECT keys.path_key, refs.name, keys.path, refs.entity'
+                    ' FROM refs JOIN keys ON keys.key_id = refs.key_id'
+                    ' WHERE refs.entity = ? AND ' + where,
+                    (entity_str,) + tuple(where_args),
+                ))
+
+        # Sort rows by casefolded key path, then field name
+        row_s.sort()
+
+        # Return referencing fields
+        return [(row[2], row[1], row[3]) for row in row_s]
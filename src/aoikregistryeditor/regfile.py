@@ -0,0 +1,1061 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import codecs
+from collections import namedtuple
+import locale
+import re
+
+from .registry_walker import child_path_join
+from .regval import REG_BINARY
+from .regval import REG_DWORD
+from .regval import REG_SZ
+from .regval import data_decode
+from .regval import data_encode
+
+
+# `.reg` file header line of format version 5
+REGEDIT5_HEADER = 'Windows Registry Editor Version 5.00'
+
+# `.reg` file header line of format version 4, encoded in ANSI code page
+REGEDIT4_HEADER = 'REGEDIT4'
+
+# `.reg` file encoding
+REGFILE_ENCODING = 'utf-16-le'
+
+# `.reg` file line separator
+_LINE_SEP = '\r\n'
+
+# Max line width, including the continuation backslash
+_LINE_WIDTH = 80
+
+# Hex line continuation indent
+_HEX_INDENT = '  '
+
+# Number of bytes on each hex continuation line
+_HEX_BYTES_PER_LINE = (_LINE_WIDTH - len(_HEX_INDENT) - 1) // 3
+
+# Hex items of byte values, e.g. `0a` for 10
+_HEX_ITEMS = ['{:02x}'.format(x) for x in range(256)]
+
+# Default buffer size in characters
+_BUFFER_SIZE_DEFAULT = 64 * 1024
+
+# Default read chunk size in bytes
+_CHUNK_SIZE_DEFAULT = 64 * 1024
+
+# Regex matching a field line's name part, e.g. `"name"=` or `@=`.
+# Group 1 is the escaped name, or None for the default field.
+_NAME_PART_REGEX = re.compile(r'(?:@|"((?:[^"\\]|\\.)*)")\s*=\s*')
+
+# Regex matching a quoted string.
+# Group 1 is the escaped string.
+_QUOTED_REGEX = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+# Regex matching an escape sequence in a quoted string
+_ESCAPE_REGEX = re.compile(r'\\(.)')
+
+# Operation kind of key section start. The key is created if not exists.
+OP_KEY = 'key'
+
+# Operation kind of key deletion, including the key's subtree
+OP_KEY_DELETE = 'key_delete'
+
+# Operation kind of field write
+OP_WRITE = 'write'
+
+# Operation kind of field deletion
+OP_DELETE = 'delete'
+
+# Operation parsed from a `.reg` file.
+# `name`, `type`, and `data` are None for key operations. `type` and `data`
+# are None for field deletion.
+RegFileOp = namedtuple(
+    'RegFileOp',
+    [
+        'kind',
+        'path',
+        'name',
+        'type',
+        'data',
+    ]
+)
+
+# Change kind of key creation
+CHANGE_KEY_ADD = 'key_add'
+
+# Change kind of key deletion
+CHANGE_KEY_DELETE = 'key_delete'
+
+# Change kind of field creation
+CHANGE_FIELD_ADD = 'field_add'
+
+# Change kind of field data or type change
+CHANGE_FIELD_CHANGE = 'field_change'
+
+# Change kind of field deletion
+CHANGE_FIELD_DELETE = 'field_delete'
+
+# Change made, or to be made in dry-run mode, by applying a `.reg` file.
+# `name` is None for key changes. `old` and `new` are tuples:
+# (data, type), or None if the field not exists before or after the change.
+RegChange = namedtuple(
+    'RegChange',
+    [
+        'kind',
+        'path',
+        'name',
+        'old',
+        'new',
+    ]
+)
+
+
+#
+def _quote(text):
+    """
+    Quote a field name or string field data in `.reg` syntax.
+
+    @param text: Text to quote.
+
+    @return: Quoted text.
+    """
+    # Escape backslashes and double quotes.
+    # Return the quoted text.
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+#
+def _hex_lines(prefix, raw):
+    """
+    Format raw bytes as `.reg` hex list, wrapped with continuation lines.
+
+    @param prefix: Text before the hex list on the first line, e.g.
+    `"name"=hex:`.
+
+    @param raw: Raw bytes.
+
+    @return: Lines text without trailing line separator.
+    """
+    # Get number of bytes on the first line
+    first_count = max(0, (_LINE_WIDTH - 1 - len(prefix)) // 3)
+
+    # Lines list
+    line_s = []
+
+    # Start index of the current line's bytes
+    start = 0
+
+    # Number of bytes on the current line
+    count = first_count
+
+    # Line prefix of the current line
+    line_prefix = prefix
+
+    # Total number of bytes
+    total = len(raw)
+
+    # Loop until all bytes are formatted
+    while True:
+        # Get stop index of the current line's bytes
+        stop = min(total, start + count)
+
+        # Get the current line's hex items
+        item_text = ','.join([_HEX_ITEMS[x] for x in raw[start:stop]])
+
+        # If have bytes after the current line
+        if stop < total:
+            # Add the line with trailing comma and continuation backslash.
+            # A line without items has no trailing comma.
+            line_s.append(
+                line_prefix + item_text + (',\\' if item_text else '\\')
+            )
+
+            # Move to the next line
+            start = stop
+
+            # Use continuation line's byte count
+            count = _HEX_BYTES_PER_LINE
+
+            # Use continuation line's indent
+            line_prefix = _HEX_INDENT
+
+        # If have no bytes after the current line
+        else:
+            # Add the last line
+            line_s.append(line_prefix + item_text)
+
+            # Stop the loop
+            break
+
+    # Return the lines text
+    return _LINE_SEP.join(line_s)
+
+
+#
+def value_text(name, type, data):
+    """
+    Format a field in `.reg` syntax.
+
+    @param name: Field name. Empty string means the default field.
+
+    @param type: Field type.
+
+    @param data: Field data, as pywin32's `RegQueryValueEx` returns.
+
+    @return: Field text without trailing line separator.
+    """
+    # Get name part
+    name_part = (_quote(name) if name else '@') + '='
+
+    # If the type is `REG_SZ`,
+    # and the data can be written as a quoted string.
+    if type == REG_SZ and isinstance(data, str) \
+            and '\0' not in data and '\r' not in data and '\n' not in data:
+        # Return quoted string syntax
+        return name_part + _quote(data)
+
+    # If the type is `REG_DWORD` and the data is integer
+    if type == REG_DWORD and isinstance(data, int):
+        # Return dword syntax
+        return name_part + 'dword:{:08x}'.format(data & 0xFFFFFFFF)
+
+    # If the type is other type.
+
+    # Get hex list prefix.
+    # `REG_BINARY` uses `hex:`, other types use `hex(TYPE):`.
+    if type == REG_BINARY:
+        prefix = name_part + 'hex:'
+    else:
+        prefix = name_part + 'hex({:x}):'.format(type)
+
+    # Return hex list syntax
+    return _hex_lines(prefix, data_encode(type, data))
+
+
+#
+class RegFileWriter(object):
+    """
+    RegFileWriter writes `.reg` file content to a binary stream, encoded in
+    UTF-16LE. Text is buffered and encoded in large chunks so that writing
+    many small lines is cheap.
+    """
+
+    def __init__(self, out_stream, buffer_size=None):
+        """
+        Initialize object.
+
+        @param out_stream: Binary output stream.
+
+        @param buffer_size: Buffer size in characters.
+
+        @return: None.
+        """
+        # Binary output stream
+        self._out_stream = out_stream
+
+        # Buffer size in characters
+        self._buffer_size = buffer_size if buffer_size is not None \
+            else _BUFFER_SIZE_DEFAULT
+
+        # Buffered text parts
+        self._part_s = []
+
+        # Number of characters buffered
+        self._buffered = 0
+
+        # Number of bytes written
+        self._bytes_written = 0
+
+        # Number of keys written
+        self._key_count = 0
+
+        # Number of fields written
+        self._value_count = 0
+
+    def stats(self):
+        """
+        Get writer statistics dict.
+
+        @return: Writer statistics dict.
+        """
+        # Return writer statistics dict
+        return {
+            'keys': self._key_count,
+            'values': self._value_count,
+            'bytes': self._bytes_written,
+        }
+
+    def _write(self, text):
+        """
+        Buffer text, flushing the buffer if it is full.
+
+        @param text: Text.
+
+        @return: None.
+        """
+        # Add the text to the buffer
+        self._part_s.append(text)
+
+        # Increase number of characters buffered
+        self._buffered += len(text)
+
+        # If the buffer is full
+        if self._buffered >= self._buffer_size:
+            # Flush the buffer
+            self.flush()
+
+    def flush(self):
+        """
+        Encode buffered text and write it to the output stream.
+
+        @return: None.
+        """
+        # If the buffer is empty
+        if not self._part_s:
+            # Do nothing
+            return
+
+        # Encode buffered text
+        data = ''.join(self._part_s).encode(REGFILE_ENCODING)
+
+        # Clear the buffer
+        self._part_s = []
+
+        # Reset number of characters buffered
+        self._buffered = 0
+
+        # Write the data
+        self._out_stream.write(data)
+
+        # Increase number of bytes written
+        self._bytes_written += len(data)
+
+    def header_write(self):
+        """
+        Write byte order mark and header line.
+
+        @return: None.
+        """
+        # Write byte order mark and header line
+        self._write('\ufeff' + REGEDIT5_HEADER + _LINE_SEP)
+
+    def footer_write(self):
+        """
+        Write the empty line that ends the last key's section.
+
+        @return: None.
+        """
+        # Write the empty line
+        self._write(_LINE_SEP)
+
+    def key_write(self, path):
+        """
+        Write a key line, preceded by an empty line.
+
+        @param path: Registry key path.
+
+        @return: None.
+        """
+        # Write the key line
+        self._write(_LINE_SEP + '[' + path + ']' + _LINE_SEP)
+
+        # Increment key count
+        self._key_count += 1
+
+    def key_delete_write(self, path):
+        """
+        Write a key deletion line, preceded by an empty line.
+
+        @param path: Registry key path.
+
+        @return: None.
+        """
+        # Write the key deletion line
+        self._write(_LINE_SEP + '[-' + path + ']' + _LINE_SEP)
+
+        # Increment key count
+        self._key_count += 1
+
+    def value_write(self, name, type, data):
+        """
+        Write a field.
+
+        @param name: Field name. Empty string means the default field.
+
+        @param type: Field type.
+
+        @param data: Field data, as pywin32's `RegQueryValueEx` returns.
+
+        @return: None.
+        """
+        # Write the field
+        self._write(value_text(name, type, data) + _LINE_SEP)
+
+        # Increment field count
+        self._value_count += 1
+
+    def value_delete_write(self, name):
+        """
+        Write a field deletion.
+
+        @param name: Field name. Empty string means the default field.
+
+        @return: None.
+        """
+        # Write the field deletion
+        self._write((_quote(name) if name else '@') + '=-' + _LINE_SEP)
+
+        # Increment field count
+        self._value_count += 1
+
+
+#
+def export_reg(path, out_stream, regkey_get, on_error=None, buffer_size=None):
+    """
+    Export a registry subtree in `.reg` format, key by key.
+
+    Keys are visited depth-first in enumeration order, and each key's fields
+    are written as they are enumerated, so memory use does not grow with the
+    size of the subtree.
+
+    @param path: Registry key path of the subtree's top key. Empty string
+    means root key path, whose child keys are exported.
+
+    @param out_stream: Binary output stream.
+
+    @param regkey_get: RegKey getter function. It takes a registry key path
+    and returns a RegKey-compatible object, or None if failed.
+
+    @param on_error: Error callback taking arguments `(path, exc)`. Called
+    for each key that failed reading. The key's subtree is skipped. Default
+    is ignore the error.
+
+    @param buffer_size: Writer buffer size in characters.
+
+    @return: Writer statistics dict, see `RegFileWriter.stats`, with key
+    `errors` added for the number of keys that failed reading.
+    """
+    # Create writer
+    writer = RegFileWriter(out_stream, buffer_size=buffer_size)
+
+    # Number of keys that failed reading
+    error_count = 0
+
+    # Write header
+    writer.header_write()
+
+    # Paths to export.
+    # Used as a stack so that keys are written depth-first.
+    todo_s = [path]
+
+    # While have paths to export
+    while todo_s:
+        # Get a path to export
+        key_path = todo_s.pop()
+
+        # Open the key
+        regkey = regkey_get(key_path)
+
+        # If failed opening the key
+        if regkey is None:
+            # Increment number of errors
+            error_count += 1
+
+            # If have error callback
+            if on_error is not None:
+                # Call the error callback
+                on_error(key_path, ValueError(
+                    'Cannot open key: `{}`.'.format(key_path)
+                ))
+
+            # Skip the key's subtree
+            continue
+
+        # If not failed opening the key.
+
+        try:
+            # If the key is not root key
+            if key_path != '':
+                # Write the key line
+                writer.key_write(key_path)
+
+                # For each field, with data got in the enumeration pass
+                for field in regkey.iter_fields(with_data=True):
+                    # Write the field
+                    writer.value_write(
+                        field.name(), field.type(), field.data()
+                    )
+
+            # Get child key names
+            child_name_s = regkey.child_names()
+
+        # If have error
+        except Exception as exc:
+            # Increment number of errors
+            error_count += 1
+
+            # If have error callback
+            if on_error is not None:
+                # Call the error callback
+                on_error(key_path, exc)
+
+            # Skip the key's subtree
+            continue
+
+        finally:
+            # Close the key
+            regkey.close()
+
+        # For each child key name, reversed so that the stack pops them in
+        # enumeration order
+        for child_name in reversed(child_name_s):
+            # Add the child key path to paths to export
+            todo_s.append(child_path_join(key_path, child_name))
+
+    # Write footer
+    writer.footer_write()
+
+    # Flush buffered text
+    writer.flush()
+
+    # Get writer statistics dict
+    stats = writer.stats()
+
+    # Add number of errors
+    stats['errors'] = error_count
+
+    # Return writer statistics dict
+    return stats
+
+
+#
+def _unquote(text):
+    """
+    Unescape a quoted string's content in `.reg` syntax.
+
+    @param text: Escaped text, without the surrounding double quotes.
+
+    @return: Unescaped text.
+    """
+    # If the text has no escape sequences
+    if '\\' not in text:
+        # Return the text
+        return text
+
+    # If the text has escape sequences.
+
+    # Return the unescaped text
+    return _ESCAPE_REGEX.sub(r'\1', text)
+
+
+#
+def _hex_parse(text):
+    """
+    Parse `.reg` hex list into raw bytes.
+
+    @param text: Hex list text, with continuation lines joined, e.g.
+    `01,02,ff`.
+
+    @return: Raw bytes. Raise ValueError if the text is not valid.
+    """
+    # Remove whitespace
+    text = ''.join(text.split())
+
+    # If the text is empty
+    if not text:
+        # Return empty bytes
+        return b''
+
+    # If the text is not empty.
+
+    # Get text without separators
+    digit_text = text.replace(',', '')
+
+    # If each item has two digits, which is the case for files written by
+    # regedit.
+    if len(digit_text) == 2 * (text.count(',') + 1):
+        # Parse the digits in one call
+        return bytes.fromhex(digit_text)
+
+    # If some items have one digit.
+
+    # Parse each item
+    return bytes(int(x, 16) for x in text.split(','))
+
+
+#
+class RegFileReader(object):
+    """
+    RegFileReader parses `.reg` file content from a binary stream into
+    RegFileOp operations, in file order.
+
+    The stream is read and decoded in chunks, and operations are yielded as
+    their lines are parsed, so memory use does not grow with the file size.
+
+    Supported syntax is what regedit writes and reads:
+    - Header line `Windows Registry Editor Version 5.00` or `REGEDIT4`.
+    - Key lines `[path]` and key deletion lines `[-path]`.
+    - Field lines with quoted string, `dword:`, `hex:`, and `hex(TYPE):`
+      data, and field deletion lines `"name"=-`.
+    - Hex list continuation lines ending with backslash.
+    - Comment lines starting with semicolon.
+    """
+
+    # Error raised when the content is not valid
+    class ParseError(ValueError):
+        pass
+
+    def __init__(self, in_stream, encoding=None, chunk_size=None):
+        """
+        Initialize object.
+
+        @param in_stream: Binary input stream.
+
+        @param encoding: Content encoding. Default is detected from the byte
+        order mark: UTF-16LE or UTF-8 if present, otherwise the ANSI code page
+        that regedit uses for `REGEDIT4` files.
+
+        @param chunk_size: Read chunk size in bytes.
+
+        @return: None.
+        """
+        # Binary input stream
+        self._in_stream = in_stream
+
+        # Content encoding, or None to detect
+        self._encoding = encoding
+
+        # Read chunk size in bytes
+        self._chunk_size = chunk_size if chunk_size is not None \
+            else _CHUNK_SIZE_DEFAULT
+
+        # Number of lines read
+        self._line_count = 0
+
+    def line_count(self):
+        """
+        Get number of lines read, which is the current line number while
+        parsing.
+
+        @return: Number of lines read.
+        """
+        # Return number of lines read
+        return self._line_count
+
+    def _error(self, line_number, msg):
+        """
+        Create ParseError with line number.
+
+        @param line_number: Line number.
+
+        @param msg: Error message.
+
+        @return: ParseError object.
+        """
+        # Return ParseError object
+        return RegFileReader.ParseError(
+            'Line {}: {}'.format(line_number, msg)
+        )
+
+    def _iter_lines(self):
+        """
+        Read and decode the stream in chunks, and yield lines.
+
+        @return: Generator that yields lines without line separators.
+        """
+        # Read the first chunk
+        chunk = self._in_stream.read(self._chunk_size)
+
+        # Get encoding
+        encoding = self._encoding
+
+        # If encoding is not given
+        if encoding is None:
+            # If have UTF-16LE byte order mark
+            if chunk.startswith(codecs.BOM_UTF16_LE):
+                # Use UTF-16LE
+                encoding = 'utf-16-le'
+
+            # If have UTF-8 byte order mark
+            elif chunk.startswith(codecs.BOM_UTF8):
+                # Use UTF-8
+                encoding = 'utf-8'
+
+            # If have no byte order mark
+            else:
+                # Use ANSI code page
+                encoding = locale.getpreferredencoding(False)
+
+        # Create incremental decoder.
+        # It keeps partial characters split across chunks.
+        decoder = codecs.getincrementaldecoder(encoding)()
+
+        # Text after the last line separator, not yet yielded
+        pending = ''
+
+        # Whether the first line has been yielded
+        first = True
+
+        # Loop until the stream is exhausted
+        while True:
+            # Whether this is the last chunk
+            final = not chunk
+
+            # Decode the chunk
+            text = pending + decoder.decode(chunk, final)
+
+            # Split the text into lines.
+            # The last item is an incomplete line, or empty string.
+            line_s = text.split('\n')
+
+            # Keep the incomplete line
+            pending = line_s.pop()
+
+            # For each complete line
+            for line in line_s:
+                # If this is the first line
+                if first:
+                    # Remove byte order mark
+                    line = line.lstrip('\ufeff')
+
+                    # Set first line yielded
+                    first = False
+
+                # Increment number of lines read
+                self._line_count += 1
+
+                # Yield the line, removing the CR of CRLF
+                yield line.rstrip('\r')
+
+            # If this is the last chunk
+            if final:
+                # Stop the loop
+                break
+
+            # Read the next chunk
+            chunk = self._in_stream.read(self._chunk_size)
+
+        # If have a last line without line separator
+        if pending:
+            # Increment number of lines read
+            self._line_count += 1
+
+            # Yield the line
+            yield pending.lstrip('\ufeff') if first else pending
+
+    def _field_op(self, key_path, text, line_number):
+        """
+        Parse a field line into RegFileOp.
+
+        @param key_path: Registry key path of the current key section.
+
+        @param text: Field line text, with continuation lines joined.
+
+        @param line_number: Line number of the field line's first line.
+
+        @return: RegFileOp object. Raise ParseError if the line is not valid.
+        """
+        # Match the name part
+        match = _NAME_PART_REGEX.match(text)
+
+        # If the name part is not matched
+        if match is None:
+            # Raise error
+            raise self._error(line_number, 'Invalid line: `{}`.'.format(
+                text[:_LINE_WIDTH]
+            ))
+
+        # If the name part is matched.
+
+        # Get field name.
+        # Empty string means the default field.
+        name = _unquote(match.group(1)) if match.group(1) is not None else ''
+
+        # Get data part
+        data_text = text[match.end():]
+
+        # If the data part is deletion
+        if data_text == '-':
+            # Return field deletion operation
+            return RegFileOp(OP_DELETE, key_path, name, None, None)
+
+        # If the data part is quoted string
+        if data_text.startswith('"'):
+            # Match the quoted string
+            match = _QUOTED_REGEX.match(data_text)
+
+            # If the quoted string spans the data part
+            if match is not None and match.end() == len(data_text):
+                # Return `REG_SZ` field write operation
+                return RegFileOp(
+                    OP_WRITE, key_path, name, REG_SZ, _unquote(match.group(1))
+                )
+
+        # Get data part in lowercase for prefix tests
+        data_lower = data_text[:12].lower()
+
+        try:
+            # If the data part is dword
+            if data_lower.startswith('dword:'):
+                # Get hex digits
+                digit_text = data_text[6:].strip()
+
+                # If the hex digits exceed 32 bits
+                if len(digit_text) > 8:
+                    # Raise error
+                    raise ValueError(digit_text)
+
+                # Return `REG_DWORD` field write operation
+                return RegFileOp(
+                    OP_WRITE, key_path, name, REG_DWORD, int(digit_text, 16)
+                )
+
+            # If the data part is hex list of `REG_BINARY`
+            if data_lower.startswith('hex:'):
+                # Return `REG_BINARY` field write operation
+                return RegFileOp(
+                    OP_WRITE,
+                    key_path,
+                    name,
+                    REG_BINARY,
+                    _hex_parse(data_text[4:]),
+                )
+
+            # If the data part is hex list of other type
+            if data_lower.startswith('hex('):
+                # Split the type and the hex list.
+                # May raise ValueError.
+                type_text, hex_text = data_text[4:].split('):', 1)
+
+                # Get field type
+                type = int(type_text, 16)
+
+                # Return field write operation, with data decoded from raw
+                # bytes as pywin32's `RegQueryValueEx` returns.
+                return RegFileOp(
+                    OP_WRITE,
+                    key_path,
+                    name,
+                    type,
+                    data_decode(type, _hex_parse(hex_text)),
+                )
+
+        # If have error
+        except ValueError:
+            # Ignore, the error is raised below
+            pass
+
+        # Raise error
+        raise self._error(line_number, 'Invalid field data: `{}`.'.format(
+            text[:_LINE_WIDTH]
+        ))
+
+    def iter_ops(self):
+        """
+        Parse the stream into operations.
+
+        @return: Generator that yields RegFileOp objects. It raises ParseError
+        if the content is not valid, after yielding operations of the lines
+        before the invalid line.
+        """
+        # Whether the header line has been read
+        header_read = False
+
+        # Registry key path of the current key section.
+        # None means no key section, e.g. after a key deletion line.
+        key_path = None
+
+        # Parts of a field line with continuation lines, or None
+        part_s = None
+
+        # Line number of the field line's first line
+        line_number = 0
+
+        # For each line
+        for line in self._iter_lines():
+            # Strip whitespace
+            text = line.strip()
+
+            # If in a field line with continuation lines
+            if part_s is not None:
+                # If the line is empty or a comment line
+                if not text or text.startswith(';'):
+                    # Ignore the line
+                    continue
+
+                # If the line continues
+                if text.endswith('\\'):
+                    # Add the line without the backslash
+                    part_s.append(text[:-1])
+
+                    # Read the next line
+                    continue
+
+                # If the line is the last continuation line.
+
+                # Add the line
+                part_s.append(text)
+
+                # Join the field line
+                text = ''.join(part_s)
+
+                # Clear the parts
+                part_s = None
+
+            # If not in a field line with continuation lines
+            else:
+                # If the line is empty or a comment line
+                if not text or text.startswith(';'):
+                    # Ignore the line
+                    continue
+
+                # Get line number
+                line_number = self._line_count
+
+                # If the header line has not been read
+                if not header_read:
+                    # If the line is not a header line
+                    if text != REGEDIT5_HEADER and text != REGEDIT4_HEADER:
+                        # Raise error
+                        raise self._error(
+                            line_number, 'Invalid header line.'
+                        )
+
+                    # Set the header line read
+                    header_read = True
+
+                    # Read the next line
+                    continue
+
+                # If the line is a key line
+                if text.startswith('['):
+                    # If the line is not closed
+                    if not text.endswith(']'):
+                        # Raise error
+                        raise self._error(
+                            line_number, 'Invalid key line: `{}`.'.format(
+                                text[:_LINE_WIDTH]
+                            )
+                        )
+
+                    # If the line is key deletion
+                    if text.startswith('[-'):
+                        # Yield key deletion operation
+                        yield RegFileOp(
+                            OP_KEY_DELETE, text[2:-1], None, None, None
+                        )
+
+                        # Set no key section.
+                        # Field lines are not valid until next key line.
+                        key_path = None
+
+                    # If the line is key section start
+                    else:
+                        # Set the current key path
+                        key_path = text[1:-1]
+
+                        # Yield key section start operation
+                        yield RegFileOp(OP_KEY, key_path, None, None, None)
+
+                    # Read the next line
+                    continue
+
+                # If the line is a field line.
+
+                # If the line continues
+                if text.endswith('\\'):
+                    # Start the parts
+                    part_s = [text[:-1]]
+
+                    # Read the next line
+                    continue
+
+            # If have a complete field line.
+
+            # If have no key section
+            if key_path is None:
+                # Raise error
+                raise self._error(line_number, 'Field line without key line.')
+
+            # Yield field operation
+            yield self._field_op(key_path, text, line_number)
+
+        # If the file ends in a field line with continuation lines
+        if part_s is not None:
+            # If have no key section
+            if key_path is None:
+                # Raise error
+                raise self._error(line_number, 'Field line without key line.')
+
+            # Yield field operation
+            yield self._field_op(key_path, ''.join(part_s), line_number)
+
+        # If the header line has not been read
+        if not header_read:
+            # Raise error
+            raise self._error(self._line_count, 'Missing header line.')
+
+
+#
+def parse_reg(in_stream, encoding=None):
+    """
+    Parse `.reg` file content into operations, in constant memory.
+    See `RegFileReader`.
+
+    @param in_stream: Binary input stream.
+
+    @param encoding: Content encoding. Default is detected.
+
+    @return: Generator that yields RegFileOp objects.
+    """
+    # Return the operations generator
+    return RegFileReader(in_stream, encoding=encoding).iter_ops()
+
+
+#
+def change_text(change):
+    """
+    Format a RegChange as diff lines, using `.reg` syntax for fields.
+
+    @param change: RegChange object.
+
+    @return: Diff text. Lines are separated by `\\n`. Removed items start
+    with `-`, added items start with `+`.
+    """
+    # If the change is key creation
+    if change.kind == CHANGE_KEY_ADD:
+        # Return the diff line
+        return '+[{}]'.format(change.path)
+
+    # If the change is key deletion
+    if change.kind == CHANGE_KEY_DELETE:
+        # Return the diff line
+        return '-[{}]'.format(change.path)
+
+    # If the change is field change.
+
+    # Diff lines list
+    line_s = []
+
+    # For each side of the change
+    for sign, data_type_tuple in (('-', change.old), ('+', change.new)):
+        # If the field not exists on this side
+        if data_type_tuple is None:
+            # Skip
+            continue
+
+        # Get data and type
+        data, type = data_type_tuple
+
+        # Add the diff line.
+        # Hex list continuation lines are kept as separate lines.
+        line_s.append('{}[{}] {}'.format(
+            sign,
+            change.path,
+            value_text(change.name, type, data).replace(_LINE_SEP, '\n'),
+        ))
+
+    # Return the diff text
+    return '\n'.join(line_s)
@@ -2,28 +2,75 @@
 #
 from __future__ import absolute_import
 
+from array import array
+import atexit
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+import sys
+from sys import intern
+
 import pywintypes
 from win32api import RegCloseKey
+from win32api import RegCreateKeyEx
+from win32api import RegDeleteTree
 from win32api import RegDeleteValue
+from win32api import RegEnumKey
 from win32api import RegEnumKeyEx
 from win32api import RegEnumValue
+from win32api import RegNotifyChangeKeyValue
 from win32api import RegOpenKeyEx
+from win32api import RegQueryInfoKeyW
 from win32api import RegQueryValueEx
 from win32api import RegSetValueEx
 from win32con import KEY_ALL_ACCESS
+from win32con import KEY_NOTIFY
 from win32con import KEY_READ
 from win32con import KEY_WOW64_64KEY
-from win32con import HKEY_CLASSES_ROOT
-from win32con import HKEY_CURRENT_CONFIG
-from win32con import HKEY_CURRENT_USER
-from win32con import HKEY_LOCAL_MACHINE
-from win32con import HKEY_USERS
 from win32con import HWND_BROADCAST
+from win32con import REG_NOTIFY_CHANGE_LAST_SET
+from win32con import REG_NOTIFY_CHANGE_NAME
 from win32con import SMTO_ABORTIFHUNG
 from win32con import WM_SETTINGCHANGE
+from win32event import CreateEvent
+from win32event import INFINITE
+from win32event import SetEvent
+from win32event import WAIT_OBJECT_0
+from win32event import WaitForMultipleObjects
 from win32gui import SendMessageTimeout
+from winerror import ERROR_ACCESS_DENIED
+from winerror import ERROR_FILE_NOT_FOUND
+from winerror import ERROR_KEY_DELETED
 
+from .binary_search import binary_search as _binary_search
+from .broadcaster import DebouncedBroadcaster
 from .eventor import Eventor
+from .existence_cache import ExistenceCache
+from .listing_cache import ListingCache
+from .path_completion import PathCompleter
+from .regfile import CHANGE_FIELD_ADD
+from .regfile import CHANGE_FIELD_CHANGE
+from .regfile import CHANGE_FIELD_DELETE
+from .regfile import CHANGE_KEY_ADD
+from .regfile import CHANGE_KEY_DELETE
+from .regfile import OP_KEY
+from .regfile import OP_KEY_DELETE
+from .regfile import OP_WRITE
+from .regfile import RegChange
+from .regfile import export_reg as _export_reg
+from .regfile import parse_reg
+from .registry_walker import walk as _walk
+from .search import RegSearch
+from .snapshot import snapshot_save as _snapshot_save
+from .regpath import HIVE_NAME_TO_INT
+from .regpath import RegPath
+from .regval import FieldTable
+from .regval import RegKeyInfo
+from .regval import RegVal
+from .regval import data_decode
+from .registry_watcher import RegChangeNotifier
+from .registry_watcher import RegKeyWatcher
+from .regkey_pool import RegKeyHandlePool
 
 
 #
@@ -50,27 +97,61 @@ def send_WM_SETTINGCHANGE():
         pass
 
 
-# Map registry hive name to hive integer
-_HIVE_NAME_TO_INT = {
-    'HKEY_CLASSES_ROOT': HKEY_CLASSES_ROOT,
-    'HKEY_CURRENT_CONFIG': HKEY_CURRENT_CONFIG,
-    'HKEY_CURRENT_USER': HKEY_CURRENT_USER,
-    'HKEY_LOCAL_MACHINE': HKEY_LOCAL_MACHINE,
-    'HKEY_USERS': HKEY_USERS,
-}
+# Broadcaster that coalesces `WM_SETTINGCHANGE` sent after registry changes
+_SETTINGCHANGE_BROADCASTER = DebouncedBroadcaster(
+    send_func=send_WM_SETTINGCHANGE,
+)
+
+# Send pending `WM_SETTINGCHANGE` before exit
+atexit.register(_SETTINGCHANGE_BROADCASTER.flush)
+
+
+#
+def settingchange_broadcaster():
+    """
+    Get the broadcaster that sends `WM_SETTINGCHANGE` after registry changes.
+
+    Registry changes request a broadcast, which is sent from a background
+    thread after a quiet period, so that a burst of changes causes only one
+    broadcast. Call its `flush` method to send a pending broadcast now.
+
+    @return: DebouncedBroadcaster object.
+    """
+    # Return the broadcaster
+    return _SETTINGCHANGE_BROADCASTER
+
+
+# FILETIME epoch
+_FILETIME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
 
 
 #
-def _hive_name_to_int(name):
+def _time_to_filetime(time_obj):
     """
-    Map registry hive name to hive integer.
+    Convert time object returned by pywin32 to FILETIME integer.
 
-    @param name: Hive name.
+    @param time_obj: `pywintypes.TimeType` object, or FILETIME integer.
 
-    @return: Hive integer, or None if the hive name not exists.
+    @return: FILETIME integer.
     """
-    # Map registry hive name to hive integer
-    return _HIVE_NAME_TO_INT.get(name, None)
+    # If the time object is integer already
+    if isinstance(time_obj, int):
+        # Return the integer
+        return time_obj
+
+    # If the time object is not integer.
+
+    # If the time object is naive
+    if time_obj.tzinfo is None:
+        # Assume it is UTC
+        time_obj = time_obj.replace(tzinfo=timezone.utc)
+
+    # Get time delta since FILETIME epoch
+    delta = time_obj - _FILETIME_EPOCH
+
+    # Convert the time delta to 100-nanosecond intervals.
+    # Return the FILETIME integer.
+    return (delta // timedelta(microseconds=1)) * 10
 
 
 #
@@ -78,25 +159,21 @@ def _regkey_handle_get(path, mask=None):
     """
     Get registry key handle.
 
-    @param path: Registry key path.
+    @param path: Registry key path, or RegPath object.
 
     @param mask: Permission mask.
 
     @return: Registry key handle, or raise error if failed.
     """
-    # Split the registry key path into hive name and no-hive path
-    hive_name, _, nohive_path = path.partition('\\')
+    # Get RegPath object.
+    # May raise ValueError.
+    regpath = RegPath.of(path)
 
-    # If no-hive path is empty,
-    # it means path given is solely hive name.
-    if nohive_path == '':
-        # Set no-hive path to None
-        nohive_path = None
+    # Get hive integer precomputed by the RegPath object
+    hive_int = regpath.hive_int()
 
-    # Get hive integer
-    hive_int = _hive_name_to_int(hive_name)
-
-    # If hive integer is not found
+    # If hive integer is not found,
+    # it means the path is root key path.
     if hive_int is None:
         # Get error message
         msg = 'Invalid registry key path: {}'.format(path)
@@ -115,7 +192,7 @@ def _regkey_handle_get(path, mask=None):
     # May raise `pywintypes.error`.
     regkey_handle = RegOpenKeyEx(
         hive_int,
-        nohive_path,
+        regpath.nohive_path(),
         0,  # Always 0
         mask,
     )
@@ -124,28 +201,152 @@ def _regkey_handle_get(path, mask=None):
     return regkey_handle
 
 
+# Registry key handle pool used by `regkey_get`
+_REGKEY_POOL = RegKeyHandlePool(
+    open_func=(lambda path, mask: _regkey_handle_get(path, mask=mask)),
+    close_func=RegCloseKey,
+)
+
+
+#
+def regkey_pool():
+    """
+    Get the registry key handle pool used by `regkey_get`.
+
+    The pool's capacity can be changed via its `capacity_set` method, and its
+    hit and miss counters can be read via its `stats` method.
+
+    @return: RegKeyHandlePool object.
+    """
+    # Return the registry key handle pool
+    return _REGKEY_POOL
+
+
+# Listing cache used by `RegKey.child_names` and `RegKey.fields`
+_LISTING_CACHE = ListingCache()
+
+# Listing kind of child key names
+_LISTING_CHILD_NAMES = 'child_names'
+
+# Listing kind of field tuples
+_LISTING_FIELDS = 'fields'
+
+
+#
+def listing_cache():
+    """
+    Get the listing cache used by `RegKey.child_names` and `RegKey.fields`
+    when their `cached` argument is on.
+
+    The cache's capacity in bytes can be changed via its `capacity_set`
+    method.
+
+    @return: ListingCache object.
+    """
+    # Return the listing cache
+    return _LISTING_CACHE
+
+
+# Existence cache used by `regkey_exists` when its `cached` argument is on
+_EXISTENCE_CACHE = ExistenceCache()
+
+
+#
+def existence_cache():
+    """
+    Get the existence cache used by `regkey_exists` when its `cached`
+    argument is on.
+
+    @return: ExistenceCache object.
+    """
+    # Return the existence cache
+    return _EXISTENCE_CACHE
+
+
+# Path completer used by the path bar.
+# Opens keys read-only via the handle pool.
+_PATH_COMPLETER = PathCompleter(
+    regkey_get=(lambda path: regkey_get(path, mask=KEY_READ))
+)
+
+
+#
+def path_completer():
+    """
+    Get the path completer used by the path bar.
+
+    Its cache of child key name indexes can be read via its `cache` method.
+
+    @return: PathCompleter object.
+    """
+    # Return the path completer
+    return _PATH_COMPLETER
+
+
+#
+def _listing_size(item_s):
+    """
+    Estimate size in bytes of a listing to cache.
+
+    @param item_s: Listing items. Each item is a string.
+
+    @return: Estimated size in bytes.
+    """
+    # Size of the sequence itself
+    size = sys.getsizeof(item_s)
+
+    # For each item
+    for item in item_s:
+        # Add the item's size
+        size += sys.getsizeof(item)
+
+    # Return the estimated size
+    return size
+
+
 #
-def regkey_get(path, mask=None):
+def regkey_get(path, mask=None, pooled=True):
     """
     Create RegKey object for given registry key path.
 
-    @param path: Registry key path.
+    @param path: Registry key path, or RegPath object.
 
     @param mask: Permission mask.
 
+    @param pooled: Whether lease the registry key handle from the handle pool.
+    If True, closing the RegKey object gives the lease back to the pool
+    instead of closing the registry key handle.
+
     @return: RegKey object, or None if failed getting the registry key handle.
     """
-    # If the registry key path is root key path
-    if path == RegKey.ROOT:
+    # If the registry key path is root key path.
+    # Compare as string because RegPath objects do not equal path strings.
+    if str(path) == RegKey.ROOT:
         # Return RootRegKey object
         return RootRegKey()
 
     # If the registry key path is not root key path.
 
+    # If permission mask is not given
+    if mask is None:
+        # Set default permission mask.
+        # Resolve it here so that the pool key is same as explicit default.
+        mask = KEY_ALL_ACCESS | KEY_WOW64_64KEY
+
+    # Get handle pool
+    pool = _REGKEY_POOL if pooled else None
+
     #
     try:
-        # Get registry key handle
-        regkey_handle = _regkey_handle_get(path, mask=mask)
+        # If use handle pool
+        if pool is not None:
+            # Lease registry key handle from the pool
+            regkey_handle = pool.acquire(path, mask)
+
+        # If not use handle pool
+        else:
+            # Get registry key handle
+            regkey_handle = _regkey_handle_get(path, mask=mask)
     # If have error
     except Exception:
         # Set registry key handle to None
@@ -161,7 +362,9 @@ def regkey_get(path, mask=None):
     # Create RegKey object
     regkey = RegKey(
         handle=regkey_handle,
-        path=path,
+        path=str(path),
+        mask=mask,
+        pool=pool,
     )
 
     # Return the RegKey object
@@ -169,17 +372,160 @@ def regkey_get(path, mask=None):
 
 
 #
-def regkey_exists(path):
+def _regkey_get_unpooled(path):
+    """
+    Get RegKey object for bulk reading, e.g. by walks, searches, exports, and
+    snapshots. The key is opened with read permission and not via the handle
+    pool, so that reading many keys does not evict the handles used by the
+    editor.
+
+    @param path: Registry key path.
+
+    @return: RegKey object, or None if failed.
+    """
+    # Return RegKey object owning its handle
+    return regkey_get(path, mask=KEY_READ, pooled=False)
+
+
+#
+def _top_paths(path_s):
+    """
+    Get subtrees' top key paths, with root key path replaced by hive names,
+    so that each hive is read separately.
+
+    @param path_s: Registry key paths. Default is root key path.
+
+    @return: Top key paths list.
+    """
+    # If key paths are not given
+    if path_s is None:
+        # Use root key path
+        path_s = [RegKey.ROOT]
+
+    # Top key paths list
+    top_path_s = []
+
+    # For each key path
+    for path in path_s:
+        # If the key path is root key path
+        if str(path) == RegKey.ROOT:
+            # Use each hive
+            top_path_s.extend(RegKey.HKEYS)
+
+        # If the key path is not root key path
+        else:
+            # Use the key path
+            top_path_s.append(path)
+
+    # Return top key paths list
+    return top_path_s
+
+
+#
+def _regkey_open_error(path):
+    """
+    Open given registry key path with read permission, to tell why the key
+    can not be read. A fresh handle is opened and closed instead of leasing
+    from the handle pool, because a pooled handle stays valid after another
+    process deletes the key.
+
+    @param path: Registry key path.
+
+    @return: None if the key is opened, otherwise the error raised.
+    """
+    # If the registry key path is root key path
+    if str(path) == RegKey.ROOT:
+        # Return None because root key always exists
+        return None
+
+    # If the registry key path is not root key path.
+
+    try:
+        # Get registry key handle
+        regkey_handle = _regkey_handle_get(path, mask=KEY_READ)
+
+    # If have error
+    except Exception as exc:
+        # Return the error
+        return exc
+
+    # Close the registry key handle
+    RegCloseKey(regkey_handle)
+
+    # Return None
+    return None
+
+
+#
+def regkey_exists(path, cached=False):
     """
     Test whether given registry key path exists, and user permissions are
     granted to read the registry key.
 
     @param path: Registry key path.
 
+    @param cached: Whether reuse a result cached within the existence
+    cache's time to live, including a cached missing ancestor, see
+    `ExistenceCache`. Keys are cached as missing only if they not exist, and
+    as existing but not readable if access is denied.
+
     @return: Boolean.
     """
-    # Create RegKey object for given registry key path
-    regkey = regkey_get(path, mask=KEY_READ)
+    # If use existence cache
+    if cached:
+        try:
+            # Get cached result.
+            # May raise ValueError.
+            exists = _EXISTENCE_CACHE.get(path)
+
+        # If the path is not valid
+        except ValueError:
+            # Return False
+            return False
+
+        # If have cached result
+        if exists is not None:
+            # Return the cached result
+            return exists
+
+        # If not have cached result.
+
+        # Open the key, getting the error if failed
+        error = _regkey_open_error(path)
+
+        # If the key is opened
+        if error is None:
+            # Cache the key as existing
+            _EXISTENCE_CACHE.put(path, True)
+
+            # Return True
+            return True
+
+        # If the key is not opened.
+
+        # Get Windows error code, or None if not a Windows error
+        error_code = getattr(error, 'winerror', None)
+
+        # If the key not exists
+        if error_code == ERROR_FILE_NOT_FOUND:
+            # Cache the key and, implicitly, its descendants as missing
+            _EXISTENCE_CACHE.put(path, False)
+
+        # If the key exists but access is denied
+        elif error_code == ERROR_ACCESS_DENIED:
+            # Cache the key as existing but not readable
+            _EXISTENCE_CACHE.put(path, True, readable=False)
+
+        # Other errors, e.g. transient ones, are not cached.
+
+        # Return False
+        return False
+
+    # If not use existence cache.
+
+    # Create RegKey object for given registry key path, with a fresh handle
+    # because a pooled handle stays valid after the key is deleted
+    regkey = regkey_get(path, mask=KEY_READ, pooled=False)
 
     # If the RegKey object is created,
     # it means the registry key path exists.
@@ -199,236 +545,1124 @@ def regkey_exists(path):
 
 
 #
-def regkey_parent_path(path):
+def regkey_info(path):
     """
-    Get given registry key path's parent registry key path.
+    Get given registry key path's metadata, without enumerating the key.
 
     @param path: Registry key path.
 
-    @return: Parent registry key path.
+    @return: RegKeyInfo object, or None if have error.
     """
-    # If the key path is root key path or hive key path
-    if path == RegKey.ROOT or path in RegKey.HKEYS:
-        # Return the root key path
-        return RegKey.ROOT
+    # Create RegKey object for given registry key path
+    regkey = regkey_get(path, mask=KEY_READ)
 
-    # If the key path is not root key path or hive key path
+    # If the RegKey object is not created
+    if regkey is None:
+        # Return None
+        return None
+
+    # If the RegKey object is created.
+
+    try:
+        # Return the key's metadata
+        return regkey.info()
 
-    # Get parent key path.
-    # Assume the given path has path separator in it.
-    parent_path, sep, child_part = path.rpartition('\\')
+    # If have error
+    except pywintypes.error:
+        # Return None
+        return None
 
-    # Return the parent key path
-    return parent_path
+    finally:
+        # Close the RegKey object
+        regkey.close()
 
 
 #
-def regkey_child_names(path):
+def walk(
+    path,
+    max_depth=None,
+    workers=None,
+    include_values=False,
+    cancel_token=None,
+    on_error=None,
+    include_info=False,
+):
     """
-    Get given registry key path's child key names list.
+    Walk a registry subtree, listing keys on a bounded thread pool.
+    See `registry_walker.walk`.
 
-    @param path: Registry key path.
+    @param path: Registry key path of the subtree's top key.
 
-    @return: Child key names list.
-    """
-    # If the key path is root key path
-    if path == RegKey.ROOT:
-        # Return hive key names
-        return RegKey.HKEYS
+    @param max_depth: Max depth to descend. The top key is depth 0. None
+    means no limit.
 
-    # If the key path is not root key path.
+    @param workers: Number of worker threads. Default is number of CPUs.
 
-    # Create RegKey object for given registry key path
-    regkey = regkey_get(path)
+    @param include_values: Whether list fields of each key.
 
-    # If the RegKey object is not created
-    if regkey is None:
-        # Return None
-        return None
+    @param cancel_token: WalkCancelToken object to cancel the walk.
 
-    # If the RegKey object is created.
-    else:
-        # Return child key names list
-        return regkey.child_names()
+    @param on_error: Error callback taking arguments `(path, exc)`.
 
+    @param include_info: Whether get metadata of each key.
 
-#
-class RegVal(object):
-    """
-    RegVal represents a registry key's field.
+    @return: Generator of tuples: (path, child_names, fields), plus the key's
+    RegKeyInfo if `include_info` is on.
     """
+    # Return the walk generator
+    return _walk(
+        path,
+        regkey_get=_regkey_get_unpooled,
+        max_depth=max_depth,
+        workers=workers,
+        include_values=include_values,
+        cancel_token=cancel_token,
+        on_error=on_error,
+        include_info=include_info,
+    )
 
-    def __init__(self, regkey, name, type):
-        """
-        Initialize object.
 
-        @param regkey: RegKey object of the registry key containing the field.
+#
+def search(text, path_s=None, **kwargs):
+    """
+    Create registry search. See `search.RegSearch`. Call `start` on the
+    returned object to start searching.
 
-        @param name: Field name.
+    @param text: Text to find.
 
-        @param type: Field type.
+    @param path_s: Registry key paths of the subtrees' top keys. Root key
+    path means all hives, each searched in its own thread. Default is root
+    key path.
 
-        @return: None.
-        """
-        # RegKey object
-        self._regkey = regkey
+    @param kwargs: Other arguments for `RegSearch`.
 
-        # Field name
-        self._name = name
+    @return: RegSearch object.
+    """
+    # Return the registry search
+    return RegSearch(
+        _top_paths(path_s),
+        text,
+        regkey_get=_regkey_get_unpooled,
+        **kwargs
+    )
 
-        # Field type
-        self._type = type
 
-    def __str__(self):
-        """
-        Get string of the object.
+#
+def binary_search(pattern, path_s=None, **kwargs):
+    """
+    Search registry subtrees for a byte pattern in fields' data. See
+    `binary_search.binary_search`.
 
-        @return: String of the object.
-        """
-        # Return the field name
-        return self._name
+    @param pattern: Hex byte pattern, e.g. `4D 5A ?? 00`.
 
-    def name(self):
-        """
-        Get field name.
+    @param path_s: Registry key paths of the subtrees' top keys. Root key
+    path means all hives. Default is root key path.
 
-        @return: Field name
-        """
-        # Return the field name
-        return self._name
+    @param kwargs: Other arguments for `binary_search.binary_search`.
 
-    def name_set(self, name):
-        """
-        Set field name.
+    @return: Generator of BinaryHit objects. Raise ValueError if the pattern
+    is not valid.
+    """
+    # Return the search's hits generator
+    return _binary_search(
+        _top_paths(path_s),
+        pattern,
+        regkey_get=_regkey_get_unpooled,
+        **kwargs
+    )
 
-        @param name: Field name to set.
 
-        @return: None.
-        """
-        # Set the field name
-        self._name = name
+#
+def reference_index_refresh(index, path=None, **kwargs):
+    """
+    Update a reference index incrementally from a registry subtree. See
+    `reference_index.ReferenceIndex.refresh`.
 
-    def type(self):
-        """
-        Get field type.
+    @param index: ReferenceIndex object.
 
-        @return: Field type
-        """
-        # Return the field type
-        return self._type
+    @param path: Registry key path of the subtree's top key. Root key path
+    means all hives. Default is root key path.
 
-    def type_set(self, type):
-        """
-        Set field type.
+    @param kwargs: Other arguments for `ReferenceIndex.refresh`.
 
-        @param type: Field type to set.
+    @return: Statistics dict with keys `keys`, `updates`, and `removes`.
+    """
+    # Refresh the index.
+    # Return statistics dict.
+    return index.refresh(
+        path if path is not None else RegKey.ROOT,
+        regkey_get=_regkey_get_unpooled,
+        **kwargs
+    )
 
-        @return: None.
-        """
-        # Set the field type
-        self._type = type
 
-    def data(self):
-        """
-        Get field data.
+#
+def export_reg(path, out_stream, on_error=None):
+    """
+    Export a registry subtree in `.reg` format, encoded in UTF-16LE.
+    See `regfile.export_reg`.
 
-        @return: Field data.
-        """
-        # Read field data from registry.
-        # Return the field data.
-        return self._regkey.field_data(name=self._name)
+    @param path: Registry key path of the subtree's top key.
 
-    def data_set(self, data):
-        """
-        Set field data.
+    @param out_stream: Binary output stream.
 
-        @param data: Field data to set.
+    @param on_error: Error callback taking arguments `(path, exc)`.
 
-        @return: None
-        """
-        # Write field data to registry
-        success = self._regkey.field_write(
-            name=self._name,
-            type=self._type,
-            data=data,
-        )
+    @return: Writer statistics dict with keys `keys`, `values`, `bytes`, and
+    `errors`. Raise ValueError if the path is not valid.
+    """
+    # Export the subtree.
+    # Use full hive name in key lines because `.reg` files do not accept
+    # hive aliases.
+    return _export_reg(
+        str(RegPath.of(path)),
+        out_stream,
+        regkey_get=_regkey_get_unpooled,
+        on_error=on_error,
+    )
 
-        # If have no success
-        if not success:
-            # Raise error
-            raise ValueError(data)
 
-    def delete(self):
-        """
-        Delete the field.
+#
+def regkey_create(path, notify=True):
+    """
+    Create registry key, including missing ancestor keys. Existing keys are
+    opened as is.
 
-        @return: Whether the operation is successful.
-        """
-        # Delete the field.
-        # Return whether the operation is successful.
-        return self._regkey.field_delete(self._name)
+    @param path: Registry key path, or RegPath object.
 
+    @param notify: Whether request `WM_SETTINGCHANGE` broadcast.
 
-#
-class RegKey(object):
-    """
-    RegKey represents a registry key.
+    @return: RegKey object leased from the handle pool, or None if failed.
     """
+    # Get RegPath object.
+    # May raise ValueError.
+    regpath = RegPath.of(path)
 
-    # Root path
-    ROOT = ''
+    # If the path is root key path
+    if regpath.hive_int() is None:
+        # Return None because root key can not be created
+        return None
 
-    # Hive names list
-    HKEYS = tuple(_HIVE_NAME_TO_INT.keys())
+    #
+    try:
+        # Create the key
+        regkey_handle, _ = RegCreateKeyEx(
+            regpath.hive_int(),
+            regpath.nohive_path(),
+            KEY_ALL_ACCESS | KEY_WOW64_64KEY,
+            0,  # Options
+        )
 
-    def __init__(self, handle, path):
-        """
-        Initialize object.
+    # If have error
+    except pywintypes.error:
+        # Return None
+        return None
 
-        @param handle: Registry key handle.
+    # If have no error.
 
-        @param path: Registry key path.
+    # Close the created handle. The key is opened again via the handle pool.
+    RegCloseKey(regkey_handle)
 
-        @return: None.
-        """
-        # Registry key handle
-        self._handle = handle
+    # Get parent path
+    parent_path = regpath.parent()
 
-        # Registry key path
-        self._path = path
+    # Cache the key and its ancestors as existing
+    _EXISTENCE_CACHE.put(regpath, True)
 
-    def __str__(self):
-        """
-        Get string of the object.
+    # For each ancestor path, because missing ancestors may have been created
+    while not parent_path.is_root():
+        # Remove cached child names of the ancestor key
+        _LISTING_CACHE.invalidate(parent_path)
 
-        @return: String of the object.
-        """
-        # Return the key path
-        return self._path
+        # Get the next ancestor path
+        parent_path = parent_path.parent()
 
-    def path(self):
-        """
-        Get key path.
+    # If notify registry changes
+    if notify:
+        # Request WM_SETTINGCHANGE to notify registry changes
+        _SETTINGCHANGE_BROADCASTER.request()
 
-        @return: Key path
+    # Return RegKey object via the handle pool
+    return regkey_get(regpath)
+
+
+#
+def regkey_delete(path, notify=True):
+    """
+    Delete registry key and its subtree.
+
+    @param path: Registry key path, or RegPath object.
+
+    @param notify: Whether request `WM_SETTINGCHANGE` broadcast.
+
+    @return: Whether the operation is successful. Raise ValueError if the
+    path is root key path or a hive key path.
+    """
+    # Get RegPath object.
+    # May raise ValueError.
+    regpath = RegPath.of(path)
+
+    # If the path is root key path or a hive key path
+    if regpath.is_root() or regpath.is_hive():
+        # Raise error
+        raise ValueError(
+            'Cannot delete root key or hive key: `{}`.'.format(path)
+        )
+
+    # Open parent key via the handle pool
+    parent_regkey = regkey_get(regpath.parent())
+
+    # If failed opening parent key
+    if parent_regkey is None:
+        # Return the operation is not successful
+        return False
+
+    #
+    try:
+        # Delete the key and its subtree
+        RegDeleteTree(parent_regkey._handle, regpath.name())
+
+    # If have error
+    except pywintypes.error:
+        # Return the operation is not successful
+        return False
+
+    finally:
+        # Close parent key
+        parent_regkey.close()
+
+    # If have no error.
+
+    # Remove cached handles of the subtree
+    _REGKEY_POOL.discard(regpath)
+
+    # Remove cached listings of the subtree
+    _LISTING_CACHE.invalidate(regpath, subtree=True)
+
+    # Remove cached child names of parent key
+    _LISTING_CACHE.invalidate(regpath.parent())
+
+    # Cache the key and, implicitly, its descendants as missing
+    _EXISTENCE_CACHE.invalidate(regpath, subtree=True)
+
+    _EXISTENCE_CACHE.put(regpath, False)
+
+    # If notify registry changes
+    if notify:
+        # Request WM_SETTINGCHANGE to notify registry changes
+        _SETTINGCHANGE_BROADCASTER.request()
+
+    # Return the operation is successful
+    return True
+
+
+#
+def import_reg(
+    in_stream,
+    dry_run=False,
+    on_change=None,
+    on_error=None,
+    encoding=None,
+):
+    """
+    Apply `.reg` file content to the registry, streaming operations from
+    `regfile.parse_reg` so that memory use does not grow with the file size.
+
+    Operations of a key section are applied via one RegKey object leased
+    from the handle pool, and one `WM_SETTINGCHANGE` broadcast is requested
+    after all operations.
+
+    In dry-run mode, nothing is written, and the changes that would be made
+    are reported via `on_change`. Later key sections see the effects of
+    earlier key deletions and creations, but not of earlier field changes to
+    the same field.
+
+    @param in_stream: Binary input stream of `.reg` file content.
+
+    @param dry_run: Whether report changes without writing.
+
+    @param on_change: Change callback taking a RegChange object. If given,
+    each field's current value is read before writing so that changes can be
+    reported, and writes that would not change the field are skipped.
+
+    @param on_error: Error callback taking arguments `(path, exc)`. Called
+    for each operation that failed. Default is ignore the error.
+
+    @param encoding: Content encoding. Default is detected.
+
+    @return: Statistics dict with keys `keys` (number of key operations),
+    `values` (number of field operations), `changes` (number of reported
+    changes), and `errors`. Raise `RegFileReader.ParseError` if the content
+    is not valid, after applying the operations before the invalid line.
+    """
+    # Whether read current values to compute changes
+    diff = dry_run or on_change is not None
+
+    # Statistics dict
+    stats = {
+        'keys': 0,
+        'values': 0,
+        'changes': 0,
+        'errors': 0,
+    }
+
+    # Paths of keys deleted, or to be deleted in dry-run mode
+    deleted_path_s = []
+
+    # Paths of keys created in dry-run mode
+    created_path_s = set()
+
+    # RegKey object of the current key section, or None
+    regkey = None
+
+    # Registry key path of the current key section
+    key_path = None
+
+    # Whether skip field operations of the current key section, e.g. the key
+    # failed opening.
+    skip = True
+
+    #
+    def change_report(kind, path, name=None, old=None, new=None):
+        # Increment number of changes
+        stats['changes'] += 1
+
+        # If have change callback
+        if on_change is not None:
+            # Call the change callback
+            on_change(RegChange(kind, path, name, old, new))
+
+    #
+    def error_report(path, exc):
+        # Increment number of errors
+        stats['errors'] += 1
+
+        # If have error callback
+        if on_error is not None:
+            # Call the error callback
+            on_error(path, exc)
+
+    #
+    def dry_run_exists(regpath):
+        # If the key is created in dry-run mode
+        if regpath in created_path_s:
+            # Return the key exists
+            return True
+
+        # If the key is within a key deleted in dry-run mode
+        if any(regpath.is_within(x) for x in deleted_path_s):
+            # Return the key not exists
+            return False
+
+        # Return whether the key exists in the registry
+        return regkey_exists(regpath)
+
+    try:
+        # For each operation
+        for op in parse_reg(in_stream, encoding=encoding):
+            # If the operation is field operation
+            if op.name is not None:
+                # Increment number of field operations
+                stats['values'] += 1
+
+                # If the key section is skipped
+                if skip:
+                    # Skip the operation
+                    continue
+
+                # If the key section is not skipped.
+
+                # Get the field's current data and type.
+                # None means the field not exists.
+                if diff and regkey is not None:
+                    old = regkey._field_data_type_tuple(op.name)
+                else:
+                    old = None
+
+                # If the operation is field write
+                if op.kind == OP_WRITE:
+                    # Get new data and type
+                    new = (op.data, op.type)
+
+                    # If compute changes
+                    if diff:
+                        # If the field would not change
+                        if old == new:
+                            # Skip the operation
+                            continue
+
+                        # Report the change
+                        change_report(
+                            CHANGE_FIELD_ADD if old is None
+                            else CHANGE_FIELD_CHANGE,
+                            key_path,
+                            name=op.name,
+                            old=old,
+                            new=new,
+                        )
+
+                    # If not dry-run
+                    if not dry_run:
+                        # Write the field without broadcast
+                        success = regkey.field_write(
+                            name=op.name,
+                            type=op.type,
+                            data=op.data,
+                            notify=False,
+                        )
+
+                        # If have no success
+                        if not success:
+                            # Report error
+                            error_report(key_path, ValueError(
+                                'Failed to write field: `{}->{}`.'.format(
+                                    key_path, op.name
+                                )
+                            ))
+
+                # If the operation is field delete
+                else:
+                    # If compute changes
+                    if diff:
+                        # If the field not exists
+                        if old is None:
+                            # Skip the operation
+                            continue
+
+                        # Report the change
+                        change_report(
+                            CHANGE_FIELD_DELETE,
+                            key_path,
+                            name=op.name,
+                            old=old,
+                        )
+
+                    # If not dry-run
+                    if not dry_run:
+                        # Delete the field without broadcast.
+                        # Ignore failure because the field may not exist,
+                        # which regedit ignores too.
+                        regkey.field_delete(op.name, notify=False)
+
+                # Next operation
+                continue
+
+            # If the operation is key operation.
+
+            # Increment number of key operations
+            stats['keys'] += 1
+
+            # If have RegKey object of the previous key section
+            if regkey is not None:
+                # Give the lease back to the handle pool
+                regkey.close()
+
+                # Set RegKey object to None
+                regkey = None
+
+            # Skip field operations until the key section is set up
+            skip = True
+
+            #
+            try:
+                # Get RegPath object.
+                # May raise ValueError.
+                regpath = RegPath.of(op.path)
+
+            # If have error
+            except ValueError as exc:
+                # Report error
+                error_report(op.path, exc)
+
+                # Next operation
+                continue
+
+            # Use full hive name in reported paths
+            key_path = str(regpath)
+
+            # If the operation is key deletion
+            if op.kind == OP_KEY_DELETE:
+                # If dry-run
+                if dry_run:
+                    # If the key exists
+                    if dry_run_exists(regpath):
+                        # Report the change
+                        change_report(CHANGE_KEY_DELETE, key_path)
+
+                        # Remove created paths within the key
+                        created_path_s.difference_update([
+                            x for x in created_path_s if x.is_within(regpath)
+                        ])
+
+                        # Add to deleted paths
+                        deleted_path_s.append(regpath)
+
+                # If not dry-run
+                else:
+                    # If the key exists
+                    if regkey_exists(regpath):
+                        #
+                        try:
+                            # Delete the key
+                            success = regkey_delete(regpath, notify=False)
+
+                        # If have error, e.g. the key is a hive key
+                        except ValueError as exc:
+                            # Report error
+                            error_report(key_path, exc)
+
+                        # If have no error
+                        else:
+                            # If have success
+                            if success:
+                                # If compute changes
+                                if diff:
+                                    # Report the change
+                                    change_report(CHANGE_KEY_DELETE, key_path)
+
+                            # If have no success
+                            else:
+                                # Report error
+                                error_report(key_path, ValueError(
+                                    'Failed to delete key: `{}`.'.format(
+                                        key_path
+                                    )
+                                ))
+
+                # Next operation
+                continue
+
+            # If the operation is key section start.
+            assert op.kind == OP_KEY
+
+            # If dry-run
+            if dry_run:
+                # If the key exists
+                if dry_run_exists(regpath):
+                    # Open the key for reading via the handle pool.
+                    # None if the key is created in dry-run mode.
+                    regkey = regkey_get(regpath, mask=KEY_READ)
+
+                # If the key not exists
+                else:
+                    # Report the change
+                    change_report(CHANGE_KEY_ADD, key_path)
+
+                    # Add to created paths
+                    created_path_s.add(regpath)
+
+                # Report field changes of the key section
+                skip = False
+
+            # If not dry-run
+            else:
+                # Open the key via the handle pool
+                regkey = regkey_get(regpath)
+
+                # If the key not exists
+                if regkey is None:
+                    # Create the key
+                    regkey = regkey_create(regpath, notify=False)
+
+                    # If failed creating the key
+                    if regkey is None:
+                        # Report error
+                        error_report(key_path, ValueError(
+                            'Failed to create key: `{}`.'.format(key_path)
+                        ))
+
+                        # Skip field operations of the key section
+                        continue
+
+                    # If compute changes
+                    if diff:
+                        # Report the change
+                        change_report(CHANGE_KEY_ADD, key_path)
+
+                # Apply field operations of the key section
+                skip = False
+
+    finally:
+        # If have RegKey object of the last key section
+        if regkey is not None:
+            # Give the lease back to the handle pool
+            regkey.close()
+
+        # If not dry-run, and have operations
+        if not dry_run and (stats['keys'] or stats['values']):
+            # Request one WM_SETTINGCHANGE broadcast for all operations
+            _SETTINGCHANGE_BROADCASTER.request()
+
+    # Return statistics dict
+    return stats
+
+
+#
+def snapshot_save(
+    path,
+    out_stream,
+    compression=None,
+    on_error=None,
+    merkle_stream=None,
+):
+    """
+    Save a registry subtree as a binary snapshot. See `snapshot.SnapshotFile`
+    for reading it, and `snapshot_restore` for restoring it.
+
+    @param path: Registry key path of the subtree's top key.
+
+    @param out_stream: Binary output stream.
+
+    @param compression: Compression name, see `snapshot.SnapshotWriter`.
+    Default is zlib.
+
+    @param on_error: Error callback taking arguments `(path, exc)`.
+
+    @param merkle_stream: Seekable binary output stream to write the
+    snapshot's Merkle file to. None means not write.
+
+    @return: Writer statistics dict with keys `keys`, `values`, `blocks`,
+    and `bytes`. Raise ValueError if the path is not valid.
+    """
+    # Save the subtree.
+    # Use full hive name in the root path.
+    return _snapshot_save(
+        str(RegPath.of(path)),
+        out_stream,
+        regkey_get=_regkey_get_unpooled,
+        compression=compression,
+        on_error=on_error,
+        merkle_stream=merkle_stream,
+    )
+
+
+#
+def snapshot_restore(snapshot, target_path=None, on_error=None):
+    """
+    Restore a registry subtree from a snapshot, so that it matches the
+    snapshot: missing keys are created, fields are written if different,
+    and fields and child keys not in the snapshot are deleted.
+
+    Records are streamed one block at a time, each key is opened once via
+    the handle pool, and one `WM_SETTINGCHANGE` broadcast is requested after
+    all operations.
+
+    Keys that failed saving are not in the snapshot, but are still listed as
+    child keys of their parent keys, so they are left untouched.
+
+    @param snapshot: SnapshotFile object.
+
+    @param target_path: Registry key path to restore the subtree to.
+    Default is the snapshot's root path.
+
+    @param on_error: Error callback taking arguments `(path, exc)`. Called
+    for each operation that failed. Default is ignore the error.
+
+    @return: Statistics dict with keys `keys` (number of keys restored),
+    `creates` (number of keys created), `writes` (number of fields written),
+    `deletes` (number of fields and keys deleted), and `errors`. Raise
+    ValueError if the target path is not valid.
+    """
+    # Get root path
+    root_path = snapshot.root_path()
+
+    # Get target path, using full hive name.
+    # May raise ValueError.
+    target_path = str(RegPath.of(
+        target_path if target_path is not None else root_path
+    ))
+
+    # Statistics dict
+    stats = {
+        'keys': 0,
+        'creates': 0,
+        'writes': 0,
+        'deletes': 0,
+        'errors': 0,
+    }
+
+    #
+    def error_report(path, msg):
+        # Increment number of errors
+        stats['errors'] += 1
+
+        # If have error callback
+        if on_error is not None:
+            # Call the error callback
+            on_error(path, ValueError(msg))
+
+    try:
+        # For each key record
+        for record_path, _, child_name_s, field_s in snapshot.iter_records():
+            # Get key path under the target path
+            key_path = target_path + record_path[len(root_path):]
+
+            # Open the key via the handle pool
+            regkey = regkey_get(key_path)
+
+            # If the key not exists
+            if regkey is None:
+                # Create the key
+                regkey = regkey_create(key_path, notify=False)
+
+                # If failed creating the key
+                if regkey is None:
+                    # Report error
+                    error_report(
+                        key_path,
+                        'Failed to create key: `{}`.'.format(key_path),
+                    )
+
+                    # Skip the key.
+                    # Its descendants fail too.
+                    continue
+
+                # Increment number of keys created
+                stats['creates'] += 1
+
+            try:
+                # Get current fields dict.
+                # Key is casefolded field name.
+                # Value is a tuple: (name, data, type).
+                current_field_s = {
+                    field.name().casefold():
+                        (field.name(), field.data(), field.type())
+                    for field in regkey.fields(with_data=True)
+                }
+
+                # For each snapshot field
+                for name, type, raw_data in field_s:
+                    # Get the field data
+                    data = data_decode(type, raw_data)
+
+                    # Get the current field
+                    current_field = current_field_s.pop(name.casefold(), None)
+
+                    # If the current field matches
+                    if current_field is not None \
+                            and current_field[1:] == (data, type):
+                        # Skip the field
+                        continue
+
+                    # Write the field without broadcast
+                    if regkey.field_write(
+                        name=name, type=type, data=data, notify=False
+                    ):
+                        # Increment number of writes
+                        stats['writes'] += 1
+
+                    # If failed writing the field
+                    else:
+                        # Report error
+                        error_report(
+                            key_path,
+                            'Failed to write field: `{}->{}`.'.format(
+                                key_path, name
+                            ),
+                        )
+
+                # For each current field not in the snapshot
+                for name, _, _ in current_field_s.values():
+                    # Delete the field without broadcast
+                    if regkey.field_delete(name, notify=False):
+                        # Increment number of deletes
+                        stats['deletes'] += 1
+
+                    # If failed deleting the field
+                    else:
+                        # Report error
+                        error_report(
+                            key_path,
+                            'Failed to delete field: `{}->{}`.'.format(
+                                key_path, name
+                            ),
+                        )
+
+                # Get snapshot child key names set, casefolded
+                child_key_s = set(x.casefold() for x in child_name_s)
+
+                # Get current child key names not in the snapshot
+                extra_child_name_s = [
+                    x for x in regkey.child_names()
+                    if x.casefold() not in child_key_s
+                ]
+
+            finally:
+                # Give the lease back to the handle pool
+                regkey.close()
+
+            # For each current child key not in the snapshot
+            for child_name in extra_child_name_s:
+                # Get child key path
+                child_path = key_path + '\\' + child_name
+
+                # Delete the child key without broadcast
+                if regkey_delete(child_path, notify=False):
+                    # Increment number of deletes
+                    stats['deletes'] += 1
+
+                # If failed deleting the child key
+                else:
+                    # Report error
+                    error_report(
+                        child_path,
+                        'Failed to delete key: `{}`.'.format(child_path),
+                    )
+
+            # Increment number of keys restored
+            stats['keys'] += 1
+
+    finally:
+        # If have changes
+        if stats['creates'] or stats['writes'] or stats['deletes']:
+            # Request one WM_SETTINGCHANGE broadcast for all operations
+            _SETTINGCHANGE_BROADCASTER.request()
+
+    # Return statistics dict
+    return stats
+
+
+#
+def regkey_parent_path(path):
+    """
+    Get given registry key path's parent registry key path.
+
+    @param path: Registry key path, or RegPath object.
+
+    @return: Parent registry key path, using full hive name. Raise ValueError
+    if the path is not valid.
+    """
+    # Return the parent key path derived from the path's segments
+    return str(RegPath.of(path).parent())
+
+
+#
+def regkey_child_names(path, cached=True):
+    """
+    Get given registry key path's child key names list.
+
+    @param path: Registry key path.
+
+    @param cached: Whether reuse cached child key names if the key's last
+    write time has not changed.
+
+    @return: Child key names list.
+    """
+    # If the key path is root key path
+    if str(path) == RegKey.ROOT:
+        # Return hive key names
+        return RegKey.HKEYS
+
+    # If the key path is not root key path.
+
+    # Create RegKey object for given registry key path
+    regkey = regkey_get(path)
+
+    # If the RegKey object is not created
+    if regkey is None:
+        # Return None
+        return None
+
+    # If the RegKey object is created.
+    else:
+        try:
+            # Return child key names list
+            return regkey.child_names(cached=cached)
+        finally:
+            # Close the RegKey object
+            regkey.close()
+
+
+#
+class RegKey(object):
+    """
+    RegKey represents a registry key.
+    """
+
+    # Root path
+    ROOT = ''
+
+    # Hive names list
+    HKEYS = tuple(HIVE_NAME_TO_INT.keys())
+
+    # Attribute slots
+    __slots__ = ('_handle', '_path', '_mask', '_pool')
+
+    def __init__(self, handle, path, mask=None, pool=None):
+        """
+        Initialize object.
+
+        @param handle: Registry key handle.
+
+        @param path: Registry key path.
+
+        @param mask: Permission mask the registry key handle is opened with.
+
+        @param pool: RegKeyHandlePool object the registry key handle is leased
+        from. None means the handle is owned by the RegKey object.
+
+        @return: None.
+        """
+        # Registry key handle
+        self._handle = handle
+
+        # Registry key path
+        self._path = path
+
+        # Permission mask
+        self._mask = mask
+
+        # Handle pool the registry key handle is leased from
+        self._pool = pool
+
+    def __str__(self):
+        """
+        Get string of the object.
+
+        @return: String of the object.
         """
         # Return the key path
         return self._path
 
-    def child_names(self):
+    def path(self):
+        """
+        Get key path.
+
+        @return: Key path
+        """
+        # Return the key path
+        return self._path
+
+    def regpath(self):
+        """
+        Get key path as RegPath object.
+
+        @return: RegPath object.
+        """
+        # Return cached RegPath object for the key path
+        return RegPath.of(self._path)
+
+    def _handle_call(self, func, *args):
+        """
+        Call a registry function with the registry key handle as the first
+        argument.
+
+        If the handle is leased from a handle pool and the call fails with
+        `ERROR_KEY_DELETED`, the key may have been deleted and recreated by
+        another process. The stale handle is removed from the pool, a new
+        handle is leased, and the call is retried once.
+
+        @param func: Registry function.
+
+        @param args: Other arguments of the registry function.
+
+        @return: The registry function's result. Raise `pywintypes.error` if
+        failed.
+        """
+        try:
+            # Call the registry function
+            return func(self._handle, *args)
+
+        # If have error
+        except pywintypes.error as exc:
+            # If the handle is not leased from a handle pool,
+            # or the error is not because the key is deleted,
+            # or failed leasing a new handle.
+            if self._pool is None \
+                    or exc.winerror != ERROR_KEY_DELETED \
+                    or not self._handle_reopen():
+                # Propagate the error
+                raise
+
+        # Retry the registry function with the new handle
+        return func(self._handle, *args)
+
+    def _handle_reopen(self):
+        """
+        Remove the stale registry key handle from the handle pool and lease a
+        new one.
+
+        @return: Whether a new handle is leased. If not, the stale handle is
+        kept so that `close` gives its lease back.
+        """
+        # Remove pooled handles of the key and its descendant keys.
+        # The stale handle becomes an orphan because it is leased.
+        self._pool.discard(self._path)
+
+        try:
+            # Lease a new registry key handle
+            handle = self._pool.acquire(self._path, self._mask)
+
+        # If have error, e.g. the key not exists
+        except Exception:
+            # Return False
+            return False
+
+        # Give back the stale handle's lease, which closes the orphan
+        self._pool.release(self._path, self._mask, self._handle)
+
+        # Use the new handle
+        self._handle = handle
+
+        # Return True
+        return True
+
+    def info(self):
+        """
+        Get the key's metadata by a single `RegQueryInfoKey` call.
+
+        @return: RegKeyInfo object, or raise `pywintypes.error` if failed.
+        """
+        # Ensure registry key handle is set
+        assert self._handle
+
+        # Get metadata dict.
+        # May raise `pywintypes.error`.
+        info_dict = self._handle_call(RegQueryInfoKeyW)
+
+        # Return RegKeyInfo object
+        return RegKeyInfo(
+            subkey_count=info_dict['SubKeys'],
+            value_count=info_dict['Values'],
+            max_subkey_name_len=info_dict['MaxSubKeyLen'],
+            max_value_name_len=info_dict['MaxValueNameLen'],
+            max_value_data_len=info_dict['MaxValueLen'],
+            last_write_time=_time_to_filetime(info_dict['LastWriteTime']),
+        )
+
+    def child_names(self, cached=False):
         """
         Get child key names list.
 
+        @param cached: Whether reuse cached child key names if the key's last
+        write time has not changed.
+
         @return: Child key names list.
         """
         # Ensure registry key handle is set
         assert self._handle
 
+        # If use listing cache
+        if cached:
+            # Get the key's last write time.
+            # This is the only registry call if the cached entry is valid.
+            stamp = self.info().last_write_time
+
+            # Get cached child key names
+            cached_name_s = _LISTING_CACHE.get(
+                self._path, _LISTING_CHILD_NAMES, stamp
+            )
+
+            # If have valid cached child key names
+            if cached_name_s is not None:
+                # Return a copy of the cached child key names
+                return list(cached_name_s)
+
         # Child key names list
         child_name_s = []
 
         # Get child key info tuples
-        info_tuple_s = RegEnumKeyEx(self._handle)
+        info_tuple_s = self._handle_call(RegEnumKeyEx)
 
         # For each child key info tuple
         for info_tuple in info_tuple_s:
@@ -438,311 +1672,1270 @@ class RegKey(object):
             # Add the child key name to child key names list
             child_name_s.append(child_name)
 
+        # If use listing cache
+        if cached:
+            # Get immutable copy of the child key names
+            cached_name_s = tuple(child_name_s)
+
+            # Cache the child key names with the last write time got before
+            # enumeration, so that a change during enumeration makes the
+            # entry stale.
+            _LISTING_CACHE.put(
+                self._path,
+                _LISTING_CHILD_NAMES,
+                stamp,
+                cached_name_s,
+                size=_listing_size(cached_name_s),
+            )
+
         # Return the child key names list
         return child_name_s
 
-    def child_paths(self):
+    def iter_child_names(self, start=0, limit=None):
         """
-        Get child key paths list.
+        Iterate child key names, one `RegEnumKey` call per name, so that
+        memory use is constant and the caller can stop early.
 
-        Notice this method assumes the key is not root key.
+        @param start: Index of the first child key.
 
-        @return: Child key paths list.
+        @param limit: Max number of child key names. None means no limit.
+
+        @return: Generator of child key names.
         """
-        # Return child key paths list
-        return [self._path + '\\' + name for name in self.child_names()]
+        # Ensure registry key handle is set
+        assert self._handle
+
+        # Get number of child keys
+        child_count = self.info().subkey_count
+
+        # Get stop index
+        stop = child_count if limit is None \
+            else min(child_count, start + limit)
+
+        # Child key index
+        child_index = start
+
+        # For each child key index up to the stop index
+        while child_index < stop:
+            #
+            try:
+                # Get child key name.
+                # May raise `pywintypes.error`.
+                child_name = RegEnumKey(self._handle, child_index)
+
+            # If have error,
+            # it means child keys have been deleted since the count was got.
+            except pywintypes.error:
+                # Stop the loop
+                break
+
+            # If have no error.
+
+            # Yield the child key name
+            yield child_name
+
+            # Increment child key index
+            child_index += 1
+
+    def iter_fields(self, start=0, limit=None, with_data=False):
+        """
+        Iterate fields, one `RegEnumValue` call per field, so that memory use
+        is constant and the caller can stop early. Each field is a RegVal
+        object.
+
+        @param start: Index of the first field.
+
+        @param limit: Max number of fields. None means no limit.
+
+        @param with_data: Whether keep field data got in the enumeration pass
+        in the RegVal objects.
+
+        @return: Generator of RegVal objects.
+        """
+        # Ensure registry key handle is set
+        assert self._handle
+
+        # Get number of fields
+        field_count = self.info().value_count
+
+        # Get stop index
+        stop = field_count if limit is None \
+            else min(field_count, start + limit)
+
+        # Field index
+        field_index = start
+
+        # For each field index up to the stop index
+        while field_index < stop:
+            #
+            try:
+                # Get field name, data, and type.
+                # May raise `pywintypes.error`.
+                field_name, field_data, field_type = RegEnumValue(
+                    self._handle,
+                    field_index,
+                )
+
+            # If have error,
+            # it means fields have been deleted since the count was got.
+            except pywintypes.error:
+                # Stop the loop
+                break
+
+            # If have no error.
+
+            # Yield RegVal object
+            yield RegVal(
+                regkey=self,
+                name=field_name,
+                type=field_type,
+                data=field_data if with_data else RegVal.DATA_NOT_LOADED,
+            )
+
+            # Increment field index
+            field_index += 1
+
+    def child_paths(self):
+        """
+        Get child key paths list.
+
+        Notice this method assumes the key is not root key.
+
+        @return: Child key paths list.
+        """
+        # Return child key paths list
+        return [self._path + '\\' + name for name in self.child_names()]
+
+    def fields(self, with_data=False, cached=False, as_table=False):
+        """
+        Get key fields list. Each field is a RegVal object.
+
+        @param with_data: Whether keep field data got in the enumeration pass
+        in the RegVal objects, so that their `data` method need not read from
+        registry again.
+
+        @param cached: Whether reuse cached fields if the key's last write
+        time has not changed. Cached fields always have data loaded.
+
+        @param as_table: Whether return a FieldTable instead of a list. The
+        table stores fields in columns and creates RegVal objects on demand.
+
+        @return: Key fields list, or FieldTable if `as_table` is on.
+        """
+        # Ensure registry key handle is set
+        assert self._handle
+
+        # Get the key's metadata
+        key_info = self.info()
+
+        # If use listing cache
+        if cached:
+            # Get cached field table
+            table = _LISTING_CACHE.get(
+                self._path, _LISTING_FIELDS, key_info.last_write_time
+            )
+
+            # If have valid cached field table
+            if table is not None:
+                # Bind the cached columns to this RegKey object
+                table = table.rebind(self)
+
+                # Return the field table, or the RegVal objects list
+                return table if as_table else table.to_list()
+
+            # If not have valid cached field table.
+
+            # Data is needed for caching
+            with_data = True
+
+        # Get number of fields
+        field_count = key_info.value_count
+
+        # Pre-size names column
+        name_s = [None] * field_count
+
+        # Pre-size types column
+        type_s = array('I', [0]) * field_count
+
+        # Pre-size data column
+        data_s = [None] * field_count if with_data else None
+
+        # Number of fields got
+        field_index = 0
+
+        # For each field index up to the known number of fields
+        while field_index < field_count:
+            #
+            try:
+                # Get field name, data, and type.
+                # May raise `pywintypes.error`.
+                field_name, field_data, field_type = RegEnumValue(
+                    self._handle,
+                    field_index,
+                )
+
+            # If have error,
+            # it means fields have been deleted since the count was got.
+            except pywintypes.error:
+                # Stop the loop
+                break
+
+            # If have no error.
+
+            # Put the interned field name to names column
+            name_s[field_index] = intern(field_name)
+
+            # Put the field type to types column
+            type_s[field_index] = field_type
+
+            # If keep field data
+            if data_s is not None:
+                # Put the field data to data column
+                data_s[field_index] = field_data
+
+            # Increment field index
+            field_index += 1
+
+        # If fewer fields are got than the known number
+        if field_index < field_count:
+            # Drop unused names
+            del name_s[field_index:]
+
+            # Drop unused types
+            del type_s[field_index:]
+
+            # If keep field data
+            if data_s is not None:
+                # Drop unused data
+                del data_s[field_index:]
+
+        # Create field table
+        table = FieldTable(
+            regkey=self,
+            names=name_s,
+            types=type_s,
+            datas=data_s,
+        )
+
+        # If use listing cache
+        if cached:
+            # Cache the field table.
+            # The table is not changed after it is built.
+            _LISTING_CACHE.put(
+                self._path,
+                _LISTING_FIELDS,
+                key_info.last_write_time,
+                table,
+                size=table.size_estimate(),
+            )
+
+        # Return the field table, or the RegVal objects list
+        return table if as_table else table.to_list()
+
+    def _field_data_type_tuple(self, name):
+        """
+        Get field data and type tuple: (data, type).
+
+        @return: Field data and type tuple: (data, type), or None if have
+        error.
+        """
+        # Ensure registry key handle is set
+        assert self._handle
+
+        #
+        try:
+            # Return field data and type tuple: (data, type)
+            return self._handle_call(RegQueryValueEx, name)
+
+        # If have error
+        except pywintypes.error:
+            # Return None
+            return None
+
+    def _field_prior(self, name):
+        """
+        Get field data and type tuple to snapshot before changing the field.
+
+        Unlike `_field_data_type_tuple`, only a field that not exists gives
+        None, so that a field that can not be read is not taken as absent.
+
+        @param name: Field name.
+
+        @return: Field data and type tuple: (data, type), or None if the field
+        not exists. Raise `pywintypes.error` if failed reading the field.
+        """
+        # Ensure registry key handle is set
+        assert self._handle
+
+        try:
+            # Return field data and type tuple: (data, type)
+            return self._handle_call(RegQueryValueEx, name)
+
+        # If have error
+        except pywintypes.error as exc:
+            # If the field not exists
+            if exc.winerror == ERROR_FILE_NOT_FOUND:
+                # Return None
+                return None
+
+            # If have other error.
+
+            # Propagate the error
+            raise
+
+    def field_type(self, name):
+        """
+        Get field type.
+
+        @param name: Field name.
+
+        @return: Field type, or None if have error.
+        """
+        # Get field data and type tuple
+        data_type_tuple = self._field_data_type_tuple(name)
+
+        # If have error
+        if data_type_tuple is None:
+            # Return None
+            return None
+
+        # If have no error
+        else:
+            # Get the field type
+            _, field_type = data_type_tuple
+
+            # Return the field type
+            return field_type
+
+    def field_data(self, name):
+        """
+        Get field data.
+
+        @param name: Field name.
+
+        @return: Field data, or None if have error.
+        """
+        # Get field data and type tuple
+        data_type_tuple = self._field_data_type_tuple(name)
+
+        # If have error
+        if data_type_tuple is None:
+            # Return None
+            return None
+
+        # If have no error
+        else:
+            # Get the field data
+            field_data, _ = data_type_tuple
+
+            # Return the field data
+            return field_data
+
+    def field_write(self, name, type, data, notify=True):
+        """
+        Write field.
+
+        @param name: Field name.
+
+        @param type: Field type.
+
+        @param data: Field data.
+
+        @param notify: Whether request `WM_SETTINGCHANGE` broadcast.
+
+        @return: Whether the operation is successful.
+        """
+        # Ensure registry key handle is set
+        assert self._handle
+
+        #
+        try:
+            # Write field
+            self._handle_call(
+                RegSetValueEx,
+                name,
+                0,
+                type,
+                data,
+            )
+
+            # Remove cached fields of the key
+            _LISTING_CACHE.invalidate(self._path)
+
+            # If notify registry changes
+            if notify:
+                # Request WM_SETTINGCHANGE to notify registry changes.
+                # It is sent from a background thread after a quiet period.
+                _SETTINGCHANGE_BROADCASTER.request()
+
+            # If have no error.
+
+            # Return the operation is successful
+            return True
+
+        # If have error
+        except pywintypes.error:
+            # Return the operation is not successful
+            return False
+
+    def field_delete(self, name, notify=True):
+        """
+        Delete field.
+
+        @param name: Field name.
+
+        @param notify: Whether request `WM_SETTINGCHANGE` broadcast.
+
+        @return: Whether the operation is successful.
+        """
+        # Ensure registry key handle is set
+        assert self._handle
+
+        #
+        try:
+            # Delete field
+            self._handle_call(
+                RegDeleteValue,
+                name,
+            )
+
+            # Remove cached fields of the key
+            _LISTING_CACHE.invalidate(self._path)
+
+            # If notify registry changes
+            if notify:
+                # Request WM_SETTINGCHANGE to notify registry changes.
+                # It is sent from a background thread after a quiet period.
+                _SETTINGCHANGE_BROADCASTER.request()
+
+            # If have no error.
+
+            # Return the operation is successful
+            return True
+
+        # If have error
+        except pywintypes.error:
+            # Return the operation is not successful
+            return False
+
+    def batch(self):
+        """
+        Create RegTransaction object whose field operations default to this
+        key. Use it as a context manager to commit on exit:
+
+            with regkey.batch() as batch:
+                batch.field_write('A', 1, 'a')
+                batch.field_delete('B')
+
+        @return: RegTransaction object.
+        """
+        # Return RegTransaction object bound to this key
+        return RegTransaction(regkey=self)
+
+    def close(self):
+        """
+        Close the registry key handle. If the registry key handle is leased
+        from a handle pool, give the lease back instead.
+
+        @return: None.
+        """
+        # If the registry key handle is closed
+        if self.closed():
+            # Raise error
+            raise ValueError('Already closed')
+
+        # If the registry key handle is not closed.
+
+        # If the registry key handle is leased from a handle pool
+        if self._pool is not None:
+            # Give the lease back to the handle pool
+            self._pool.release(self._path, self._mask, self._handle)
+
+        # If the registry key handle is owned by the RegKey object
+        else:
+            # Close the registry key handle
+            RegCloseKey(self._handle)
+
+        # Set the registry key handle to None
+        self._handle = None
+
+    def closed(self):
+        """
+        Test whether the registry key handle is closed.
+
+        @return: Boolean.
+        """
+        # Test whether the registry key handle is closed
+        return self._handle is None
+
+
+#
+class RootRegKey(RegKey):
+    """
+    RootRegKey represents registry root key that contains the hive keys.
+    """
+
+    # Attribute slots
+    __slots__ = ()
+
+    def __init__(self):
+        """
+        Initialize object.
+
+        @return: None.
+        """
+        # Initialize RegKey.
+        # Registry key handle is None for root key.
+        # Registry key path is empty for root key.
+        RegKey.__init__(self, handle=None, path='')
+
+    def child_names(self, cached=False):
+        """
+        Get child key names list.
+
+        @param cached: Whether reuse cached child key names.
+
+        @return: Child key names list.
+        """
+        # Return hive names for root key
+        return RegKey.HKEYS
+
+    def iter_child_names(self, start=0, limit=None):
+        """
+        Iterate child key names.
+
+        @param start: Index of the first child key.
+
+        @param limit: Max number of child key names. None means no limit.
+
+        @return: Generator of child key names.
+        """
+        # Get stop index
+        stop = None if limit is None else start + limit
+
+        # For each hive name in the range
+        for hive_name in RegKey.HKEYS[start:stop]:
+            # Yield the hive name
+            yield hive_name
+
+    def iter_fields(self, start=0, limit=None, with_data=False):
+        """
+        Iterate fields.
+
+        @param start: Index of the first field.
+
+        @param limit: Max number of fields. None means no limit.
+
+        @param with_data: Whether keep field data in the RegVal objects.
+
+        @return: Generator of RegVal objects.
+        """
+        # Root key has no fields
+        return iter([])
+
+    def child_paths(self):
+        """
+        Get child key paths list.
+
+        @return: Child key paths list.
+        """
+        # Return hive names for root key
+        return RegKey.HKEYS
+
+    def info(self):
+        """
+        Get the key's metadata.
+
+        @return: RegKeyInfo object.
+        """
+        # Return metadata of root key that contains only the hive keys
+        return RegKeyInfo(
+            subkey_count=len(RegKey.HKEYS),
+            value_count=0,
+            max_subkey_name_len=max(len(x) for x in RegKey.HKEYS),
+            max_value_name_len=0,
+            max_value_data_len=0,
+            last_write_time=0,
+        )
+
+    def fields(self, with_data=False, cached=False, as_table=False):
+        """
+        Get key fields list. Each field is a RegVal object.
+
+        @param with_data: Whether keep field data in the RegVal objects.
+
+        @param cached: Whether reuse cached fields.
+
+        @param as_table: Whether return a FieldTable instead of a list.
+
+        @return: Key fields list, or FieldTable if `as_table` is on.
+        """
+        # If return a FieldTable
+        if as_table:
+            # Return empty field table for root key
+            return FieldTable(
+                regkey=self,
+                names=[],
+                types=array('I'),
+                datas=[] if with_data else None,
+            )
+
+        # Return empty list for root key
+        return []
+
+    def field_type(self, name):
+        # Raise error for root key
+        raise ValueError("Root key has no fields.")
+
+    def field_data(self, name):
+        # Raise error for root key
+        raise ValueError("Root key has no fields.")
+
+    def field_write(self, name, type, data, notify=True):
+        # Raise error for root key
+        raise ValueError("Root key has no fields.")
+
+    def field_delete(self, name, notify=True):
+        # Raise error for root key
+        raise ValueError("Root key has no fields.")
+
+    def close(self):
+        """
+        Close the registry key handle.
+
+        @return: None.
+        """
+        # Do nothing for root key
+        pass
+
+    def closed(self):
+        """
+        Test whether the registry key handle is closed.
+
+        @return: Boolean.
+        """
+        # Return False for root key
+        return False
+
+
+#
+class RegTransaction(object):
+    """
+    RegTransaction queues field writes and deletes across one or more keys,
+    and applies them in order on commit.
+
+    On commit, each key is opened once via the handle pool, each touched
+    field's prior value is snapshotted before any operation is applied, and
+    one `WM_SETTINGCHANGE` broadcast is requested after all operations
+    succeed. Paths are compared as RegPath objects, so paths differing only
+    in hive alias or case share one key. If a key can not be opened or a
+    prior value can not be read, nothing is applied and `CommitError` is
+    raised. If any operation fails, the applied operations are reverted to
+    the snapshotted values and `CommitError` is raised.
+
+    Use it as a context manager to commit on normal exit, or discard the
+    queued operations if the block raises error.
+    """
+
+    # Error raised when commit fails
+    class CommitError(ValueError):
+        pass
+
+    # Operation kind of field write
+    OP_WRITE = 'write'
+
+    # Operation kind of field delete
+    OP_DELETE = 'delete'
+
+    def __init__(self, regkey=None):
+        """
+        Initialize object.
+
+        @param regkey: RegKey object whose path is the default path of queued
+        operations. Its handle is used instead of opening the key again.
+
+        @return: None.
+        """
+        # Default RegKey object
+        self._regkey = regkey
+
+        # Queued operations list.
+        # Each operation is a tuple: (kind, path, name, type, data).
+        self._op_s = []
+
+    def __enter__(self):
+        """
+        Enter context.
+
+        @return: The transaction.
+        """
+        # Return the transaction
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Exit context. Commit if the block exits normally, otherwise discard
+        the queued operations.
+
+        @return: False, so error raised in the block is propagated.
+        """
+        # If the block exits normally
+        if exc_type is None:
+            # Commit.
+            # May raise CommitError.
+            self.commit()
+
+        # If the block raises error
+        else:
+            # Discard the queued operations
+            self.discard()
+
+        # Propagate error raised in the block
+        return False
 
-    def fields(self):
+    def _path_resolve(self, path):
         """
-        Get key fields list. Each field is a RegVal object.
+        Get operation path, using the default key's path if path is not given.
+
+        @param path: Registry key path, or None.
 
-        @return: Key fields list.
+        @return: Registry key path.
         """
-        # Ensure registry key handle is set
-        assert self._handle
+        # If path is given
+        if path is not None:
+            # Return the path
+            return path
 
-        # Fields list
-        field_s = []
+        # If path is not given.
 
-        # Field index
-        field_index = 0
+        # If have no default key
+        if self._regkey is None:
+            # Raise error
+            raise ValueError('Argument `path` is not given.')
 
-        # For each field index
-        while True:
-            #
-            try:
-                # Get field name and type.
-                # May raise `pywintypes.error`.
-                field_name, _, field_type = RegEnumValue(
-                    self._handle,
-                    field_index,
-                )
+        # If have default key.
 
-            # If have error,
-            # it means no more field
-            except pywintypes.error:
-                # Stop the loop
-                break
+        # Return the default key's path
+        return self._regkey.path()
 
-            # If have no error.
+    def field_write(self, name, type, data, path=None):
+        """
+        Queue field write.
 
-            # Create RegVal object
-            field = RegVal(
-                regkey=self,
-                name=field_name,
-                type=field_type,
-            )
+        @param name: Field name.
 
-            # Add the RegVal object to fields list
-            field_s.append(field)
+        @param type: Field type.
 
-            # Increment field index
-            field_index += 1
+        @param data: Field data.
 
-        # Return the fields list
-        return field_s
+        @param path: Registry key path. Default is the default key's path.
 
-    def _field_data_type_tuple(self, name):
+        @return: None.
         """
-        Get field data and type tuple: (data, type).
+        # Queue the operation
+        self._op_s.append(
+            (self.OP_WRITE, self._path_resolve(path), name, type, data)
+        )
 
-        @return: Field data and type tuple: (data, type), or None if have
-        error.
+    def field_delete(self, name, path=None):
         """
-        # Ensure registry key handle is set
-        assert self._handle
+        Queue field delete.
 
-        #
-        try:
-            # Return field data and type tuple: (data, type)
-            return RegQueryValueEx(self._handle, name)
+        @param name: Field name.
 
-        # If have error
-        except pywintypes.error:
-            # Return None
-            return None
+        @param path: Registry key path. Default is the default key's path.
 
-    def field_type(self, name):
+        @return: None.
         """
-        Get field type.
-
-        @param name: Field name.
+        # Queue the operation
+        self._op_s.append(
+            (self.OP_DELETE, self._path_resolve(path), name, None, None)
+        )
 
-        @return: Field type, or None if have error.
+    def operations(self):
         """
-        # Get field data and type tuple
-        data_type_tuple = self._field_data_type_tuple(name)
-
-        # If have error
-        if data_type_tuple is None:
-            # Return None
-            return None
+        Get queued operations list.
+        Notice do not change the list outside.
 
-        # If have no error
-        else:
-            # Get the field type
-            _, field_type = data_type_tuple
+        @return: Queued operations list. Each operation is a tuple:
+        (kind, path, name, type, data).
+        """
+        # Return queued operations list
+        return self._op_s
 
-            # Return the field type
-            return field_type
+    def discard(self):
+        """
+        Discard the queued operations.
 
-    def field_data(self, name):
+        @return: None.
         """
-        Get field data.
+        # Discard the queued operations
+        self._op_s = []
 
-        @param name: Field name.
+    def commit(self):
+        """
+        Apply the queued operations in order.
 
-        @return: Field data, or None if have error.
+        @return: None. Raise CommitError if failed, before applying any
+        operation if snapshotting failed, otherwise after reverting applied
+        operations.
         """
-        # Get field data and type tuple
-        data_type_tuple = self._field_data_type_tuple(name)
+        # Get queued operations
+        op_s = self._op_s
 
-        # If have error
-        if data_type_tuple is None:
-            # Return None
-            return None
+        # Clear queued operations
+        self._op_s = []
 
-        # If have no error
-        else:
-            # Get the field data
-            field_data, _ = data_type_tuple
+        # If have no operations
+        if not op_s:
+            # Do nothing
+            return
 
-            # Return the field data
-            return field_data
+        # If have operations.
 
-    def field_write(self, name, type, data):
-        """
-        Write field.
+        # Opened RegKey objects dict.
+        # Key is RegPath object, so that paths differing only in hive alias
+        # or case share one key.
+        # Value is RegKey object.
+        regkey_s = {}
 
-        @param name: Field name.
+        # If have default key
+        if self._regkey is not None:
+            # Use the default key's handle for its path
+            regkey_s[self._regkey.regpath()] = self._regkey
 
-        @param type: Field type.
+        # Operations with opened keys list.
+        # Each item is a tuple: (regkey, kind, name, type, data).
+        keyed_op_s = []
 
-        @param data: Field data.
+        # Snapshots list, in order of first change.
+        # Each snapshot is a tuple: (regkey, name, data_type_tuple).
+        # `data_type_tuple` is None if the field did not exist.
+        snapshot_s = []
 
-        @return: Whether the operation is successful.
-        """
-        # Ensure registry key handle is set
-        assert self._handle
+        # Snapshotted field keys set.
+        # Each field key is a tuple: (RegPath object, lowercase field name).
+        snapshotted_s = set()
 
-        #
         try:
-            # Write field
-            RegSetValueEx(
-                self._handle,
-                name,
-                0,
-                type,
-                data,
-            )
+            # For each operation
+            for kind, path, name, type, data in op_s:
+                # Get RegPath object.
+                # May raise ValueError.
+                regpath = RegPath.of(path)
+
+                # Get opened RegKey object
+                regkey = regkey_s.get(regpath, None)
+
+                # If the key has not been opened
+                if regkey is None:
+                    # Open the key via the handle pool
+                    regkey = regkey_get(regpath)
+
+                    # If failed opening the key
+                    if regkey is None:
+                        # Raise error
+                        raise RegTransaction.CommitError(
+                            'Cannot open key: `{}`.'.format(path)
+                        )
+
+                    # Store the opened RegKey object
+                    regkey_s[regpath] = regkey
+
+                # Get field key.
+                # Field names are case-insensitive.
+                field_key = (regpath, name.lower())
+
+                # If the field has not been snapshotted
+                if field_key not in snapshotted_s:
+                    try:
+                        # Get the field's prior value
+                        data_type_tuple = regkey._field_prior(name)
+
+                    # If failed reading the field
+                    except pywintypes.error as exc:
+                        # Raise error
+                        raise RegTransaction.CommitError(
+                            'Failed to read field: `{}->{}`: {}'.format(
+                                path, name, exc
+                            )
+                        )
+
+                    # Snapshot the field's prior value
+                    snapshot_s.append((regkey, name, data_type_tuple))
+
+                    # Mark the field as snapshotted
+                    snapshotted_s.add(field_key)
+
+                # Add the operation with the opened key
+                keyed_op_s.append((regkey, kind, name, type, data))
+
+        # If have error.
+        # No operations have been applied yet.
+        except Exception as exc:
+            # Close opened keys
+            self._regkeys_close(regkey_s)
 
-            # Send WM_SETTINGCHANGE to notify registry changes
-            send_WM_SETTINGCHANGE()
+            # Raise error
+            raise RegTransaction.CommitError(str(exc))
 
-            # If have no error.
+        # If all touched fields are snapshotted.
 
-            # Return the operation is successful
-            return True
+        try:
+            # For each operation
+            for regkey, kind, name, type, data in keyed_op_s:
+                # If the operation is field write
+                if kind == self.OP_WRITE:
+                    # Write the field without broadcast
+                    success = regkey.field_write(
+                        name=name,
+                        type=type,
+                        data=data,
+                        notify=False,
+                    )
+
+                # If the operation is field delete
+                else:
+                    # Delete the field without broadcast
+                    success = regkey.field_delete(name, notify=False)
+
+                # If have no success
+                if not success:
+                    # Raise error
+                    raise RegTransaction.CommitError(
+                        'Failed to {} field: `{}->{}`.'.format(
+                            kind, regkey.path(), name
+                        )
+                    )
 
         # If have error
-        except pywintypes.error:
-            # Return the operation is not successful
-            return False
+        except Exception as exc:
+            # Revert applied operations.
+            # Get names of fields that failed reverting.
+            failed_name_s = self._revert(snapshot_s)
+
+            # Close opened keys
+            self._regkeys_close(regkey_s)
+
+            # If some fields failed reverting
+            if failed_name_s:
+                # Get error message
+                msg = '{} Failed reverting fields: {}'.format(
+                    exc,
+                    ', '.join('`{}`'.format(x) for x in failed_name_s),
+                )
+
+            # If all fields are reverted
+            else:
+                # Get error message
+                msg = str(exc)
+
+            # Raise error
+            raise RegTransaction.CommitError(msg)
 
-    def field_delete(self, name):
+        # If have no error.
+
+        # Close opened keys
+        self._regkeys_close(regkey_s)
+
+        # Request one WM_SETTINGCHANGE broadcast for all operations
+        _SETTINGCHANGE_BROADCASTER.request()
+
+    def _revert(self, snapshot_s):
         """
-        Delete field.
+        Revert fields to snapshotted values, in reverse order.
 
-        @param name: Field name.
+        @param snapshot_s: Snapshots list.
 
-        @return: Whether the operation is successful.
+        @return: Names of fields that failed reverting.
         """
-        # Ensure registry key handle is set
-        assert self._handle
+        # Names of fields that failed reverting
+        failed_name_s = []
 
-        #
-        try:
-            # Delete field
-            RegDeleteValue(
-                self._handle,
-                name,
-            )
+        # For each snapshot in reverse order
+        for regkey, name, data_type_tuple in reversed(snapshot_s):
+            # If the field did not exist
+            if data_type_tuple is None:
+                # Delete the field.
+                # Ignore failure because the field may not have been created.
+                regkey.field_delete(name, notify=False)
 
-            # Send WM_SETTINGCHANGE to notify registry changes
-            send_WM_SETTINGCHANGE()
+                try:
+                    # Whether have success
+                    success = regkey._field_prior(name) is None
 
-            # If have no error.
+                # If failed reading the field
+                except pywintypes.error:
+                    # Have no success
+                    success = False
 
-            # Return the operation is successful
-            return True
+            # If the field existed
+            else:
+                # Get prior data and type
+                data, type = data_type_tuple
 
-        # If have error
-        except pywintypes.error:
-            # Return the operation is not successful
-            return False
+                # Write prior data and type
+                success = regkey.field_write(
+                    name=name,
+                    type=type,
+                    data=data,
+                    notify=False,
+                )
 
-    def close(self):
+            # If have no success
+            if not success:
+                # Add the field name to failed names
+                failed_name_s.append(
+                    '{}->{}'.format(regkey.path(), name)
+                )
+
+        # Return names of fields that failed reverting
+        return failed_name_s
+
+    def _regkeys_close(self, regkey_s):
         """
-        Close the registry key handle.
+        Close RegKey objects opened by commit.
+
+        @param regkey_s: Opened RegKey objects dict.
 
         @return: None.
         """
-        # If the registry key handle is closed
-        if self.closed():
-            # Raise error
-            raise ValueError('Already closed')
+        # For each opened RegKey object
+        for regkey in regkey_s.values():
+            # If the RegKey object is the default key
+            if regkey is self._regkey:
+                # Do not close because it is owned by the caller
+                continue
 
-        # If the registry key handle is not closed
-        else:
-            # Close the registry key handle
-            RegCloseKey(self._handle)
+            # Close the RegKey object
+            regkey.close()
 
-            # Set the registry key handle to None
-            self._handle = None
 
-    def closed(self):
-        """
-        Test whether the registry key handle is closed.
+#
+def transaction():
+    """
+    Create RegTransaction object for queuing field operations across keys.
+    Use it as a context manager to commit on exit:
 
-        @return: Boolean.
-        """
-        # Test whether the registry key handle is closed
-        return self._handle is None
+        with transaction() as txn:
+            txn.field_write('A', 1, 'a', path=path_1)
+            txn.field_delete('B', path=path_2)
+
+    @return: RegTransaction object.
+    """
+    # Return RegTransaction object
+    return RegTransaction()
 
 
 #
-class RootRegKey(RegKey):
+class Win32RegChangeNotifier(RegChangeNotifier):
     """
-    RootRegKey represents registry root key that contains the hive keys.
+    Win32RegChangeNotifier watches a registry key path via
+    `RegNotifyChangeKeyValue`.
+
+    Child key changes and field changes are watched via two separate handles
+    and events, so that they can be reported as different change kinds.
     """
 
-    def __init__(self):
+    def __init__(self, path, subtree=True):
         """
         Initialize object.
 
-        @return: None.
+        @param path: Registry key path.
+
+        @param subtree: Whether also watch descendant keys.
+
+        @return: None. Raise error if the key can not be opened.
         """
-        # Initialize RegKey.
-        # Registry key handle is None for root key.
-        # Registry key path is empty for root key.
-        RegKey.__init__(self, handle=None, path='')
+        # Whether also watch descendant keys
+        self._subtree = subtree
 
-    def child_names(self):
+        # Permission mask for watching
+        mask = KEY_NOTIFY | KEY_WOW64_64KEY
+
+        # Registry key handle for watching child key changes.
+        # May raise error.
+        self._key_handle = _regkey_handle_get(path, mask=mask)
+
+        #
+        try:
+            # Registry key handle for watching field changes.
+            # May raise error.
+            self._value_handle = _regkey_handle_get(path, mask=mask)
+
+        # If have error
+        except Exception:
+            # Close the other handle
+            RegCloseKey(self._key_handle)
+
+            # Re-raise the error
+            raise
+
+        # Manual-reset event set by `cancel`
+        self._cancel_event = CreateEvent(None, True, False, None)
+
+        # Auto-reset event signaled on child key changes
+        self._key_event = CreateEvent(None, False, False, None)
+
+        # Auto-reset event signaled on field changes
+        self._value_event = CreateEvent(None, False, False, None)
+
+        # Whether the notifications have been registered.
+        # They are registered from the worker thread calling `wait`, because
+        # the registration ends when the registering thread exits.
+        self._armed = False
+
+    def _arm_key(self):
         """
-        Get child key names list.
+        Register notification for child key changes.
 
-        @return: Child key names list.
+        @return: None.
         """
-        # Return hive names for root key
-        return RegKey.HKEYS
+        # Register notification for child key changes
+        RegNotifyChangeKeyValue(
+            self._key_handle,
+            self._subtree,
+            REG_NOTIFY_CHANGE_NAME,
+            self._key_event,
+            True,  # Asynchronous
+        )
 
-    def child_paths(self):
+    def _arm_value(self):
         """
-        Get child key paths list.
+        Register notification for field changes.
 
-        @return: Child key paths list.
+        @return: None.
         """
-        # Return hive names for root key
-        return RegKey.HKEYS
+        # Register notification for field changes
+        RegNotifyChangeKeyValue(
+            self._value_handle,
+            self._subtree,
+            REG_NOTIFY_CHANGE_LAST_SET,
+            self._value_event,
+            True,  # Asynchronous
+        )
 
-    def fields(self):
+    def wait(self):
         """
-        Get key fields list. Each field is a RegVal object.
+        Block until changes happen or the notifier is canceled.
 
-        @return: Key fields list.
+        @return: A list of change kinds, empty if the notifier is canceled.
         """
-        # Return empty list for root key
-        return []
+        # If the notifications have not been registered
+        if not self._armed:
+            # Register notification for child key changes
+            self._arm_key()
 
-    def field_type(self, name):
-        # Raise error for root key
-        raise ValueError("Root key has no fields.")
+            # Register notification for field changes
+            self._arm_value()
 
-    def field_data(self, name):
-        # Raise error for root key
-        raise ValueError("Root key has no fields.")
+            # Set registered flag on
+            self._armed = True
 
-    def field_write(self, name, type, data):
-        # Raise error for root key
-        raise ValueError("Root key has no fields.")
+        # Wait until any event is signaled
+        result = WaitForMultipleObjects(
+            [self._cancel_event, self._key_event, self._value_event],
+            False,  # Wait for any
+            INFINITE,
+        )
 
-    def close(self):
+        # Get signaled event index
+        index = result - WAIT_OBJECT_0
+
+        # If the cancel event is signaled
+        if index == 0:
+            # Return no changes
+            return []
+
+        # If the child key changes event is signaled
+        elif index == 1:
+            # Register again before returning so no change is missed
+            self._arm_key()
+
+            # Return the change kind
+            return [self.KEY_CHANGED]
+
+        # If the field changes event is signaled
+        elif index == 2:
+            # Register again before returning so no change is missed
+            self._arm_value()
+
+            # Return the change kind
+            return [self.VALUE_CHANGED]
+
+        # If the result is something else
+        else:
+            # Raise error
+            raise ValueError(result)
+
+    def cancel(self):
         """
-        Close the registry key handle.
+        Wake up a blocking `wait` call.
 
         @return: None.
         """
-        # Do nothing for root key
-        pass
+        # Set the cancel event
+        SetEvent(self._cancel_event)
 
-    def closed(self):
+    def close(self):
         """
-        Test whether the registry key handle is closed.
+        Close the registry key handles.
 
-        @return: Boolean.
+        @return: None.
         """
-        # Return False for root key
-        return False
+        # Close the registry key handle for child key changes
+        RegCloseKey(self._key_handle)
+
+        # Close the registry key handle for field changes
+        RegCloseKey(self._value_handle)
+
+
+#
+def _listing_cache_on_change(path):
+    """
+    Registry watcher's change event handler that removes cached listings,
+    existence results, and pooled handles of the changed key and its
+    descendant keys.
+
+    @param path: Watched registry key path.
+
+    @return: None.
+    """
+    # Remove cached listings of the key and its descendant keys
+    _LISTING_CACHE.invalidate(path, subtree=True)
+
+    # Remove cached existence results of the key and its descendant keys
+    _EXISTENCE_CACHE.invalidate(path, subtree=True)
+
+    # Remove pooled handles of the key and its descendant keys, so that a key
+    # deleted by another process is not read via its stale handle
+    _REGKEY_POOL.discard(path)
+
+
+#
+def regkey_watcher_create(notifier_factory=None):
+    """
+    Create RegKeyWatcher object whose change events remove stale entries in
+    the listing cache.
+
+    @param notifier_factory: Notifier factory function. Default is
+    Win32RegChangeNotifier.
+
+    @return: RegKeyWatcher object.
+    """
+    # Create watcher
+    watcher = RegKeyWatcher(
+        notifier_factory=notifier_factory
+        if notifier_factory is not None else Win32RegChangeNotifier
+    )
+
+    # For each change event
+    for event in [watcher.KEY_CHANGED, watcher.VALUE_CHANGED]:
+        # Add listing cache invalidation handler
+        watcher.handler_add(event, _listing_cache_on_change, need_arg=True)
+
+    # Return the watcher
+    return watcher
 
 
 #
@@ -797,6 +2990,16 @@ class RegKeyPathNavigator(Eventor):
         # Return the active key path
         return self._path
 
+    def regpath(self):
+        """
+        Get the active key path as RegPath object.
+
+        @return: RegPath object. Raise ValueError if the active key path is not
+        valid.
+        """
+        # Return cached RegPath object for the active key path
+        return RegPath.of(self._path)
+
     def parent_path(self):
         """
         Get the active key path's parent key path.
@@ -814,18 +3017,8 @@ class RegKeyPathNavigator(Eventor):
 
         @return: Active key path's child key path.
         """
-        # If the active key path is root key path
-        if self._path == self.ROOT:
-            # Use child name as child path
-            child_path = child_name
-
-        # If the active key path is not root key path
-        else:
-            # Add separator between parent key path and child key name
-            child_path = self._path + '\\' + child_name
-
-        # Return the child key path
-        return child_path
+        # Derive the child key path from the active key path's segments
+        return str(self.regpath().child(child_name))
 
     def child_names(self):
         """
@@ -840,7 +3033,7 @@ class RegKeyPathNavigator(Eventor):
         """
         Go to given key path.
 
-        @param path: Key path to go to.
+        @param path: Key path to go to, or RegPath object.
 
         @param check: Whether check if the key path exists, and raise error if
         the key path not exists.
@@ -859,8 +3052,9 @@ class RegKeyPathNavigator(Eventor):
         # Notify pre-change event
         self.handler_notify(self.PATH_CHANGE_SOON, self)
 
-        # Set new active path
-        self._path = path
+        # Set new active path.
+        # Store RegPath object as path string.
+        self._path = str(path)
 
         # Notify post-change event
         self.handler_notify(self.PATH_CHANGE_DONE, self)
@@ -2,11 +2,18 @@
 #
 from __future__ import absolute_import
 
+import os
+from queue import Empty
+from queue import Queue
+import threading
+from tkinter import BooleanVar
+from tkinter import filedialog
 from tkinter import IntVar
 from tkinter import messagebox
 from tkinter.constants import ACTIVE
 from tkinter.constants import DISABLED
 from tkinter.constants import NORMAL
+from tkinter.ttk import Checkbutton
 from tkinter.ttk import Frame
 from tkinter.ttk import Label
 from tkinter.ttk import LabelFrame
@@ -15,9 +22,22 @@ from win32con import KEY_ALL_ACCESS
 from win32con import KEY_READ
 from win32con import KEY_WRITE
 
+from .reference_index import ReferenceIndex
+from .reference_index import entities as reference_entities
 from .registry import RegKeyPathNavigator
+from .registry import export_reg
+from .registry import path_completer
+from .registry import reference_index_refresh
 from .registry import regkey_exists
 from .registry import regkey_get
+from .registry import regkey_info
+from .registry import regkey_watcher_create
+from .registry import search as registry_search
+from .regpath import RegPath
+from .search import HIT_DATA
+from .search import HIT_KEY
+from .search import HIT_NAME
+from .search import SearchHit
 from .tkinterutil.label import LabelVidget
 from .tkinterutil.listbox import ListboxVidget
 from .tkinterutil.menu import MenuTree
@@ -294,9 +314,223 @@ class FilteredFieldEditor(FieldEditor):
         self._text_vidget.destroy()
 
 
+#
+class FieldRows(object):
+    """
+    FieldRows is the fields listbox's items sequence. It holds a FieldTable
+    and creates a RegVal object only for a row that is accessed by index,
+    e.g. the active field, instead of a RegVal list of all fields.
+
+    The RegVal object of the last row accessed by index is kept, so that
+    getting the active field again gives the same object, and data set via
+    the object are seen.
+    """
+
+    def __init__(self, table):
+        """
+        Initialize object.
+
+        @param table: FieldTable object.
+
+        @return: None.
+        """
+        # FieldTable object
+        self._table = table
+
+        # Index of the last row accessed by index
+        self._index = -1
+
+        # RegVal object of the last row accessed by index
+        self._field = None
+
+    def table(self):
+        """
+        Get the FieldTable object.
+
+        @return: FieldTable object.
+        """
+        # Return the FieldTable object
+        return self._table
+
+    def __len__(self):
+        """
+        Get number of fields.
+
+        @return: Number of fields.
+        """
+        # Return number of fields
+        return len(self._table)
+
+    def __getitem__(self, index):
+        """
+        Get RegVal object for given index.
+
+        @param index: Field index.
+
+        @return: RegVal object.
+        """
+        # If the index is negative
+        if index < 0:
+            # Convert to non-negative index
+            index += len(self._table)
+
+        # If the index is not the last accessed one
+        if index != self._index:
+            # Create RegVal object.
+            # May raise IndexError.
+            self._field = self._table[index]
+
+            # Store the index
+            self._index = index
+
+        # Return the RegVal object
+        return self._field
+
+    def __iter__(self):
+        """
+        Iterate RegVal objects. Rows other than the last accessed one get
+        temporary RegVal objects, e.g. for showing the field names.
+
+        @return: Generator of RegVal objects.
+        """
+        # For each field index
+        for index in range(len(self._table)):
+            # Yield the kept RegVal object, or a temporary one
+            yield self._field if index == self._index else self._table[index]
+
+
+#
+class BackgroundJob(object):
+    """
+    BackgroundJob runs a function in a background thread, and reports its
+    result in the GUI thread by polling the thread with `after`, because
+    Tkinter widgets must not be used from other threads.
+    """
+
+    # Interval in milliseconds to check whether the job is done
+    POLL_INTERVAL = 200
+
+    def __init__(self, widget, name, func, on_done):
+        """
+        Initialize object.
+
+        @param widget: Widget whose `after` method schedules polls.
+
+        @param name: Thread name.
+
+        @param func: Job function taking no arguments. Called in the
+        background thread.
+
+        @param on_done: Done callback taking arguments `(result, exc)`, where
+        `result` is the job function's return value, and `exc` is the
+        exception raised by the job function, or None. Called in the GUI
+        thread.
+
+        @return: None.
+        """
+        # Widget whose `after` method schedules polls
+        self._widget = widget
+
+        # Job function
+        self._func = func
+
+        # Done callback
+        self._on_done = on_done
+
+        # Job function's return value
+        self._result = None
+
+        # Exception raised by the job function, or None
+        self._exc = None
+
+        # Create job thread
+        self._thread = threading.Thread(target=self._run, name=name)
+
+        # Do not keep the process alive for the job thread
+        self._thread.daemon = True
+
+    def start(self):
+        """
+        Start the job thread, and poll it until it is done.
+
+        @return: None.
+        """
+        # Start the job thread
+        self._thread.start()
+
+        # Check whether the job is done later
+        self._widget.after(self.POLL_INTERVAL, self._poll)
+
+    def _run(self):
+        """
+        Job thread function. Store the job function's result or exception.
+
+        @return: None.
+        """
+        try:
+            # Call the job function.
+            # Store the result.
+            self._result = self._func()
+
+        # If have error
+        except Exception as exc:
+            # Store the error
+            self._exc = exc
+
+    def _poll(self):
+        """
+        Check in the GUI thread whether the job is done, and call the done
+        callback if it is.
+
+        @return: None.
+        """
+        # If the job thread is running
+        if self._thread.is_alive():
+            # Check again later
+            self._widget.after(self.POLL_INTERVAL, self._poll)
+
+            # Return
+            return
+
+        # If the job thread is done.
+
+        # Call the done callback
+        self._on_done(self._result, self._exc)
+
+
 #
 class RegistryEditor(Vidget):
 
+    # Interval in milliseconds to hand registry watcher events over to the
+    # GUI thread
+    _WATCH_EVENTS_DISPATCH_INTERVAL = 200
+
+    # Interval in milliseconds to move background search hits into the
+    # search results listbox
+    _SEARCH_POLL_INTERVAL = 100
+
+    # Max number of search hits moved into the search results listbox per
+    # poll, so that one poll does not block the GUI thread for long
+    _SEARCH_POLL_HITS_MAX = 500
+
+    # Max number of search hits before the search stops
+    _SEARCH_HITS_MAX = 100000
+
+    # Delay in milliseconds after the last path bar edit before the path is
+    # checked, so that intermediate paths typed on the way are not checked
+    _PATH_BAR_VALIDATE_DELAY = 300
+
+    # Max number of completions in the path bar's dropdown list
+    _PATH_BAR_COMPLETIONS_MAX = 200
+
+    # Map menu action name to handler method name
+    _MENU_ACTIONS = {
+        'export_reg': 'export_reg_dialog',
+        'search': 'search_dialog',
+        'reference_index': 'reference_index_dialog',
+        'references_find': 'references_find',
+    }
+
     def __init__(
         self,
         field_editor_factory,
@@ -333,14 +567,44 @@ class RegistryEditor(Vidget):
         # Create registry key path navigator
         self._path_nav = RegKeyPathNavigator()
 
-        # Create registry key path bar textfield
-        self._path_bar = EntryVidget(master=self.widget())
+        # Create registry watcher that watches the active key path
+        self._watcher = regkey_watcher_create()
+
+        # Registry key path being watched, or None
+        self._watched_path = None
+
+        # Queue of registry watcher events to be handled in the GUI thread.
+        # Each item is a tuple: (event, key_path).
+        self._watch_event_queue = Queue()
+
+        # Background export job, or None
+        self._export_job = None
+
+        # Reference index, or None if not opened
+        self._reference_index = None
+
+        # Background reference index refresh job, or None
+        self._reference_index_job = None
+
+        # Create registry key path bar textfield.
+        # Use Combobox for the completions dropdown list.
+        self._path_bar = EntryVidget(
+            master=self.widget(),
+            widget_type='Combobox',
+        )
+
+        # Pending path bar check's timer ID, or None
+        self._path_bar_validate_after_id = None
+
+        # Background path completion index prefetch thread, or None
+        self._path_bar_prefetch_thread = None
 
         # Create child keys listbox
         self._child_keys_listbox = ListboxVidget(master=self.widget())
 
         # Child keys listbox's active index cache.
-        # Key is registry key path.
+        # Key is RegPath object, so that paths differing only in case share
+        # one entry.
         # Value is active child key index.
         self._child_keys_listbox_indexcur_memo = {}
 
@@ -349,9 +613,27 @@ class RegistryEditor(Vidget):
             master=self.widget(),
         )
 
+        # RegKey object whose fields are in the fields listbox.
+        # Its registry key handle lease is kept until the fields listbox shows
+        # another key's fields, because the RegVal objects use the handle.
+        self._fields_regkey = None
+
         # Field editor
         self._field_editor = None
 
+        # Field shown in the field editor, as a tuple: (key_path, field_name,
+        # field_type, field_data), or None if the field editor is disabled
+        self._field_editor_field = None
+
+        # Field editor data right after the field's data is set, to tell
+        # whether the field editor has unsaved edits
+        self._field_editor_loaded_data = None
+
+        # Whether the fields listbox is being reloaded due to a registry
+        # watcher event. Field editor updates are deferred until the reload
+        # is done.
+        self._fields_reloading = False
+
         # Create `field add` label
         self._field_add_label = LabelVidget(master=self.widget())
 
@@ -417,6 +699,92 @@ class RegistryEditor(Vidget):
         # Set `field add` dialog's radio button variable's initial value
         self._field_add_type_var.set(1)
 
+        # Running RegSearch object, or None
+        self._search = None
+
+        # Create `search` dialog
+        self._search_dialog = DialogVidget(
+            master=self.widget(),
+            confirm_handler=self._search_start,
+            confirm_buttion_text='Search',
+            cancel_handler=self._search_stop,
+            cancel_buttion_text='Stop',
+            close_handler=self._search_dialog_on_close,
+        )
+
+        # Create `search` dialog's view frame
+        self._search_frame = Frame(master=self._search_dialog.toplevel())
+
+        # Create `search` dialog's `text` label
+        self._search_text_label = Label(master=self._search_frame)
+
+        # Create `search` dialog's `text` textfield
+        self._search_text_textfield = EntryVidget(master=self._search_frame)
+
+        # Create `search` dialog's `key path` label
+        self._search_path_label = Label(master=self._search_frame)
+
+        # Create `search` dialog's `key path` textfield
+        self._search_path_textfield = EntryVidget(master=self._search_frame)
+
+        # Create `search` dialog's check buttons frame
+        self._search_options_frame = Frame(master=self._search_frame)
+
+        # Create `search` dialog's check button variables
+        self._search_keys_var = BooleanVar(value=True)
+
+        self._search_names_var = BooleanVar(value=True)
+
+        self._search_data_var = BooleanVar(value=True)
+
+        self._search_case_var = BooleanVar(value=False)
+
+        self._search_regex_var = BooleanVar(value=False)
+
+        # Create `search` dialog's check button for matching key names
+        self._search_keys_cbutton = Checkbutton(
+            master=self._search_options_frame,
+            text='Keys',
+            variable=self._search_keys_var,
+        )
+
+        # Create `search` dialog's check button for matching field names
+        self._search_names_cbutton = Checkbutton(
+            master=self._search_options_frame,
+            text='Field Names',
+            variable=self._search_names_var,
+        )
+
+        # Create `search` dialog's check button for matching field data
+        self._search_data_cbutton = Checkbutton(
+            master=self._search_options_frame,
+            text='Field Data',
+            variable=self._search_data_var,
+        )
+
+        # Create `search` dialog's check button for matching case
+        self._search_case_cbutton = Checkbutton(
+            master=self._search_options_frame,
+            text='Match Case',
+            variable=self._search_case_var,
+        )
+
+        # Create `search` dialog's check button for regex mode
+        self._search_regex_cbutton = Checkbutton(
+            master=self._search_options_frame,
+            text='Regex',
+            variable=self._search_regex_var,
+        )
+
+        # Create `search` dialog's status label
+        self._search_status_label = Label(master=self._search_frame)
+
+        # Create `search` dialog's results listbox
+        self._search_results_listbox = ListboxVidget(
+            master=self._search_frame,
+            item_to_text=self._search_hit_text,
+        )
+
         # Bind widget event handlers
         self._widget_bind()
 
@@ -426,6 +794,9 @@ class RegistryEditor(Vidget):
         # Go to root key path
         self._path_nav.go_to_root()
 
+        # Start handing registry watcher events over to the GUI thread
+        self._watch_events_dispatch()
+
     def _widget_bind(self):
         """
         Bind widget event handlers.
@@ -438,6 +809,11 @@ class RegistryEditor(Vidget):
             self._path_bar_on_text_change
         )
 
+        # Path bar textfield fills completions before the dropdown list shows
+        self._path_bar.text_widget().config(
+            postcommand=self._path_bar_completions_update
+        )
+
         # Path bar textfield adds navigator path change event handler
         self._path_nav.handler_add(
             self._path_nav.PATH_CHANGE_DONE,
@@ -474,6 +850,28 @@ class RegistryEditor(Vidget):
             self._fields_listbox_on_nav_pathcur_change
         )
 
+        # Registry watcher adds navigator path change event handler
+        self._path_nav.handler_add(
+            self._path_nav.PATH_CHANGE_DONE,
+            self._watcher_on_nav_path_change
+        )
+
+        # Registry watcher adds child keys change event handler.
+        # Notice the handler is called from a watcher worker thread.
+        self._watcher.handler_add(
+            self._watcher.KEY_CHANGED,
+            self._watcher_on_key_change,
+            need_arg=True,
+        )
+
+        # Registry watcher adds fields change event handler.
+        # Notice the handler is called from a watcher worker thread.
+        self._watcher.handler_add(
+            self._watcher.VALUE_CHANGED,
+            self._watcher_on_value_change,
+            need_arg=True,
+        )
+
         # Field editor adds `fields listbox items change` event handler
         self._fields_listbox.handler_add(
             self._fields_listbox.ITEMS_CHANGE_DONE,
@@ -561,6 +959,18 @@ class RegistryEditor(Vidget):
             self._field_save_label_on_click_release,
         )
 
+        # `search` dialog's text textfield adds enter key event handler
+        self._search_text_textfield.text_widget().bind(
+            '<Return>',
+            lambda event: self._search_start(),
+        )
+
+        # `search` dialog's results listbox adds double click event handler
+        self._search_results_listbox.handler_add(
+            '<Double-Button-1>',
+            self._search_results_listbox_on_double_click
+        )
+
     def _widget_update(self):
         """
         Update widget config and layout.
@@ -841,6 +1251,117 @@ class RegistryEditor(Vidget):
         # Set `field add` dialog's title
         self._field_add_dialog.title('Create field')
 
+        # Configure layout weights for children.
+        # Row 0 is for text to find.
+        self._search_frame.rowconfigure(0, weight=0)
+
+        # Row 1 is for key path.
+        self._search_frame.rowconfigure(1, weight=0)
+
+        # Row 2 is for check buttons.
+        self._search_frame.rowconfigure(2, weight=0)
+
+        # Row 3 is for status label.
+        self._search_frame.rowconfigure(3, weight=0)
+
+        # Row 4 is for results listbox.
+        self._search_frame.rowconfigure(4, weight=1)
+
+        # Column 0 is for prompt labels
+        self._search_frame.columnconfigure(0, weight=0)
+
+        # Column 1 is for textfields.
+        self._search_frame.columnconfigure(1, weight=1)
+
+        # Configure `search` dialog's text prompt label
+        self._search_text_label.config(text='Find:')
+
+        # Lay out `search` dialog's text prompt label
+        self._search_text_label.grid(
+            in_=self._search_frame,
+            row=0,
+            column=0,
+            sticky='NSEW',
+        )
+
+        # Lay out `search` dialog's text textfield
+        self._search_text_textfield.grid(
+            in_=self._search_frame,
+            row=0,
+            column=1,
+            sticky='NSEW',
+            padx=(5, 0),
+        )
+
+        # Configure `search` dialog's key path prompt label
+        self._search_path_label.config(text='Key:')
+
+        # Lay out `search` dialog's key path prompt label
+        self._search_path_label.grid(
+            in_=self._search_frame,
+            row=1,
+            column=0,
+            sticky='NSEW',
+        )
+
+        # Lay out `search` dialog's key path textfield
+        self._search_path_textfield.grid(
+            in_=self._search_frame,
+            row=1,
+            column=1,
+            sticky='NSEW',
+            padx=(5, 0),
+        )
+
+        # Lay out `search` dialog's check buttons frame
+        self._search_options_frame.grid(
+            in_=self._search_frame,
+            row=2,
+            column=0,
+            columnspan=2,
+            sticky='NSEW',
+        )
+
+        # For each `search` dialog's check button
+        for column, cbutton in enumerate([
+            self._search_keys_cbutton,
+            self._search_names_cbutton,
+            self._search_data_cbutton,
+            self._search_case_cbutton,
+            self._search_regex_cbutton,
+        ]):
+            # Lay out the check button
+            cbutton.grid(
+                in_=self._search_options_frame,
+                row=0,
+                column=column,
+                sticky='W',
+            )
+
+        # Lay out `search` dialog's status label
+        self._search_status_label.grid(
+            in_=self._search_frame,
+            row=3,
+            column=0,
+            columnspan=2,
+            sticky='NSEW',
+        )
+
+        # Lay out `search` dialog's results listbox
+        self._search_results_listbox.grid(
+            in_=self._search_frame,
+            row=4,
+            column=0,
+            columnspan=2,
+            sticky='NSEW',
+        )
+
+        # Set `search` dialog's view widget
+        self._search_dialog.view_set(self._search_frame)
+
+        # Set `search` dialog's title
+        self._search_dialog.title('Search')
+
     def _path_nav_goto(self, path):
         """
         Go to registry key path. Show error dialog if failed.
@@ -869,17 +1390,22 @@ class RegistryEditor(Vidget):
         # return successful
         return True
 
-    def _path_bar_update(self):
+    def _path_bar_update(self, exists=None):
         """
         Update registry key path bar.
 
+        @param exists: Whether the path bar's registry key path exists. None
+        means check it, via the existence cache.
+
         @return: None.
         """
-        # Get path bar's registry key path
-        key_path = self._path_bar.text()
+        # If whether the registry key path exists is not given
+        if exists is None:
+            # Check whether the path bar's registry key path exists
+            exists = regkey_exists(self._path_bar.text(), cached=True)
 
         # If the registry key path not exists
-        if not regkey_exists(key_path):
+        if not exists:
             # Set path bar label's state to disabled
             self._path_bar_label.config(state=DISABLED)
 
@@ -894,20 +1420,103 @@ class RegistryEditor(Vidget):
 
         @return: None.
         """
-        # Update path bar
-        self._path_bar_update()
+        # If have pending path bar check
+        if self._path_bar_validate_after_id is not None:
+            # Cancel the pending check because the text has changed again
+            self.widget().after_cancel(self._path_bar_validate_after_id)
+
+        # Check the path bar's registry key path after the edits pause
+        self._path_bar_validate_after_id = self.widget().after(
+            self._PATH_BAR_VALIDATE_DELAY,
+            self._path_bar_validate,
+        )
+
+    def _path_bar_validate(self):
+        """
+        Check registry key path bar's registry key path once the edits pause.
+        Go to the path if it exists.
+
+        @return: None.
+        """
+        # Clear the pending check's timer ID
+        self._path_bar_validate_after_id = None
 
         # Get path bar's registry key path
         key_path = self._path_bar.text()
 
+        # Check whether the registry key path exists, via the existence
+        # cache. A missing ancestor typed earlier answers without a registry
+        # call.
+        exists = regkey_exists(key_path, cached=True)
+
+        # Update path bar
+        self._path_bar_update(exists=exists)
+
+        # Build the completion index of the path's parent key in a background
+        # thread, so that showing the dropdown list later does not enumerate
+        # child keys in the GUI thread
+        self._path_bar_completions_prefetch(key_path)
+
         # If the registry key path exists
-        if regkey_exists(key_path):
-            # Set path navigator to go to the registry key path
-            self._path_nav_goto(key_path)
+        if exists:
+            # If the path navigator is not at the registry key path
+            if RegPath.of(key_path) != self._path_nav.regpath():
+                # Set path navigator to go to the registry key path.
+                # No need check again because the path has just been
+                # checked.
+                self._path_nav.go_to_path(key_path)
 
         # If the registry key path not exists,
         # do nothing.
 
+    def _path_bar_completions_prefetch(self, text):
+        """
+        Build the completion index used by completions of given path bar
+        text, in a background thread.
+
+        @param text: Path bar text.
+
+        @return: None.
+        """
+        # If a prefetch is running
+        if self._path_bar_prefetch_thread is not None \
+                and self._path_bar_prefetch_thread.is_alive():
+            # Skip. The next pause in edits prefetches again.
+            return
+
+        # If no prefetch is running.
+
+        # Create prefetch thread
+        self._path_bar_prefetch_thread = threading.Thread(
+            target=path_completer().prefetch,
+            args=(text,),
+            name='RegistryEditor path completion',
+        )
+
+        # Do not keep the process alive for the prefetch thread
+        self._path_bar_prefetch_thread.daemon = True
+
+        # Start the prefetch thread
+        self._path_bar_prefetch_thread.start()
+
+    def _path_bar_completions_update(self):
+        """
+        Fill registry key path bar's dropdown list with completions of the
+        path bar's text. Called right before the dropdown list shows.
+
+        @return: None.
+        """
+        # Get completions of the path bar's text.
+        # The parent key's child names are enumerated only if not cached or
+        # changed.
+        completion_s = path_completer().complete(
+            self._path_bar.text(),
+            limit=self._PATH_BAR_COMPLETIONS_MAX,
+        )
+
+        # Set the dropdown list's items
+        self._path_bar.text_widget().config(values=completion_s)
+
     def _path_bar_on_nav_path_change(self):
         """
         Registry key path bar's `path navigator path change` event handler.
@@ -939,14 +1548,14 @@ class RegistryEditor(Vidget):
         @return: None.
         """
         # Get the path navigator's active registry key path
-        key_path = self._path_nav.path()
+        key_path = self._path_nav.regpath()
 
         # Get child keys listbox's active index
         indexcur = self._child_keys_listbox.indexcur()
 
         # If the active registry key path is not root path,
         # and the child keys listbox's active item is `go up` (see 6PMTJ)
-        if key_path != self._path_nav.ROOT and indexcur == 0:
+        if not key_path.is_root() and indexcur == 0:
             # Do not remember
             return
         else:
@@ -960,7 +1569,7 @@ class RegistryEditor(Vidget):
         @return: None.
         """
         # Get active registry key path
-        key_path = self._path_nav.path()
+        key_path = self._path_nav.regpath()
 
         # Get remembered child keys listbox active index for the active
         # registry key path
@@ -1027,16 +1636,18 @@ class RegistryEditor(Vidget):
 
             # If have success
             if success:
-                # Get old key name
-                _, _, old_key_name = old_key_path.rpartition('\\')
+                # Get old key name.
+                # Hive alias in the old key path is resolved to hive name.
+                old_key_name = RegPath.of(old_key_path).name().casefold()
 
                 # If the old key name is not empty
                 if old_key_name:
                     # For each child key names in the child keys listbox
                     for index, child_key_name in enumerate(
                             self._child_keys_listbox.items()):
-                        # If the child key name is EQ the old key name
-                        if child_key_name == old_key_name:
+                        # If the child key name is EQ the old key name,
+                        # ignoring case.
+                        if child_key_name.casefold() == old_key_name:
                             # Set the index to active
                             self._child_keys_listbox.indexcur_set(
                                 index=index,
@@ -1108,8 +1719,22 @@ class RegistryEditor(Vidget):
             # Copy the child key names to a new list
             child_key_name_s = list(child_key_name_s)
 
-        # Get status message
-        status_msg = 'Key: `{}`'.format(key_path)
+        # Get the key's metadata, without enumerating the key
+        key_info = regkey_info(key_path)
+
+        # If have no metadata
+        if key_info is None:
+            # Get status message
+            status_msg = 'Key: `{}`'.format(key_path)
+
+        # If have metadata
+        else:
+            # Get status message with child key count and field count
+            status_msg = 'Key: `{}` ({} child keys, {} fields)'.format(
+                key_path,
+                key_info.subkey_count,
+                key_info.value_count,
+            )
 
         # Set status message to status bar
         self._status_bar_set(status_msg)
@@ -1153,6 +1778,19 @@ class RegistryEditor(Vidget):
                 # Stop trying
                 break
 
+        # Get old RegKey object
+        old_regkey = self._fields_regkey
+
+        # Store new RegKey object
+        self._fields_regkey = regkey
+
+        # If old RegKey object is not None
+        if old_regkey is not None:
+            # Give old RegKey object's handle lease back to the handle pool.
+            # The new RegKey object is got first so that a same-key reload
+            # reuses the pooled handle.
+            old_regkey.close()
+
         # If the RegKey object is None,
         # it means the key path can not be opened.
         if regkey is None:
@@ -1167,18 +1805,24 @@ class RegistryEditor(Vidget):
 
         # If the RegKey object is not None.
         else:
-            # Get the registry key's fields
-            field_s = regkey.fields()
+            # Get the registry key's fields.
+            # Keep field data got in the enumeration pass so that showing a
+            # field in the field editor need not read from registry again.
+            # Reuse cached fields if the key's last write time has not
+            # changed.
+            # Get them as a compact field table, so that RegVal objects are
+            # created only for accessed rows.
+            table = regkey.fields(with_data=True, cached=True, as_table=True)
 
             # If the registry key have fields
-            if field_s:
+            if len(table):
                 # Sort the fields by field name
-                field_s = list(
-                    sorted(field_s, key=(lambda x: x.name().lower()))
-                )
+                table = table.sorted_by_name()
 
                 # Set the fields to the fields listbox
-                self._fields_listbox.items_set(field_s, notify=True)
+                self._fields_listbox.items_set(
+                    FieldRows(table), notify=True
+                )
 
                 # Set fields listbox's indexcur to 0
                 self._fields_listbox.indexcur_set(0, notify=True)
@@ -1186,22 +1830,269 @@ class RegistryEditor(Vidget):
                 # Set fields listbox to empty
                 self._fields_listbox.items_set([], notify=True)
 
-    def _field_editor_update(self):
+    def _watcher_on_nav_path_change(self):
         """
-        Update field editor.
+        Registry watcher's `path navigator path change` event handler.
 
         @return: None.
         """
-        # Get old field editor
-        old_field_editor = self._field_editor
+        # Get active key path
+        key_path = self._path_nav.path()
 
-        # Get fields listbox's active registry field
-        field = self._fields_listbox.itemcur()
+        # If the active key path is being watched
+        if key_path == self._watched_path:
+            # Do nothing
+            return
 
-        # 5WMYV
-        # Create new field editor.
-        # Notice the factory function may return the old editor object.
-        self._field_editor = self._field_editor_factory(
+        # If the active key path is not being watched.
+
+        # If have watched key path
+        if self._watched_path is not None:
+            # Stop watching the old key path
+            self._watcher.unwatch(self._watched_path)
+
+            # Set watched key path to None
+            self._watched_path = None
+
+        # If the active key path is root key path
+        if key_path == self._path_nav.ROOT:
+            # Do not watch because root key is not a real key
+            return
+
+        # If the active key path is not root key path.
+
+        try:
+            # Watch the active key path.
+            # Only the key itself is watched because the listboxes show only
+            # its child keys and fields.
+            self._watcher.watch(key_path, subtree=False)
+
+        # If have error
+        except Exception:
+            # Ignore.
+            # The key is shown without live updates.
+            return
+
+        # If have no error.
+
+        # Store the watched key path
+        self._watched_path = key_path
+
+    def _watcher_on_key_change(self, key_path):
+        """
+        Registry watcher's child keys change event handler.
+        Called from a watcher worker thread.
+
+        @param key_path: Changed key path.
+
+        @return: None.
+        """
+        # Hand the event over to the GUI thread
+        self._watch_event_queue.put((self._watcher.KEY_CHANGED, key_path))
+
+    def _watcher_on_value_change(self, key_path):
+        """
+        Registry watcher's fields change event handler.
+        Called from a watcher worker thread.
+
+        @param key_path: Changed key path.
+
+        @return: None.
+        """
+        # Hand the event over to the GUI thread
+        self._watch_event_queue.put((self._watcher.VALUE_CHANGED, key_path))
+
+    def _watch_events_dispatch(self):
+        """
+        Handle queued registry watcher events in the GUI thread. Reload the
+        listboxes only if the active key has changed.
+
+        @return: None.
+        """
+        # Get active key path
+        key_path = self._path_nav.path()
+
+        # Whether child keys have changed
+        keys_changed = False
+
+        # Whether fields have changed
+        values_changed = False
+
+        # For each queued event
+        while True:
+            try:
+                # Get queued event
+                event, event_key_path = self._watch_event_queue.get_nowait()
+
+            # If have no queued event
+            except Empty:
+                # Stop the loop
+                break
+
+            # If the event is not for the active key path
+            if event_key_path != key_path:
+                # Ignore the stale event
+                continue
+
+            # If the event is child keys change event
+            if event == self._watcher.KEY_CHANGED:
+                # Set child keys changed flag on
+                keys_changed = True
+
+            # If the event is fields change event
+            else:
+                # Set fields changed flag on
+                values_changed = True
+
+        # If child keys have changed
+        if keys_changed:
+            # Reload child keys listbox
+            self._child_keys_listbox_reload()
+
+        # If fields have changed
+        if values_changed:
+            # Reload fields listbox
+            self._fields_listbox_reload()
+
+        # Schedule next dispatch
+        self.widget().after(
+            self._WATCH_EVENTS_DISPATCH_INTERVAL,
+            self._watch_events_dispatch,
+        )
+
+    def _child_keys_listbox_reload(self):
+        """
+        Reload child keys listbox for the active key path, keeping the active
+        child key if it still exists.
+
+        @return: None.
+        """
+        # Get active child key name
+        old_itemcur = self._child_keys_listbox.itemcur()
+
+        # Reload child keys listbox
+        self._child_keys_listbox_on_nav_path_change()
+
+        # If have no old active child key
+        if old_itemcur is None:
+            # Do nothing
+            return
+
+        # If have old active child key.
+
+        # For each child key name in the child keys listbox
+        for index, child_key_name in enumerate(
+                self._child_keys_listbox.items()):
+            # If the child key name is EQ the old active child key name
+            if child_key_name == old_itemcur:
+                # Set the index to active
+                self._child_keys_listbox.indexcur_set(
+                    index=index,
+                    notify=True,
+                )
+
+                # Stop finding
+                break
+
+    def _fields_listbox_reload(self):
+        """
+        Reload fields listbox for the active key path, keeping the active field
+        if it still exists.
+
+        The field editor is updated only if the active field has changed, and
+        never if it has unsaved edits, so that a change of another field, or
+        an external write, does not discard the user's edits.
+
+        @return: None.
+        """
+        # Get active field
+        old_field = self._fields_listbox.itemcur()
+
+        # Set reloading flag on to defer field editor updates
+        self._fields_reloading = True
+
+        try:
+            # Reload fields listbox
+            self._fields_listbox_on_nav_pathcur_change()
+
+            # If have old active field
+            if old_field is not None:
+                # Get old active field name
+                old_field_name = old_field.name()
+
+                # For each field in fields listbox
+                for index, field in enumerate(self._fields_listbox.items()):
+                    # If the field's name is EQ the old active field name
+                    if field.name() == old_field_name:
+                        # Set the index to active
+                        self._fields_listbox.indexcur_set(
+                            index=index,
+                            notify=True,
+                        )
+
+                        # Stop finding
+                        break
+
+        finally:
+            # Set reloading flag off
+            self._fields_reloading = False
+
+        # Get new active field
+        field = self._fields_listbox.itemcur()
+
+        # If the field editor shows the active field
+        if field is not None and self._field_editor_field is not None \
+                and self._field_editor_field[:3] == (
+                    self._path_nav.path(), field.name(), field.type()
+                ):
+            # If the field editor has unsaved edits
+            if self._field_editor.data() != self._field_editor_loaded_data:
+                # If the field's data have changed
+                if field.data() != self._field_editor_field[3]:
+                    # Show status
+                    self._status_bar_set(
+                        'Field `{}` changed outside the editor. Unsaved edits'
+                        ' are kept.'.format(field.name())
+                    )
+
+                # Keep the unsaved edits
+                return
+
+            # If the field editor has no unsaved edits.
+
+            # If the field's data have not changed
+            if field.data() == self._field_editor_field[3]:
+                # Keep the field editor as is
+                return
+
+        # If the active field has changed.
+
+        # Update field editor
+        self._field_editor_update()
+
+    def _field_editor_update(self):
+        """
+        Update field editor.
+
+        @return: None.
+        """
+        # If the fields listbox is being reloaded
+        if self._fields_reloading:
+            # Defer to the end of the reload
+            return
+
+        # If the fields listbox is not being reloaded.
+
+        # Get old field editor
+        old_field_editor = self._field_editor
+
+        # Get fields listbox's active registry field
+        field = self._fields_listbox.itemcur()
+
+        # 5WMYV
+        # Create new field editor.
+        # Notice the factory function may return the old editor object.
+        self._field_editor = self._field_editor_factory(
             field=field,
             old_editor=old_field_editor,
             master=self._field_editor_labelframe,
@@ -1236,7 +2127,8 @@ class RegistryEditor(Vidget):
             # If the field is supported by the field editor
             if is_enabled:
                 # 5GN0P
-                # Read field data from registry
+                # Get field data.
+                # Read from registry only if not loaded in enumeration pass.
                 field_data = field.data()
 
                 # If field data is None
@@ -1264,6 +2156,14 @@ class RegistryEditor(Vidget):
             # Set field editor data
             self._field_editor.data_set(field_data)
 
+            # Store the field shown in the field editor
+            self._field_editor_field = (
+                self._path_nav.path(), field.name(), field.type(), field_data
+            )
+
+            # Store the field editor data to detect unsaved edits
+            self._field_editor_loaded_data = self._field_editor.data()
+
             # Set field load label's state to normal
             self._field_load_label.config(state=NORMAL)
 
@@ -1281,6 +2181,9 @@ class RegistryEditor(Vidget):
             # Set field editor to disabled
             self._field_editor.enable(False)
 
+            # Set field shown in the field editor to None
+            self._field_editor_field = None
+
             # Set field load label's state to disabled
             self._field_load_label.config(state=DISABLED)
 
@@ -1638,6 +2541,14 @@ class RegistryEditor(Vidget):
             # Set field load label's state to normal
             self._field_load_label.config(state=NORMAL)
 
+            # Get fields listbox's active field
+            field = self._fields_listbox.itemcur()
+
+            # If have active field
+            if field is not None:
+                # Read the field data from registry again
+                field.refresh()
+
             # Update field editor
             self._field_editor_update()
 
@@ -1694,6 +2605,15 @@ class RegistryEditor(Vidget):
                 # Write data to registry field
                 field.data_set(data=data)
 
+                # Store the saved data as the field editor's loaded data, so
+                # that it is not taken as unsaved edits
+                self._field_editor_field = (
+                    self._path_nav.path(), field.name(), field.type(),
+                    field.data(),
+                )
+
+                self._field_editor_loaded_data = data
+
             # If have error
             except Exception:
                 # Show error dialog
@@ -1702,6 +2622,701 @@ class RegistryEditor(Vidget):
                     "Failed writing data to registry."
                 )
 
+    def export_reg_dialog(self, path=None):
+        """
+        Ask for a `.reg` file path, then export given registry key path's
+        subtree to the file in a background thread.
+
+        @param path: Registry key path. Default is the active key path.
+
+        @return: None.
+        """
+        # If an export is running
+        if self._export_job is not None:
+            # Show error dialog
+            messagebox.showwarning(
+                'Error',
+                'An export is running.'
+            )
+
+            # Return
+            return
+
+        # If no export is running.
+
+        # If registry key path is not given
+        if path is None:
+            # Use the active key path
+            path = self._path_nav.path()
+
+        # Get default file name
+        file_name = (path.rpartition('\\')[2] or 'Registry') + '.reg'
+
+        # Ask for the file path
+        file_path = filedialog.asksaveasfilename(
+            parent=self.widget(),
+            title='Export',
+            initialfile=file_name,
+            defaultextension='.reg',
+            filetypes=[('Registration files', '*.reg'), ('All files', '*')],
+        )
+
+        # If the dialog is canceled
+        if not file_path:
+            # Do nothing
+            return
+
+        # If the dialog is not canceled.
+
+        # List of tuples `(key_path, exc)` of keys that failed reading
+        error_s = []
+
+        # Create export error callback, called in the export thread
+        def on_error(key_path, exc):
+            # Store the error
+            error_s.append((key_path, exc))
+
+        # Create export job function
+        def export_run():
+            # Open the file
+            with open(file_path, 'wb') as out_stream:
+                # Export the subtree.
+                # Return the writer statistics.
+                return export_reg(path, out_stream, on_error=on_error)
+
+        # Create export job
+        self._export_job = BackgroundJob(
+            self.widget(),
+            name='RegistryEditor export',
+            func=export_run,
+            on_done=lambda stats, exc: self._export_reg_done(
+                path, file_path, error_s, stats, exc
+            ),
+        )
+
+        # Start the export job
+        self._export_job.start()
+
+        # Show status
+        self._status_bar_set('Exporting `{}` ...'.format(path))
+
+    def _export_reg_done(self, path, file_path, error_s, stats, exc):
+        """
+        Report the background export's result. Called in the GUI thread.
+
+        @param path: Exported registry key path.
+
+        @param file_path: `.reg` file path.
+
+        @param error_s: List of tuples `(key_path, exc)` of keys that failed
+        reading.
+
+        @param stats: Writer statistics, or None if the export failed.
+
+        @param exc: Error that failed the export, or None.
+
+        @return: None.
+        """
+        # Set the export job to None
+        self._export_job = None
+
+        # If have error
+        if exc is not None:
+            # Show error dialog
+            messagebox.showwarning(
+                'Error',
+                'Failed exporting key `{}`: {}'.format(path, exc)
+            )
+
+            # Return
+            return
+
+        # If have no error.
+
+        # Show status
+        self._status_bar_set(
+            'Exported {} keys, {} fields to `{}`, {} errors.'.format(
+                stats['keys'], stats['values'], file_path, stats['errors']
+            )
+        )
+
+        # If some keys failed reading
+        if stats['errors']:
+            # Get the first error
+            error_path, error = error_s[0]
+
+            # Show error dialog
+            messagebox.showwarning(
+                'Error',
+                'Failed exporting {} keys of `{}`. First error at `{}`:'
+                ' {}'.format(stats['errors'], path, error_path, error)
+            )
+
+    def reference_index_dialog(self, path=None):
+        """
+        Ask for a reference index file path, then update the index from given
+        registry key path's subtree in a background thread. An existing index
+        file is updated incrementally, re-reading only keys changed since
+        they were indexed.
+
+        @param path: Registry key path. Default is the active key path.
+
+        @return: None.
+        """
+        # If a reference index refresh is running
+        if self._reference_index_job is not None:
+            # Show error dialog
+            messagebox.showwarning(
+                'Error',
+                'A reference index update is running.'
+            )
+
+            # Return
+            return
+
+        # If no reference index refresh is running.
+
+        # If registry key path is not given
+        if path is None:
+            # Use the active key path
+            path = self._path_nav.path()
+
+        # Ask for the index file path.
+        # An existing index file is updated, not overwritten.
+        file_path = filedialog.asksaveasfilename(
+            parent=self.widget(),
+            title='Index References',
+            initialfile=(
+                self._reference_index.index_path()
+                if self._reference_index is not None else 'References.refs'
+            ),
+            defaultextension='.refs',
+            filetypes=[('Reference indexes', '*.refs'), ('All files', '*')],
+            confirmoverwrite=False,
+        )
+
+        # If the dialog is canceled
+        if not file_path:
+            # Do nothing
+            return
+
+        # If the dialog is not canceled.
+
+        # If the file exists and is not a reference index file.
+        # Opening an invalid index file replaces it, so do not risk other
+        # files.
+        if os.path.exists(file_path) and not file_path.endswith('.refs'):
+            # Show error dialog
+            messagebox.showwarning(
+                'Error',
+                'Not a reference index file: `{}`.'.format(file_path)
+            )
+
+            # Return
+            return
+
+        # If the file is a reference index file, or not exists.
+
+        # If the index file is not the opened one
+        if self._reference_index is None \
+                or self._reference_index.index_path() != file_path:
+            try:
+                # Open the index file
+                index = ReferenceIndex(file_path)
+
+            # If have error
+            except Exception as exc:
+                # Show error dialog
+                messagebox.showwarning(
+                    'Error',
+                    'Failed opening reference index `{}`: {}'.format(
+                        file_path, exc
+                    )
+                )
+
+                # Return
+                return
+
+            # If have no error.
+
+            # If have an opened index
+            if self._reference_index is not None:
+                # Close the opened index
+                self._reference_index.close()
+
+            # Store the index
+            self._reference_index = index
+
+        # Get the index
+        index = self._reference_index
+
+        # Create refresh job
+        self._reference_index_job = BackgroundJob(
+            self.widget(),
+            name='RegistryEditor reference index',
+            func=lambda: reference_index_refresh(index, path),
+            on_done=lambda stats, exc: self._reference_index_done(
+                path, stats, exc
+            ),
+        )
+
+        # Start the refresh job
+        self._reference_index_job.start()
+
+        # Show status
+        self._status_bar_set('Indexing references of `{}` ...'.format(path))
+
+    def _reference_index_done(self, path, stats, exc):
+        """
+        Report the background reference index refresh's result. Called in
+        the GUI thread.
+
+        @param path: Indexed registry key path.
+
+        @param stats: Refresh statistics, or None if the refresh failed.
+
+        @param exc: Error that failed the refresh, or None.
+
+        @return: None.
+        """
+        # Set the refresh job to None
+        self._reference_index_job = None
+
+        # If have error
+        if exc is not None:
+            # Show error dialog
+            messagebox.showwarning(
+                'Error',
+                'Failed indexing references of key `{}`: {}'.format(
+                    path, exc
+                )
+            )
+
+            # Return
+            return
+
+        # If have no error.
+
+        # Show status
+        self._status_bar_set(
+            'Indexed references of {} keys, {} updated, {} removed.'.format(
+                stats['keys'], stats['updates'], stats['removes']
+            )
+        )
+
+    def references_find(self):
+        """
+        Find fields referencing the GUIDs, file paths, and ProgIDs in the
+        active field's name and data, via the reference index, and list them
+        in `search` dialog's results listbox. Double click a result to go to
+        the referencing field.
+
+        @return: None.
+        """
+        # If reference index is not opened
+        if self._reference_index is None:
+            # Show error dialog
+            messagebox.showwarning(
+                'Error',
+                'No reference index. Use `Index References` first.'
+            )
+
+            # Return
+            return
+
+        # If reference index is opened.
+
+        # Get fields listbox's active field
+        field = self._fields_listbox.itemcur()
+
+        # If have no active field
+        if field is None:
+            # Show error dialog
+            messagebox.showwarning(
+                'Error',
+                'No field is selected.'
+            )
+
+            # Return
+            return
+
+        # If have active field.
+
+        # Get the field's name
+        name = field.name()
+
+        # Get the field's data.
+        # Read from registry only if not loaded in enumeration pass.
+        data = field.data()
+
+        # Get entities referenced by the field name
+        entity_s = reference_entities(name)
+
+        # For each string of the field data
+        for string in (
+            data if isinstance(data, list)
+            else [data] if isinstance(data, str) else []
+        ):
+            # Add entities referenced by the string
+            entity_s.update(reference_entities(string))
+
+        # If the field references no entities
+        if not entity_s:
+            # Show info dialog
+            messagebox.showinfo(
+                'Find References',
+                'Field `{}` has no GUIDs, file paths, or ProgIDs.'.format(
+                    name
+                )
+            )
+
+            # Return
+            return
+
+        # If the field references entities.
+
+        # Hits list
+        hit_s = []
+
+        # Referencing fields seen, to list each field once
+        seen_s = set()
+
+        # For each referencing field
+        for ref_path, ref_name, ref_entity in \
+                self._reference_index.referrers(sorted(entity_s)):
+            # If the field is listed
+            if (ref_path, ref_name) in seen_s:
+                # Skip the field
+                continue
+
+            # If the field is not listed.
+
+            # Mark the field as listed
+            seen_s.add((ref_path, ref_name))
+
+            # Add hit, as field name hit if the entity is in the field name
+            hit_s.append(SearchHit(
+                HIT_NAME if ref_entity in reference_entities(ref_name)
+                else HIT_DATA,
+                ref_path,
+                ref_name,
+                None,
+            ))
+
+        # If a search is running
+        if self._search is not None:
+            # Cancel the search.
+            # Its poll stops because it is replaced below.
+            self._search.cancel()
+
+            # Set the running search to None
+            self._search = None
+
+        # Set results listbox to the hits
+        self._search_results_listbox.items_set(hit_s, notify=False)
+
+        # Show status
+        self._search_status_label.config(
+            text='{} referrers of `{}`: {}.'.format(
+                len(hit_s), name, ', '.join(sorted(entity_s))
+            )
+        )
+
+        # Show `search` dialog
+        self.search_dialog()
+
+    def search_dialog(self, path=None):
+        """
+        Show `search` dialog to search given registry key path's subtree.
+
+        @param path: Registry key path. Default is the active key path.
+
+        @return: None.
+        """
+        # If registry key path is not given
+        if path is None:
+            # Use the active key path
+            path = self._path_nav.path()
+
+        # If no search is running
+        if self._search is None:
+            # Set key path textfield to the registry key path
+            self._search_path_textfield.text_set(path)
+
+        # Show `search` dialog
+        self._search_dialog.deiconify()
+
+        # Center `search` dialog around the main window
+        center_window(
+            self._search_dialog.toplevel(),
+            point=get_window_center(self.widget().winfo_toplevel()),
+        )
+
+        # Set focus on the text textfield
+        self._search_text_textfield.text_widget().focus()
+
+    def _search_start(self):
+        """
+        `search` dialog's confirm button event handler.
+        Start searching in background threads.
+
+        @return: None.
+        """
+        # Get text to find
+        text = self._search_text_textfield.text()
+
+        # If the text is empty
+        if not text:
+            # Do nothing
+            return
+
+        # If the text is not empty.
+
+        # Get registry key path
+        path = self._search_path_textfield.text()
+
+        # If the registry key path not exists
+        if not regkey_exists(path):
+            # Show error dialog
+            messagebox.showwarning(
+                'Error',
+                'Cannot open key: `{}`.'.format(path),
+                parent=self._search_dialog.toplevel(),
+            )
+
+            # Return
+            return
+
+        # If the registry key path exists.
+
+        try:
+            # Create search.
+            # May raise ValueError if the regex pattern is not valid.
+            reg_search = registry_search(
+                text,
+                path_s=[path],
+                match_keys=self._search_keys_var.get(),
+                match_names=self._search_names_var.get(),
+                match_data=self._search_data_var.get(),
+                case_sensitive=self._search_case_var.get(),
+                max_hits=self._SEARCH_HITS_MAX,
+                regex=self._search_regex_var.get(),
+            )
+
+        # If the query is not valid
+        except ValueError as exc:
+            # Show error dialog
+            messagebox.showwarning(
+                'Error',
+                str(exc),
+                parent=self._search_dialog.toplevel(),
+            )
+
+            # Return
+            return
+
+        # If a search is running
+        if self._search is not None:
+            # Cancel the search.
+            # Its poll stops because it is replaced below.
+            self._search.cancel()
+
+        # Store the search
+        self._search = reg_search
+
+        # Clear results listbox
+        self._search_results_listbox.items_set([], notify=False)
+
+        # Start the search threads
+        self._search.start()
+
+        # Show status
+        self._search_status_update()
+
+        # Move hits into the results listbox later
+        self.widget().after(
+            self._SEARCH_POLL_INTERVAL,
+            lambda: self._search_poll(self._search),
+        )
+
+    def _search_stop(self):
+        """
+        `search` dialog's cancel button event handler.
+        Cancel the running search.
+
+        @return: None.
+        """
+        # If a search is running
+        if self._search is not None:
+            # Cancel the search.
+            # The poll stops when the search threads are done.
+            self._search.cancel()
+
+    def _search_dialog_on_close(self):
+        """
+        `search` dialog's window close button event handler.
+        Cancel the running search and hide the dialog.
+
+        @return: None.
+        """
+        # Cancel the running search
+        self._search_stop()
+
+        # Hide `search` dialog
+        self._search_dialog.withdraw()
+
+    def _search_poll(self, reg_search):
+        """
+        Move queued hits of the background search into the results listbox in
+        the GUI thread, in limited batches so that the GUI stays responsive.
+
+        @param reg_search: RegSearch object.
+
+        @return: None.
+        """
+        # If the search is not the running search
+        if reg_search is not self._search:
+            # Stop polling
+            return
+
+        # Get whether the search threads are done before taking hits, so that
+        # hits queued before they are done are not missed
+        done = reg_search.done()
+
+        # Take a batch of queued hits
+        hit_s = reg_search.hits_take(limit=self._SEARCH_POLL_HITS_MAX)
+
+        # If have hits
+        if hit_s:
+            # Add the hits to the results listbox
+            self._search_results_listbox.items_add(hit_s, notify=False)
+
+        # If the search threads are done, and have no hits left
+        if done and not hit_s:
+            # Set the running search to None
+            self._search = None
+
+            # Show final status
+            self._search_status_update(reg_search)
+
+            # Stop polling
+            return
+
+        # If the search is not done.
+
+        # Show status
+        self._search_status_update()
+
+        # Poll again later
+        self.widget().after(
+            self._SEARCH_POLL_INTERVAL,
+            lambda: self._search_poll(reg_search),
+        )
+
+    def _search_status_update(self, reg_search=None):
+        """
+        Update `search` dialog's status label.
+
+        @param reg_search: RegSearch object. Default is the running search.
+
+        @return: None.
+        """
+        # If RegSearch object is not given
+        if reg_search is None:
+            # Use the running search
+            reg_search = self._search
+
+        # If the search is running
+        if reg_search is self._search:
+            # Get status prefix
+            prefix = 'Searching...'
+
+        # If the search is cancelled or stopped due to max hits
+        elif reg_search.cancelled():
+            # Get status prefix
+            prefix = 'Stopped.'
+
+        # If the search is done
+        else:
+            # Get status prefix
+            prefix = 'Done.'
+
+        # Show status
+        self._search_status_label.config(
+            text='{} {} hits in {} keys.'.format(
+                prefix, reg_search.hit_count(), reg_search.key_count()
+            )
+        )
+
+    @staticmethod
+    def _search_hit_text(hit):
+        """
+        Get search results listbox's item text.
+
+        @param hit: SearchHit object.
+
+        @return: Item text.
+        """
+        # If the hit is key name hit
+        if hit.kind == HIT_KEY:
+            # Return key path
+            return hit.path
+
+        # If the hit is field name or field data hit.
+
+        # Return key path and field name, in the field name pointer format
+        # used by menu config (see 2T5EK)
+        return '{}->{}{}'.format(
+            hit.path,
+            hit.name,
+            ' (data)' if hit.kind == HIT_DATA else '',
+        )
+
+    def _search_results_listbox_on_double_click(self, event):
+        """
+        Search results listbox double click event handler.
+        Go to the hit's key, and select the hit's field.
+
+        @param event: Tkinter event object.
+
+        @return: None.
+        """
+        # Get active hit
+        hit = self._search_results_listbox.itemcur()
+
+        # If have no active hit
+        if hit is None:
+            # Do nothing
+            return
+
+        # If have active hit.
+
+        # Go to the hit's key path
+        success = self._path_nav_goto(hit.path)
+
+        # If have no success
+        if not success:
+            # Ignore
+            return
+
+        # If have success.
+
+        # If the hit is field name or field data hit
+        if hit.kind != HIT_KEY:
+            # For each field in fields listbox
+            for index, field in enumerate(self._fields_listbox.items()):
+                # If the field's name is EQ the hit's field name
+                if field.name() == hit.name:
+                    # Set the index to active
+                    self._fields_listbox.indexcur_set(
+                        index,
+                        focus=True,
+                        notify=True,
+                    )
+
+                    # Stop finding
+                    break
+
     def menutree_create(self, specs, id_sep=None):
         """
         Create menu tree by specs.
@@ -1724,6 +3339,16 @@ class RegistryEditor(Vidget):
           The registry key path can contain a field name pointer `->` (see
           2T5EK).
 
+        - action: Action name. Used if `type` is 'command'. If given, the
+          command runs the action instead of going to a registry key path.
+          Supported actions are:
+          - export_reg: Export the active key's subtree to a `.reg` file.
+          - search: Search the active key's subtree.
+          - reference_index: Update a reference index file from the active
+            key's subtree.
+          - references_find: Find fields referencing the GUIDs, file paths,
+            and ProgIDs in the active field, via the reference index.
+
         @param id_sep: ID parts separator used when converting a relative ID to
         full ID. Default is `/`.
 
@@ -1775,6 +3400,29 @@ class RegistryEditor(Vidget):
                     id_is_full=id_is_full,
                 )
 
+            # If the item type is `command` with action
+            elif item_type == 'command' and 'action' in spec:
+                # Get action name
+                action = spec['action']
+
+                # Get action handler method name
+                method_name = self._MENU_ACTIONS.get(action, None)
+
+                # If the action is not supported
+                if method_name is None:
+                    # Raise error
+                    raise ValueError(action)
+
+                # Create command item
+                menutree.add_command(
+                    pid=pid,
+                    id=id,
+                    command=getattr(self, method_name),
+                    id_is_full=id_is_full,
+                    id_sep=id_sep,
+                    label=spec.get('label', None),
+                )
+
             # If the item type is `command`
             elif item_type == 'command':
                 # Get registry key path
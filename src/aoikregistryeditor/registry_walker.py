@@ -0,0 +1,281 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+import os
+import threading
+
+
+#
+class WalkCancelToken(object):
+    """
+    WalkCancelToken lets another thread cancel a running walk.
+    """
+
+    def __init__(self):
+        """
+        Initialize object.
+
+        @return: None.
+        """
+        # Event set when cancelled
+        self._event = threading.Event()
+
+    def cancel(self):
+        """
+        Cancel the walk.
+
+        @return: None.
+        """
+        # Set the event
+        self._event.set()
+
+    def cancelled(self):
+        """
+        Test whether the walk is cancelled.
+
+        @return: Boolean.
+        """
+        # Return whether the event is set
+        return self._event.is_set()
+
+
+#
+def child_path_join(path, child_name):
+    """
+    Get child key path given parent key path and child key name.
+
+    @param path: Parent key path. Empty string means root key path.
+
+    @param child_name: Child key name.
+
+    @return: Child key path.
+    """
+    # If the parent key path is root key path
+    if path == '':
+        # Use child name as child path
+        return child_name
+
+    # If the parent key path is not root key path.
+
+    # Add separator between parent key path and child key name
+    return path + '\\' + child_name
+
+
+#
+def _key_list(regkey_get, path, include_values, include_info=False):
+    """
+    Open a key and list its child key names and fields. Run in a worker
+    thread.
+
+    @param regkey_get: RegKey getter function.
+
+    @param path: Registry key path.
+
+    @param include_values: Whether list fields.
+
+    @param include_info: Whether get the key's metadata.
+
+    @return: A tuple: (child_names, fields, info). `info` is RegKeyInfo if
+    `include_info` is on, otherwise None. Raise error if failed.
+    """
+    # Open the key
+    regkey = regkey_get(path)
+
+    # If failed opening the key
+    if regkey is None:
+        # Raise error
+        raise ValueError('Cannot open key: `{}`.'.format(path))
+
+    # If not failed opening the key.
+
+    try:
+        # Get child key names
+        child_name_s = regkey.child_names()
+
+        # If list fields
+        if include_values:
+            # Get fields as a compact field table, with data loaded so that
+            # they can be used after the key is closed.
+            field_s = regkey.fields(with_data=True, as_table=True)
+
+        # If not list fields
+        else:
+            # Set fields to None
+            field_s = None
+
+        # Get metadata if needed
+        info = regkey.info() if include_info else None
+
+        # Return child key names, fields, and metadata
+        return list(child_name_s), field_s, info
+
+    finally:
+        # Close the key
+        regkey.close()
+
+
+#
+def walk(
+    path,
+    regkey_get,
+    max_depth=None,
+    workers=None,
+    include_values=False,
+    cancel_token=None,
+    on_error=None,
+    max_pending=None,
+    include_info=False,
+):
+    """
+    Walk a registry subtree, listing keys on a bounded thread pool.
+
+    Results are yielded in completion order as soon as they are available.
+    At most `max_pending` keys are being listed or waiting to be consumed, so
+    a slow consumer slows down the walk instead of growing memory.
+
+    @param path: Registry key path of the subtree's top key.
+
+    @param regkey_get: RegKey getter function. It takes a registry key path
+    and returns a RegKey-compatible object, or None if failed.
+
+    @param max_depth: Max depth to descend. The top key is depth 0. None
+    means no limit.
+
+    @param workers: Number of worker threads. Default is number of CPUs.
+
+    @param include_values: Whether list fields of each key.
+
+    @param cancel_token: WalkCancelToken object to cancel the walk.
+
+    @param on_error: Error callback taking arguments `(path, exc)`. Called in
+    the consumer's thread for each key that failed listing. The key's
+    subtree is skipped. Default is ignore the error.
+
+    @param max_pending: Max number of keys being listed or waiting to be
+    consumed. Default is four times the number of workers.
+
+    @param include_info: Whether get metadata of each key.
+
+    @return: Generator of tuples: (path, child_names, fields). `fields` is a
+    FieldTable with data loaded if `include_values` is on, otherwise None.
+    If `include_info` is on, each tuple has a fourth item: the key's
+    RegKeyInfo.
+    """
+    # If number of workers is not given
+    if workers is None:
+        # Use number of CPUs
+        workers = os.cpu_count() or 1
+
+    # If max pending is not given
+    if max_pending is None:
+        # Use four times the number of workers
+        max_pending = workers * 4
+
+    # Paths to list.
+    # Each item is a tuple: (path, depth).
+    # Used as a stack so that its size is proportional to depth times
+    # branching instead of to the width of the whole tree.
+    todo_s = [(path, 0)]
+
+    # Pending futures dict.
+    # Key is future.
+    # Value is a tuple: (path, depth).
+    pending_s = {}
+
+    # Create thread pool
+    executor = ThreadPoolExecutor(max_workers=workers)
+
+    try:
+        # While have paths to list or pending futures
+        while todo_s or pending_s:
+            # If cancelled
+            if cancel_token is not None and cancel_token.cancelled():
+                # Stop walking
+                break
+
+            # While have paths to list and pending futures are not too many
+            while todo_s and len(pending_s) < max_pending:
+                # Get a path to list
+                todo_path, todo_depth = todo_s.pop()
+
+                # Submit the listing task
+                future = executor.submit(
+                    _key_list,
+                    regkey_get,
+                    todo_path,
+                    include_values,
+                    include_info,
+                )
+
+                # Store the pending future
+                pending_s[future] = (todo_path, todo_depth)
+
+            # Wait until any pending future is done
+            done_s, _ = wait(
+                list(pending_s.keys()),
+                return_when=FIRST_COMPLETED,
+            )
+
+            # For each done future
+            for future in done_s:
+                # Get the future's path and depth
+                done_path, done_depth = pending_s.pop(future)
+
+                #
+                try:
+                    # Get child key names, fields, and metadata
+                    child_name_s, field_s, info = future.result()
+
+                # If have error
+                except Exception as exc:
+                    # If have error callback
+                    if on_error is not None:
+                        # Call the error callback
+                        on_error(done_path, exc)
+
+                    # Skip the key's subtree
+                    continue
+
+                # If have no error.
+
+                # If max depth is not reached
+                if max_depth is None or done_depth < max_depth:
+                    # For each child key name, reversed so that the stack pops
+                    # them in enumeration order
+                    for child_name in reversed(child_name_s):
+                        # Add the child key path to paths to list
+                        todo_s.append((
+                            child_path_join(done_path, child_name),
+                            done_depth + 1,
+                        ))
+
+                # Yield the result.
+                # The generator is suspended here until the consumer asks for
+                # the next result, which gives backpressure.
+                # If get metadata
+                if include_info:
+                    # Yield the result with metadata
+                    yield done_path, child_name_s, field_s, info
+
+                # If not get metadata
+                else:
+                    # Yield the result
+                    yield done_path, child_name_s, field_s
+
+                # If cancelled
+                if cancel_token is not None and cancel_token.cancelled():
+                    # Stop yielding
+                    break
+
+    finally:
+        # For each pending future
+        for future in pending_s:
+            # Cancel the future if not started
+            future.cancel()
+
+        # Shut down the thread pool without waiting for running tasks
+        executor.shutdown(wait=False)
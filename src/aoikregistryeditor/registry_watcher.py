@@ -0,0 +1,327 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import threading
+
+from .eventor import Eventor
+
+
+#
+class RegChangeNotifier(object):
+    """
+    Registry change notifier interface class.
+
+    A notifier watches one registry key path. Its `wait` method is called
+    repeatedly from a watcher worker thread, and its `cancel` method may be
+    called from another thread to wake up a blocking `wait` call.
+    """
+
+    # Change kind meaning child keys are added or deleted
+    KEY_CHANGED = 'KEY_CHANGED'
+
+    # Change kind meaning fields are written or deleted
+    VALUE_CHANGED = 'VALUE_CHANGED'
+
+    def wait(self):
+        """
+        Block until changes happen or the notifier is canceled.
+
+        @return: A list of change kinds, empty if the notifier is canceled.
+        Raise error if the key can no longer be watched.
+        """
+        # Raise error
+        raise NotImplementedError()
+
+    def cancel(self):
+        """
+        Wake up a blocking `wait` call. Can be called from any thread.
+
+        @return: None.
+        """
+        # Raise error
+        raise NotImplementedError()
+
+    def close(self):
+        """
+        Release resources. Called from the watcher worker thread after the
+        last `wait` call.
+
+        @return: None.
+        """
+        # Raise error
+        raise NotImplementedError()
+
+
+#
+class _WatchWorker(object):
+    """
+    _WatchWorker runs a worker thread that blocks on a notifier's `wait`
+    method and reports changes to the watcher.
+    """
+
+    def __init__(self, watcher, path, notifier):
+        """
+        Initialize object.
+
+        @param watcher: RegKeyWatcher object.
+
+        @param path: Watched registry key path.
+
+        @param notifier: RegChangeNotifier object.
+
+        @return: None.
+        """
+        # RegKeyWatcher object
+        self._watcher = watcher
+
+        # Watched registry key path
+        self._path = path
+
+        # RegChangeNotifier object
+        self._notifier = notifier
+
+        # Whether the worker is stopping
+        self._stopping = False
+
+        # Create worker thread
+        self._thread = threading.Thread(
+            target=self._run,
+            name='RegKeyWatcher: {}'.format(path),
+        )
+
+        # Do not keep the process alive for the worker thread
+        self._thread.daemon = True
+
+    def start(self):
+        """
+        Start the worker thread.
+
+        @return: None.
+        """
+        # Start the worker thread
+        self._thread.start()
+
+    def stop(self, join=False):
+        """
+        Stop the worker thread.
+
+        @param join: Whether wait until the worker thread exits.
+
+        @return: None.
+        """
+        # Set stopping flag on
+        self._stopping = True
+
+        # Wake up the worker thread
+        self._notifier.cancel()
+
+        # If wait until the worker thread exits,
+        # and caller is not the worker thread.
+        if join and threading.current_thread() is not self._thread:
+            # Wait until the worker thread exits
+            self._thread.join()
+
+    def is_alive(self):
+        """
+        Test whether the worker thread is running.
+
+        @return: Boolean.
+        """
+        # Return whether the worker thread is running
+        return self._thread.is_alive()
+
+    def _run(self):
+        """
+        Worker thread function.
+
+        @return: None.
+        """
+        try:
+            # While not stopping
+            while not self._stopping:
+                #
+                try:
+                    # Block until changes happen or the notifier is canceled
+                    change_kind_s = self._notifier.wait()
+
+                # If have error,
+                # it means the key can no longer be watched, e.g. deleted.
+                except Exception:
+                    # If not stopping
+                    if not self._stopping:
+                        # Report the key as changed so that listeners reload
+                        # and find out the key's new state.
+                        self._watcher._changes_notify(
+                            self._path, [RegChangeNotifier.KEY_CHANGED]
+                        )
+
+                    # Stop the loop
+                    break
+
+                # If stopping
+                if self._stopping:
+                    # Stop the loop
+                    break
+
+                # If not stopping.
+
+                # If have changes
+                if change_kind_s:
+                    # Report the changes
+                    self._watcher._changes_notify(self._path, change_kind_s)
+
+        finally:
+            try:
+                # Release the notifier's resources
+                self._notifier.close()
+
+            # If have error
+            except Exception:
+                # Ignore
+                pass
+
+
+#
+class RegKeyWatcher(Eventor):
+    """
+    RegKeyWatcher runs one worker thread per watched registry key path. Each
+    worker thread blocks on a change notifier, and notifies `KEY_CHANGED` or
+    `VALUE_CHANGED` events with the watched key path as event argument.
+
+    Notice event handlers are called from worker threads. Handlers that touch
+    GUI widgets should hand the event over to the GUI thread.
+    """
+
+    # Event notified when child keys of a watched key are added or deleted
+    KEY_CHANGED = RegChangeNotifier.KEY_CHANGED
+
+    # Event notified when fields of a watched key are written or deleted
+    VALUE_CHANGED = RegChangeNotifier.VALUE_CHANGED
+
+    def __init__(self, notifier_factory):
+        """
+        Initialize object.
+
+        @param notifier_factory: Notifier factory function. It takes arguments
+        `(path, subtree)` and returns a RegChangeNotifier object, or raises
+        error if the key can not be watched.
+
+        @return: None.
+        """
+        # Initialize Eventor
+        Eventor.__init__(self)
+
+        # Notifier factory function
+        self._notifier_factory = notifier_factory
+
+        # Workers dict.
+        # Key is watched registry key path.
+        # Value is _WatchWorker object.
+        self._workers = {}
+
+        # Lock that guards the workers dict
+        self._lock = threading.Lock()
+
+    def watch(self, path, subtree=True):
+        """
+        Start watching given registry key path.
+
+        @param path: Registry key path.
+
+        @param subtree: Whether also watch descendant keys.
+
+        @return: None. Raise error if the key can not be watched.
+        """
+        with self._lock:
+            # Get existing worker
+            worker = self._workers.get(path, None)
+
+            # If the path is being watched
+            if worker is not None and worker.is_alive():
+                # Do nothing
+                return
+
+            # If the path is not being watched.
+
+            # Create notifier.
+            # May raise error.
+            notifier = self._notifier_factory(path, subtree)
+
+            # Create worker
+            worker = _WatchWorker(watcher=self, path=path, notifier=notifier)
+
+            # Store the worker
+            self._workers[path] = worker
+
+        # Start the worker thread
+        worker.start()
+
+    def unwatch(self, path, join=False):
+        """
+        Stop watching given registry key path.
+
+        @param path: Registry key path.
+
+        @param join: Whether wait until the worker thread exits.
+
+        @return: None.
+        """
+        with self._lock:
+            # Remove the worker
+            worker = self._workers.pop(path, None)
+
+        # If have worker
+        if worker is not None:
+            # Stop the worker
+            worker.stop(join=join)
+
+    def unwatch_all(self, join=False):
+        """
+        Stop watching all registry key paths.
+
+        @param join: Whether wait until the worker threads exit.
+
+        @return: None.
+        """
+        with self._lock:
+            # Get all workers
+            worker_s = list(self._workers.values())
+
+            # Remove all workers
+            self._workers.clear()
+
+        # For each worker
+        for worker in worker_s:
+            # Stop the worker
+            worker.stop(join=join)
+
+    def watched_paths(self):
+        """
+        Get watched registry key paths.
+
+        @return: Watched registry key paths list.
+        """
+        with self._lock:
+            # Return watched registry key paths whose workers are running
+            return [
+                path for path, worker in self._workers.items()
+                if worker.is_alive()
+            ]
+
+    def _changes_notify(self, path, change_kind_s):
+        """
+        Notify change events. Called from worker threads.
+
+        @param path: Watched registry key path.
+
+        @param change_kind_s: A list of change kinds.
+
+        @return: None.
+        """
+        # For each distinct change kind, `KEY_CHANGED` first
+        for change_kind in (self.KEY_CHANGED, self.VALUE_CHANGED):
+            # If the change kind happened
+            if change_kind in change_kind_s:
+                # Notify the change event
+                self.handler_notify(change_kind, path)
@@ -0,0 +1,448 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import threading
+
+from .regpath import RegPath
+
+
+#
+class RegKeyHandlePool(object):
+    """
+    RegKeyHandlePool caches opened registry key handles, keyed by
+    (registry key path, permission mask). Paths are compared as RegPath
+    objects, so paths differing only in case share one handle.
+
+    A handle is leased by `acquire` and given back by `release`. Each cached
+    handle has a reference count of active leases. When the number of cached
+    handles exceeds the capacity, least recently used handles that have no
+    active leases are closed.
+
+    Handles removed from the pool while leased, e.g. by `discard` after the
+    key is deleted, become orphans. An orphan is closed when its last lease
+    is given back. `release` takes the leased handle, so that a lease of an
+    orphan never touches a newer handle cached for the same path.
+
+    The pool does not call pywin32 itself. The open and close functions are
+    given by the creator, so that the pool can be used with stand-in
+    functions where pywin32 is not available.
+    """
+
+    # Default capacity
+    CAPACITY_DEFAULT = 64
+
+    def __init__(self, open_func, close_func, capacity=None):
+        """
+        Initialize object.
+
+        @param open_func: Handle open function. It takes arguments
+        `(path, mask)` and returns a handle, or raises error if failed.
+
+        @param close_func: Handle close function. It takes a handle argument.
+
+        @param capacity: Max number of cached handles. Handles with active
+        leases are not evicted, so the pool may exceed the capacity while
+        they are leased. Default is `CAPACITY_DEFAULT`.
+
+        @return: None.
+        """
+        # Handle open function
+        self._open_func = open_func
+
+        # Handle close function
+        self._close_func = close_func
+
+        # Capacity
+        self._capacity = capacity \
+            if capacity is not None else self.CAPACITY_DEFAULT
+
+        # Entries dict ordered from least to most recently used.
+        # Key is (path, mask) tuple.
+        # Value is a list: [handle, lease_count].
+        self._entries = OrderedDict()
+
+        # Orphan handles removed from the pool while leased.
+        # Key is the handle's id.
+        # Value is a list: [handle, lease_count].
+        self._orphans = {}
+
+        # Number of `acquire` calls served by a cached handle
+        self._hits = 0
+
+        # Number of `acquire` calls that opened a new handle
+        self._misses = 0
+
+        # Lock that guards the entries dict and the counters
+        self._lock = threading.RLock()
+
+    def capacity(self):
+        """
+        Get capacity.
+
+        @return: Capacity.
+        """
+        # Return the capacity
+        return self._capacity
+
+    def capacity_set(self, capacity):
+        """
+        Set capacity. Evict handles if the new capacity is exceeded.
+
+        @param capacity: Capacity to set.
+
+        @return: None.
+        """
+        # If the capacity is negative
+        if capacity < 0:
+            # Raise error
+            raise ValueError(capacity)
+
+        # If the capacity is not negative.
+
+        with self._lock:
+            # Set the capacity
+            self._capacity = capacity
+
+            # Evict handles exceeding the capacity
+            self._evict()
+
+    def size(self):
+        """
+        Get number of cached handles.
+
+        @return: Number of cached handles.
+        """
+        # Return number of cached handles
+        return len(self._entries)
+
+    def hits(self):
+        """
+        Get number of `acquire` calls served by a cached handle.
+
+        @return: Hit count.
+        """
+        # Return the hit count
+        return self._hits
+
+    def misses(self):
+        """
+        Get number of `acquire` calls that opened a new handle.
+
+        @return: Miss count.
+        """
+        # Return the miss count
+        return self._misses
+
+    def stats(self):
+        """
+        Get pool statistics dict.
+
+        @return: Pool statistics dict.
+        """
+        with self._lock:
+            # Return pool statistics dict
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'size': len(self._entries),
+                'orphans': len(self._orphans),
+                'capacity': self._capacity,
+            }
+
+    def stats_reset(self):
+        """
+        Reset hit and miss counters.
+
+        @return: None.
+        """
+        with self._lock:
+            # Reset the hit count
+            self._hits = 0
+
+            # Reset the miss count
+            self._misses = 0
+
+    def acquire(self, path, mask):
+        """
+        Lease a handle for given registry key path and permission mask.
+        Open the handle if it is not cached.
+
+        @param path: Registry key path, or RegPath object.
+
+        @param mask: Permission mask.
+
+        @return: Registry key handle, or raise error if failed opening.
+        """
+        # Get RegPath object
+        path = RegPath.of(path)
+
+        # Get entry key
+        key = (path, mask)
+
+        with self._lock:
+            # Get cached entry
+            entry = self._entries.get(key, None)
+
+            # If the entry is cached
+            if entry is not None:
+                # Increment hit count
+                self._hits += 1
+
+                # Mark the entry as most recently used
+                self._entries.move_to_end(key)
+
+                # Increment lease count
+                entry[1] += 1
+
+                # Return the cached handle
+                return entry[0]
+
+            # If the entry is not cached.
+
+            # Increment miss count
+            self._misses += 1
+
+        # Open handle without holding the lock, so that a slow open does not
+        # block other threads' `acquire` calls.
+        # May raise error.
+        handle = self._open_func(path, mask)
+
+        with self._lock:
+            # Get cached entry, which may have been cached by another thread
+            # while the handle was being opened
+            entry = self._entries.get(key, None)
+
+            # If the entry is not cached
+            if entry is None:
+                # Cache the handle with one lease
+                self._entries[key] = [handle, 1]
+
+                # Evict handles exceeding the capacity
+                self._evict()
+
+                # Return the handle
+                return handle
+
+            # If the entry is cached by another thread.
+
+            # Mark the entry as most recently used
+            self._entries.move_to_end(key)
+
+            # Increment lease count
+            entry[1] += 1
+
+            # Get the cached handle
+            cached_handle = entry[0]
+
+        # Close the duplicate handle
+        self._close(handle)
+
+        # Return the cached handle
+        return cached_handle
+
+    def release(self, path, mask, handle=None):
+        """
+        Give back a handle leased by `acquire`. Close the handle if it is an
+        orphan and this is its last lease.
+
+        @param path: Registry key path, or RegPath object.
+
+        @param mask: Permission mask.
+
+        @param handle: The leased handle. If given and it is not the cached
+        handle, the lease is given back to the orphan handle.
+
+        @return: None.
+        """
+        # Get RegPath object
+        path = RegPath.of(path)
+
+        # Get entry key
+        key = (path, mask)
+
+        with self._lock:
+            # Get cached entry
+            entry = self._entries.get(key, None)
+
+            # If the entry is not cached, or caches another handle,
+            # it means the leased handle has been removed from the pool.
+            if entry is None \
+                    or (handle is not None and entry[0] is not handle):
+                # Give the lease back to the orphan handle
+                self._orphan_release(handle)
+
+                # Return
+                return
+
+            # If the entry is cached.
+
+            # If the entry has no active leases
+            if entry[1] <= 0:
+                # Raise error
+                raise ValueError('Not leased: {}'.format(key))
+
+            # If the entry has active leases.
+
+            # Decrement lease count
+            entry[1] -= 1
+
+            # Evict handles exceeding the capacity
+            self._evict()
+
+    def discard(self, path):
+        """
+        Remove cached handles for given registry key path and its descendant
+        paths, e.g. after the key is deleted. Handles with active leases
+        become orphans, closed when their last leases are given back.
+
+        @param path: Registry key path, or RegPath object.
+
+        @return: None.
+        """
+        # Get RegPath object
+        path = RegPath.of(path)
+
+        with self._lock:
+            # For each entry key
+            for key in list(self._entries.keys()):
+                # Get entry path
+                entry_path = key[0]
+
+                # If the entry path is the path or a descendant path
+                if entry_path.is_within(path):
+                    # Remove the entry
+                    handle, lease_count = self._entries.pop(key)
+
+                    # If the entry has no active leases
+                    if lease_count == 0:
+                        # Close the handle
+                        self._close(handle)
+
+                    # If the entry has active leases
+                    else:
+                        # Keep the handle as orphan
+                        self._orphans[id(handle)] = [handle, lease_count]
+
+    def clear(self):
+        """
+        Close all cached handles that have no active leases, and forget all
+        cached handles. Handles with active leases become orphans, closed
+        when their last leases are given back.
+
+        @return: None.
+        """
+        with self._lock:
+            # Get entries
+            entry_s = list(self._entries.values())
+
+            # Forget all entries
+            self._entries.clear()
+
+            # For each entry with active leases
+            for handle, lease_count in entry_s:
+                # If the entry has active leases
+                if lease_count > 0:
+                    # Keep the handle as orphan
+                    self._orphans[id(handle)] = [handle, lease_count]
+
+        # For each entry
+        for handle, lease_count in entry_s:
+            # If the entry has no active leases
+            if lease_count == 0:
+                # Close the handle
+                self._close(handle)
+
+    def _orphan_release(self, handle):
+        """
+        Give back a lease of an orphan handle. Close the handle if this is its
+        last lease.
+
+        Caller should hold the lock.
+
+        @param handle: The leased handle, or None if not known.
+
+        @return: None.
+        """
+        # Get orphan entry
+        entry = self._orphans.get(id(handle), None) \
+            if handle is not None else None
+
+        # If the handle is not an orphan, e.g. not known
+        if entry is None:
+            # Ignore
+            return
+
+        # If the handle is an orphan.
+
+        # Decrement lease count
+        entry[1] -= 1
+
+        # If the orphan has no active leases
+        if entry[1] <= 0:
+            # Forget the orphan
+            del self._orphans[id(handle)]
+
+            # Close the handle
+            self._close(handle)
+
+    def _evict(self):
+        """
+        Close least recently used handles that have no active leases, until
+        the number of cached handles does not exceed the capacity.
+
+        Caller should hold the lock.
+
+        @return: None.
+        """
+        # Number of entries to evict
+        evict_count = len(self._entries) - self._capacity
+
+        # If no need to evict
+        if evict_count <= 0:
+            # Return
+            return
+
+        # For each entry key, from least to most recently used
+        for key in list(self._entries.keys()):
+            # If enough entries have been evicted
+            if evict_count <= 0:
+                # Stop evicting
+                break
+
+            # Get the entry
+            handle, lease_count = self._entries[key]
+
+            # If the entry has active leases
+            if lease_count > 0:
+                # Skip the entry
+                continue
+
+            # If the entry has no active leases.
+
+            # Remove the entry
+            del self._entries[key]
+
+            # Close the handle
+            self._close(handle)
+
+            # Decrement number of entries to evict
+            evict_count -= 1
+
+    def _close(self, handle):
+        """
+        Close handle, ignoring error.
+
+        @param handle: Registry key handle.
+
+        @return: None.
+        """
+        try:
+            # Close the handle
+            self._close_func(handle)
+
+        # If have error
+        except Exception:
+            # Ignore
+            pass
@@ -0,0 +1,494 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from collections import OrderedDict
+from functools import lru_cache
+from sys import intern
+
+
+#
+def _handle_signed(handle):
+    """
+    Convert a predefined registry key handle from its unsigned 32-bit value
+    to the signed value.
+
+    Predefined handles are `(HKEY)(LONG)0x8000000X`, so they are negative and
+    sign-extended to 64 bits on 64-bit Windows. `win32con` defines them as
+    negative integers too, e.g. `HKEY_CLASSES_ROOT == -2147483648`, and
+    pywin32 converts an unsigned 0x80000000 to a different handle there.
+
+    @param handle: Unsigned 32-bit handle value.
+
+    @return: Signed handle value.
+    """
+    # Return the signed value
+    return handle - 0x100000000 if handle & 0x80000000 else handle
+
+
+# Map registry hive name to hive integer.
+# The integers are the predefined registry key handles, same as the signed
+# `HKEY_*` constants in `win32con`. They are defined here so that this
+# module does not need pywin32.
+HIVE_NAME_TO_INT = OrderedDict([
+    ('HKEY_CLASSES_ROOT', _handle_signed(0x80000000)),
+    ('HKEY_CURRENT_CONFIG', _handle_signed(0x80000005)),
+    ('HKEY_CURRENT_USER', _handle_signed(0x80000001)),
+    ('HKEY_LOCAL_MACHINE', _handle_signed(0x80000002)),
+    ('HKEY_USERS', _handle_signed(0x80000003)),
+])
+
+# Map hive name alias to hive name
+HIVE_ALIAS_TO_NAME = {
+    'HKCR': 'HKEY_CLASSES_ROOT',
+    'HKCC': 'HKEY_CURRENT_CONFIG',
+    'HKCU': 'HKEY_CURRENT_USER',
+    'HKLM': 'HKEY_LOCAL_MACHINE',
+    'HKU': 'HKEY_USERS',
+}
+
+
+#
+def _hive_name_resolve(name):
+    """
+    Map hive name or alias, in any case, to hive name.
+
+    @param name: Hive name or alias.
+
+    @return: Hive name, or None if not valid.
+    """
+    # Get uppercase name
+    name_upper = name.upper()
+
+    # If the name is hive name
+    if name_upper in HIVE_NAME_TO_INT:
+        # Return the hive name
+        return name_upper
+
+    # If the name is not hive name.
+
+    # Return hive name for the alias, or None if not valid
+    return HIVE_ALIAS_TO_NAME.get(name_upper, None)
+
+
+#
+class RegPath(object):
+    """
+    RegPath is an immutable, hashable registry key path.
+
+    It is parsed once into interned segments, with the hive name and hive
+    integer precomputed. Equality and hashing use a casefolded comparison key
+    because registry key paths are case-insensitive, so `HKLM\\Software` and
+    `HKEY_LOCAL_MACHINE\\SOFTWARE` are equal.
+
+    Parent and child paths are derived from the segments without parsing
+    strings again.
+
+    The root path, which contains the hive keys, has no segments.
+    """
+
+    # Attribute slots
+    __slots__ = (
+        '_segments',
+        '_hive_int',
+        '_str',
+        '_key',
+        '_hash',
+        '_parent',
+    )
+
+    def __init__(self, path=''):
+        """
+        Initialize object by parsing a path string.
+
+        @param path: Registry key path string, or RegPath object. The first
+        segment can be a hive name or alias in any case, e.g. `HKLM`.
+
+        @return: None. Raise ValueError if the path is not valid.
+        """
+        # If the path is RegPath object
+        if isinstance(path, RegPath):
+            # Copy its segments
+            segment_s = path._segments
+
+        # If the path is root key path
+        elif path == '':
+            # Use no segments
+            segment_s = ()
+
+        # If the path is a string
+        else:
+            # Split the path into segments
+            part_s = path.split('\\')
+
+            # If the path ends with separator
+            if len(part_s) > 1 and part_s[-1] == '':
+                # Ignore the trailing separator
+                part_s.pop()
+
+            # Get hive name
+            hive_name = _hive_name_resolve(part_s[0])
+
+            # If the hive name is not valid
+            if hive_name is None:
+                # Raise error
+                raise ValueError(
+                    'Invalid registry key path: {}'.format(path)
+                )
+
+            # If any key name is empty
+            if '' in part_s:
+                # Raise error
+                raise ValueError(
+                    'Invalid registry key path: {}'.format(path)
+                )
+
+            # Get interned segments
+            segment_s = (hive_name,) + tuple(intern(x) for x in part_s[1:])
+
+        # Initialize from the segments
+        self._init(segment_s, parent=None)
+
+    def _init(self, segment_s, parent):
+        """
+        Initialize attributes from segments.
+
+        @param segment_s: Segments tuple. The first segment is hive name.
+
+        @param parent: Parent RegPath object if known, otherwise None.
+
+        @return: None.
+        """
+        # Segments tuple
+        self._segments = segment_s
+
+        # Hive integer, or None for root key path
+        self._hive_int = HIVE_NAME_TO_INT[segment_s[0]] if segment_s else None
+
+        # Path string
+        self._str = '\\'.join(segment_s)
+
+        # Casefolded comparison key
+        self._key = self._str.casefold()
+
+        # Hash value
+        self._hash = hash(self._key)
+
+        # Parent RegPath object if known
+        self._parent = parent
+
+    @classmethod
+    def of(cls, path):
+        """
+        Get RegPath object for given path. Parsed paths are cached.
+
+        @param path: Registry key path string, or RegPath object.
+
+        @return: RegPath object. Raise ValueError if the path is not valid.
+        """
+        # If the path is RegPath object
+        if isinstance(path, RegPath):
+            # Return the RegPath object
+            return path
+
+        # If the path is not RegPath object.
+
+        # Return cached parsed RegPath object
+        return _regpath_parse(path)
+
+    @classmethod
+    def root(cls):
+        """
+        Get root key path.
+
+        @return: RegPath object for root key path.
+        """
+        # Return root key path
+        return _ROOT
+
+    def __str__(self):
+        """
+        Get path string, using full hive name.
+
+        @return: Path string.
+        """
+        # Return the path string
+        return self._str
+
+    def __repr__(self):
+        """
+        Get representation string.
+
+        @return: Representation string.
+        """
+        # Return the representation string
+        return 'RegPath({!r})'.format(self._str)
+
+    def __hash__(self):
+        """
+        Get hash value of the casefolded comparison key.
+
+        @return: Hash value.
+        """
+        # Return the hash value
+        return self._hash
+
+    def __eq__(self, other):
+        """
+        Equality operator. Case-insensitive.
+
+        A path string is not equal to any RegPath object, because their hash
+        values differ. Use `RegPath.of` to compare with a path string.
+
+        @param other: RegPath object.
+
+        @return: Boolean.
+        """
+        # If the other object is not RegPath object
+        if not isinstance(other, RegPath):
+            # Let the other object decide
+            return NotImplemented
+
+        # Compare comparison keys
+        return self._hash == other._hash and self._key == other._key
+
+    def __ne__(self, other):
+        """
+        Inequality operator. Case-insensitive.
+
+        @param other: RegPath object.
+
+        @return: Boolean.
+        """
+        # Get equality result
+        result = self.__eq__(other)
+
+        # If the result is not implemented
+        if result is NotImplemented:
+            # Return the result
+            return result
+
+        # Return inverted result
+        return not result
+
+    def __len__(self):
+        """
+        Get number of segments.
+
+        @return: Number of segments.
+        """
+        # Return number of segments
+        return len(self._segments)
+
+    def key(self):
+        """
+        Get casefolded comparison key.
+
+        @return: Casefolded path string.
+        """
+        # Return the comparison key
+        return self._key
+
+    def segments(self):
+        """
+        Get segments tuple. The first segment is hive name.
+
+        @return: Segments tuple.
+        """
+        # Return the segments tuple
+        return self._segments
+
+    def hive(self):
+        """
+        Get hive name.
+
+        @return: Hive name, or None for root key path.
+        """
+        # Return the hive name
+        return self._segments[0] if self._segments else None
+
+    def hive_int(self):
+        """
+        Get hive integer.
+
+        @return: Hive integer, or None for root key path.
+        """
+        # Return the hive integer
+        return self._hive_int
+
+    def nohive_path(self):
+        """
+        Get path string without hive name.
+
+        @return: Path string without hive name, or None if the path is root
+        key path or hive key path.
+        """
+        # If the path has no segments below hive
+        if len(self._segments) <= 1:
+            # Return None
+            return None
+
+        # If the path has segments below hive.
+
+        # Return the path string after the hive name and separator
+        return self._str[len(self._segments[0]) + 1:]
+
+    def name(self):
+        """
+        Get the last segment.
+
+        @return: Last segment, or empty string for root key path.
+        """
+        # Return the last segment
+        return self._segments[-1] if self._segments else ''
+
+    def is_root(self):
+        """
+        Test whether the path is root key path.
+
+        @return: Boolean.
+        """
+        # Return whether the path has no segments
+        return not self._segments
+
+    def is_hive(self):
+        """
+        Test whether the path is a hive key path.
+
+        @return: Boolean.
+        """
+        # Return whether the path has only hive segment
+        return len(self._segments) == 1
+
+    def parent(self):
+        """
+        Get parent key path. The parent of root key path is root key path.
+
+        @return: Parent RegPath object.
+        """
+        # If the parent is known
+        if self._parent is not None:
+            # Return the parent
+            return self._parent
+
+        # If the parent is not known.
+
+        # If the path is root key path
+        if not self._segments:
+            # Return root key path
+            return self
+
+        # If the path is not root key path.
+
+        # Create parent RegPath object
+        parent = RegPath.__new__(RegPath)
+
+        # Initialize from parent segments
+        parent._init(self._segments[:-1], parent=None)
+
+        # Remember the parent
+        self._parent = parent
+
+        # Return the parent
+        return parent
+
+    def child(self, name):
+        """
+        Get child key path.
+
+        @param name: Child key name. For root key path, hive name or alias.
+
+        @return: Child RegPath object.
+        """
+        # If the path is root key path
+        if not self._segments:
+            # Get hive name
+            hive_name = _hive_name_resolve(name)
+
+            # If the hive name is not valid
+            if hive_name is None:
+                # Raise error
+                raise ValueError('Invalid hive name: {}'.format(name))
+
+            # Use hive name as segment
+            name = hive_name
+
+        # If the path is not root key path.
+
+        # If the child key name is not valid
+        elif not name or '\\' in name:
+            # Raise error
+            raise ValueError('Invalid key name: {}'.format(name))
+
+        # Create child RegPath object
+        child = RegPath.__new__(RegPath)
+
+        # Initialize from child segments
+        child._init(self._segments + (intern(name),), parent=self)
+
+        # Return the child
+        return child
+
+    def is_within(self, other):
+        """
+        Test whether the path is given path or its descendant path.
+
+        @param other: RegPath object or path string.
+
+        @return: Boolean.
+        """
+        # Get RegPath object
+        other = RegPath.of(other)
+
+        # If the other path is root key path
+        if not other._segments:
+            # Every path is within root key path
+            return True
+
+        # If the other path is not root key path.
+
+        # Test whether comparison keys match as prefix at segment boundary
+        return self._key == other._key \
+            or self._key.startswith(other._key + '\\')
+
+
+#
+@lru_cache(maxsize=4096)
+def _regpath_parse(path):
+    """
+    Parse path string into RegPath object. Cached.
+
+    @param path: Registry key path string.
+
+    @return: RegPath object. Raise ValueError if the path is not valid.
+    """
+    # Return RegPath object
+    return RegPath(path)
+
+
+#
+def path_normalize(path):
+    """
+    Normalize registry key path string, so that equal paths given in
+    different forms match as casefolded strings. Hive alias is resolved to
+    full hive name and trailing separator is dropped, e.g. `HKCU\\Software\\`
+    becomes `HKEY_CURRENT_USER\\Software`.
+
+    @param path: Registry key path string. A path not starting with a hive,
+    e.g. a key path in an offline hive file, only has trailing separator
+    dropped.
+
+    @return: Normalized path string.
+    """
+    try:
+        # Return path string with full hive name
+        return str(RegPath.of(path))
+
+    # If the path does not start with a hive
+    except ValueError:
+        # Return the path without trailing separator
+        return path.rstrip('\\')
+
+
+# Root key path
+_ROOT = RegPath('')
@@ -0,0 +1,552 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from array import array
+from collections import namedtuple
+import struct
+import sys
+
+
+# Field types, same as the `REG_*` constants in `win32con`
+REG_NONE = 0
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_DWORD_BIG_ENDIAN = 5
+REG_LINK = 6
+REG_MULTI_SZ = 7
+REG_RESOURCE_LIST = 8
+REG_FULL_RESOURCE_DESCRIPTOR = 9
+REG_RESOURCE_REQUIREMENTS_LIST = 10
+REG_QWORD = 11
+
+
+# Registry key metadata, e.g. got by `RegQueryInfoKey`.
+# - subkey_count: Number of child keys.
+# - value_count: Number of fields.
+# - max_subkey_name_len: Length of the longest child key name.
+# - max_value_name_len: Length of the longest field name.
+# - max_value_data_len: Size of the largest field data in bytes.
+# - last_write_time: Last write time as FILETIME integer, i.e. number of
+#   100-nanosecond intervals since 1601-01-01 UTC.
+RegKeyInfo = namedtuple(
+    'RegKeyInfo',
+    [
+        'subkey_count',
+        'value_count',
+        'max_subkey_name_len',
+        'max_value_name_len',
+        'max_value_data_len',
+        'last_write_time',
+    ],
+)
+
+
+#
+class RegVal(object):
+    """
+    RegVal represents a registry key's field.
+
+    RegVal uses `__slots__` instead of an attribute dict, so that keys with
+    many fields take less memory.
+    """
+
+    # Attribute slots
+    __slots__ = ('_regkey', '_name', '_type', '_data')
+
+    # Field data value meaning the field data has not been loaded
+    DATA_NOT_LOADED = object()
+
+    def __init__(self, regkey, name, type, data=DATA_NOT_LOADED):
+        """
+        Initialize object.
+
+        @param regkey: RegKey object of the registry key containing the field.
+
+        @param name: Field name.
+
+        @param type: Field type.
+
+        @param data: Field data. Default is `DATA_NOT_LOADED`, meaning the
+        field data is read from registry when `data` is first called.
+
+        @return: None.
+        """
+        # RegKey object
+        self._regkey = regkey
+
+        # Field name
+        self._name = name
+
+        # Field type
+        self._type = type
+
+        # Field data
+        self._data = data
+
+    def __str__(self):
+        """
+        Get string of the object.
+
+        @return: String of the object.
+        """
+        # Return the field name
+        return self._name
+
+    def name(self):
+        """
+        Get field name.
+
+        @return: Field name
+        """
+        # Return the field name
+        return self._name
+
+    def name_set(self, name):
+        """
+        Set field name.
+
+        @param name: Field name to set.
+
+        @return: None.
+        """
+        # Set the field name
+        self._name = name
+
+    def type(self):
+        """
+        Get field type.
+
+        @return: Field type
+        """
+        # Return the field type
+        return self._type
+
+    def type_set(self, type):
+        """
+        Set field type.
+
+        @param type: Field type to set.
+
+        @return: None.
+        """
+        # Set the field type
+        self._type = type
+
+    def data(self):
+        """
+        Get field data. Read from registry only if the field data has not been
+        loaded. Call `refresh` to read again.
+
+        @return: Field data, or None if have error.
+        """
+        # If the field data has not been loaded
+        if self._data is self.DATA_NOT_LOADED:
+            # Read field data from registry
+            self.refresh()
+
+        # Return the field data
+        return self._data
+
+    def data_is_loaded(self):
+        """
+        Test whether the field data has been loaded.
+
+        @return: Boolean.
+        """
+        # Return whether the field data has been loaded
+        return self._data is not self.DATA_NOT_LOADED
+
+    def refresh(self):
+        """
+        Read field data and type from registry again.
+
+        @return: Field data, or None if have error.
+        """
+        # Read field data and type tuple from registry
+        data_type_tuple = self._regkey._field_data_type_tuple(self._name)
+
+        # If have error
+        if data_type_tuple is None:
+            # Set field data to None.
+            # Notice it is not `DATA_NOT_LOADED` so the error is not retried
+            # until next refresh.
+            self._data = None
+
+        # If have no error
+        else:
+            # Store the field data and type
+            self._data, self._type = data_type_tuple
+
+        # Return the field data
+        return self._data
+
+    def data_set(self, data):
+        """
+        Set field data.
+
+        @param data: Field data to set.
+
+        @return: None
+        """
+        # Write field data to registry
+        success = self._regkey.field_write(
+            name=self._name,
+            type=self._type,
+            data=data,
+        )
+
+        # If have no success
+        if not success:
+            # Raise error
+            raise ValueError(data)
+
+        # If have success.
+
+        # Update the loaded field data
+        self._data = data
+
+    def delete(self):
+        """
+        Delete the field.
+
+        @return: Whether the operation is successful.
+        """
+        # Delete the field.
+        # Return whether the operation is successful.
+        return self._regkey.field_delete(self._name)
+
+
+#
+class FieldTable(object):
+    """
+    FieldTable stores a registry key's fields in columns instead of as a list
+    of RegVal objects:
+    - Names column: A list of field names, interned by the builder.
+    - Types column: An `array('I')` of field types.
+    - Data column: A list of field data, or None if data is not loaded.
+
+    RegVal objects are created on demand when items are accessed, so a table
+    of many fields takes a fraction of the memory of a RegVal list.
+
+    Notice a FieldTable is not changed after it is built, so that tables
+    created by `rebind` can share columns.
+    """
+
+    # Attribute slots
+    __slots__ = ('_regkey', '_names', '_types', '_datas')
+
+    def __init__(self, regkey, names, types, datas=None):
+        """
+        Initialize object.
+
+        @param regkey: RegKey object of the registry key containing the
+        fields.
+
+        @param names: Names column. A list of field names. Builders should
+        intern the names via `sys.intern`.
+
+        @param types: Types column. An `array('I')` of field types.
+
+        @param datas: Data column. A list of field data, or None if data is
+        not loaded.
+
+        @return: None.
+        """
+        # If the columns have different lengths
+        if len(types) != len(names) \
+                or (datas is not None and len(datas) != len(names)):
+            # Raise error
+            raise ValueError('Columns have different lengths.')
+
+        # If the columns have same length.
+
+        # RegKey object
+        self._regkey = regkey
+
+        # Names column
+        self._names = names
+
+        # Types column
+        self._types = types
+
+        # Data column, or None if data is not loaded
+        self._datas = datas
+
+    def rebind(self, regkey):
+        """
+        Create a table sharing the columns but bound to another RegKey object.
+
+        @param regkey: RegKey object.
+
+        @return: FieldTable object.
+        """
+        # Return table sharing the columns
+        return FieldTable(
+            regkey=regkey,
+            names=self._names,
+            types=self._types,
+            datas=self._datas,
+        )
+
+    def sorted_by_name(self):
+        """
+        Create a table with the fields sorted by lowercase field name.
+
+        @return: FieldTable object.
+        """
+        # Get field indexes sorted by lowercase field name
+        index_s = sorted(
+            range(len(self._names)),
+            key=lambda index: self._names[index].lower(),
+        )
+
+        # Return table with the columns reordered
+        return FieldTable(
+            regkey=self._regkey,
+            names=[self._names[index] for index in index_s],
+            types=array('I', (self._types[index] for index in index_s)),
+            datas=[self._datas[index] for index in index_s]
+            if self._datas is not None else None,
+        )
+
+    def __len__(self):
+        """
+        Get number of fields.
+
+        @return: Number of fields.
+        """
+        # Return number of fields
+        return len(self._names)
+
+    def __getitem__(self, index):
+        """
+        Get RegVal object for given index.
+
+        @param index: Field index.
+
+        @return: RegVal object created on demand.
+        """
+        # Return RegVal object
+        return RegVal(
+            regkey=self._regkey,
+            name=self._names[index],
+            type=self._types[index],
+            data=self._datas[index]
+            if self._datas is not None else RegVal.DATA_NOT_LOADED,
+        )
+
+    def __iter__(self):
+        """
+        Iterate RegVal objects created on demand.
+
+        @return: Generator of RegVal objects.
+        """
+        # For each field index
+        for index in range(len(self._names)):
+            # Yield RegVal object
+            yield self[index]
+
+    def has_data(self):
+        """
+        Test whether the table has data column.
+
+        @return: Boolean.
+        """
+        # Return whether the table has data column
+        return self._datas is not None
+
+    def names(self):
+        """
+        Get names column.
+        Notice do not change the list outside.
+
+        @return: Names column.
+        """
+        # Return names column
+        return self._names
+
+    def types(self):
+        """
+        Get types column.
+        Notice do not change the array outside.
+
+        @return: Types column.
+        """
+        # Return types column
+        return self._types
+
+    def datas(self):
+        """
+        Get data column.
+        Notice do not change the list outside.
+
+        @return: Data column, or None if data is not loaded.
+        """
+        # Return data column
+        return self._datas
+
+    def to_list(self):
+        """
+        Create list of RegVal objects.
+
+        @return: List of RegVal objects.
+        """
+        # Return list of RegVal objects
+        return list(self)
+
+    def size_estimate(self):
+        """
+        Estimate size of the table in bytes, excluding the RegKey object.
+
+        @return: Estimated size in bytes.
+        """
+        # Size of the table object and its columns
+        size = sys.getsizeof(self) \
+            + sys.getsizeof(self._names) \
+            + sys.getsizeof(self._types)
+
+        # For each field name
+        for name in self._names:
+            # Add the field name's size.
+            # Interned names shared with other tables are counted too.
+            size += sys.getsizeof(name)
+
+        # If the table has data column
+        if self._datas is not None:
+            # Add the data column's size
+            size += sys.getsizeof(self._datas)
+
+            # For each field data
+            for data in self._datas:
+                # Add the field data's size
+                size += sys.getsizeof(data)
+
+        # Return the estimated size
+        return size
+
+
+#
+def data_decode(type, raw):
+    """
+    Decode raw field data bytes into the Python value pywin32's
+    `RegQueryValueEx` returns for the field type.
+
+    @param type: Field type.
+
+    @param raw: Raw field data, a bytes-like object.
+
+    @return: Field data. A string for `REG_SZ` and `REG_EXPAND_SZ`, a list of
+    strings for `REG_MULTI_SZ`, an integer for `REG_DWORD`,
+    `REG_DWORD_BIG_ENDIAN` and `REG_QWORD`, otherwise bytes.
+    """
+    # If the type is string type
+    if type == REG_SZ or type == REG_EXPAND_SZ:
+        # Decode as UTF-16LE, dropping an odd trailing byte.
+        # Stop at the first null character.
+        return bytes(raw[:len(raw) & ~1]).decode(
+            'utf-16-le', 'replace'
+        ).partition('\0')[0]
+
+    # If the type is multi-string type
+    if type == REG_MULTI_SZ:
+        # Decode as UTF-16LE, dropping an odd trailing byte
+        text = bytes(raw[:len(raw) & ~1]).decode('utf-16-le', 'replace')
+
+        # Strings list
+        string_s = []
+
+        # For each null-terminated string
+        for string in text.split('\0'):
+            # If the string is empty,
+            # it means the end of the list.
+            if not string:
+                # Stop the loop
+                break
+
+            # Add the string to the list
+            string_s.append(string)
+
+        # Return the strings list
+        return string_s
+
+    # If the type is 32-bit integer type
+    if type == REG_DWORD or type == REG_DWORD_BIG_ENDIAN:
+        # Pad short data to 4 bytes
+        raw = bytes(raw[:4]).ljust(4, b'\0')
+
+        # Return the integer
+        return struct.unpack('<I' if type == REG_DWORD else '>I', raw)[0]
+
+    # If the type is 64-bit integer type
+    if type == REG_QWORD:
+        # Return the integer, padding short data to 8 bytes
+        return struct.unpack('<Q', bytes(raw[:8]).ljust(8, b'\0'))[0]
+
+    # If the type is other type.
+
+    # Return the bytes
+    return bytes(raw)
+
+
+#
+def data_encode(type, data):
+    """
+    Encode field data, as pywin32's `RegQueryValueEx` returns for the field
+    type, into raw field data bytes. Inverse of `data_decode`.
+
+    @param type: Field type.
+
+    @param data: Field data. Bytes-like data are returned as bytes for any
+    type.
+
+    @return: Raw field data bytes.
+    """
+    # If have no data
+    if data is None:
+        # Return empty bytes
+        return b''
+
+    # If the type is string type
+    if type == REG_SZ or type == REG_EXPAND_SZ:
+        # Encode as UTF-16LE with null terminator
+        return (str(data) + '\0').encode('utf-16-le')
+
+    # If the type is multi-string type
+    if type == REG_MULTI_SZ:
+        # Encode each string with null terminator, followed by an empty
+        # string's null terminator.
+        return (
+            ''.join(string + '\0' for string in data) + '\0'
+        ).encode('utf-16-le')
+
+    # If the data is bytes-like,
+    # e.g. pywin32 returns bytes for `REG_DWORD_BIG_ENDIAN`.
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        # Return the bytes
+        return bytes(data)
+
+    # If the type is 32-bit integer type
+    if type == REG_DWORD or type == REG_DWORD_BIG_ENDIAN:
+        # Return the integer's bytes
+        return struct.pack(
+            '<I' if type == REG_DWORD else '>I', data & 0xFFFFFFFF
+        )
+
+    # If the type is 64-bit integer type
+    if type == REG_QWORD:
+        # Return the integer's bytes
+        return struct.pack('<Q', data & 0xFFFFFFFFFFFFFFFF)
+
+    # If the data is string,
+    # e.g. pywin32 returns string for `REG_LINK`.
+    if isinstance(data, str):
+        # Encode as UTF-16LE
+        return data.encode('utf-16-le')
+
+    # If the type is other type.
+
+    # Return the bytes
+    return bytes(data)
@@ -0,0 +1,1017 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from collections import namedtuple
+import os
+from queue import Empty
+from queue import Queue
+import re
+import threading
+
+from .registry_walker import WalkCancelToken
+from .registry_walker import walk as _walk
+from .regpath import path_normalize
+from .regval import REG_EXPAND_SZ
+from .regval import REG_MULTI_SZ
+from .regval import REG_SZ
+from .regval import data_decode
+from .regval import data_encode
+
+try:
+    # Regex parser modules, renamed in Python 3.11
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_constants
+    import sre_parse
+
+
+# Hit kind: key name matches
+HIT_KEY = 'key'
+
+# Hit kind: field name matches
+HIT_NAME = 'name'
+
+# Hit kind: field data matches
+HIT_DATA = 'data'
+
+# Search hit.
+# `kind` is one of HIT_KEY, HIT_NAME, and HIT_DATA.
+# `path` is the registry key path.
+# `name` and `type` are the field's name and type, or None for HIT_KEY.
+SearchHit = namedtuple('SearchHit', ['kind', 'path', 'name', 'type'])
+
+# Field types whose data are matched as strings
+_STRING_TYPES = frozenset([REG_SZ, REG_EXPAND_SZ, REG_MULTI_SZ])
+
+# Max number of required literals used by a regex prefilter, longest first
+_REGEX_LITERAL_COUNT_MAX = 3
+
+# Characters that case-insensitive regexes match to non-ASCII characters
+# which `str.lower` does not map to them, e.g. `s` to long s `\u017f`.
+# Case-insensitive prefilter literals exclude them.
+_REGEX_CASE_SPECIAL_CHARS = frozenset('iksIKS')
+
+
+#
+def matcher_create(text, case_sensitive=False):
+    """
+    Create matcher function that tests whether a string contains given text.
+
+    @param text: Text to find.
+
+    @param case_sensitive: Whether match case.
+
+    @return: Matcher function taking a string and returning a boolean.
+    """
+    # If match case
+    if case_sensitive:
+        # Return matcher function
+        return lambda string: text in string
+
+    # If not match case.
+
+    # Get casefolded text
+    text = text.casefold()
+
+    # Return matcher function
+    return lambda string: text in string.casefold()
+
+
+#
+def _regex_literals(item_s, ignore_case):
+    """
+    Get literals that any match of a parsed regex sequence must contain.
+
+    @param item_s: Parsed regex sequence, a list of `(op, arg)` items.
+
+    @param ignore_case: Whether the regex ignores case. If True, literals
+    contain only ASCII characters that `str.lower` handles like the regex
+    engine, lowercased.
+
+    @return: Literals list.
+    """
+    # Literals list
+    literal_s = []
+
+    # Current run of consecutive literal characters
+    run_s = []
+
+    # For each item
+    for op, arg in item_s:
+        # If the item is a literal character
+        if op == sre_constants.LITERAL:
+            # Get the character
+            char = chr(arg)
+
+            # If not ignore case
+            if not ignore_case:
+                # Add the character to the run
+                run_s.append(char)
+
+                # Continue with the next item
+                continue
+
+            # If ignore case.
+
+            # If the character is ASCII and lowercasing handles it like the
+            # regex engine
+            if char < '\x80' and char not in _REGEX_CASE_SPECIAL_CHARS:
+                # Add the lowercased character to the run
+                run_s.append(char.lower())
+
+                # Continue with the next item
+                continue
+
+            # If the character is not usable, it ends the run.
+
+        # If the item is a group
+        elif op == sre_constants.SUBPATTERN:
+            # Get the group's flags and sequence.
+            # The argument is `(group, add_flags, del_flags, sequence)`, or
+            # `(group, sequence)` before Python 3.6.
+            flag_s = arg[1:-1]
+
+            # If the group does not change flags
+            if not any(flag_s):
+                # Add the group's literals
+                literal_s.extend(_regex_literals(arg[-1], ignore_case))
+
+        # If the item is a repeat
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            # Get min count and sequence
+            min_count, _, repeat_item_s = arg
+
+            # If the sequence occurs at least once
+            if min_count >= 1:
+                # Add the sequence's literals
+                literal_s.extend(_regex_literals(repeat_item_s, ignore_case))
+
+        # Other items, e.g. character sets, branches, and assertions, end the
+        # run and have no required literals.
+
+        # If have run
+        if run_s:
+            # Add the run as a literal
+            literal_s.append(''.join(run_s))
+
+            # Start a new run
+            run_s = []
+
+    # If have run
+    if run_s:
+        # Add the run as a literal
+        literal_s.append(''.join(run_s))
+
+    # Return literals list
+    return literal_s
+
+
+#
+class RegexMatcher(object):
+    """
+    RegexMatcher matches a regex against strings, and optionally against raw
+    bytes of non-string fields.
+
+    Literals that every match must contain are pulled out of the pattern, and
+    a value is given to the regex engine only if it contains them, which
+    rejects most values with a fast substring test.
+
+    Raw field matching (see `raw_match`) tests the literals against string
+    fields' UTF-16LE bytes before decoding, decodes only string types, and
+    matches other types as raw bytes only if binary matching is on.
+    """
+
+    def __init__(self, pattern, case_sensitive=True, binary=False):
+        """
+        Initialize object.
+
+        @param pattern: Regex pattern string.
+
+        @param case_sensitive: Whether match case.
+
+        @param binary: Whether match raw bytes of non-string fields. The
+        pattern is then also compiled as a bytes pattern, with characters
+        mapped to bytes via Latin-1, e.g. `\\x00` matches a null byte.
+
+        @return: None. Raise `re.error` if the pattern is not valid, or
+        ValueError if binary matching is on and the pattern has characters
+        outside Latin-1.
+        """
+        # Get regex flags
+        flags = 0 if case_sensitive else re.IGNORECASE
+
+        # Compile string regex.
+        # May raise `re.error`.
+        self._regex = re.compile(pattern, flags)
+
+        # Get whether the regex ignores case, including inline flags
+        self._ignore_case = bool(self._regex.flags & re.IGNORECASE)
+
+        # Get required literals, longest first
+        self._literal_s = sorted(
+            set(_regex_literals(
+                sre_parse.parse(pattern, flags), self._ignore_case
+            )),
+            key=len,
+            reverse=True,
+        )[:_REGEX_LITERAL_COUNT_MAX]
+
+        # Get required literals as UTF-16LE bytes, to prefilter string
+        # fields' raw data before decoding. If ignore case, only literals
+        # without cased characters can be found in raw data as is.
+        self._raw_literal_s = [
+            x.encode('utf-16-le', 'surrogatepass') for x in self._literal_s
+            if not self._ignore_case or x.upper() == x
+        ]
+
+        # If binary matching is on
+        if binary:
+            try:
+                # Compile bytes regex
+                self._bytes_regex = re.compile(
+                    pattern.encode('latin-1'), flags
+                )
+
+                # Get required literals as bytes
+                self._bytes_literal_s = [
+                    x.encode('latin-1') for x in self._literal_s
+                ]
+
+            # If the pattern has characters outside Latin-1
+            except UnicodeEncodeError:
+                # Raise error
+                raise ValueError(
+                    'Pattern has characters outside Latin-1: `{}`.'.format(
+                        pattern
+                    )
+                )
+
+        # If binary matching is off
+        else:
+            # Set bytes regex to None
+            self._bytes_regex = None
+
+            self._bytes_literal_s = []
+
+    def literals(self):
+        """
+        Get required literals used by the prefilter, longest first.
+        Lowercased if the regex ignores case.
+
+        @return: Literals list.
+        """
+        # Return literals list
+        return list(self._literal_s)
+
+    def binary(self):
+        """
+        Test whether binary matching is on.
+
+        @return: Boolean.
+        """
+        # Return whether have bytes regex
+        return self._bytes_regex is not None
+
+    def match(self, string):
+        """
+        Test whether the regex matches anywhere in a string.
+
+        @param string: String.
+
+        @return: Boolean.
+        """
+        # If have required literals
+        if self._literal_s:
+            # Get prefilter text, lowercased if ignore case
+            text = string.lower() if self._ignore_case else string
+
+            # For each required literal
+            for literal in self._literal_s:
+                # If the text does not contain the literal
+                if literal not in text:
+                    # Return not matched without running the regex
+                    return False
+
+        # Return whether the regex matches
+        return self._regex.search(string) is not None
+
+    def bytes_match(self, raw):
+        """
+        Test whether the bytes regex matches anywhere in raw bytes.
+
+        @param raw: Raw bytes.
+
+        @return: Boolean. False if binary matching is off.
+        """
+        # If binary matching is off
+        if self._bytes_regex is None:
+            # Return not matched
+            return False
+
+        # If binary matching is on.
+
+        # If have required literals
+        if self._bytes_literal_s:
+            # Get prefilter bytes, lowercased if ignore case
+            text = raw.lower() if self._ignore_case else raw
+
+            # For each required literal
+            for literal in self._bytes_literal_s:
+                # If the bytes do not contain the literal
+                if literal not in text:
+                    # Return not matched without running the regex
+                    return False
+
+        # Return whether the bytes regex matches
+        return self._bytes_regex.search(raw) is not None
+
+    def raw_match(self, type, raw):
+        """
+        Test whether the regex matches a field's raw data. Decode the data
+        only if it is string type and its raw bytes contain the required
+        literals. Match other types as raw bytes if binary matching is on.
+
+        @param type: Field type.
+
+        @param raw: Raw field data, a bytes-like object.
+
+        @return: Boolean.
+        """
+        # If the field type is string type
+        if type in _STRING_TYPES:
+            # If have required literals as UTF-16LE bytes
+            if self._raw_literal_s:
+                # Get raw bytes
+                raw = bytes(raw)
+
+                # For each required literal
+                for literal in self._raw_literal_s:
+                    # If the raw bytes do not contain the literal
+                    if literal not in raw:
+                        # Return not matched without decoding
+                        return False
+
+            # Decode the data
+            data = data_decode(type, raw)
+
+            # If the field data is multi-string
+            if type == REG_MULTI_SZ:
+                # Return whether any string matches
+                return any(self.match(x) for x in data)
+
+            # If the field data is string.
+
+            # Return whether the string matches
+            return self.match(data)
+
+        # If the field type is not string type.
+
+        # Return whether the raw bytes match, if binary matching is on
+        return self._bytes_regex is not None \
+            and self.bytes_match(bytes(raw))
+
+
+#
+def matchers_create(text, case_sensitive=False, regex=False, binary=False):
+    """
+    Create matcher functions for a query.
+
+    @param text: Text to find, or regex pattern if `regex` is on.
+
+    @param case_sensitive: Whether match case.
+
+    @param regex: Whether the text is a regex pattern, see `RegexMatcher`.
+
+    @param binary: Whether match raw bytes of non-string fields. Requires
+    `regex` on.
+
+    @return: A tuple: (match, bytes_match). `match` takes a string and
+    returns a boolean. `bytes_match` takes raw bytes and returns a boolean,
+    or is None if binary matching is off. Raise ValueError if the query is
+    not valid.
+    """
+    # If the text is not regex pattern
+    if not regex:
+        # If binary matching is on
+        if binary:
+            # Raise error
+            raise ValueError('Binary matching requires regex mode.')
+
+        # Return substring matcher function
+        return matcher_create(text, case_sensitive=case_sensitive), None
+
+    # If the text is regex pattern.
+
+    try:
+        # Create regex matcher
+        matcher = RegexMatcher(
+            text, case_sensitive=case_sensitive, binary=binary
+        )
+
+    # If the pattern is not valid
+    except re.error as exc:
+        # Raise error
+        raise ValueError('Invalid pattern: {}'.format(exc))
+
+    # Return matcher functions
+    return matcher.match, matcher.bytes_match if binary else None
+
+
+#
+def key_search(
+    path,
+    field_s,
+    match,
+    match_keys=True,
+    match_names=True,
+    match_data=True,
+    bytes_match=None,
+):
+    """
+    Find hits in a key.
+
+    @param path: Registry key path.
+
+    @param field_s: FieldTable with data loaded, or None if not match field
+    names and data.
+
+    @param match: Matcher function, see `matchers_create`.
+
+    @param match_keys: Whether match the key name.
+
+    @param match_names: Whether match field names.
+
+    @param match_data: Whether match string data of fields.
+
+    @param bytes_match: Bytes matcher function for data of non-string fields,
+    see `matchers_create`. None means not match them.
+
+    @return: Hits list.
+    """
+    # Hits list
+    hit_s = []
+
+    # If match the key name, and the key name matches
+    if match_keys and match(path.rpartition('\\')[2]):
+        # Add key hit
+        hit_s.append(SearchHit(HIT_KEY, path, None, None))
+
+    # If have no fields
+    if field_s is None:
+        # Return hits list
+        return hit_s
+
+    # If have fields.
+
+    # Get data column
+    data_s = field_s.datas() if match_data else None
+
+    # For each field's name and type
+    for index, (name, type) in enumerate(
+        zip(field_s.names(), field_s.types())
+    ):
+        # If match field names, and the field name matches
+        if match_names and match(name):
+            # Add field name hit
+            hit_s.append(SearchHit(HIT_NAME, path, name, type))
+
+            # Skip matching the data so that a field has one hit at most
+            continue
+
+        # If not match data
+        if data_s is None:
+            # Skip the data
+            continue
+
+        # Get field data
+        data = data_s[index]
+
+        # If the field type is not string type
+        if type not in _STRING_TYPES:
+            # If match bytes, and the data's bytes match
+            if bytes_match is not None and bytes_match(
+                data if isinstance(data, bytes) else data_encode(type, data)
+            ):
+                # Add field data hit
+                hit_s.append(SearchHit(HIT_DATA, path, name, type))
+
+            # Continue with the next field
+            continue
+
+        # If the field type is string type.
+
+        # If the field data is multi-string
+        if isinstance(data, list):
+            # Get whether any string matches
+            data_matched = any(match(x) for x in data)
+
+        # If the field data is string
+        elif isinstance(data, str):
+            # Get whether the string matches
+            data_matched = match(data)
+
+        # If the field data is something else, e.g. undecodable bytes
+        else:
+            # Set not matched
+            data_matched = False
+
+        # If the data matches
+        if data_matched:
+            # Add field data hit
+            hit_s.append(SearchHit(HIT_DATA, path, name, type))
+
+    # Return hits list
+    return hit_s
+
+
+#
+class RegSearch(object):
+    """
+    RegSearch searches registry subtrees in background threads.
+
+    Each subtree is walked in its own thread, listing keys on its own thread
+    pool (see `registry_walker.walk`), so that searching several hives does
+    not serialize on one of them. Hits are queued in per-key batches and
+    taken by the consumer via `hits_take`, e.g. periodically in the GUI
+    thread, so that the consumer is never blocked by the walk.
+    """
+
+    def __init__(
+        self,
+        path_s,
+        text,
+        regkey_get,
+        match_keys=True,
+        match_names=True,
+        match_data=True,
+        case_sensitive=False,
+        workers=None,
+        max_hits=None,
+        on_error=None,
+        regex=False,
+        binary=False,
+    ):
+        """
+        Initialize object.
+
+        @param path_s: Registry key paths of the subtrees' top keys.
+
+        @param text: Text to find, or regex pattern if `regex` is on.
+
+        @param regkey_get: RegKey getter function. It takes a registry key
+        path and returns a RegKey-compatible object, or None if failed.
+
+        @param match_keys: Whether match key names.
+
+        @param match_names: Whether match field names.
+
+        @param match_data: Whether match string data of fields.
+
+        @param case_sensitive: Whether match case.
+
+        @param workers: Total number of listing worker threads, divided among
+        the subtrees. Default is number of CPUs.
+
+        @param max_hits: Stop the search after this number of hits. None
+        means no limit.
+
+        @param on_error: Error callback taking arguments `(path, exc)`.
+        Called in a search thread for each key that failed listing.
+
+        @param regex: Whether the text is a regex pattern, see
+        `RegexMatcher`.
+
+        @param binary: Whether match raw bytes of non-string fields with the
+        regex pattern. Requires `regex` on.
+
+        @return: None. Raise ValueError if the query is not valid.
+        """
+        # Registry key paths of the subtrees' top keys
+        self._path_s = list(path_s)
+
+        # RegKey getter function
+        self._regkey_get = regkey_get
+
+        # Matcher functions.
+        # May raise ValueError.
+        self._match, self._bytes_match = matchers_create(
+            text,
+            case_sensitive=case_sensitive,
+            regex=regex,
+            binary=binary,
+        )
+
+        # Whether match key names
+        self._match_keys = match_keys
+
+        # Whether match field names
+        self._match_names = match_names
+
+        # Whether match string data of fields
+        self._match_data = match_data
+
+        # If number of workers is not given
+        if workers is None:
+            # Use number of CPUs
+            workers = os.cpu_count() or 1
+
+        # Number of listing worker threads per subtree
+        self._walk_workers = max(1, workers // max(1, len(self._path_s)))
+
+        # Max number of hits, or None
+        self._max_hits = max_hits
+
+        # Error callback
+        self._on_error = on_error
+
+        # Cancel token shared by the walks
+        self._cancel_token = WalkCancelToken()
+
+        # Queue of hit batches.
+        # Each item is a hits list.
+        self._hit_queue = Queue()
+
+        # Hits taken from the queue but not returned yet, due to limit
+        self._hit_rest_s = []
+
+        # Lock that guards the counters
+        self._lock = threading.Lock()
+
+        # Number of keys searched
+        self._key_count = 0
+
+        # Number of hits found
+        self._hit_count = 0
+
+        # Search threads
+        self._thread_s = []
+
+    def start(self):
+        """
+        Start the search threads.
+
+        @return: None.
+        """
+        # If the search threads are started
+        if self._thread_s:
+            # Raise error
+            raise ValueError('Search is started.')
+
+        # If the search threads are not started.
+
+        # For each subtree's top key path
+        for path in self._path_s:
+            # Create search thread
+            thread = threading.Thread(
+                target=self._run,
+                args=(path,),
+                name='RegSearch `{}`'.format(path),
+            )
+
+            # Do not keep the process alive for the search thread
+            thread.daemon = True
+
+            # Store the search thread
+            self._thread_s.append(thread)
+
+            # Start the search thread
+            thread.start()
+
+    def _run(self, path):
+        """
+        Search a subtree. Run in a search thread.
+
+        @param path: Registry key path of the subtree's top key.
+
+        @return: None.
+        """
+        # Whether need fields
+        include_values = self._match_names or self._match_data
+
+        # For each key in the subtree
+        for key_path, _, field_s in _walk(
+            path,
+            regkey_get=self._regkey_get,
+            workers=self._walk_workers,
+            include_values=include_values,
+            cancel_token=self._cancel_token,
+            on_error=self._on_error,
+        ):
+            # Find hits in the key
+            hit_s = key_search(
+                key_path,
+                field_s,
+                self._match,
+                match_keys=self._match_keys,
+                match_names=self._match_names,
+                match_data=self._match_data,
+                bytes_match=self._bytes_match,
+            )
+
+            with self._lock:
+                # Increment number of keys searched
+                self._key_count += 1
+
+                # If have no hits
+                if not hit_s:
+                    # Continue with the next key
+                    continue
+
+                # If have hits.
+
+                # If have max hits
+                if self._max_hits is not None:
+                    # Drop hits exceeding max hits
+                    del hit_s[max(0, self._max_hits - self._hit_count):]
+
+                # Increment number of hits
+                self._hit_count += len(hit_s)
+
+                # Get whether max hits is reached
+                max_hits_reached = self._max_hits is not None \
+                    and self._hit_count >= self._max_hits
+
+            # If have hits left
+            if hit_s:
+                # Queue the hits batch
+                self._hit_queue.put(hit_s)
+
+            # If max hits is reached
+            if max_hits_reached:
+                # Stop all the walks
+                self._cancel_token.cancel()
+
+    def cancel(self):
+        """
+        Cancel the search. Each walk stops after its current key. Running
+        key listings are completed in the background.
+
+        @return: None.
+        """
+        # Cancel the walks
+        self._cancel_token.cancel()
+
+    def cancelled(self):
+        """
+        Test whether the search is cancelled, or stopped due to max hits.
+
+        @return: Boolean.
+        """
+        # Return whether the walks are cancelled
+        return self._cancel_token.cancelled()
+
+    def done(self):
+        """
+        Test whether all search threads are done.
+        Notice queued hits may still be available via `hits_take`.
+
+        @return: Boolean.
+        """
+        # Return whether all search threads are done
+        return not any(x.is_alive() for x in self._thread_s)
+
+    def key_count(self):
+        """
+        Get number of keys searched.
+
+        @return: Number of keys searched.
+        """
+        # Return number of keys searched
+        return self._key_count
+
+    def hit_count(self):
+        """
+        Get number of hits found, including hits not taken yet.
+
+        @return: Number of hits found.
+        """
+        # Return number of hits found
+        return self._hit_count
+
+    def hits_take(self, limit=None, timeout=None):
+        """
+        Take queued hits, in the order they are found.
+
+        @param limit: Max number of hits to take. None means no limit.
+
+        @param timeout: Seconds to wait for the first hits batch if no hits
+        are queued. None means do not wait.
+
+        @return: Hits list. Empty if no hits are queued.
+        """
+        # Hits list, starting with hits left by the previous call
+        hit_s = self._hit_rest_s
+
+        self._hit_rest_s = []
+
+        # If have no hits left, and wait for the first batch
+        if not hit_s and timeout is not None:
+            try:
+                # Wait for the first hits batch
+                hit_s.extend(self._hit_queue.get(timeout=timeout))
+
+            # If have no hits batch in time
+            except Empty:
+                # Return empty list
+                return hit_s
+
+        # While limit is not reached
+        while limit is None or len(hit_s) < limit:
+            try:
+                # Get a queued hits batch
+                hit_s.extend(self._hit_queue.get_nowait())
+
+            # If have no queued hits batch
+            except Empty:
+                # Stop taking
+                break
+
+        # If limit is exceeded
+        if limit is not None and len(hit_s) > limit:
+            # Keep the exceeding hits for the next call
+            self._hit_rest_s = hit_s[limit:]
+
+            del hit_s[limit:]
+
+        # Return hits list
+        return hit_s
+
+    def join(self, timeout=None):
+        """
+        Wait until all search threads are done.
+
+        @param timeout: Seconds to wait for each thread. None means no limit.
+
+        @return: None.
+        """
+        # For each search thread
+        for thread in self._thread_s:
+            # Wait until the search thread is done
+            thread.join(timeout)
+
+
+#
+def search(path_s, text, regkey_get, **kwargs):
+    """
+    Search registry subtrees, yielding hits as they are found.
+    See `RegSearch`.
+
+    @param path_s: Registry key paths of the subtrees' top keys.
+
+    @param text: Text to find, or regex pattern if `regex` is on.
+
+    @param regkey_get: RegKey getter function.
+
+    @param kwargs: Other arguments for `RegSearch`.
+
+    @return: Generator of SearchHit objects. Closing the generator cancels
+    the search.
+    """
+    # Create search
+    reg_search = RegSearch(path_s, text, regkey_get, **kwargs)
+
+    # Start the search threads
+    reg_search.start()
+
+    try:
+        # Loop
+        while True:
+            # Get whether the search threads are done before taking hits, so
+            # that hits queued before they are done are not missed
+            done = reg_search.done()
+
+            # Take queued hits, waiting a while for the first batch
+            hit_s = reg_search.hits_take(timeout=0.1)
+
+            # For each hit
+            for hit in hit_s:
+                # Yield the hit
+                yield hit
+
+            # If the search threads are done, and have no hits left
+            if done and not hit_s:
+                # Stop
+                break
+
+    finally:
+        # Cancel the search if not done
+        reg_search.cancel()
+
+
+#
+def snapshot_search(
+    snapshot,
+    text,
+    path=None,
+    match_keys=True,
+    match_names=True,
+    match_data=True,
+    case_sensitive=False,
+    regex=False,
+    binary=False,
+):
+    """
+    Search a snapshot's raw key records in one sequential pass. Only data of
+    string fields are decoded, and data of other fields only if binary
+    matching is on, and then as raw bytes.
+
+    @param snapshot: SnapshotFile object.
+
+    @param text: Text to find, or regex pattern if `regex` is on.
+
+    @param path: Registry key path of the subtree to search in. Default is
+    the snapshot's root key path.
+
+    @param match_keys: Whether match key names.
+
+    @param match_names: Whether match field names.
+
+    @param match_data: Whether match string data of fields.
+
+    @param case_sensitive: Whether match case.
+
+    @param regex: Whether the text is a regex pattern, see `RegexMatcher`.
+
+    @param binary: Whether match raw bytes of non-string fields with the
+    regex pattern. Requires `regex` on.
+
+    @return: Generator of SearchHit objects. Raise ValueError if the query is
+    not valid.
+    """
+    # If the text is regex pattern
+    if regex:
+        try:
+            # Create regex matcher.
+            # May raise ValueError.
+            matcher = RegexMatcher(
+                text, case_sensitive=case_sensitive, binary=binary
+            )
+
+        # If the pattern is not valid
+        except re.error as exc:
+            # Raise error
+            raise ValueError('Invalid pattern: {}'.format(exc))
+
+        # Get string matcher function
+        match = matcher.match
+
+        # Get raw field data matcher function
+        raw_match = matcher.raw_match
+
+    # If the text is not regex pattern
+    else:
+        # Create string matcher function.
+        # May raise ValueError.
+        match, _ = matchers_create(
+            text, case_sensitive=case_sensitive, binary=binary
+        )
+
+        # Create raw field data matcher function
+        def raw_match(type, raw):
+            # If the field type is not string type
+            if type not in _STRING_TYPES:
+                # Return not matched
+                return False
+
+            # Decode the data
+            data = data_decode(type, raw)
+
+            # Return whether any string matches
+            return any(match(x) for x in data) if type == REG_MULTI_SZ \
+                else match(data)
+
+    # Get casefolded subtree path, or None for the whole snapshot.
+    # Hive alias is resolved to match the snapshot's key paths.
+    path_key = path_normalize(path).casefold() if path is not None else None
+
+    # For each key record
+    for key_path, _, _, raw_field_s in snapshot.iter_records():
+        # If the key is not in the subtree
+        if path_key is not None:
+            # Get casefolded key path
+            key_path_key = key_path.casefold()
+
+            # If the key is not the subtree's top key or a descendant
+            if key_path_key != path_key \
+                    and not key_path_key.startswith(path_key + '\\'):
+                # Skip the key
+                continue
+
+        # If match the key name, and the key name matches
+        if match_keys and match(key_path.rpartition('\\')[2]):
+            # Yield key hit
+            yield SearchHit(HIT_KEY, key_path, None, None)
+
+        # For each raw field
+        for name, type, raw in raw_field_s:
+            # If match field names, and the field name matches
+            if match_names and match(name):
+                # Yield field name hit
+                yield SearchHit(HIT_NAME, key_path, name, type)
+
+            # If match data, and the data matches
+            elif match_data and raw_match(type, raw):
+                # Yield field data hit
+                yield SearchHit(HIT_DATA, key_path, name, type)
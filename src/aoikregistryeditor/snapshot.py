@@ -0,0 +1,1905 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+import mmap
+import struct
+from sys import intern
+import threading
+import zlib
+
+from .merkle import MerkleWriter
+from .registry_walker import child_path_join
+from .registry_walker import walk as _walk
+from .regpath import path_normalize
+from .regval import FieldTable
+from .regval import RegKeyInfo
+from .regval import RegVal
+from .regval import data_decode
+from .regval import data_encode
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+
+# Snapshot file layout:
+# - Header: magic, format version, compression, root path.
+# - Blocks: each block is a string table and length-prefixed key records,
+#   compressed as a whole with the file's compression. Offset tables of the
+#   strings and the records come first, so opening a block does not parse
+#   all its records.
+# - Block index: per block, its file offset, stored size, raw size, key
+#   count, and first key's casefolded path segments.
+# - Footer: block index offset, key count, magic.
+#
+# Key records are in depth-first pre-order with child keys sorted by
+# casefolded name, so they are sorted by casefolded path segments and a key's
+# block is found by binary search in the block index. Reading one key
+# decompresses only its block.
+#
+# A key record stores the key's path segments relative to the root path,
+# last write time, child key names, and fields as (name, type, raw data).
+# Names are string table indexes of the record's block.
+
+# File magic
+_MAGIC = b'AOIKSNAP'
+
+# Format version
+_VERSION = 2
+
+# Header layout: magic, format version, compression ID, root path length.
+# The root path follows, encoded in UTF-8.
+_HEADER = struct.Struct('<8sHHI')
+
+# Footer layout: block index offset, key count, magic
+_FOOTER = struct.Struct('<QQ8s')
+
+# Block index entry layout: file offset, stored size, raw size, key count,
+# first key's segment count. The segments follow, each is a `_UINT16` length
+# and UTF-8 bytes.
+_INDEX_ENTRY = struct.Struct('<QIIIH')
+
+# Key record header layout: last write time, segment count, child key count,
+# field count. Segment name indexes, child name indexes, and fields follow.
+_KEY_HEADER = struct.Struct('<QHII')
+
+# Field header layout: name index, type, raw data size. Raw data follows.
+_FIELD_HEADER = struct.Struct('<III')
+
+# Block header layout: string count, record count. String end offsets,
+# record offsets, string bytes, and records follow.
+_BLOCK_HEADER = struct.Struct('<II')
+
+# Unsigned 16-bit integer
+_UINT16 = struct.Struct('<H')
+
+# Unsigned 32-bit integer
+_UINT32 = struct.Struct('<I')
+
+# Compression of no compression
+COMPRESSION_NONE = 'none'
+
+# Compression of zlib
+COMPRESSION_ZLIB = 'zlib'
+
+# Compression of lzma. Available if Python has module `lzma`.
+COMPRESSION_LZMA = 'lzma'
+
+# Compression names in order of compression ID
+_COMPRESSION_NAMES = (COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_LZMA)
+
+# Default block raw size in bytes
+_BLOCK_SIZE_DEFAULT = 256 * 1024
+
+# Number of decoded blocks cached by SnapshotFile
+_BLOCK_CACHE_CAPACITY = 8
+
+# Encoding of strings. Registry names may have unpaired surrogates.
+_STRING_ENCODING = 'utf-8'
+
+# Encoding error handler of strings
+_STRING_ERRORS = 'surrogatepass'
+
+# Errors raised when decoding a corrupt block
+_DECODE_ERRORS = (struct.error, zlib.error) + (
+    (lzma.LZMAError,) if lzma is not None else ()
+)
+
+
+#
+def _compress(compression, raw):
+    """
+    Compress block raw bytes.
+
+    @param compression: Compression name.
+
+    @param raw: Block raw bytes.
+
+    @return: Compressed bytes.
+    """
+    # If the compression is zlib
+    if compression == COMPRESSION_ZLIB:
+        # Return compressed bytes
+        return zlib.compress(raw)
+
+    # If the compression is lzma
+    if compression == COMPRESSION_LZMA:
+        # Return compressed bytes
+        return lzma.compress(raw)
+
+    # If the compression is none.
+
+    # Return the raw bytes
+    return raw
+
+
+#
+def _decompress(compression, data):
+    """
+    Decompress block stored bytes.
+
+    @param compression: Compression name.
+
+    @param data: Block stored bytes.
+
+    @return: Block raw bytes.
+    """
+    # If the compression is zlib
+    if compression == COMPRESSION_ZLIB:
+        # Return decompressed bytes
+        return zlib.decompress(data)
+
+    # If the compression is lzma
+    if compression == COMPRESSION_LZMA:
+        # Return decompressed bytes
+        return lzma.decompress(data)
+
+    # If the compression is none.
+
+    # Return the stored bytes
+    return bytes(data)
+
+
+#
+def _segments_key(segment_s):
+    """
+    Get sort key of path segments.
+
+    @param segment_s: Path segments.
+
+    @return: Tuple of casefolded path segments.
+    """
+    # Return tuple of casefolded path segments
+    return tuple(x.casefold() for x in segment_s)
+
+
+#
+class SnapshotWriter(object):
+    """
+    SnapshotWriter writes a snapshot file to a binary stream, key by key.
+
+    Keys must be written in depth-first pre-order with child keys sorted by
+    casefolded name, see `snapshot_save`. Only the current block and the
+    block index are kept in memory.
+    """
+
+    def __init__(
+        self,
+        out_stream,
+        root_path,
+        compression=None,
+        block_size=None,
+    ):
+        """
+        Initialize object. Write the header.
+
+        @param out_stream: Binary output stream.
+
+        @param root_path: Registry key path of the subtree's top key. Key
+        paths are stored relative to it.
+
+        @param compression: Compression name, one of `COMPRESSION_NONE`,
+        `COMPRESSION_ZLIB`, and `COMPRESSION_LZMA`. Default is zlib.
+
+        @param block_size: Block raw size in bytes at which a block is
+        flushed.
+
+        @return: None. Raise ValueError if the compression is not supported.
+        """
+        # If compression is not given
+        if compression is None:
+            # Use zlib
+            compression = COMPRESSION_ZLIB
+
+        # If the compression is not known
+        if compression not in _COMPRESSION_NAMES:
+            # Raise error
+            raise ValueError(
+                'Unknown compression: `{}`.'.format(compression)
+            )
+
+        # If the compression is lzma but module `lzma` is not available
+        if compression == COMPRESSION_LZMA and lzma is None:
+            # Raise error
+            raise ValueError('Compression `lzma` is not available.')
+
+        # Binary output stream
+        self._out_stream = out_stream
+
+        # Compression name
+        self._compression = compression
+
+        # Block raw size in bytes at which a block is flushed
+        self._block_size = block_size if block_size is not None \
+            else _BLOCK_SIZE_DEFAULT
+
+        # Current block's string table.
+        # Key is string.
+        # Value is string index.
+        self._string_dict = {}
+
+        # Current block's strings list, in index order
+        self._string_s = []
+
+        # Current block's record parts
+        self._part_s = []
+
+        # Current block's record bytes size
+        self._part_size = 0
+
+        # Current block's record offsets, relative to the first record
+        self._record_offset_s = array('I')
+
+        # Current block's key count
+        self._block_key_count = 0
+
+        # Current block's first key's sort key
+        self._block_first_key = None
+
+        # Block index entries list.
+        # Each entry is a tuple: (offset, stored_size, raw_size, key_count,
+        # first_key).
+        self._index_entry_s = []
+
+        # Last written key's sort key, used to check key order
+        self._last_key = None
+
+        # Number of keys written
+        self._key_count = 0
+
+        # Number of fields written
+        self._value_count = 0
+
+        # Number of bytes written
+        self._offset = 0
+
+        # Whether closed
+        self._closed = False
+
+        # Encode root path
+        root_bytes = root_path.encode(_STRING_ENCODING, _STRING_ERRORS)
+
+        # Write the header
+        self._out_write(
+            _HEADER.pack(
+                _MAGIC,
+                _VERSION,
+                _COMPRESSION_NAMES.index(compression),
+                len(root_bytes),
+            ) + root_bytes
+        )
+
+    def _out_write(self, data):
+        """
+        Write bytes to the output stream.
+
+        @param data: Bytes.
+
+        @return: None.
+        """
+        # Write the bytes
+        self._out_stream.write(data)
+
+        # Increase number of bytes written
+        self._offset += len(data)
+
+    def _string_index(self, string):
+        """
+        Get string index in the current block's string table, adding the
+        string if not present.
+
+        @param string: String.
+
+        @return: String index.
+        """
+        # Get string index
+        index = self._string_dict.get(string, None)
+
+        # If the string is not present
+        if index is None:
+            # Get new string index
+            index = self._string_dict[string] = len(self._string_s)
+
+            # Add the string
+            self._string_s.append(string)
+
+        # Return the string index
+        return index
+
+    def stats(self):
+        """
+        Get writer statistics dict.
+
+        @return: Writer statistics dict with keys `keys`, `values`, `blocks`,
+        and `bytes`.
+        """
+        # Return writer statistics dict
+        return {
+            'keys': self._key_count,
+            'values': self._value_count,
+            'blocks': len(self._index_entry_s),
+            'bytes': self._offset,
+        }
+
+    def key_write(self, segment_s, last_write_time, child_name_s, field_s):
+        """
+        Write a key record.
+
+        @param segment_s: Key path segments relative to the root path. Empty
+        for the root path's key.
+
+        @param last_write_time: Last write time as FILETIME integer.
+
+        @param child_name_s: Child key names.
+
+        @param field_s: Fields. Each field is a tuple: (name, type, raw_data).
+
+        @return: None. Raise ValueError if the key is not after the last
+        written key in snapshot order.
+        """
+        # Get the key's sort key
+        key = _segments_key(segment_s)
+
+        # If the key is not after the last written key
+        if self._last_key is not None and key <= self._last_key:
+            # Raise error
+            raise ValueError(
+                'Key is out of order: `{}`.'.format('\\'.join(segment_s))
+            )
+
+        # Set the last written key
+        self._last_key = key
+
+        # Get string index function
+        string_index = self._string_index
+
+        # Get child key names list
+        child_name_s = list(child_name_s)
+
+        # Record parts list.
+        # The header is inserted after the fields are counted.
+        part_s = [None]
+
+        # Add segment name indexes and child name indexes
+        part_s.append(array('I', [
+            string_index(x) for x in segment_s
+        ] + [
+            string_index(x) for x in child_name_s
+        ]).tobytes())
+
+        # Number of fields
+        field_count = 0
+
+        # For each field
+        for name, type, raw_data in field_s:
+            # Add the field header
+            part_s.append(
+                _FIELD_HEADER.pack(string_index(name), type, len(raw_data))
+            )
+
+            # Add the raw data
+            part_s.append(raw_data)
+
+            # Increment number of fields
+            field_count += 1
+
+        # Put the record header
+        part_s[0] = _KEY_HEADER.pack(
+            last_write_time or 0,
+            len(segment_s),
+            len(child_name_s),
+            field_count,
+        )
+
+        # Get record body
+        body = b''.join(part_s)
+
+        # Add the record's offset
+        self._record_offset_s.append(self._part_size)
+
+        # Add the length-prefixed record to the current block
+        self._part_s.append(_UINT32.pack(len(body)))
+
+        self._part_s.append(body)
+
+        # Increase the current block's record bytes size
+        self._part_size += _UINT32.size + len(body)
+
+        # If the record is the current block's first record
+        if self._block_key_count == 0:
+            # Set the current block's first key
+            self._block_first_key = key
+
+        # Increment the current block's key count
+        self._block_key_count += 1
+
+        # Increment number of keys
+        self._key_count += 1
+
+        # Increase number of fields
+        self._value_count += field_count
+
+        # If the current block is full
+        if self._part_size >= self._block_size:
+            # Flush the current block
+            self._block_flush()
+
+    def _block_flush(self):
+        """
+        Compress and write the current block, and add its block index entry.
+
+        @return: None.
+        """
+        # If the current block is empty
+        if self._block_key_count == 0:
+            # Do nothing
+            return
+
+        # Encode strings
+        string_bytes_s = [
+            x.encode(_STRING_ENCODING, _STRING_ERRORS) for x in self._string_s
+        ]
+
+        # String end offsets, relative to the first string
+        string_end_s = array('I')
+
+        # Current string end offset
+        string_end = 0
+
+        # For each encoded string
+        for string_bytes in string_bytes_s:
+            # Add the string's end offset
+            string_end += len(string_bytes)
+
+            string_end_s.append(string_end)
+
+        # Get block raw bytes
+        raw = b''.join([
+            _BLOCK_HEADER.pack(
+                len(string_bytes_s), len(self._record_offset_s)
+            ),
+            string_end_s.tobytes(),
+            self._record_offset_s.tobytes(),
+        ] + string_bytes_s + self._part_s)
+
+        # Compress the block
+        data = _compress(self._compression, raw)
+
+        # Add block index entry
+        self._index_entry_s.append((
+            self._offset,
+            len(data),
+            len(raw),
+            self._block_key_count,
+            self._block_first_key,
+        ))
+
+        # Write the block
+        self._out_write(data)
+
+        # Reset the current block
+        self._string_dict = {}
+
+        self._string_s = []
+
+        self._part_s = []
+
+        self._part_size = 0
+
+        self._record_offset_s = array('I')
+
+        self._block_key_count = 0
+
+        self._block_first_key = None
+
+    def close(self):
+        """
+        Flush the last block, and write the block index and the footer.
+        The output stream is not closed.
+
+        @return: Writer statistics dict, see `stats`.
+        """
+        # If closed
+        if self._closed:
+            # Return writer statistics dict
+            return self.stats()
+
+        # Set closed
+        self._closed = True
+
+        # Flush the last block
+        self._block_flush()
+
+        # Get block index offset
+        index_offset = self._offset
+
+        # Block index parts list, starting with the entry count
+        part_s = [_UINT32.pack(len(self._index_entry_s))]
+
+        # For each block index entry
+        for offset, stored_size, raw_size, key_count, first_key in \
+                self._index_entry_s:
+            # Add the entry header
+            part_s.append(_INDEX_ENTRY.pack(
+                offset, stored_size, raw_size, key_count, len(first_key)
+            ))
+
+            # For each first key's segment
+            for segment in first_key:
+                # Encode the segment
+                segment_bytes = segment.encode(
+                    _STRING_ENCODING, _STRING_ERRORS
+                )
+
+                # Add the length-prefixed segment
+                part_s.append(_UINT16.pack(len(segment_bytes)))
+
+                part_s.append(segment_bytes)
+
+        # Write the block index
+        self._out_write(b''.join(part_s))
+
+        # Write the footer
+        self._out_write(
+            _FOOTER.pack(index_offset, self._key_count, _MAGIC)
+        )
+
+        # Return writer statistics dict
+        return self.stats()
+
+
+#
+def snapshot_save(
+    path,
+    out_stream,
+    regkey_get,
+    compression=None,
+    block_size=None,
+    on_error=None,
+    merkle_stream=None,
+):
+    """
+    Save a registry subtree as a snapshot, key by key.
+
+    Keys are visited depth-first with child keys sorted by casefolded name,
+    and each key's record is written as soon as it is read, so memory use
+    does not grow with the size of the subtree.
+
+    @param path: Registry key path of the subtree's top key.
+
+    @param out_stream: Binary output stream.
+
+    @param regkey_get: RegKey getter function. It takes a registry key path
+    and returns a RegKey-compatible object, or None if failed.
+
+    @param compression: Compression name. Default is zlib.
+
+    @param block_size: Block raw size in bytes.
+
+    @param on_error: Error callback taking arguments `(path, exc)`. Called
+    for each key that failed reading. The key's subtree is skipped, and
+    `snapshot_restore` leaves it untouched. Also called for each field that
+    failed encoding, with path `key_path->field_name`. Only the field is
+    skipped, so `snapshot_restore` deletes it from the restored key. Default
+    is ignore the error.
+
+    @param merkle_stream: Seekable binary output stream to write the
+    snapshot's Merkle file to, see `merkle.snapshot_diff`. None means not
+    write.
+
+    @return: Writer statistics dict, see `SnapshotWriter.stats`.
+    """
+    # Create writer
+    writer = SnapshotWriter(
+        out_stream,
+        root_path=path,
+        compression=compression,
+        block_size=block_size,
+    )
+
+    # Create Merkle writer
+    merkle_writer = MerkleWriter(merkle_stream) \
+        if merkle_stream is not None else None
+
+    # Keys to save.
+    # Each item is a tuple: (path, segments relative to the root path).
+    # Used as a stack so that keys are saved depth-first.
+    todo_s = [(path, ())]
+
+    # While have keys to save
+    while todo_s:
+        # Get a key to save
+        key_path, segment_s = todo_s.pop()
+
+        # Open the key
+        regkey = regkey_get(key_path)
+
+        # If failed opening the key
+        if regkey is None:
+            # If have error callback
+            if on_error is not None:
+                # Call the error callback
+                on_error(key_path, ValueError(
+                    'Cannot open key: `{}`.'.format(key_path)
+                ))
+
+            # Skip the key's subtree
+            continue
+
+        # If not failed opening the key.
+
+        try:
+            # Get child key names sorted by casefolded name
+            child_name_s = sorted(regkey.child_names(), key=str.casefold)
+
+            # Fields list.
+            # Each item is a tuple: (name, type, raw data).
+            field_s = []
+
+            # For each field, with data
+            for field in regkey.iter_fields(with_data=True):
+                try:
+                    # Encode the field data
+                    raw_data = data_encode(field.type(), field.data())
+
+                # If have error
+                except Exception as exc:
+                    # If have error callback
+                    if on_error is not None:
+                        # Call the error callback with the field's path
+                        on_error(
+                            '{}->{}'.format(key_path, field.name()), exc
+                        )
+
+                    # Skip the field only
+                    continue
+
+                # Add the field with raw data
+                field_s.append((field.name(), field.type(), raw_data))
+
+            # Get last write time
+            last_write_time = regkey.info().last_write_time
+
+        # If have error
+        except Exception as exc:
+            # If have error callback
+            if on_error is not None:
+                # Call the error callback
+                on_error(key_path, exc)
+
+            # Skip the key's subtree
+            continue
+
+        finally:
+            # Close the key
+            regkey.close()
+
+        # Write the key record
+        writer.key_write(segment_s, last_write_time, child_name_s, field_s)
+
+        # If have Merkle writer
+        if merkle_writer is not None:
+            # Add the key
+            merkle_writer.key_add(
+                len(segment_s),
+                segment_s[-1] if segment_s else '',
+                child_name_s,
+                field_s,
+            )
+
+        # For each child key name, reversed so that the stack pops them in
+        # sorted order
+        for child_name in reversed(child_name_s):
+            # Add the child key to save
+            todo_s.append((
+                child_path_join(key_path, child_name),
+                segment_s + (child_name,),
+            ))
+
+    # If have Merkle writer
+    if merkle_writer is not None:
+        # Complete the Merkle file
+        merkle_writer.close()
+
+    # Write the block index and the footer.
+    # Return writer statistics dict.
+    return writer.close()
+
+
+#
+class _SnapshotBlock(object):
+    """
+    _SnapshotBlock is a decoded block of a snapshot file. Only the offset
+    tables are read on creation. Strings and records are decoded when they
+    are accessed.
+    """
+
+    # Attribute slots
+    __slots__ = (
+        '_view',
+        '_string_end_s',
+        '_string_base',
+        '_string_s',
+        '_record_offset_s',
+        '_record_base',
+    )
+
+    def __init__(self, raw):
+        """
+        Initialize object. Read the offset tables.
+
+        @param raw: Block raw bytes.
+
+        @return: None.
+        """
+        # View of the raw bytes.
+        # Field raw data are slices of it.
+        self._view = view = memoryview(raw)
+
+        # Get string count and record count
+        string_count, record_count = _BLOCK_HEADER.unpack_from(view, 0)
+
+        # Current position
+        pos = _BLOCK_HEADER.size
+
+        # String end offsets, relative to the first string
+        self._string_end_s = array('I')
+
+        self._string_end_s.frombytes(view[pos:pos + 4 * string_count])
+
+        pos += 4 * string_count
+
+        # Record offsets, relative to the first record
+        self._record_offset_s = array('I')
+
+        self._record_offset_s.frombytes(view[pos:pos + 4 * record_count])
+
+        pos += 4 * record_count
+
+        # The first string's position
+        self._string_base = pos
+
+        # Decoded strings list.
+        # None means not decoded yet.
+        self._string_s = [None] * string_count
+
+        # The first record's position
+        self._record_base = pos + (
+            self._string_end_s[-1] if string_count else 0
+        )
+
+    def _string(self, index):
+        """
+        Get string by index, decoding it if not decoded yet.
+
+        @param index: String index.
+
+        @return: String.
+        """
+        # Get decoded string
+        string = self._string_s[index]
+
+        # If the string is not decoded yet
+        if string is None:
+            # Get the string's position
+            start = self._string_base + (
+                self._string_end_s[index - 1] if index > 0 else 0
+            )
+
+            end = self._string_base + self._string_end_s[index]
+
+            # Decode the interned string
+            string = self._string_s[index] = intern(
+                bytes(self._view[start:end]).decode(
+                    _STRING_ENCODING, _STRING_ERRORS
+                )
+            )
+
+        # Return the string
+        return string
+
+    def record_count(self):
+        """
+        Get number of records.
+
+        @return: Number of records.
+        """
+        # Return number of records
+        return len(self._record_offset_s)
+
+    def _record_header(self, position):
+        """
+        Parse a record's header and name indexes.
+
+        @param position: Record position in the block.
+
+        @return: A tuple: (last_write_time, segment_count, child_count,
+        field_count, index_s, fields_pos). `index_s` is segment name indexes
+        followed by child name indexes. `fields_pos` is the first field's
+        position.
+        """
+        # Get the record body's position, after the length prefix
+        pos = self._record_base + self._record_offset_s[position] \
+            + _UINT32.size
+
+        # Parse the record header
+        last_write_time, segment_count, child_count, field_count = \
+            _KEY_HEADER.unpack_from(self._view, pos)
+
+        pos += _KEY_HEADER.size
+
+        # Get segment name indexes and child name indexes
+        index_s = array('I')
+
+        index_s.frombytes(
+            self._view[pos:pos + 4 * (segment_count + child_count)]
+        )
+
+        pos += 4 * (segment_count + child_count)
+
+        # Return the header
+        return (
+            last_write_time,
+            segment_count,
+            child_count,
+            field_count,
+            index_s,
+            pos,
+        )
+
+    def record_key(self, position):
+        """
+        Get a record's sort key.
+
+        @param position: Record position in the block.
+
+        @return: Sort key, see `_segments_key`.
+        """
+        # Parse the record header
+        _, segment_count, _, _, index_s, _ = self._record_header(position)
+
+        # Return the sort key
+        return _segments_key(
+            self._string(x) for x in index_s[:segment_count]
+        )
+
+    def record(self, position):
+        """
+        Get a record by position.
+
+        @param position: Record position in the block.
+
+        @return: A tuple: (segments, last_write_time, child_names, fields).
+        Each field is a tuple: (name, type, raw_data).
+        """
+        # Parse the record header
+        last_write_time, segment_count, _, field_count, index_s, pos = \
+            self._record_header(position)
+
+        # Get string function
+        string = self._string
+
+        # Get view
+        view = self._view
+
+        # Fields list
+        field_s = []
+
+        # For each field
+        for _ in range(field_count):
+            # Parse the field header
+            name_index, type, data_size = \
+                _FIELD_HEADER.unpack_from(view, pos)
+
+            pos += _FIELD_HEADER.size
+
+            # Add the field
+            field_s.append(
+                (string(name_index), type, view[pos:pos + data_size])
+            )
+
+            pos += data_size
+
+        # Return the record
+        return (
+            tuple(string(x) for x in index_s[:segment_count]),
+            last_write_time,
+            [string(x) for x in index_s[segment_count:]],
+            field_s,
+        )
+
+    def records(self):
+        """
+        Get all records, in snapshot order.
+
+        @return: Records list.
+        """
+        # Return records list
+        return [self.record(x) for x in range(len(self._record_offset_s))]
+
+    def find(self, key):
+        """
+        Find a record by sort key, via binary search.
+
+        @param key: Sort key, see `_segments_key`.
+
+        @return: Record, or None if not found.
+        """
+        # Search range
+        low = 0
+
+        high = len(self._record_offset_s)
+
+        # While the range is not empty
+        while low < high:
+            # Get the middle position
+            middle = (low + high) // 2
+
+            # If the middle record is before the key
+            if self.record_key(middle) < key:
+                # Search after the middle record
+                low = middle + 1
+
+            # If the middle record is not before the key
+            else:
+                # Search up to the middle record
+                high = middle
+
+        # If the record at the position matches the key
+        if low < len(self._record_offset_s) and self.record_key(low) == key:
+            # Return the record
+            return self.record(low)
+
+        # Return None
+        return None
+
+
+#
+class SnapshotFile(object):
+    """
+    SnapshotFile opens a snapshot file read-only via `mmap`.
+
+    Only the header and the block index are parsed on open. Blocks are
+    decompressed when their keys are accessed, and a few decoded blocks are
+    cached.
+
+    Key paths are full paths, i.e. the snapshot's root path plus the key's
+    relative path, e.g. `HKEY_CURRENT_USER\\Software\\App\\Sub`. Paths are
+    matched ignoring case.
+    """
+
+    class FormatError(ValueError):
+        """
+        Error raised when the snapshot file is not valid.
+        """
+        pass
+
+    def __init__(self, file_path):
+        """
+        Initialize object.
+
+        @param file_path: Snapshot file path.
+
+        @return: None. Raise `SnapshotFile.FormatError` if the file is not a
+        snapshot file, or OSError if failed opening the file.
+        """
+        # Snapshot file path
+        self._file_path = file_path
+
+        # Open the file
+        self._file = open(file_path, 'rb')
+
+        try:
+            # Map the file read-only
+            self._mmap = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+        # If have error, e.g. the file is empty
+        except ValueError:
+            # Close the file
+            self._file.close()
+
+            # Raise error
+            raise SnapshotFile.FormatError(
+                'Not a snapshot file: `{}`.'.format(file_path)
+            )
+
+        # View of the mapping
+        self._view = memoryview(self._mmap)
+
+        # Decoded blocks cache.
+        # Key is block index.
+        # Value is _SnapshotBlock object.
+        self._block_cache = OrderedDict()
+
+        # Lock of the decoded blocks cache, because walk worker threads may
+        # access keys concurrently.
+        self._lock = threading.Lock()
+
+        try:
+            # Parse the header and the block index
+            self._index_parse()
+
+        # If have error
+        except Exception as exc:
+            # Close the snapshot file
+            self.close()
+
+            # If the error is struct error, e.g. the file is truncated
+            if isinstance(exc, struct.error):
+                # Raise error
+                raise SnapshotFile.FormatError(
+                    'Corrupt snapshot file: `{}`.'.format(file_path)
+                )
+
+            # Propagate the error
+            raise
+
+    def _index_parse(self):
+        """
+        Parse the header, the footer, and the block index.
+
+        @return: None. Raise `SnapshotFile.FormatError` if not valid.
+        """
+        # Get view
+        view = self._view
+
+        # If the file is too small
+        if len(view) < _HEADER.size + _FOOTER.size:
+            # Raise error
+            raise SnapshotFile.FormatError(
+                'Not a snapshot file: `{}`.'.format(self._file_path)
+            )
+
+        # Parse the header
+        magic, version, compression_id, root_size = \
+            _HEADER.unpack_from(view, 0)
+
+        # Parse the footer
+        index_offset, key_count, footer_magic = \
+            _FOOTER.unpack_from(view, len(view) - _FOOTER.size)
+
+        # If the magics are not valid
+        if magic != _MAGIC or footer_magic != _MAGIC:
+            # Raise error
+            raise SnapshotFile.FormatError(
+                'Not a snapshot file: `{}`.'.format(self._file_path)
+            )
+
+        # If the version or the compression is not supported
+        if version != _VERSION \
+                or compression_id >= len(_COMPRESSION_NAMES):
+            # Raise error
+            raise SnapshotFile.FormatError(
+                'Unsupported snapshot file: `{}`.'.format(self._file_path)
+            )
+
+        # Compression name
+        self._compression = _COMPRESSION_NAMES[compression_id]
+
+        # If the compression is lzma but module `lzma` is not available
+        if self._compression == COMPRESSION_LZMA and lzma is None:
+            # Raise error
+            raise SnapshotFile.FormatError(
+                'Compression `lzma` is not available.'
+            )
+
+        # Root path, with hive alias resolved in case the snapshot was saved
+        # with one
+        self._root_path = path_normalize(bytes(
+            view[_HEADER.size:_HEADER.size + root_size]
+        ).decode(_STRING_ENCODING, _STRING_ERRORS))
+
+        # Casefolded root path segments, for matching paths.
+        # Empty root path has no segments.
+        self._root_key = _segments_key(
+            self._root_path.split('\\')
+        ) if self._root_path else ()
+
+        # Number of keys
+        self._key_count = key_count
+
+        # Get block count
+        block_count = _UINT32.unpack_from(view, index_offset)[0]
+
+        # Current position
+        pos = index_offset + _UINT32.size
+
+        # Block locations list.
+        # Each item is a tuple: (offset, stored_size, raw_size).
+        self._block_s = []
+
+        # Block first keys list, for binary search
+        self._block_first_key_s = []
+
+        # Block first key indexes list, for binary search
+        self._block_first_index_s = []
+
+        # Number of keys in previous blocks
+        block_first_index = 0
+
+        # For each block index entry
+        for _ in range(block_count):
+            # Parse the entry header
+            offset, stored_size, raw_size, key_count, segment_count = \
+                _INDEX_ENTRY.unpack_from(view, pos)
+
+            pos += _INDEX_ENTRY.size
+
+            # First key's segments list
+            segment_s = []
+
+            # For each segment
+            for _ in range(segment_count):
+                # Get segment bytes length
+                length = _UINT16.unpack_from(view, pos)[0]
+
+                pos += _UINT16.size
+
+                # Add the segment
+                segment_s.append(bytes(view[pos:pos + length]).decode(
+                    _STRING_ENCODING, _STRING_ERRORS
+                ))
+
+                pos += length
+
+            # Add the block location
+            self._block_s.append((offset, stored_size, raw_size))
+
+            # Add the block's first key
+            self._block_first_key_s.append(tuple(segment_s))
+
+            # Add the block's first key index
+            self._block_first_index_s.append(block_first_index)
+
+            # Increase number of keys in previous blocks
+            block_first_index += key_count
+
+    def __enter__(self):
+        """
+        Enter context.
+
+        @return: The object itself.
+        """
+        # Return the object itself
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Exit context. Close the snapshot file.
+
+        @return: False, so that error raised in the block is propagated.
+        """
+        # Close the snapshot file
+        self.close()
+
+        # Propagate error raised in the block
+        return False
+
+    def file_path(self):
+        """
+        Get snapshot file path.
+
+        @return: Snapshot file path.
+        """
+        # Return the snapshot file path
+        return self._file_path
+
+    def root_path(self):
+        """
+        Get registry key path of the snapshot's top key.
+
+        @return: Root path.
+        """
+        # Return the root path
+        return self._root_path
+
+    def compression(self):
+        """
+        Get compression name.
+
+        @return: Compression name.
+        """
+        # Return the compression name
+        return self._compression
+
+    def key_count(self):
+        """
+        Get number of keys.
+
+        @return: Number of keys.
+        """
+        # Return number of keys
+        return self._key_count
+
+    def block_count(self):
+        """
+        Get number of blocks.
+
+        @return: Number of blocks.
+        """
+        # Return number of blocks
+        return len(self._block_s)
+
+    def close(self):
+        """
+        Close the snapshot file. SnapshotRegKey objects can not be used after
+        this.
+
+        @return: None.
+        """
+        # If the snapshot file has been closed
+        if self._view is None:
+            # Do nothing
+            return
+
+        with self._lock:
+            # Clear the decoded blocks cache
+            self._block_cache.clear()
+
+        # Release the view before closing the mapping it exports
+        self._view.release()
+
+        # Set the view to None
+        self._view = None
+
+        try:
+            # Close the mapping
+            self._mmap.close()
+
+        # If slices of uncompressed blocks are still alive
+        except BufferError:
+            # Leave the mapping to be closed when the slices are released
+            pass
+
+        # Close the file
+        self._file.close()
+
+    def closed(self):
+        """
+        Test whether the snapshot file has been closed.
+
+        @return: Boolean.
+        """
+        # Return whether the snapshot file has been closed
+        return self._view is None
+
+    def _block_decode(self, block_index):
+        """
+        Read and decode a block without caching.
+
+        @param block_index: Block index.
+
+        @return: _SnapshotBlock object.
+        """
+        # Get the block location
+        offset, stored_size, raw_size = self._block_s[block_index]
+
+        # Decompress the block
+        raw = _decompress(
+            self._compression, self._view[offset:offset + stored_size]
+        )
+
+        # If the raw size is not valid
+        if len(raw) != raw_size:
+            # Raise error
+            raise SnapshotFile.FormatError(
+                'Corrupt block {}: `{}`.'.format(block_index, self._file_path)
+            )
+
+        # Return _SnapshotBlock object
+        return _SnapshotBlock(raw)
+
+    def _block(self, block_index):
+        """
+        Get decoded block, via the decoded blocks cache.
+
+        @param block_index: Block index.
+
+        @return: _SnapshotBlock object.
+        """
+        with self._lock:
+            # Get cached block
+            block = self._block_cache.get(block_index, None)
+
+            # If the block is cached
+            if block is not None:
+                # Mark the block as most recently used
+                self._block_cache.move_to_end(block_index)
+
+                # Return the block
+                return block
+
+        # If the block is not cached.
+
+        # Decode the block outside the lock
+        block = self._block_decode(block_index)
+
+        with self._lock:
+            # Cache the block
+            self._block_cache[block_index] = block
+
+            # While the cache exceeds the capacity
+            while len(self._block_cache) > _BLOCK_CACHE_CAPACITY:
+                # Remove the least recently used block
+                self._block_cache.popitem(last=False)
+
+        # Return the block
+        return block
+
+    def _record(self, path):
+        """
+        Find key record by key path.
+
+        @param path: Key path.
+
+        @return: Record, or None if not found.
+        """
+        # Get casefolded path segments.
+        # Hive alias is resolved and trailing separator is ignored.
+        key = _segments_key(path_normalize(path).split('\\')) if path else ()
+
+        # Get root key's segment count
+        root_len = len(self._root_key)
+
+        # If the path is not within the root path
+        if key[:root_len] != self._root_key:
+            # Return None
+            return None
+
+        # Get sort key relative to the root path
+        key = key[root_len:]
+
+        # Find the last block whose first key is not after the key
+        block_index = bisect_right(self._block_first_key_s, key) - 1
+
+        # If the key is before the first block
+        if block_index < 0:
+            # Return None
+            return None
+
+        # Get the record from the block
+        return self._block(block_index).find(key)
+
+    def _record_path(self, record):
+        """
+        Get key path of a key record.
+
+        @param record: Key record.
+
+        @return: Key path.
+        """
+        # Get key path
+        key_path = self._root_path
+
+        # For each segment
+        for segment in record[0]:
+            # Add the segment
+            key_path = child_path_join(key_path, segment)
+
+        # Return key path
+        return key_path
+
+    def record_at(self, key_index):
+        """
+        Get key record by key index, via the decoded blocks cache.
+
+        @param key_index: Key index in snapshot order. The root path's key
+        has index 0.
+
+        @return: A tuple: (path, last_write_time, child_names, fields). Each
+        field is a tuple: (name, type, raw_data). Raise IndexError if the key
+        index is out of range.
+        """
+        # If the key index is out of range
+        if not 0 <= key_index < self._key_count:
+            # Raise error
+            raise IndexError(key_index)
+
+        # Find the block containing the key index
+        block_index = bisect_right(self._block_first_index_s, key_index) - 1
+
+        # Get the record
+        record = self._block(block_index).record(
+            key_index - self._block_first_index_s[block_index]
+        )
+
+        # Get the record's fields
+        _, last_write_time, child_name_s, field_s = record
+
+        # Return the record with key path
+        return self._record_path(record), last_write_time, child_name_s, \
+            field_s
+
+    def iter_records(self, start=0, stop=None):
+        """
+        Iterate key records in snapshot order, decoding one block at a time
+        without caching.
+
+        @param start: Key index of the first record.
+
+        @param stop: Key index after the last record. None means the end.
+
+        @return: Generator of tuples: (path, last_write_time, child_names,
+        fields). Each field is a tuple: (name, type, raw_data).
+        """
+        # If stop index is not given, or out of range
+        if stop is None or stop > self._key_count:
+            # Use the end
+            stop = self._key_count
+
+        # If the range is empty
+        if start >= stop:
+            # Stop
+            return
+
+        # Find the block containing the start index
+        block_index = bisect_right(self._block_first_index_s, start) - 1
+
+        # While have records in the range
+        while start < stop:
+            # Get the block's first key index
+            first_index = self._block_first_index_s[block_index]
+
+            # Decode the block
+            block = self._block_decode(block_index)
+
+            # Get the block's record count
+            record_count = block.record_count()
+
+            # For each record position of the block in the range
+            for position in range(
+                start - first_index, min(stop - first_index, record_count)
+            ):
+                # Get the record
+                record = block.record(position)
+
+                # Get the record's fields
+                _, last_write_time, child_name_s, field_s = record
+
+                # Yield the record with key path
+                yield self._record_path(record), last_write_time, \
+                    child_name_s, field_s
+
+            # Move to the next block
+            start = first_index + record_count
+
+            block_index += 1
+
+    def regkey_get(self, path=None):
+        """
+        Create SnapshotRegKey object for given key path.
+
+        @param path: Key path. Default is the root path.
+
+        @return: SnapshotRegKey object, or None if the key is not found or
+        the snapshot file is corrupt.
+        """
+        # If path is not given
+        if path is None:
+            # Use the root path
+            path = self._root_path
+
+        #
+        try:
+            # Find the key record
+            record = self._record(path)
+
+        # If have error
+        except (SnapshotFile.FormatError,) + _DECODE_ERRORS:
+            # Return None
+            return None
+
+        # If the key record is not found
+        if record is None:
+            # Return None
+            return None
+
+        # If the key record is found.
+
+        # Return SnapshotRegKey object
+        return SnapshotRegKey(
+            snapshot=self, record=record, path=path.rstrip('\\')
+        )
+
+    def regkey_exists(self, path):
+        """
+        Test whether given key path exists.
+
+        @param path: Key path.
+
+        @return: Boolean.
+        """
+        # Return whether the key is found
+        return self.regkey_get(path) is not None
+
+    def regkey_child_names(self, path):
+        """
+        Get given key path's child key names list.
+
+        @param path: Key path.
+
+        @return: Child key names list, or None if the key is not found.
+        """
+        # Get SnapshotRegKey object
+        regkey = self.regkey_get(path)
+
+        # If the key is not found
+        if regkey is None:
+            # Return None
+            return None
+
+        # If the key is found.
+
+        # Return child key names list
+        return regkey.child_names()
+
+    def walk(
+        self,
+        path=None,
+        max_depth=None,
+        workers=None,
+        include_values=False,
+        cancel_token=None,
+        on_error=None,
+    ):
+        """
+        Walk a subtree of the snapshot. See `registry_walker.walk`.
+
+        @param path: Key path of the subtree's top key. Default is the root
+        path.
+
+        @param max_depth: Max depth to descend. The top key is depth 0. None
+        means no limit.
+
+        @param workers: Number of worker threads. Decoding holds the GIL, so
+        one worker is usually as fast as more. Default is 1.
+
+        @param include_values: Whether list fields of each key.
+
+        @param cancel_token: WalkCancelToken object to cancel the walk.
+
+        @param on_error: Error callback taking arguments `(path, exc)`.
+
+        @return: Generator of tuples: (path, child_names, fields).
+        """
+        # Return the walk generator
+        return _walk(
+            path if path is not None else self._root_path,
+            regkey_get=self.regkey_get,
+            max_depth=max_depth,
+            workers=workers if workers is not None else 1,
+            include_values=include_values,
+            cancel_token=cancel_token,
+            on_error=on_error,
+        )
+
+
+#
+class SnapshotRegKey(object):
+    """
+    SnapshotRegKey represents a key in a snapshot file. It has the read
+    methods of `registry.RegKey`. Write methods raise ValueError.
+    """
+
+    # Attribute slots
+    __slots__ = ('_snapshot', '_record', '_path')
+
+    def __init__(self, snapshot, record, path):
+        """
+        Initialize object.
+
+        @param snapshot: SnapshotFile object.
+
+        @param record: Key record.
+
+        @param path: Key path.
+
+        @return: None.
+        """
+        # SnapshotFile object
+        self._snapshot = snapshot
+
+        # Key record
+        self._record = record
+
+        # Key path
+        self._path = path
+
+    def __str__(self):
+        """
+        Get string of the object.
+
+        @return: String of the object.
+        """
+        # Return the key path
+        return self._path
+
+    def path(self):
+        """
+        Get key path.
+
+        @return: Key path
+        """
+        # Return the key path
+        return self._path
+
+    def snapshot(self):
+        """
+        Get SnapshotFile object.
+
+        @return: SnapshotFile object.
+        """
+        # Return the SnapshotFile object
+        return self._snapshot
+
+    def name(self):
+        """
+        Get key name as stored in the snapshot.
+
+        @return: Key name.
+        """
+        # Get path segments
+        segment_s = self._record[0]
+
+        # If the key is the root path's key
+        if not segment_s:
+            # Return the root path's last segment
+            return self._snapshot.root_path().rpartition('\\')[2]
+
+        # Return the last segment
+        return segment_s[-1]
+
+    def info(self):
+        """
+        Get the key's metadata from the key record.
+
+        @return: RegKeyInfo object.
+        """
+        # Get key record
+        _, last_write_time, child_name_s, field_s = self._record
+
+        # Return RegKeyInfo object
+        return RegKeyInfo(
+            subkey_count=len(child_name_s),
+            value_count=len(field_s),
+            max_subkey_name_len=max(
+                [len(x) for x in child_name_s], default=0
+            ),
+            max_value_name_len=max([len(x[0]) for x in field_s], default=0),
+            max_value_data_len=max([len(x[2]) for x in field_s], default=0),
+            last_write_time=last_write_time,
+        )
+
+    def child_names(self, cached=False):
+        """
+        Get child key names list.
+
+        @param cached: Not used. Snapshot files are not changed while open.
+
+        @return: Child key names list, sorted by casefolded name.
+        """
+        # Return a copy of child key names list
+        return list(self._record[2])
+
+    def iter_child_names(self, start=0, limit=None):
+        """
+        Iterate child key names.
+
+        @param start: Index of the first child key.
+
+        @param limit: Max number of child key names. None means no limit.
+
+        @return: Generator of child key names.
+        """
+        # Get child key names list
+        child_name_s = self._record[2]
+
+        # Get stop index
+        stop = len(child_name_s) if limit is None \
+            else min(len(child_name_s), start + limit)
+
+        # For each child key name in the range
+        for child_name in child_name_s[start:stop]:
+            # Yield the child key name
+            yield child_name
+
+    def child_paths(self):
+        """
+        Get child key paths list.
+
+        @return: Child key paths list.
+        """
+        # Return child key paths list
+        return [
+            child_path_join(self._path, name) for name in self._record[2]
+        ]
+
+    def iter_fields(self, start=0, limit=None, with_data=False):
+        """
+        Iterate fields. Each field is a RegVal object.
+
+        @param start: Index of the first field.
+
+        @param limit: Max number of fields. None means no limit.
+
+        @param with_data: Whether load field data in the RegVal objects.
+
+        @return: Generator of RegVal objects.
+        """
+        # Get fields list
+        field_s = self._record[3]
+
+        # Get stop index
+        stop = len(field_s) if limit is None \
+            else min(len(field_s), start + limit)
+
+        # For each field in the range
+        for name, type, raw_data in field_s[start:stop]:
+            # Yield RegVal object
+            yield RegVal(
+                regkey=self,
+                name=name,
+                type=type,
+                data=data_decode(type, raw_data) if with_data
+                else RegVal.DATA_NOT_LOADED,
+            )
+
+    def fields(self, with_data=False, cached=False, as_table=False):
+        """
+        Get key fields list. Each field is a RegVal object.
+
+        @param with_data: Whether load field data in the RegVal objects.
+
+        @param cached: Not used. Snapshot files are not changed while open.
+
+        @param as_table: Whether return a FieldTable instead of a list.
+
+        @return: Key fields list, or FieldTable if `as_table` is on.
+        """
+        # Get fields list
+        field_s = self._record[3]
+
+        # Create field table
+        table = FieldTable(
+            regkey=self,
+            names=[x[0] for x in field_s],
+            types=array('I', [x[1] for x in field_s]),
+            datas=[
+                data_decode(type, raw_data) for _, type, raw_data in field_s
+            ] if with_data else None,
+        )
+
+        # Return the field table, or the RegVal objects list
+        return table if as_table else table.to_list()
+
+    def field_raw(self, name):
+        """
+        Get field type and raw data, without decoding.
+
+        @param name: Field name. Empty string means the default field.
+
+        @return: A tuple: (type, raw_data), or None if not found. `raw_data`
+        is a `memoryview` slice of the decoded block.
+        """
+        # Get casefolded field name
+        name_key = name.casefold()
+
+        # For each field
+        for field_name, type, raw_data in self._record[3]:
+            # If the field name matches
+            if field_name.casefold() == name_key:
+                # Return the type and raw data
+                return type, raw_data
+
+        # Return None
+        return None
+
+    def _field_data_type_tuple(self, name):
+        """
+        Get field data and type tuple: (data, type).
+
+        @return: Field data and type tuple: (data, type), or None if not
+        found.
+        """
+        # Get field type and raw data
+        type_raw_tuple = self.field_raw(name)
+
+        # If the field is not found
+        if type_raw_tuple is None:
+            # Return None
+            return None
+
+        # If the field is found.
+
+        # Get field type and raw data
+        type, raw_data = type_raw_tuple
+
+        # Return field data and type tuple
+        return data_decode(type, raw_data), type
+
+    def field_type(self, name):
+        """
+        Get field type.
+
+        @param name: Field name.
+
+        @return: Field type, or None if not found.
+        """
+        # Get field data and type tuple
+        data_type_tuple = self._field_data_type_tuple(name)
+
+        # Return field type
+        return None if data_type_tuple is None else data_type_tuple[1]
+
+    def field_data(self, name):
+        """
+        Get field data.
+
+        @param name: Field name.
+
+        @return: Field data, or None if not found.
+        """
+        # Get field data and type tuple
+        data_type_tuple = self._field_data_type_tuple(name)
+
+        # Return field data
+        return None if data_type_tuple is None else data_type_tuple[0]
+
+    def field_write(self, name, type, data, notify=True):
+        """
+        Raise error because snapshot files are opened read-only.
+        """
+        # Raise error
+        raise ValueError('Snapshot file is read-only.')
+
+    def field_delete(self, name, notify=True):
+        """
+        Raise error because snapshot files are opened read-only.
+        """
+        # Raise error
+        raise ValueError('Snapshot file is read-only.')
+
+    def close(self):
+        """
+        Do nothing. The key record stays valid until the snapshot file is
+        closed.
+
+        @return: None.
+        """
+        pass
+
+    def closed(self):
+        """
+        Test whether the snapshot file has been closed.
+
+        @return: Boolean.
+        """
+        # Return whether the snapshot file has been closed
+        return self._snapshot.closed()
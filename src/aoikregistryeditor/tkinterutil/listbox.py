@@ -304,7 +304,10 @@ class ListboxVidget(Vidget, Eventor):
 
         Notice do not change the list outside.
 
-        @param items: Items list.
+        @param items: Items list, or a read-only sequence supporting `len`,
+        indexing, and iteration, e.g. one that creates items on demand. A
+        read-only sequence is copied to a list when the items are changed via
+        `item_insert`, `items_add` or `item_remove`.
 
         @param notify: Whether notify pre-change and post-change events.
 
@@ -312,12 +315,14 @@ class ListboxVidget(Vidget, Eventor):
 
         @return: None.
         """
-        # If the items is not list
-        if not isinstance(items, list):
+        # If the items is not list or read-only sequence
+        if not isinstance(items, list) and not (
+            hasattr(items, '__len__') and hasattr(items, '__getitem__')
+        ):
             # Raise error
             raise TypeError(items)
 
-        # If the items is list.
+        # If the items is list or read-only sequence.
 
         # If the listbox is disabled
         if not self.is_enabled():
@@ -673,6 +678,9 @@ class ListboxVidget(Vidget, Eventor):
             # `-1` works and means appending.
             index = active_index
 
+        # Ensure the items can be changed
+        self._items_make_list()
+
         # Insert the item to the items list
         self._items.insert(index, item)
 
@@ -700,6 +708,68 @@ class ListboxVidget(Vidget, Eventor):
 
             self.handler_notify(self.ITEMCUR_CHANGE_DONE)
 
+    def items_add(
+        self,
+        items,
+        notify=True,
+    ):
+        """
+        Add items at the end, keeping active index.
+
+        Unlike `items_set` and `item_insert`, existing items are not inserted
+        into listbox widget again, so adding items in many small batches costs
+        time proportional to the number of added items.
+
+        @param items: Items to add.
+
+        @param notify: Whether notify pre-change and post-change events.
+
+        @return: None.
+        """
+        # If the listbox is disabled
+        if not self.is_enabled():
+            # Raise error
+            raise ListboxVidget.DisabledError()
+
+        # If the listbox is not disabled.
+
+        # If the listbox is changing
+        if self._is_changing:
+            # Raise error
+            raise ListboxVidget.CircularCallError()
+
+        # If the listbox is not changing.
+
+        # Set changing flag on
+        self._is_changing = True
+
+        # If notify events
+        if notify:
+            # Notify pre-change event
+            self.handler_notify(self.ITEMS_CHANGE_SOON)
+
+        # Ensure the items can be changed
+        self._items_make_list()
+
+        # For each item to add
+        for item in items:
+            # Get the item's index
+            index = len(self._items)
+
+            # Add the item to the items list
+            self._items.append(item)
+
+            # Insert the item into listbox widget
+            self._listbox_widget_insert(index, item)
+
+        # If notify events
+        if notify:
+            # Notify post-change event
+            self.handler_notify(self.ITEMS_CHANGE_DONE)
+
+        # Set changing flag off
+        self._is_changing = False
+
     def item_remove(
         self,
         index,
@@ -734,6 +804,9 @@ class ListboxVidget(Vidget, Eventor):
         # Get old active index
         active_index = self.indexcur()
 
+        # Ensure the items can be changed
+        self._items_make_list()
+
         # Remove item at the index
         del self._items[index]
 
@@ -876,6 +949,17 @@ class ListboxVidget(Vidget, Eventor):
         # Updates active index
         self.indexcur_set_by_event(event, notify=True)
 
+    def _items_make_list(self):
+        """
+        Copy the items to a list if they are a read-only sequence.
+
+        @return: None.
+        """
+        # If the items is not list
+        if not isinstance(self._items, list):
+            # Copy the items to a list
+            self._items = list(self._items)
+
     def _listbox_widget_update(
         self,
         keep_active,
@@ -893,23 +977,8 @@ class ListboxVidget(Vidget, Eventor):
         # Insert new items into listbox widget.
         # For each ListboxVidget items.
         for index, item in enumerate(self.items()):
-            # Get item text
-            item_text = self._item_to_text(item)
-
-            # Insert the item text into listbox widget
-            self._listbox.insert(index, item_text)
-
-            # Set the item's normal background color
-            self._listbox.itemconfig(index, background=self._normal_bg)
-
-            # Set the item's normal foreground color
-            self._listbox.itemconfig(index, foreground=self._normal_fg)
-
-            # Set the item's selected background color
-            self._listbox.itemconfig(index, selectbackground=self._selected_bg)
-
-            # Set the item's selected foreground color
-            self._listbox.itemconfig(index, selectforeground=self._selected_fg)
+            # Insert the item into listbox widget
+            self._listbox_widget_insert(index, item)
 
         # If keep active index
         if keep_active:
@@ -942,3 +1011,31 @@ class ListboxVidget(Vidget, Eventor):
 
             # Make the active item visible
             self._listbox.see(indexcur)
+
+    def _listbox_widget_insert(self, index, item):
+        """
+        Insert an item's text into listbox widget.
+
+        @param index: Index to insert.
+
+        @param item: Item.
+
+        @return: None.
+        """
+        # Get item text
+        item_text = self._item_to_text(item)
+
+        # Insert the item text into listbox widget
+        self._listbox.insert(index, item_text)
+
+        # Set the item's normal background color
+        self._listbox.itemconfig(index, background=self._normal_bg)
+
+        # Set the item's normal foreground color
+        self._listbox.itemconfig(index, foreground=self._normal_fg)
+
+        # Set the item's selected background color
+        self._listbox.itemconfig(index, selectbackground=self._selected_bg)
+
+        # Set the item's selected foreground color
+        self._listbox.itemconfig(index, selectforeground=self._selected_fg)
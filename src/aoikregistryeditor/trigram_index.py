@@ -0,0 +1,685 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from array import array
+from itertools import accumulate
+from itertools import chain
+from itertools import groupby
+
+from .key_index import KeyIndex
+from .key_index import STRING_TYPES
+from .key_index import subtree_where
+from .regpath import path_normalize
+from .search import RegexMatcher
+from .search import key_search
+from .search import matchers_create
+
+
+# Number of characters in a gram
+_GRAM_SIZE = 3
+
+# Number of pending postings that triggers a flush
+_FLUSH_POSTING_COUNT = 2000000
+
+# Number of doc IDs per SQL `IN` query
+_SQL_BATCH_SIZE = 500
+
+# Posting array typecodes, from narrowest to widest, with their max values
+_POSTING_TYPECODES = (('B', 0xFF), ('H', 0xFFFF), ('I', 0xFFFFFFFF))
+
+
+#
+def trigrams(string):
+    """
+    Get trigrams of a string, casefolded.
+
+    @param string: String.
+
+    @return: Set of trigram strings. Empty if the string is shorter than a
+    trigram.
+    """
+    # Casefold the string
+    string = string.casefold()
+
+    # Return trigrams set
+    return set(
+        string[x:x + _GRAM_SIZE]
+        for x in range(len(string) - _GRAM_SIZE + 1)
+    )
+
+
+#
+def _key_trigrams(path, field_s):
+    """
+    Get trigrams of a key's name, field names, and string data.
+
+    @param path: Registry key path.
+
+    @param field_s: FieldTable with data loaded.
+
+    @return: Set of trigram strings.
+    """
+    # Get trigrams of the key name
+    gram_s = trigrams(path.rpartition('\\')[2])
+
+    # Get data column
+    data_s = field_s.datas()
+
+    # For each field's name and type
+    for index, (name, type) in enumerate(
+        zip(field_s.names(), field_s.types())
+    ):
+        # Add trigrams of the field name
+        gram_s.update(trigrams(name))
+
+        # If have no data, or the field type is not string type
+        if data_s is None or type not in STRING_TYPES:
+            # Skip the data
+            continue
+
+        # Get field data
+        data = data_s[index]
+
+        # If the field data is multi-string
+        if isinstance(data, list):
+            # For each string
+            for string in data:
+                # Add trigrams of the string
+                gram_s.update(trigrams(string))
+
+        # If the field data is string
+        elif isinstance(data, str):
+            # Add trigrams of the string
+            gram_s.update(trigrams(data))
+
+    # Return trigrams set
+    return gram_s
+
+
+#
+def _postings_encode(doc_id_s):
+    """
+    Encode ascending doc IDs as a delta-encoded array.
+
+    @param doc_id_s: Ascending doc IDs, not empty.
+
+    @return: Encoded bytes: typecode byte, then deltas array in native byte
+    order. The first delta is relative to zero.
+    """
+    # Get deltas
+    delta_s = [b - a for a, b in zip(chain((0,), doc_id_s), doc_id_s)]
+
+    # Get max delta
+    delta_max = max(delta_s)
+
+    # For each typecode, from narrowest to widest
+    for typecode, value_max in _POSTING_TYPECODES:
+        # If the typecode fits the max delta
+        if delta_max <= value_max:
+            # Stop finding
+            break
+
+    # Return encoded bytes
+    return typecode.encode('ascii') + array(typecode, delta_s).tobytes()
+
+
+#
+def _postings_decode(data):
+    """
+    Decode a delta-encoded array created by `_postings_encode`.
+
+    @param data: Encoded bytes.
+
+    @return: Ascending doc IDs list.
+    """
+    # Create deltas array of the typecode
+    delta_s = array(chr(data[0]))
+
+    # Read deltas
+    delta_s.frombytes(data[1:])
+
+    # Return doc IDs
+    return list(accumulate(delta_s))
+
+
+#
+class TrigramIndex(KeyIndex):
+    """
+    TrigramIndex is an on-disk SQLite inverted index from trigrams of key
+    names, field names, and string data to the keys containing them, so that
+    substring queries look up candidate keys instead of scanning everything.
+
+    Each indexed key is a doc with an ascending doc ID. Posting lists are
+    stored as delta-encoded arrays, see `_postings_encode`, in segments:
+    each flush appends one segment per touched trigram, and `compact` merges
+    them. Re-indexing or removing a key drops its doc row but leaves its
+    doc ID in posting lists until `compact`, and queries skip such IDs.
+
+    Queries casefold trigrams, intersect the posting lists of the query's
+    trigrams, and verify the candidates against the current data, so stale
+    entries never produce wrong hits, only missed ones until refreshed.
+
+    Building, refreshing, and watching are inherited from `KeyIndex`.
+    """
+
+    # Index schema version. Indexes of other versions are rebuilt.
+    _SCHEMA_VERSION = '1'
+
+    # Keys table name
+    _KEYS_TABLE = 'docs'
+
+    # SQL script creating tables other than the meta table
+    _SCHEMA_SQL = """
+        CREATE TABLE docs (
+            doc_id INTEGER PRIMARY KEY,
+            path_key TEXT NOT NULL UNIQUE,
+            path TEXT NOT NULL,
+            last_write_time INTEGER NOT NULL
+        );
+        CREATE TABLE postings (
+            trigram TEXT NOT NULL,
+            segment INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (trigram, segment)
+        ) WITHOUT ROWID;
+        """
+
+    # Initial meta counters
+    _META_DEFAULTS = (
+        ('doc_id_next', '1'),
+        ('segment_next', '1'),
+        ('dead_count', '0'),
+    )
+
+    def __init__(self, index_path, rebuild=False):
+        """
+        Initialize object. Open the index file, creating it if it not exists
+        or is not valid.
+
+        @param index_path: Index file path.
+
+        @param rebuild: Whether discard the existing index file.
+
+        @return: None.
+        """
+        # Pending postings dict.
+        # Key is trigram.
+        # Value is `array('I')` of ascending doc IDs.
+        self._pending_s = {}
+
+        # Number of pending postings
+        self._pending_count = 0
+
+        # Open the index file
+        super(TrigramIndex, self).__init__(index_path, rebuild=rebuild)
+
+        # Get meta dict
+        meta = dict(self._conn.execute('SELECT key, value FROM meta'))
+
+        # Next doc ID
+        self._doc_id_next = int(meta['doc_id_next'])
+
+        # Next segment number
+        self._segment_next = int(meta['segment_next'])
+
+        # Number of dropped docs whose IDs are in posting lists
+        self._dead_count = int(meta['dead_count'])
+
+    def stats(self):
+        """
+        Get index statistics.
+
+        @return: Statistics dict with keys `keys`, `dead_keys`, `trigrams`,
+        `segments`, and `bytes`. `dead_keys` is number of dropped keys whose
+        IDs are in posting lists until `compact`. `segments` is number of
+        posting list segments. `bytes` is size of encoded posting lists.
+        """
+        with self._lock:
+            # Flush pending postings
+            self.flush()
+
+            # Query posting statistics
+            trigram_count, segment_count, byte_count = self._conn.execute(
+                'SELECT COUNT(DISTINCT trigram), COUNT(*),'
+                ' COALESCE(SUM(LENGTH(data)), 0) FROM postings'
+            ).fetchone()
+
+            # Return statistics dict
+            return {
+                'keys': self.size(),
+                'dead_keys': self._dead_count,
+                'trigrams': trigram_count,
+                'segments': segment_count,
+                'bytes': byte_count,
+            }
+
+    def _keys_drop(self, where, args):
+        """
+        Drop doc rows. Their doc IDs stay in posting lists until `compact`.
+
+        @param where: SQL condition.
+
+        @param args: SQL condition arguments.
+
+        @return: Number of dropped docs.
+        """
+        # Delete the doc rows
+        drop_count = self._conn.execute(
+            'DELETE FROM docs WHERE ' + where, args
+        ).rowcount
+
+        # Increment number of dead docs
+        self._dead_count += drop_count
+
+        # Return number of dropped docs
+        return drop_count
+
+    def key_update(self, path, field_s, last_write_time=0):
+        """
+        Index a key, replacing its old doc if any.
+        Postings are pending until `flush`.
+
+        @param path: Registry key path.
+
+        @param field_s: FieldTable with data loaded. Data of non-string types
+        are not used and can be None.
+
+        @param last_write_time: The key's last write time, used by `refresh`.
+
+        @return: None.
+        """
+        # Get normalized path, so that paths given with hive alias or full
+        # hive name share one doc
+        path = path_normalize(path)
+
+        # Get the key's trigrams
+        gram_s = _key_trigrams(path, field_s)
+
+        with self._lock:
+            # Get casefolded path
+            path_key = path.casefold()
+
+            # Drop the key's old doc
+            self._keys_drop('path_key = ?', (path_key,))
+
+            # Get new doc ID
+            doc_id = self._doc_id_next
+
+            self._doc_id_next += 1
+
+            # Insert the doc row
+            self._conn.execute(
+                'INSERT INTO docs VALUES (?, ?, ?, ?)',
+                (doc_id, path_key, path, last_write_time),
+            )
+
+            # Get pending postings dict
+            pending_s = self._pending_s
+
+            # For each trigram
+            for gram in gram_s:
+                # Get the trigram's pending doc IDs
+                doc_id_s = pending_s.get(gram, None)
+
+                # If the trigram has no pending doc IDs
+                if doc_id_s is None:
+                    # Create pending doc IDs array
+                    doc_id_s = pending_s[gram] = array('I')
+
+                # Add the doc ID.
+                # Doc IDs are ascending because new IDs are always greater.
+                doc_id_s.append(doc_id)
+
+            # Increment number of pending postings
+            self._pending_count += len(gram_s)
+
+            # If pending postings are too many
+            if self._pending_count >= _FLUSH_POSTING_COUNT:
+                # Flush pending postings
+                self.flush()
+
+    def _commit(self):
+        """
+        Store meta counters and commit.
+
+        @return: None.
+        """
+        # Store meta counters
+        self._conn.executemany(
+            'UPDATE meta SET value = ? WHERE key = ?',
+            [
+                (str(self._doc_id_next), 'doc_id_next'),
+                (str(self._segment_next), 'segment_next'),
+                (str(self._dead_count), 'dead_count'),
+            ],
+        )
+
+        # Commit
+        self._conn.commit()
+
+    def flush(self):
+        """
+        Write pending postings as a new segment, and commit.
+
+        @return: None.
+        """
+        with self._lock:
+            # If have pending postings
+            if self._pending_s:
+                # Get segment number
+                segment = self._segment_next
+
+                self._segment_next += 1
+
+                # Insert a segment row for each pending trigram
+                self._conn.executemany(
+                    'INSERT INTO postings VALUES (?, ?, ?)',
+                    (
+                        (gram, segment, _postings_encode(doc_id_s))
+                        for gram, doc_id_s in self._pending_s.items()
+                    ),
+                )
+
+                # Clear pending postings
+                self._pending_s = {}
+
+                self._pending_count = 0
+
+            # Store meta counters and commit
+            self._commit()
+
+    def compact(self):
+        """
+        Merge posting list segments, dropping doc IDs of dropped docs.
+
+        @return: None.
+        """
+        with self._lock:
+            # Flush pending postings
+            self.flush()
+
+            # Get live doc IDs
+            live_id_s = set(
+                row[0] for row in self._conn.execute('SELECT doc_id FROM docs')
+            )
+
+            # Create table of merged posting lists
+            self._conn.execute('DROP TABLE IF EXISTS postings_new')
+
+            self._conn.execute(
+                'CREATE TABLE postings_new ('
+                ' trigram TEXT NOT NULL,'
+                ' segment INTEGER NOT NULL,'
+                ' data BLOB NOT NULL,'
+                ' PRIMARY KEY (trigram, segment)'
+                ') WITHOUT ROWID'
+            )
+
+            # Create merged rows generator
+            def row_s_merged():
+                # Read segment rows in trigram order, then segment order.
+                # Use a separate cursor because rows are inserted meanwhile.
+                row_s = self._conn.cursor().execute(
+                    'SELECT trigram, data FROM postings'
+                    ' ORDER BY trigram, segment'
+                )
+
+                # For each trigram's segment rows
+                for gram, gram_row_s in groupby(row_s, key=lambda x: x[0]):
+                    # Get live doc IDs of all segments, in segment order,
+                    # which is ascending
+                    doc_id_s = [
+                        doc_id
+                        for _, data in gram_row_s
+                        for doc_id in _postings_decode(data)
+                        if doc_id in live_id_s
+                    ]
+
+                    # If have live doc IDs
+                    if doc_id_s:
+                        # Yield merged row
+                        yield gram, 0, _postings_encode(doc_id_s)
+
+            # Insert merged rows
+            self._conn.executemany(
+                'INSERT INTO postings_new VALUES (?, ?, ?)', row_s_merged()
+            )
+
+            # Replace posting lists table
+            self._conn.execute('DROP TABLE postings')
+
+            self._conn.execute('ALTER TABLE postings_new RENAME TO postings')
+
+            # Reset number of dead docs
+            self._dead_count = 0
+
+            # Store meta counters and commit
+            self._commit()
+
+            # Reclaim space of the dropped table
+            self._conn.execute('VACUUM')
+
+    def _postings(self, gram):
+        """
+        Get posting list of a trigram, with all segments.
+
+        @param gram: Trigram.
+
+        @return: Ascending doc IDs list.
+        """
+        # Doc IDs list
+        doc_id_s = []
+
+        # For each segment, in segment order, which is ascending in doc IDs
+        for row in self._conn.execute(
+            'SELECT data FROM postings WHERE trigram = ? ORDER BY segment',
+            (gram,),
+        ):
+            # Add the segment's doc IDs
+            doc_id_s.extend(_postings_decode(row[0]))
+
+        # Return doc IDs list
+        return doc_id_s
+
+    def candidates(self, text, path=''):
+        """
+        Find keys whose indexed strings may contain given text, ignoring case.
+
+        @param text: Text to find.
+
+        @param path: Registry key path of the subtree to find in. Empty
+        string means all indexed keys.
+
+        @return: Candidate key paths list, in casefolded path order. If the
+        text is shorter than a trigram, all indexed keys of the subtree.
+        """
+        # Get the text's trigrams
+        gram_s = trigrams(text)
+
+        # Get SQL condition matching docs of the subtree
+        where, where_args = subtree_where(path)
+
+        with self._lock:
+            # Flush pending postings
+            self.flush()
+
+            # If the text has no trigrams
+            if not gram_s:
+                # Return all indexed keys of the subtree
+                return [
+                    row[0] for row in self._conn.execute(
+                        'SELECT path FROM docs WHERE ' + where
+                        + ' ORDER BY path_key',
+                        where_args,
+                    )
+                ]
+
+            # If the text has trigrams.
+
+            # Get posting lists, shortest first
+            posting_s = sorted(
+                (self._postings(x) for x in gram_s), key=len
+            )
+
+            # Intersect the posting lists
+            doc_id_s = set(posting_s[0])
+
+            # For each other posting list
+            for posting in posting_s[1:]:
+                # If the intersection is empty
+                if not doc_id_s:
+                    # Stop intersecting
+                    break
+
+                # Intersect the posting list
+                doc_id_s.intersection_update(posting)
+
+            # Get doc IDs list
+            doc_id_s = list(doc_id_s)
+
+            # Rows of live docs
+            row_s = []
+
+            # For each batch of doc IDs
+            for start in range(0, len(doc_id_s), _SQL_BATCH_SIZE):
+                # Get the batch
+                batch = doc_id_s[start:start + _SQL_BATCH_SIZE]
+
+                # Query live docs of the batch in the subtree
+                row_s.extend(self._conn.execute(
+                    'SELECT path_key, path FROM docs WHERE doc_id IN ({})'
+                    ' AND {}'.format(','.join('?' * len(batch)), where),
+                    tuple(batch) + tuple(where_args),
+                ))
+
+        # Sort rows by casefolded path
+        row_s.sort()
+
+        # Return candidate key paths
+        return [row[1] for row in row_s]
+
+    def search(
+        self,
+        text,
+        regkey_get,
+        path='',
+        match_keys=True,
+        match_names=True,
+        match_data=True,
+        case_sensitive=False,
+        regex=False,
+    ):
+        """
+        Search indexed keys, verifying candidates against current data.
+        See `search.key_search`.
+
+        In regex mode, candidates are keys containing all the pattern's
+        required literals that are at least a trigram long, see
+        `search.RegexMatcher`. Patterns without such literals verify all
+        indexed keys.
+
+        @param text: Text to find, or regex pattern if `regex` is on.
+
+        @param regkey_get: RegKey getter function used to verify candidates.
+
+        @param path: Registry key path of the subtree to search in. Empty
+        string means all indexed keys.
+
+        @param match_keys: Whether match key names.
+
+        @param match_names: Whether match field names.
+
+        @param match_data: Whether match string data of fields.
+
+        @param case_sensitive: Whether match case.
+
+        @param regex: Whether the text is a regex pattern.
+
+        @return: Generator of SearchHit objects. Raise ValueError if the
+        query is not valid.
+        """
+        # Create matcher function.
+        # May raise ValueError.
+        match, _ = matchers_create(
+            text, case_sensitive=case_sensitive, regex=regex
+        )
+
+        # If the text is not regex pattern
+        if not regex:
+            # Get candidate key paths
+            key_path_s = self.candidates(text, path=path)
+
+        # If the text is regex pattern
+        else:
+            # Get the pattern's required literals that have trigrams
+            literal_s = [
+                x for x in RegexMatcher(
+                    text, case_sensitive=case_sensitive
+                ).literals() if trigrams(x)
+            ]
+
+            # If have no such literals
+            if not literal_s:
+                # Use all indexed keys of the subtree
+                key_path_s = self.candidates('', path=path)
+
+            # If have such literals
+            else:
+                # Get candidate key paths of the first literal
+                key_path_s = self.candidates(literal_s[0], path=path)
+
+                # For each other literal
+                for literal in literal_s[1:]:
+                    # Get candidate key paths set of the literal
+                    key_path_set = set(self.candidates(literal, path=path))
+
+                    # Keep candidate key paths of all literals, in order
+                    key_path_s = [x for x in key_path_s if x in key_path_set]
+
+        # Whether need fields
+        include_values = match_names or match_data
+
+        # For each candidate key path
+        for key_path in key_path_s:
+            # If need fields
+            if include_values:
+                # Open the key
+                regkey = regkey_get(key_path)
+
+                # If failed opening the key
+                if regkey is None:
+                    # Skip the key
+                    continue
+
+                # If not failed opening the key.
+
+                try:
+                    # Get fields with data
+                    field_s = regkey.fields(with_data=True, as_table=True)
+
+                # If have error
+                except Exception:
+                    # Skip the key
+                    continue
+
+                finally:
+                    # Close the key
+                    regkey.close()
+
+            # If not need fields
+            else:
+                # Set fields to None
+                field_s = None
+
+            # For each verified hit in the key
+            for hit in key_search(
+                key_path,
+                field_s,
+                match,
+                match_keys=match_keys,
+                match_names=match_names,
+                match_data=match_data,
+            ):
+                # Yield the hit
+                yield hit
@@ -383,6 +383,24 @@ def configure_ui(info):
     # Set field add dialog's cancel button's outer padding
     field_add_dialog.cancel_button().grid(pady=(15, 0))
 
+    # Get search dialog
+    search_dialog = info['search_dialog']
+
+    # Set search dialog's geometry
+    search_dialog.toplevel().geometry('600x400')
+
+    # Set search dialog's background
+    search_dialog.toplevel().config(background=bg_color)
+
+    # Set search dialog's main frame's outer padding
+    search_dialog.main_frame().grid(padx=5, pady=5)
+
+    # Set search dialog's confirm button's outer padding
+    search_dialog.confirm_button().grid(pady=(5, 0))
+
+    # Set search dialog's cancel button's outer padding
+    search_dialog.cancel_button().grid(pady=(5, 0))
+
     # Set field add dialog's field add type label's outer padding
     editor._field_add_type_label.grid(
         pady=(10, 0),
@@ -0,0 +1,12 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import os.path
+import sys
+
+
+# Make the package importable without installing it
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src')
+)
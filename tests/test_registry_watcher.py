@@ -0,0 +1,296 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from queue import Empty
+from queue import Queue
+import threading
+
+import pytest
+
+from aoikregistryeditor.registry_watcher import RegChangeNotifier
+from aoikregistryeditor.registry_watcher import RegKeyWatcher
+
+
+# Seconds to wait for worker threads
+_TIMEOUT = 5
+
+
+#
+class _FakeNotifier(RegChangeNotifier):
+    """
+    Stand-in notifier whose `wait` returns changes fed by the test.
+    """
+
+    def __init__(self, path, subtree):
+        # Watched registry key path
+        self.path = path
+
+        # Whether descendant keys are watched
+        self.subtree = subtree
+
+        # Fed changes. Each item is a list of change kinds, an error to
+        # raise, or None meaning canceled.
+        self._queue = Queue()
+
+        # Number of `wait` calls, i.e. times the notifier is armed
+        self.wait_count = 0
+
+        # Set when `wait` is called, cleared by the test
+        self.waiting = threading.Event()
+
+        # Set when `close` is called
+        self.closed = threading.Event()
+
+    def feed(self, item):
+        # Feed a change list or an error
+        self._queue.put(item)
+
+    def wait(self):
+        # Increment wait count
+        self.wait_count += 1
+
+        # Tell the test the notifier is armed
+        self.waiting.set()
+
+        # Block until an item is fed
+        item = self._queue.get()
+
+        # If canceled
+        if item is None:
+            # Return no changes
+            return []
+
+        # If the item is error
+        if isinstance(item, Exception):
+            # Raise the error
+            raise item
+
+        # Return the changes
+        return item
+
+    def cancel(self):
+        # Wake up the blocking `wait` call
+        self._queue.put(None)
+
+    def close(self):
+        # Mark as closed
+        self.closed.set()
+
+
+#
+@pytest.fixture
+def watcher():
+    # Created notifiers. Key is path.
+    notifier_s = {}
+
+    #
+    def notifier_factory(path, subtree):
+        # If the key can not be watched
+        if path.endswith('Missing'):
+            # Raise error
+            raise OSError(path)
+
+        # Create notifier
+        notifier = notifier_s[path] = _FakeNotifier(path, subtree)
+
+        # Return the notifier
+        return notifier
+
+    # Create watcher
+    watcher = RegKeyWatcher(notifier_factory=notifier_factory)
+
+    # Expose created notifiers
+    watcher.notifiers = notifier_s
+
+    yield watcher
+
+    # Stop all workers
+    watcher.unwatch_all(join=True)
+
+
+#
+def _events_collect(watcher):
+    # Events queue. Each item is a tuple: (event, path).
+    event_queue = Queue()
+
+    # For each change event
+    for event in [watcher.KEY_CHANGED, watcher.VALUE_CHANGED]:
+        # Add handler putting the event and its path argument to the queue
+        watcher.handler_add(
+            event,
+            (lambda path, event=event: event_queue.put((event, path))),
+            need_arg=True,
+        )
+
+    # Return the events queue
+    return event_queue
+
+
+#
+def _events_get(event_queue, count):
+    # Return given number of events
+    return [event_queue.get(timeout=_TIMEOUT) for _ in range(count)]
+
+
+#
+def _armed_wait(notifier, wait_count):
+    # Wait until the notifier has been armed given number of times
+    while notifier.wait_count < wait_count:
+        assert notifier.waiting.wait(_TIMEOUT)
+
+        notifier.waiting.clear()
+
+
+#
+def test_changes_notify_events_with_path(watcher):
+    event_queue = _events_collect(watcher)
+
+    watcher.watch('HKCU\\A', subtree=False)
+
+    notifier = watcher.notifiers['HKCU\\A']
+
+    assert notifier.subtree is False
+
+    # Both change kinds in one wake-up, `KEY_CHANGED` is notified first
+    notifier.feed([
+        RegChangeNotifier.VALUE_CHANGED, RegChangeNotifier.KEY_CHANGED,
+    ])
+
+    assert _events_get(event_queue, 2) == [
+        (watcher.KEY_CHANGED, 'HKCU\\A'),
+        (watcher.VALUE_CHANGED, 'HKCU\\A'),
+    ]
+
+
+#
+def test_notifier_is_rearmed_after_each_change(watcher):
+    event_queue = _events_collect(watcher)
+
+    watcher.watch('HKCU\\A')
+
+    notifier = watcher.notifiers['HKCU\\A']
+
+    # For each change
+    for index in range(3):
+        # Wait until the notifier is armed again
+        _armed_wait(notifier, index + 1)
+
+        notifier.feed([RegChangeNotifier.VALUE_CHANGED])
+
+        assert _events_get(event_queue, 1) == [
+            (watcher.VALUE_CHANGED, 'HKCU\\A'),
+        ]
+
+    # An empty change list notifies nothing and re-arms
+    _armed_wait(notifier, 4)
+
+    notifier.feed([])
+
+    _armed_wait(notifier, 5)
+
+    with pytest.raises(Empty):
+        event_queue.get(timeout=0.05)
+
+    assert watcher.watched_paths() == ['HKCU\\A']
+
+
+#
+def test_notifier_error_reports_key_change_and_stops(watcher):
+    event_queue = _events_collect(watcher)
+
+    watcher.watch('HKCU\\A')
+
+    notifier = watcher.notifiers['HKCU\\A']
+
+    # The key can no longer be watched, e.g. deleted
+    notifier.feed(OSError('deleted'))
+
+    assert _events_get(event_queue, 1) == [
+        (watcher.KEY_CHANGED, 'HKCU\\A'),
+    ]
+
+    assert notifier.closed.wait(_TIMEOUT)
+
+    assert notifier.wait_count == 1
+
+    # Watching again creates a new notifier
+    watcher.watch('HKCU\\A')
+
+    assert watcher.notifiers['HKCU\\A'] is not notifier
+
+
+#
+def test_unwatch_cancels_without_events(watcher):
+    event_queue = _events_collect(watcher)
+
+    watcher.watch('HKCU\\A')
+
+    watcher.watch('HKCU\\B')
+
+    notifier = watcher.notifiers['HKCU\\A']
+
+    _armed_wait(notifier, 1)
+
+    watcher.unwatch('HKCU\\A', join=True)
+
+    assert notifier.closed.is_set()
+
+    assert watcher.watched_paths() == ['HKCU\\B']
+
+    with pytest.raises(Empty):
+        event_queue.get(timeout=0.05)
+
+
+#
+def test_watch_twice_keeps_one_worker(watcher):
+    watcher.watch('HKCU\\A')
+
+    notifier = watcher.notifiers['HKCU\\A']
+
+    watcher.watch('HKCU\\A')
+
+    assert watcher.notifiers['HKCU\\A'] is notifier
+
+
+#
+def test_watch_error_is_raised(watcher):
+    with pytest.raises(OSError):
+        watcher.watch('HKCU\\Missing')
+
+    assert watcher.watched_paths() == []
+
+
+#
+def test_handler_without_arg_and_removal(watcher):
+    # Number of handler calls
+    call_s = []
+
+    # Event set on each call
+    called = threading.Event()
+
+    #
+    def handler():
+        call_s.append(None)
+
+        called.set()
+
+    watcher.handler_add(watcher.KEY_CHANGED, handler)
+
+    watcher.watch('HKCU\\A')
+
+    notifier = watcher.notifiers['HKCU\\A']
+
+    notifier.feed([RegChangeNotifier.KEY_CHANGED])
+
+    assert called.wait(_TIMEOUT)
+
+    watcher.handler_remove(handler)
+
+    _armed_wait(notifier, 2)
+
+    notifier.feed([RegChangeNotifier.KEY_CHANGED])
+
+    _armed_wait(notifier, 3)
+
+    assert len(call_s) == 1
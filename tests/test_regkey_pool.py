@@ -0,0 +1,272 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+import threading
+import time
+
+import pytest
+
+from aoikregistryeditor.regkey_pool import RegKeyHandlePool
+
+
+#
+class _Handles(object):
+    """
+    Stand-in open and close functions that record calls.
+    """
+
+    def __init__(self, open_delay=0):
+        # Number of handles opened
+        self.open_count = 0
+
+        # Handles closed, in close order
+        self.closed = []
+
+        # Seconds each open takes
+        self._open_delay = open_delay
+
+        # Lock that guards the counters
+        self._lock = threading.Lock()
+
+    def open(self, path, mask):
+        # If open is slow
+        if self._open_delay:
+            # Simulate a slow open
+            time.sleep(self._open_delay)
+
+        with self._lock:
+            # Increment open count
+            self.open_count += 1
+
+            # Return a distinct handle
+            return (str(path), mask, self.open_count)
+
+    def close(self, handle):
+        with self._lock:
+            # Record the closed handle
+            self.closed.append(handle)
+
+
+#
+def _pool_create(capacity=None, open_delay=0):
+    # Create stand-in functions
+    handles = _Handles(open_delay=open_delay)
+
+    # Create pool
+    pool = RegKeyHandlePool(
+        open_func=handles.open,
+        close_func=handles.close,
+        capacity=capacity,
+    )
+
+    # Return the pool and stand-in functions
+    return pool, handles
+
+
+#
+def test_acquire_reuses_cached_handle_for_path_aliases():
+    pool, handles = _pool_create()
+
+    handle = pool.acquire('HKLM\\Software', 1)
+
+    pool.release('HKLM\\Software', 1, handle)
+
+    # Paths differing in hive alias and case share one handle
+    assert pool.acquire('HKEY_LOCAL_MACHINE\\software', 1) is handle
+
+    assert handles.open_count == 1
+
+    assert pool.stats()['hits'] == 1
+
+    assert pool.stats()['misses'] == 1
+
+
+#
+def test_acquire_separates_masks():
+    pool, handles = _pool_create()
+
+    handle_1 = pool.acquire('HKCU\\A', 1)
+
+    handle_2 = pool.acquire('HKCU\\A', 2)
+
+    assert handle_1 is not handle_2
+
+    assert handles.open_count == 2
+
+
+#
+def test_acquire_error_is_not_cached():
+    #
+    def open_func(path, mask):
+        raise OSError(path)
+
+    pool = RegKeyHandlePool(open_func=open_func, close_func=lambda h: None)
+
+    with pytest.raises(OSError):
+        pool.acquire('HKCU\\Missing', 1)
+
+    assert pool.size() == 0
+
+
+#
+def test_evict_keeps_leased_handles():
+    pool, handles = _pool_create(capacity=1)
+
+    handle_a = pool.acquire('HKCU\\A', 1)
+
+    handle_b = pool.acquire('HKCU\\B', 1)
+
+    # Both handles are leased, so none is evicted
+    assert pool.size() == 2
+
+    assert handles.closed == []
+
+    pool.release('HKCU\\A', 1, handle_a)
+
+    # The least recently used unleased handle is evicted
+    assert handles.closed == [handle_a]
+
+    assert pool.size() == 1
+
+    pool.release('HKCU\\B', 1, handle_b)
+
+    assert pool.size() == 1
+
+
+#
+def test_discard_orphans_leased_handles():
+    pool, handles = _pool_create()
+
+    handle = pool.acquire('HKCU\\A', 1)
+
+    child_handle = pool.acquire('HKCU\\A\\B', 1)
+
+    pool.release('HKCU\\A\\B', 1, child_handle)
+
+    other_handle = pool.acquire('HKCU\\AB', 1)
+
+    pool.discard('HKCU\\A')
+
+    # The unleased descendant handle is closed, the sibling is kept
+    assert handles.closed == [child_handle]
+
+    assert pool.stats()['orphans'] == 1
+
+    # A new handle is opened for the discarded path
+    new_handle = pool.acquire('HKCU\\A', 1)
+
+    assert new_handle is not handle
+
+    # Giving back the orphan's lease closes it, not the new handle
+    pool.release('HKCU\\A', 1, handle)
+
+    assert handles.closed == [child_handle, handle]
+
+    assert pool.stats()['orphans'] == 0
+
+    pool.release('HKCU\\A', 1, new_handle)
+
+    pool.release('HKCU\\AB', 1, other_handle)
+
+    assert pool.size() == 2
+
+
+#
+def test_release_unleased_raises():
+    pool, _ = _pool_create()
+
+    handle = pool.acquire('HKCU\\A', 1)
+
+    pool.release('HKCU\\A', 1, handle)
+
+    with pytest.raises(ValueError):
+        pool.release('HKCU\\A', 1, handle)
+
+
+#
+def test_clear_closes_unleased_and_orphans_leased():
+    pool, handles = _pool_create()
+
+    handle_a = pool.acquire('HKCU\\A', 1)
+
+    handle_b = pool.acquire('HKCU\\B', 1)
+
+    pool.release('HKCU\\B', 1, handle_b)
+
+    pool.clear()
+
+    assert handles.closed == [handle_b]
+
+    assert pool.size() == 0
+
+    pool.release('HKCU\\A', 1, handle_a)
+
+    assert handles.closed == [handle_b, handle_a]
+
+
+#
+def test_capacity_set_evicts():
+    pool, handles = _pool_create(capacity=4)
+
+    for name in 'ABC':
+        path = 'HKCU\\' + name
+
+        pool.release(path, 1, pool.acquire(path, 1))
+
+    pool.capacity_set(1)
+
+    assert pool.size() == 1
+
+    assert len(handles.closed) == 2
+
+    with pytest.raises(ValueError):
+        pool.capacity_set(-1)
+
+
+#
+def test_concurrent_acquire_opens_outside_lock():
+    pool, handles = _pool_create(open_delay=0.05)
+
+    # Handles got by threads
+    result_s = []
+
+    # Lock that guards the results list
+    result_lock = threading.Lock()
+
+    #
+    def acquire(path):
+        handle = pool.acquire(path, 1)
+
+        with result_lock:
+            result_s.append((path, handle))
+
+    # Two threads per path
+    thread_s = [
+        threading.Thread(target=acquire, args=('HKCU\\' + name,))
+        for name in 'ABCDABCD'
+    ]
+
+    start_time = time.time()
+
+    for thread in thread_s:
+        thread.start()
+
+    for thread in thread_s:
+        thread.join()
+
+    # Slow opens run in parallel instead of one after another
+    assert time.time() - start_time < 0.05 * len(thread_s)
+
+    # Each path is cached once, and duplicate handles are closed
+    assert pool.size() == 4
+
+    assert len(handles.closed) == handles.open_count - 4
+
+    # Threads acquiring the same path share the cached handle
+    for path, handle in result_s:
+        assert handle not in handles.closed
+
+        pool.release(path, 1, handle)
+
+    assert pool.stats()['orphans'] == 0
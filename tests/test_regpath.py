@@ -0,0 +1,26 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from aoikregistryeditor.regpath import HIVE_NAME_TO_INT
+from aoikregistryeditor.regpath import RegPath
+
+
+#
+def test_hive_ints_are_signed_like_win32con():
+    # Values of the `HKEY_*` constants in `win32con`
+    assert dict(HIVE_NAME_TO_INT) == {
+        'HKEY_CLASSES_ROOT': -2147483648,
+        'HKEY_CURRENT_USER': -2147483647,
+        'HKEY_LOCAL_MACHINE': -2147483646,
+        'HKEY_USERS': -2147483645,
+        'HKEY_CURRENT_CONFIG': -2147483643,
+    }
+
+
+#
+def test_hive_int_of_alias_path():
+    assert RegPath.of('hklm\\Software').hive_int() \
+        == HIVE_NAME_TO_INT['HKEY_LOCAL_MACHINE']
+
+    assert RegPath.of('').hive_int() is None
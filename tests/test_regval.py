@@ -0,0 +1,71 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from array import array
+
+from aoikregistryeditor.regfile import value_text
+from aoikregistryeditor.regval import FieldTable
+from aoikregistryeditor.regval import REG_BINARY
+from aoikregistryeditor.regval import REG_DWORD
+from aoikregistryeditor.regval import REG_DWORD_BIG_ENDIAN
+from aoikregistryeditor.regval import REG_MULTI_SZ
+from aoikregistryeditor.regval import REG_QWORD
+from aoikregistryeditor.regval import REG_SZ
+from aoikregistryeditor.regval import data_decode
+from aoikregistryeditor.regval import data_encode
+
+
+#
+def test_data_encode_round_trip():
+    for type, data in [
+        (REG_SZ, 'abc'),
+        (REG_MULTI_SZ, ['a', 'bc']),
+        (REG_DWORD, 0x12345678),
+        (REG_DWORD_BIG_ENDIAN, 0x12345678),
+        (REG_QWORD, 0x123456789ABCDEF0),
+        (REG_BINARY, b'\x00\x01\x02'),
+    ]:
+        assert data_decode(type, data_encode(type, data)) == data
+
+
+#
+def test_data_encode_passes_bytes_through_for_integer_types():
+    # pywin32 returns bytes for `REG_DWORD_BIG_ENDIAN`
+    assert data_encode(REG_DWORD_BIG_ENDIAN, b'\0\0\0\1') == b'\0\0\0\1'
+
+    assert data_encode(REG_DWORD, bytearray(b'\1\0\0\0')) == b'\1\0\0\0'
+
+    assert data_encode(REG_QWORD, memoryview(b'\1' * 8)) == b'\1' * 8
+
+
+#
+def test_value_text_big_endian_bytes():
+    assert value_text('X', REG_DWORD_BIG_ENDIAN, b'\0\0\0\1') \
+        == '"X"=hex(5):00,00,00,01'
+
+
+#
+def test_field_table_sorted_by_name():
+    table = FieldTable(
+        regkey=None,
+        names=['b', 'C', 'a'],
+        types=array('I', [REG_SZ, REG_DWORD, REG_BINARY]),
+        datas=['x', 1, b'\0'],
+    )
+
+    sorted_table = table.sorted_by_name()
+
+    assert sorted_table.names() == ['a', 'b', 'C']
+
+    assert list(sorted_table.types()) == [REG_BINARY, REG_SZ, REG_DWORD]
+
+    assert sorted_table.datas() == [b'\0', 'x', 1]
+
+    # The original table is not changed
+    assert table.names() == ['b', 'C', 'a']
+
+    # A table without data column stays without it
+    assert FieldTable(
+        regkey=None, names=['b', 'a'], types=array('I', [1, 1])
+    ).sorted_by_name().datas() is None
@@ -0,0 +1,152 @@
+# coding: utf-8
+#
+from __future__ import absolute_import
+
+from aoikregistryeditor.reference_index import ReferenceIndex
+from aoikregistryeditor.reference_index import query_entities
+from aoikregistryeditor.reference_index import reference_index_path
+from aoikregistryeditor.regval import REG_DWORD
+from aoikregistryeditor.regval import REG_DWORD_BIG_ENDIAN
+from aoikregistryeditor.regval import REG_SZ
+from aoikregistryeditor.regval import RegKeyInfo
+from aoikregistryeditor.regval import RegVal
+from aoikregistryeditor.snapshot import SnapshotFile
+from aoikregistryeditor.snapshot import snapshot_save
+
+
+#
+class _FakeRegKey(object):
+    """
+    Stand-in RegKey with given child key names and fields.
+    """
+
+    def __init__(self, child_names, fields):
+        # Child key names
+        self._child_names = child_names
+
+        # Field tuples: (name, type, data)
+        self._fields = fields
+
+    def child_names(self, cached=False):
+        return list(self._child_names)
+
+    def iter_fields(self, start=0, limit=None, with_data=False):
+        for name, type, data in self._fields:
+            yield RegVal(regkey=self, name=name, type=type, data=data)
+
+    def info(self):
+        return RegKeyInfo(
+            subkey_count=len(self._child_names),
+            value_count=len(self._fields),
+            max_subkey_name_len=0,
+            max_value_name_len=0,
+            max_value_data_len=0,
+            last_write_time=0,
+        )
+
+    def close(self):
+        pass
+
+
+#
+def _regkey_get_create(tree):
+    #
+    def regkey_get(path):
+        # Get the key's child key names and fields
+        spec = tree.get(path, None)
+
+        # Return stand-in RegKey, or None if the key not exists
+        return _FakeRegKey(*spec) if spec is not None else None
+
+    return regkey_get
+
+
+#
+def test_snapshot_save_keeps_subtree_on_field_error(tmp_path):
+    tree = {
+        'HKEY_CURRENT_USER\\A': (
+            ['B'],
+            [
+                # pywin32 returns bytes for `REG_DWORD_BIG_ENDIAN`
+                ('Big', REG_DWORD_BIG_ENDIAN, b'\0\0\0\1'),
+                # Data that can not be encoded as the field type
+                ('Bad', REG_DWORD, object()),
+                ('Name', REG_SZ, 'value'),
+            ],
+        ),
+        'HKEY_CURRENT_USER\\A\\B': ([], [('X', REG_DWORD, 1)]),
+    }
+
+    error_s = []
+
+    snapshot_path = str(tmp_path / 'a.snapshot')
+
+    with open(snapshot_path, 'wb') as out_stream:
+        stats = snapshot_save(
+            'HKEY_CURRENT_USER\\A',
+            out_stream,
+            regkey_get=_regkey_get_create(tree),
+            on_error=lambda path, exc: error_s.append(path),
+        )
+
+    # Only the field that can not be encoded is reported and skipped
+    assert error_s == ['HKEY_CURRENT_USER\\A->Bad']
+
+    assert stats['keys'] == 2
+
+    with SnapshotFile(snapshot_path) as snapshot:
+        regkey = snapshot.regkey_get('HKEY_CURRENT_USER\\A')
+
+        assert regkey.child_names() == ['B']
+
+        assert sorted(field.name() for field in regkey.fields()) \
+            == ['Big', 'Name']
+
+        assert bytes(regkey.field_raw('Big')[1]) == b'\0\0\0\1'
+
+        assert snapshot.regkey_exists('HKEY_CURRENT_USER\\A\\B')
+
+
+#
+def test_reference_index_next_to_snapshot(tmp_path):
+    guid = '{12345678-1234-1234-1234-123456789ABC}'
+
+    tree = {
+        'HKEY_CLASSES_ROOT\\A': (
+            ['B'], [('Name', REG_SZ, 'Word.Application.16')],
+        ),
+        'HKEY_CLASSES_ROOT\\A\\B': ([], [('', REG_SZ, guid)]),
+    }
+
+    snapshot_path = str(tmp_path / 'a.snapshot')
+
+    with open(snapshot_path, 'wb') as out_stream:
+        snapshot_save(
+            'HKEY_CLASSES_ROOT\\A',
+            out_stream,
+            regkey_get=_regkey_get_create(tree),
+        )
+
+    index_path = reference_index_path(snapshot_path)
+
+    assert index_path == snapshot_path + '.refs'
+
+    with SnapshotFile(snapshot_path) as snapshot:
+        index = ReferenceIndex(index_path, rebuild=True)
+
+        try:
+            assert index.build_from_snapshot(snapshot) == {'keys': 2}
+
+        finally:
+            index.close()
+
+    # Reopen the persisted index
+    index = ReferenceIndex(index_path)
+
+    try:
+        assert [
+            row[:2] for row in index.referrers(query_entities(guid))
+        ] == [('HKEY_CLASSES_ROOT\\A\\B', '')]
+
+    finally:
+        index.close()